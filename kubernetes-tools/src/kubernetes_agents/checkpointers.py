@@ -0,0 +1,555 @@
+"""
+Checkpointers for the conversation state of the agents.
+
+InMemorySaver keeps every checkpoint of every thread for the lifetime of the
+process, and the state is lost on restart. SqliteCheckpointer stores the
+checkpoints in a SQLite database, in a file or in memory, and bounds its size:
+
+- Only the latest checkpoints of every thread are kept
+- The least recently used threads are evicted once there are too many threads
+  or the stored data exceeds a size cap
+- Tool results of earlier turns can be compacted to a short note, since the
+  agents only need the latest results in full
+
+The agents use get_default_checkpointer() unless a checkpointer is passed to
+their create_*_agent function. It stores the checkpoints in the directory of
+the KUBERNETES_AGENTS_CHECKPOINT_DIR environment variable if set, in memory
+otherwise.
+
+Example:
+    checkpointer = create_checkpointer("/var/lib/agents/pod_agent.sqlite", max_threads=1000)
+    agent = create_pod_agent(models.get_chat_model(), checkpointer=checkpointer)
+"""
+from __future__ import annotations
+
+import functools
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from kubernetes_agents import models
+
+CHECKPOINT_DIR_ENV = "KUBERNETES_AGENTS_CHECKPOINT_DIR"
+
+IN_MEMORY = ":memory:"
+
+DEFAULT_MAX_THREADS = 100
+DEFAULT_MAX_CHECKPOINTS_PER_THREAD = 10
+
+MESSAGES_CHANNEL = "messages"
+COMPACTED_TOOL_RESULT = "Result of an earlier tool call, removed to save space. Call the tool again if it is needed."
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    task_path TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SqliteCheckpointer(BaseCheckpointSaver[str]):
+    """
+    Checkpointer storing the checkpoints in a SQLite database with bounded size.
+
+    Channel values are stored once per version like in InMemorySaver. Pruning old
+    checkpoints assumes that every checkpoint holds the full channel values, which
+    is the case for the message lists of the agents but not for DeltaChannels.
+
+    Args:
+        path: The database file (default: an in-memory database)
+        max_threads: The maximum number of threads, None for no limit (default: 100)
+        max_checkpoints_per_thread: The number of checkpoints kept per thread and
+            checkpoint namespace, None to keep all (default: 10)
+        max_bytes: The maximum size of the stored checkpoints, channel values and
+            writes in bytes, None for no limit (default: None)
+        keep_tool_results: The number of latest tool results kept in full in the
+            message list, None to keep all (default: None)
+        serde: The serializer of the checkpoints (default: the serializer of BaseCheckpointSaver)
+    """
+
+    def __init__(
+        self,
+        path: str = IN_MEMORY,
+        max_threads: Optional[int] = DEFAULT_MAX_THREADS,
+        max_checkpoints_per_thread: Optional[int] = DEFAULT_MAX_CHECKPOINTS_PER_THREAD,
+        max_bytes: Optional[int] = None,
+        keep_tool_results: Optional[int] = None,
+        *,
+        serde: Any = None
+    ):
+        super().__init__(serde=serde)
+        if max_checkpoints_per_thread is not None and max_checkpoints_per_thread < 1:
+            raise ValueError("max_checkpoints_per_thread must be at least 1")
+
+        self.path = path
+        self.max_threads = max_threads
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.max_bytes = max_bytes
+        self.keep_tool_results = keep_tool_results
+
+        # The graph runs nodes in a thread pool, the connection is shared between them
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        if path != IN_MEMORY:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> SqliteCheckpointer:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        with self._lock:
+            if checkpoint_id:
+                row = self._connection.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                    "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id)
+                ).fetchone()
+            else:
+                row = self._connection.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                    "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns)
+                ).fetchone()
+            if row is None:
+                return None
+
+            with self._connection:
+                self._touch(thread_id)
+            return self._checkpoint_tuple(thread_id, checkpoint_ns, row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        conditions: List[str] = []
+        parameters: List[Any] = []
+        if config is not None:
+            conditions.append("thread_id = ?")
+            parameters.append(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                conditions.append("checkpoint_ns = ?")
+                parameters.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                conditions.append("checkpoint_id = ?")
+                parameters.append(checkpoint_id)
+        if before is not None and (before_checkpoint_id := get_checkpoint_id(before)):
+            conditions.append("checkpoint_id < ?")
+            parameters.append(before_checkpoint_id)
+
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            "metadata_type, metadata FROM checkpoints"
+        )
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._connection.execute(query, parameters).fetchall()
+
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            with self._lock:
+                checkpoint_tuple = self._checkpoint_tuple(thread_id, checkpoint_ns, row)
+            if limit is not None:
+                limit -= 1
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        stored_checkpoint = checkpoint.copy()
+        values: Dict[str, Any] = stored_checkpoint.pop("channel_values")
+
+        blobs = []
+        for channel, version in new_versions.items():
+            if channel in values:
+                value = values[channel]
+                if channel == MESSAGES_CHANNEL and self.keep_tool_results is not None:
+                    value = compact_tool_results(value, self.keep_tool_results)
+                value_type, blob = self.serde.dumps_typed(value)
+            else:
+                value_type, blob = "empty", None
+            blobs.append((thread_id, checkpoint_ns, channel, str(version), value_type, blob))
+
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(stored_checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                    checkpoint_type, checkpoint_blob, metadata_type, metadata_blob
+                )
+            )
+            self._touch(thread_id)
+            self._prune_checkpoints(thread_id, checkpoint_ns)
+            self._evict_threads(thread_id)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, blob = self.serde.dumps_typed(value)
+            rows.append((
+                thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                channel, value_type, blob, task_path
+            ))
+
+        # Regular writes of a task are stored once, special writes (errors, interrupts) replaced
+        with self._lock, self._connection:
+            for row in rows:
+                verb = "INSERT OR IGNORE" if row[4] >= 0 else "INSERT OR REPLACE"
+                self._connection.execute(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self._connection:
+            self._delete_threads([thread_id])
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        for checkpoint_tuple in self.list(config, filter=filter, before=before, limit=limit):
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same format as InMemorySaver, so the versions sort as strings
+        if current is None:
+            current_version = 0
+        elif isinstance(current, int):
+            current_version = current
+        else:
+            current_version = int(current.split(".")[0])
+        return f"{current_version + 1:032}.{random.random():016}"
+
+    def thread_ids(self) -> List[str]:
+        """Get the ids of the stored threads, the most recently used first."""
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT thread_id FROM threads ORDER BY last_used DESC")]
+
+    def size(self) -> int:
+        """Get the size of the stored checkpoints, channel values and writes in bytes."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT "
+                "(SELECT IFNULL(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints) + "
+                "(SELECT IFNULL(SUM(LENGTH(blob)), 0) FROM blobs) + "
+                "(SELECT IFNULL(SUM(LENGTH(value)), 0) FROM writes)"
+            ).fetchone()[0]
+
+    def _checkpoint_tuple(self, thread_id: str, checkpoint_ns: str, row: Sequence[Any]) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint_blob, metadata_type, metadata_blob = row
+        checkpoint: Checkpoint = self.serde.loads_typed((checkpoint_type, checkpoint_blob))
+
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob_row = self._connection.execute(
+                "SELECT type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version))
+            ).fetchone()
+            if blob_row is not None and blob_row[0] != "empty":
+                channel_values[channel] = self.serde.loads_typed(blob_row)
+
+        writes = self._connection.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+            parent_config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_checkpoint_id,
+                }
+            } if parent_checkpoint_id else None
+        )
+
+    def _touch(self, thread_id: str) -> None:
+        self._connection.execute("INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, time.time()))
+
+    def _prune_checkpoints(self, thread_id: str, checkpoint_ns: str) -> None:
+        if self.max_checkpoints_per_thread is None:
+            return
+
+        rows = self._connection.execute(
+            "SELECT checkpoint_id, type, checkpoint FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC",
+            (thread_id, checkpoint_ns)
+        ).fetchall()
+        if len(rows) <= self.max_checkpoints_per_thread:
+            return
+
+        kept, pruned = rows[:self.max_checkpoints_per_thread], rows[self.max_checkpoints_per_thread:]
+        self._connection.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id, _, _ in pruned]
+        )
+        self._connection.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id, _, _ in pruned]
+        )
+
+        # Channel values are shared between checkpoints, only unreferenced versions are deleted
+        referenced: Set[Tuple[str, str]] = set()
+        for _, checkpoint_type, checkpoint_blob in kept:
+            checkpoint = self.serde.loads_typed((checkpoint_type, checkpoint_blob))
+            referenced.update((channel, str(version)) for channel, version in checkpoint["channel_versions"].items())
+        stored = self._connection.execute(
+            "SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns)
+        ).fetchall()
+        self._connection.executemany(
+            "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+            [(thread_id, checkpoint_ns, channel, version) for channel, version in stored if (channel, version) not in referenced]
+        )
+
+    def _evict_threads(self, current_thread_id: str) -> None:
+        # The thread being written is never evicted, even if it alone exceeds max_bytes
+        thread_ids = [
+            row[0] for row in self._connection.execute(
+                "SELECT thread_id FROM threads WHERE thread_id != ? ORDER BY last_used",
+                (current_thread_id,)
+            )
+        ]
+
+        evicted = []
+        if self.max_threads is not None:
+            excess = len(thread_ids) + 1 - self.max_threads
+            if excess > 0:
+                evicted, thread_ids = thread_ids[:excess], thread_ids[excess:]
+                self._delete_threads(evicted)
+
+        if self.max_bytes is not None:
+            while thread_ids and self.size() > self.max_bytes:
+                self._delete_threads([thread_ids.pop(0)])
+
+    def _delete_threads(self, thread_ids: Sequence[str]) -> None:
+        parameters = [(thread_id,) for thread_id in thread_ids]
+        for table in ("threads", "checkpoints", "blobs", "writes"):
+            self._connection.executemany(f"DELETE FROM {table} WHERE thread_id = ?", parameters)
+
+
+def compact_tool_results(messages: Any, keep: int) -> Any:
+    """
+    Replace the content of all but the latest tool results in a message list by a short note.
+
+    Args:
+        messages: The value of the messages channel
+        keep: The number of latest tool results kept in full
+
+    Returns:
+        The message list with compacted tool results, the messages are not modified
+    """
+    if not isinstance(messages, list):
+        return messages
+
+    tool_message_indexes = [index for index, message in enumerate(messages) if isinstance(message, ToolMessage)]
+    compacted_indexes = tool_message_indexes[:max(len(tool_message_indexes) - keep, 0)]
+    if not compacted_indexes:
+        return messages
+
+    messages = list(messages)
+    for index in compacted_indexes:
+        if messages[index].content != COMPACTED_TOOL_RESULT:
+            messages[index] = messages[index].model_copy(update={"content": COMPACTED_TOOL_RESULT, "artifact": None})
+    return messages
+
+
+def create_checkpointer(
+    path: Optional[str] = None,
+    max_threads: Optional[int] = DEFAULT_MAX_THREADS,
+    max_checkpoints_per_thread: Optional[int] = DEFAULT_MAX_CHECKPOINTS_PER_THREAD,
+    max_bytes: Optional[int] = None,
+    keep_tool_results: Optional[int] = None
+) -> SqliteCheckpointer:
+    """
+    Create a checkpointer for an agent.
+
+    Args:
+        path: The SQLite database file, created if it does not exist (default: in memory)
+        max_threads: The maximum number of threads, None for no limit (default: 100)
+        max_checkpoints_per_thread: The number of checkpoints kept per thread, None to keep all (default: 10)
+        max_bytes: The maximum size of the stored state in bytes, None for no limit (default: None)
+        keep_tool_results: The number of latest tool results kept in full, None to keep all (default: None)
+
+    Returns:
+        The SqliteCheckpointer
+
+    Example:
+        checkpointer = create_checkpointer("agents.sqlite", max_bytes=100 * 1024 * 1024, keep_tool_results=5)
+    """
+    if path is not None and path != IN_MEMORY:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    return SqliteCheckpointer(
+        path=path or IN_MEMORY,
+        max_threads=max_threads,
+        max_checkpoints_per_thread=max_checkpoints_per_thread,
+        max_bytes=max_bytes,
+        keep_tool_results=keep_tool_results
+    )
+
+
+@functools.cache
+def get_default_checkpointer(agent_name: str) -> SqliteCheckpointer:
+    """
+    Get the checkpointer used by an agent unless another one is passed to it.
+
+    Every agent has its own database, so that agents using the same thread ids do not
+    share their state. The database is stored in the directory of the
+    KUBERNETES_AGENTS_CHECKPOINT_DIR environment variable (or .env file) if set,
+    in memory otherwise.
+
+    Args:
+        agent_name: The name of the agent, used as name of the database file
+
+    Returns:
+        The SqliteCheckpointer of the agent, shared by all callers using the same name
+    """
+    models.load_environment()
+    directory = os.environ.get(CHECKPOINT_DIR_ENV)
+    if directory:
+        return create_checkpointer(os.path.join(directory, f"{agent_name}.sqlite"))
+    return create_checkpointer()
@@ -1,6 +1,8 @@
+import functools
+from typing import Optional
+
 from langchain.agents import create_agent
-from langchain.chat_models import init_chat_model
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from kubernetes_tools.agent_tools import (
     get_pods_by_labels,
@@ -9,9 +11,7 @@ from kubernetes_tools.agent_tools import (
     test_pod_connectivity
 )
 
-from dotenv import load_dotenv
-
-load_dotenv()
+from kubernetes_agents import checkpointers, models
 
 SYSTEM_PROMPT = """
 You are a Kubernetes Pod connectivity agent. Your role is to
@@ -30,8 +30,6 @@ For testing connectivity between pods, follow these steps:
 5. Test the pods connectivity from the source pod to the target pods IP, port and protocol
 """
 
-checkpointer = InMemorySaver()
-
 tools = [
     # TODO: Add get_pod_by_name if needed in future and see whether in
     # a multi agent environment get_pods_by_labels could be delegated to Pod Agent
@@ -45,19 +43,26 @@ tools = [
 
 def create_debug_connectivity_agent(
     agent_model,
+    checkpointer: Optional[BaseCheckpointSaver] = None
 ):
     agent = create_agent(
         model=agent_model,
         system_prompt=SYSTEM_PROMPT,
         tools=tools,
-        checkpointer=checkpointer
+        checkpointer=checkpointer or checkpointers.get_default_checkpointer(__name__)
     )
     return agent
 
-debug_connectivity_agent = create_debug_connectivity_agent(
-    agent_model=init_chat_model(
-        "gpt-5-nano",
-        temperature=0,
-        timeout=60,
-        max_tokens=4000),
-)
+
+@functools.cache
+def _default_agent():
+    return create_debug_connectivity_agent(agent_model=models.get_chat_model("gpt-5-nano"))
+
+
+def __getattr__(name):
+    # The default agent and checkpointer are created on first access, not at import time
+    if name == "checkpointer":
+        return checkpointers.get_default_checkpointer(__name__)
+    if name == "debug_connectivity_agent":
+        return _default_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
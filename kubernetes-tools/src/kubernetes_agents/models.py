@@ -0,0 +1,46 @@
+"""
+Lazily created chat models shared by the agents.
+
+Loading the .env file and initializing a chat model is deferred until an agent
+is first used, so importing an agent module stays cheap and works without API keys.
+"""
+import functools
+
+from dotenv import load_dotenv
+from langchain.chat_models import init_chat_model
+
+DEFAULT_MODEL = "gpt-5-nano"
+
+
+@functools.cache
+def load_environment() -> None:
+    """Load the .env file once per process."""
+    load_dotenv()
+
+
+@functools.cache
+def get_chat_model(
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0,
+    timeout: int = 60,
+    max_tokens: int = 4000
+):
+    """
+    Get the chat model with the given settings, initializing it on first use.
+
+    Args:
+        model: The model name (default: "gpt-5-nano")
+        temperature: The sampling temperature (default: 0)
+        timeout: The request timeout in seconds (default: 60)
+        max_tokens: The maximum number of tokens to generate (default: 4000)
+
+    Returns:
+        The chat model, shared by all callers using the same settings
+    """
+    load_environment()
+    return init_chat_model(
+        model,
+        temperature=temperature,
+        timeout=timeout,
+        max_tokens=max_tokens
+    )
@@ -1,6 +1,8 @@
+import functools
+from typing import Optional
+
 from langchain.agents import create_agent
-from langchain.chat_models import init_chat_model
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from kubernetes_tools.agent_tools import (
     get_network_policies_for_pod,
@@ -8,9 +10,7 @@ from kubernetes_tools.agent_tools import (
     contains_egress_rule
 )
 
-from dotenv import load_dotenv
-
-load_dotenv()
+from kubernetes_agents import checkpointers, models
 
 SYSTEM_PROMPT = """
 You are a Kubernetes NetworkPolicy Agent. Your role is to retrieve
@@ -22,8 +22,6 @@ You have access to the following tools:
 * Check if a network policy contains an egress rule matching specified port, peer selector, and protocol
 """
 
-checkpointer = InMemorySaver()
-
 tools = [
     get_network_policies_for_pod,
     contains_ingress_rule,
@@ -32,19 +30,26 @@ tools = [
 
 def create_nwp_agent(
     agent_model,
+    checkpointer: Optional[BaseCheckpointSaver] = None
 ):
     pod_agent = create_agent(
         model=agent_model,
         system_prompt=SYSTEM_PROMPT,
         tools=tools,
-        checkpointer=checkpointer
+        checkpointer=checkpointer or checkpointers.get_default_checkpointer(__name__)
     )
     return pod_agent
 
-nwp_agent = create_nwp_agent(
-    agent_model=init_chat_model(
-        "gpt-5-nano",
-        temperature=0,
-        timeout=60,
-        max_tokens=4000),
-)
+
+@functools.cache
+def _default_agent():
+    return create_nwp_agent(agent_model=models.get_chat_model("gpt-5-nano"))
+
+
+def __getattr__(name):
+    # The default agent and checkpointer are created on first access, not at import time
+    if name == "checkpointer":
+        return checkpointers.get_default_checkpointer(__name__)
+    if name == "nwp_agent":
+        return _default_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
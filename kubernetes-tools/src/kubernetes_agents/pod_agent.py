@@ -1,14 +1,14 @@
+import functools
+from typing import Optional
+
 from langchain.agents import create_agent
-from langchain.chat_models import init_chat_model
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from kubernetes_tools.pods import (
     get_pods_by_labels
 )
 
-from dotenv import load_dotenv
-
-load_dotenv()
+from kubernetes_agents import checkpointers, models
 
 SYSTEM_PROMPT = """
 You are a Kubernetes Pod Agent. Your role is to retrieve Pods information
@@ -17,29 +17,32 @@ based on label selector and namespace. You have access to the following tools:
 * Retrieve pod information by labels and namespace
 """
 
-checkpointer = InMemorySaver()
-
 tools = [
     get_pods_by_labels,
 ]
 
 def create_pod_agent(
     agent_model,
+    checkpointer: Optional[BaseCheckpointSaver] = None
 ):
     pod_agent = create_agent(
         model=agent_model,
         system_prompt=SYSTEM_PROMPT,
         tools=tools,
-        checkpointer=checkpointer
+        checkpointer=checkpointer or checkpointers.get_default_checkpointer(__name__)
     )
     return pod_agent
 
 
+@functools.cache
+def _default_agent():
+    return create_pod_agent(agent_model=models.get_chat_model("gpt-5-nano"))
 
-agent = create_pod_agent(
-    agent_model=init_chat_model(
-        "gpt-5-nano",
-        temperature=0,
-        timeout=60,
-        max_tokens=4000),
-)
+
+def __getattr__(name):
+    # The default agent and checkpointer are created on first access, not at import time
+    if name == "checkpointer":
+        return checkpointers.get_default_checkpointer(__name__)
+    if name == "agent":
+        return _default_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
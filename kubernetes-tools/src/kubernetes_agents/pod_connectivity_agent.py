@@ -1,6 +1,8 @@
+import functools
+from typing import Optional
+
 from langchain.agents import create_agent
-from langchain.chat_models import init_chat_model
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from kubernetes_tools.agent_tools import (
     get_pod_by_name,
@@ -10,12 +12,13 @@ from kubernetes_tools.agent_tools import (
     get_network_policies_for_pod,
     check_network_policy_allows_ingress,
     check_network_policy_allows_egress,
-    test_pod_connectivity
+    test_pod_connectivity,
+    test_pod_connectivity_batch,
+    diagnose_pod_connectivity,
+    check_pod_egress_to_ip
 )
 
-from dotenv import load_dotenv
-
-load_dotenv()
+from kubernetes_agents import checkpointers, models
 
 SYSTEM_PROMPT = """
 You are a Kubernetes Pod Connectivity Agent. Your role is to assist users in diagnosing
@@ -26,7 +29,13 @@ connectivity issues between pods within the same namespace. You have access to v
 * Check if pods expose specific ports
 * Fetch network policies affecting pods
 * Check for specific ingress and egress rules in network policies
+* Check whether the network policies allow egress from a pod to an IP address, e.g. outside of the cluster
 * Test connectivity between pods using ephemeral debug containers with netcat
+* Test connectivity to many targets or ports at once from a single ephemeral debug container
+* Diagnose the connectivity between two pods with all of the steps below in a single call
+
+Start with the diagnose_pod_connectivity tool. Only use the individual tools to investigate its findings
+further. It runs the following steps, which you can also run one by one.
 
 When analyzing connectivity issues:
 1. First, get the source and target pods by their name / labels and namespace
@@ -38,15 +47,6 @@ When analyzing connectivity issues:
 7. If policies look correct, test actual connectivity using the test_pod_connectivity tool
 """
 
-model = init_chat_model(
-    "claude-sonnet-4-5-20250929",
-    temperature=0,
-    timeout=60,
-    max_tokens=4000
-)
-
-checkpointer = InMemorySaver()
-
 tools = [
     get_pod_by_name,
     get_pods_by_labels,
@@ -55,12 +55,37 @@ tools = [
     get_network_policies_for_pod,
     check_network_policy_allows_ingress,
     check_network_policy_allows_egress,
-    test_pod_connectivity
+    test_pod_connectivity,
+    test_pod_connectivity_batch,
+    diagnose_pod_connectivity,
+    check_pod_egress_to_ip
 ]
 
-agent = create_agent(
-    model=model,
-    system_prompt=SYSTEM_PROMPT,
-    tools=tools,
-    checkpointer=checkpointer
-)
+
+def create_pod_connectivity_agent(
+    agent_model,
+    checkpointer: Optional[BaseCheckpointSaver] = None
+):
+    agent = create_agent(
+        model=agent_model,
+        system_prompt=SYSTEM_PROMPT,
+        tools=tools,
+        checkpointer=checkpointer or checkpointers.get_default_checkpointer(__name__)
+    )
+    return agent
+
+
+@functools.cache
+def _default_agent():
+    return create_pod_connectivity_agent(agent_model=models.get_chat_model("claude-sonnet-4-5-20250929"))
+
+
+def __getattr__(name):
+    # The model, the agent and the checkpointer are created on first access, not at import time
+    if name == "checkpointer":
+        return checkpointers.get_default_checkpointer(__name__)
+    if name == "model":
+        return models.get_chat_model("claude-sonnet-4-5-20250929")
+    if name == "agent":
+        return _default_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
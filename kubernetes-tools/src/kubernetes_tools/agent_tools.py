@@ -9,12 +9,20 @@ TODO: AI generated wrapper code => Review and derive better return values
 for example for the network policies which should not just return names
 but should also return the full content of the policies or at least their rules.
 """
+import itertools
+
 from pydantic import BaseModel
 from typing import Optional, List, Dict
-from langchain_core.tools import tool
+from langchain_core.tools import BaseTool, tool
 from kubernetes import client
 
-from kubernetes_tools import pods, networkpolicy, debug
+from kubernetes_tools import pods, networkpolicy, debug, diagnosis, fastjson, informer, instrumentation, projection, tool_cache
+
+# The resources read-only tools depend on, see tool_cache.cached()
+PODS_IN_NAMESPACE = (informer.PODS, "namespace")
+PODS_IN_NAMESPACES = (informer.PODS, "namespaces")
+NETWORK_POLICIES_IN_NAMESPACE = (informer.NETWORK_POLICIES, "namespace")
+NETWORK_POLICIES_IN_NAMESPACES = (informer.NETWORK_POLICIES, "namespaces")
 
 class ExposedContainerPort(BaseModel):
     container_name: str
@@ -26,34 +34,40 @@ class PortConnectivityResult(BaseModel):
     command: str
 
 @tool(parse_docstring=True)
+@tool_cache.cached(PODS_IN_NAMESPACE)
 def get_pod_by_name(
     name: str,
-    namespace: str = "default"
+    namespace: str = "default",
+    fields: Optional[List[str]] = None
 ) -> Optional[dict]:
     """
-    Get a pod by name from a specific namespace and return its client.V1Pod
-    representation as a dict.
+    Get a pod by name from a specific namespace and return a compact summary of it.
 
     Args:
         name: The name of the pod to retrieve
         namespace: The Kubernetes namespace where the pod is located (default: "default")
+        fields: The fields to return. Either field names (name, namespace, labels, ips, ports, phase, node, images)
+            or field sets ("metadata", "network", "default", "all"). Defaults to all fields except images
 
     Returns:
-        client.V1Pod as a dict
+        The selected fields of the pod as a dict, None if the pod doesn't exist
 
     Example:
-        pod_info = get_pod_by_name(name="backend", namespace="test-app")
+        pod_info = get_pod_by_name(name="backend", namespace="test-app", fields=["network", "images"])
         if pod_info:
-            print(f"Pod image: {pod_info['spec']['containers'][0]['image']}")
+            print(f"Pod image: {pod_info['images'][0]}")
     """
-    pod = pods.get_pod_by_name(name=name, namespace=namespace)
+    pod = pods.get_pod_by_name(name=name, namespace=namespace, raw=True)
     if pod:
-        return pod.to_dict()
+        return projection.summarize_pod(pod, fields)
     return None
 
+@tool_cache.cached(PODS_IN_NAMESPACE)
 def get_pods_by_labels(
     labels: dict,
-    namespace: str = "default"
+    namespace: str = "default",
+    fields: Optional[List[str]] = None,
+    max_results: int = 100
 ) -> list[dict]:
     """
     Get pods by labels from a specific namespace.
@@ -61,21 +75,30 @@ def get_pods_by_labels(
     Args:
         labels: A dict, containing the labels of the pods to retrieve as key-value pairs (e.g., {"name": "db"})
         namespace: The Kubernetes namespace where the pods are located (default: "default")
+        fields: The fields to return. Either field names (name, namespace, labels, ips, ports, phase, node, images)
+            or field sets ("metadata", "network", "default", "all"). Defaults to all fields except images
+        max_results: The maximum number of pods to return (default: 100)
 
     Returns:
-        A list of dictionaries representing the pods matching the labels or an empty list if none found
+        A list of dicts with the selected fields of the pods matching the labels or an empty list if none found
 
     Example:
         pods = get_pods_by_labels_tool(labels={"app": "backend"}, namespace="default")
         for pod in pods:
-            print(f"Found pod: {pod['metadata']['name']}")
+            print(f"Found pod: {pod['name']}")
     """
-
-    pod_list = pods.get_pods_by_labels(labels, namespace)
-    return [pod.to_dict() for pod in pod_list.items]
+    # Stops requesting further pages once max_results pods have been read
+    summaries = projection.iter_pod_summaries(
+        namespace,
+        labels,
+        fields,
+        page_size=min(max_results, pods.DEFAULT_PAGE_SIZE)
+    )
+    return [summary.to_dict(fields) for summary in itertools.islice(summaries, max_results)]
 
 
 @tool(parse_docstring=True)
+@tool_cache.cached(PODS_IN_NAMESPACE)
 def get_pod_ip_addresses(
     pod_name: str,
     namespace: str = "default"
@@ -95,7 +118,7 @@ def get_pod_ip_addresses(
         if ips:
             print(f"Pod IPs: {ips}")
     """
-    pod = pods.get_pod_by_name(name=pod_name, namespace=namespace)
+    pod = pods.get_pod_by_name(name=pod_name, namespace=namespace, raw=True)
     if pod is None:
         return None
     
@@ -103,6 +126,7 @@ def get_pod_ip_addresses(
 
 
 @tool(parse_docstring=True)
+@tool_cache.cached(PODS_IN_NAMESPACE)
 def check_pod_exposes_port(
     pod_name: str,
     namespace: str,
@@ -147,6 +171,7 @@ def check_pod_exposes_port(
 
 
 @tool(parse_docstring=True)
+@tool_cache.cached(PODS_IN_NAMESPACE, NETWORK_POLICIES_IN_NAMESPACE)
 def get_network_policies_for_pod(
     pod_name: str,
     namespace: str
@@ -159,22 +184,84 @@ def get_network_policies_for_pod(
         namespace: The Kubernetes namespace where the pod is located
 
     Returns:
-        List of NetworkPolicies as a dict that match the pod
+        List of NetworkPolicies in their JSON representation that match the pod
 
     Example:
         policies = get_network_policies_for_pod(pod_name="backend", namespace="test-app")
         for policy in policies:
             print(f"Matching policy name: {policy['metadata']['name']}")
     """
-    pod = pods.get_pod_by_name(name=pod_name, namespace=namespace)
+    pod = pods.get_pod_by_name(name=pod_name, namespace=namespace, raw=True)
     if pod is None:
         return []
     
-    policies = networkpolicy.get_network_policies_matching_pod(pod)
-    return [policy.to_dict()for policy in policies]
+    policies = networkpolicy.get_network_policies_matching_pod(pod, raw=True)
+    return [fastjson.as_json_dict(policy) for policy in policies]
+
+
+@tool(parse_docstring=True)
+@tool_cache.cached(PODS_IN_NAMESPACES)
+def get_pods_by_labels_in_namespaces(
+    labels: Dict[str, str],
+    namespaces: Optional[List[str]] = None,
+    fields: Optional[List[str]] = None
+) -> Dict[str, List[dict]]:
+    """
+    Get pods by labels from several namespaces or from the whole cluster.
+
+    Args:
+        labels: The labels of the pods to retrieve as key-value pairs (e.g., {"app": "db"})
+        namespaces: The namespaces to search (default: all namespaces)
+        fields: The fields to return. Either field names (name, namespace, labels, ips, ports, phase, node, images)
+            or field sets ("metadata", "network", "default", "all"). Defaults to all fields except images
+
+    Returns:
+        A dict with the namespace as key and the list of matching pods as value
+
+    Example:
+        pods_by_namespace = get_pods_by_labels_in_namespaces(labels={"app": "db"})
+        for namespace, pods in pods_by_namespace.items():
+            print(f"{namespace}: {[pod['name'] for pod in pods]}")
+    """
+    pods_by_namespace = pods.get_pods_by_labels_in_namespaces(labels, namespaces)
+    return {
+        namespace: [projection.summarize_pod(pod, fields) for pod in namespace_pods]
+        for namespace, namespace_pods in pods_by_namespace.items()
+    }
+
+
+@tool(parse_docstring=True)
+@tool_cache.cached(NETWORK_POLICIES_IN_NAMESPACES)
+def get_network_policies_for_labels(
+    labels: Dict[str, str],
+    namespaces: Optional[List[str]] = None
+) -> Dict[str, List[dict]]:
+    """
+    Get the NetworkPolicies selecting pods with the given labels in several namespaces or in the whole cluster.
+
+    Args:
+        labels: The labels of the pods as key-value pairs (e.g., {"app": "db"})
+        namespaces: The namespaces to search (default: all namespaces)
+
+    Returns:
+        A dict with the namespace as key and the list of matching NetworkPolicies as dicts as value
+
+    Example:
+        policies_by_namespace = get_network_policies_for_labels(labels={"app": "db"})
+        for namespace, policies in policies_by_namespace.items():
+            print(f"{namespace}: {[policy['metadata']['name'] for policy in policies]}")
+    """
+    policies_by_namespace = networkpolicy.get_network_policies_matching_labels_in_namespaces(
+        labels, namespaces, raw=True
+    )
+    return {
+        namespace: [fastjson.as_json_dict(policy) for policy in policies]
+        for namespace, policies in policies_by_namespace.items()
+    }
 
 
 @tool(parse_docstring=True)
+@tool_cache.cached(NETWORK_POLICIES_IN_NAMESPACE)
 def check_network_policy_allows_ingress(
     policy_name: str,
     namespace: str,
@@ -189,7 +276,8 @@ def check_network_policy_allows_ingress(
         policy_name: The name of the NetworkPolicy to check
         namespace: The namespace where the NetworkPolicy is located
         port: The port number to match
-        peer_selector: Pod selector labels to match (e.g., {"app": "backend"})
+        peer_selector: Labels of the source pod of the traffic (e.g., {"app": "backend"}), evaluated against
+            the pod selectors of the ingress rules. A selector matches pods having at least its labels
         protocol: The protocol to match (default: "TCP")
 
     Returns:
@@ -203,18 +291,10 @@ def check_network_policy_allows_ingress(
             peer_selector={"app": "backend"}
         )
     """
-    networking_v1 = client.NetworkingV1Api()
-    
-    try:
-        network_policy = networking_v1.read_namespaced_network_policy(
-            name=policy_name,
-            namespace=namespace
-        )
-    except client.exceptions.ApiException as e:
-        if e.status == 404:
-            return False
-        raise
-    
+    network_policy = networkpolicy.read_network_policy(name=policy_name, namespace=namespace)
+    if network_policy is None:
+        return False
+
     return networkpolicy.contains_ingress_rule(
         network_policy=network_policy,
         port=port,
@@ -224,6 +304,7 @@ def check_network_policy_allows_ingress(
 
 
 @tool(parse_docstring=True)
+@tool_cache.cached(NETWORK_POLICIES_IN_NAMESPACE)
 def check_network_policy_allows_egress(
     policy_name: str,
     namespace: str,
@@ -238,7 +319,8 @@ def check_network_policy_allows_egress(
         policy_name: The name of the NetworkPolicy to check
         namespace: The namespace where the NetworkPolicy is located
         port: The port number to match
-        selector: Pod selector labels to match (e.g., {"app": "mysql"})
+        selector: Labels of the destination pod of the traffic (e.g., {"app": "mysql"}), evaluated against
+            the pod selectors of the egress rules. A selector matches pods having at least its labels
         protocol: The protocol to match (default: "TCP")
 
     Returns:
@@ -252,18 +334,10 @@ def check_network_policy_allows_egress(
             selector={"app": "mysql"}
         )
     """
-    networking_v1 = client.NetworkingV1Api()
-    
-    try:
-        network_policy = networking_v1.read_namespaced_network_policy(
-            name=policy_name,
-            namespace=namespace
-        )
-    except client.exceptions.ApiException as e:
-        if e.status == 404:
-            return False
-        raise
-    
+    network_policy = networkpolicy.read_network_policy(name=policy_name, namespace=namespace)
+    if network_policy is None:
+        return False
+
     return networkpolicy.contains_egress_rule(
         network_policy=network_policy,
         port=port,
@@ -272,6 +346,47 @@ def check_network_policy_allows_egress(
     )
 
 
+@tool(parse_docstring=True)
+@tool_cache.cached(PODS_IN_NAMESPACE, NETWORK_POLICIES_IN_NAMESPACE)
+def check_pod_egress_to_ip(
+    pod_name: str,
+    namespace: str,
+    ip: str,
+    port: int,
+    protocol: str = "TCP"
+) -> Optional[dict]:
+    """
+    Check whether the NetworkPolicies of a pod allow egress traffic to an IP address and port,
+    e.g. to a service outside of the cluster. The ipBlock rules of the policies, including their
+    except ranges, are evaluated for IPv4 and IPv6 addresses.
+
+    Args:
+        pod_name: The name of the pod
+        namespace: The Kubernetes namespace where the pod is located
+        ip: The destination IPv4 or IPv6 address
+        port: The destination port
+        protocol: The protocol (default: "TCP")
+
+    Returns:
+        A dict with "allowed" (bool), "isolated" (whether any policy restricts the egress of the pod)
+        and "policies" (the names of the policies allowing the traffic), None if the pod doesn't exist
+
+    Example:
+        result = check_pod_egress_to_ip(pod_name="backend", namespace="test-app", ip="10.2.3.4", port=443)
+        print(f"Allowed: {result['allowed']} by {result['policies']}")
+    """
+    pod = pods.get_pod_by_name(name=pod_name, namespace=namespace, raw=True)
+    if pod is None:
+        return None
+
+    policies = networkpolicy.get_network_policies_allowing_egress_to_ip(pod, ip, port, protocol)
+    return {
+        "allowed": policies is None or bool(policies),
+        "isolated": policies is not None,
+        "policies": [policy.metadata.name for policy in policies or []],
+    }
+
+
 @tool(parse_docstring=True)
 def test_pod_connectivity(
     source_pod_name: str,
@@ -280,7 +395,8 @@ def test_pod_connectivity(
     target_port: int,
     protocol: str = "TCP",
     timeout: int = 5,
-    image: str = "nicolaka/netshoot"
+    image: str = "nicolaka/netshoot",
+    reuse_probe_container: bool = False
 ) -> PortConnectivityResult:
     """
     Test connectivity from a source pod to a target IP and port using netcat in an ephemeral container.
@@ -295,6 +411,8 @@ def test_pod_connectivity(
         protocol: The protocol to use (default: "TCP")
         timeout: Connection timeout in seconds (default: 5)
         image: The container image to use for debugging (default: "nicolaka/netshoot")
+        reuse_probe_container: If True, run the test in a long-running probe container of the source pod which is
+            reused by later tests instead of adding a new ephemeral container (default: False)
 
     Returns:
         An object of type PortConnectivityResult containing the output, success status, and command used
@@ -318,13 +436,22 @@ def test_pod_connectivity(
     )
     
     # Run the debug command
-    output, success = debug.run_debug_command(
-        namespace=namespace,
-        pod_name=source_pod_name,
-        command=command,
-        image=image,
-        max_wait=timeout + 30  # Give extra time for container to start
-    )
+    if reuse_probe_container:
+        output, success = debug.run_persistent_probe_command(
+            namespace=namespace,
+            pod_name=source_pod_name,
+            command=command,
+            image=image,
+            max_wait=timeout + 30
+        )
+    else:
+        output, success = debug.run_debug_command(
+            namespace=namespace,
+            pod_name=source_pod_name,
+            command=command,
+            image=image,
+            max_wait=timeout + 30  # Give extra time for container to start
+        )
     
     return PortConnectivityResult(
         output=output,
@@ -333,19 +460,21 @@ def test_pod_connectivity(
     )
 
 @tool(parse_docstring=True)
+@tool_cache.cached(NETWORK_POLICIES_IN_NAMESPACE)
 def contains_ingress_rule(network_policy_name: str, namespace: str, port: int, peer_selector: dict, protocol: str = "TCP") -> bool:
     """
-    Check if a network policy contains an ingress rule matching the specified port, the selector of the peer pod, and protocol.
+    Check if a network policy contains an ingress rule matching the specified port, the labels of the peer pod, and protocol.
 
     Args:
         network_policy_name: The name of the V1NetworkPolicy to check
         namespace: The namespace where the NetworkPolicy is located
-        port: The port number of the egress traffic
-        peer_selector: Pod selector labels to match (e.g., {"app": "pod-a"}) for the target of the ingress rule
+        port: The port number of the ingress traffic
+        peer_selector: Labels of the source pod of the traffic (e.g., {"app": "pod-a"}), evaluated against
+            the pod selectors of the ingress rules. A selector matches pods having at least its labels
         protocol: The protocol to match (default: "TCP")
 
     Returns:
-        True if the network policy contains a matching ingress rule, False otherwise
+        True if the network policy contains a matching ingress rule, False otherwise or if the policy doesn't exist
 
     Example:
         allowed = contains_ingress_rule(
@@ -356,12 +485,9 @@ def contains_ingress_rule(network_policy_name: str, namespace: str, port: int, p
             protocol="TCP"
         )
     """
-    networking_v1 = client.NetworkingV1Api()
-
-    network_policy = networking_v1.read_namespaced_network_policy(
-        name=network_policy_name,
-        namespace=namespace
-    )
+    network_policy = networkpolicy.read_network_policy(name=network_policy_name, namespace=namespace)
+    if network_policy is None:
+        return False
 
     return networkpolicy.contains_ingress_rule(
         network_policy=network_policy,
@@ -371,19 +497,21 @@ def contains_ingress_rule(network_policy_name: str, namespace: str, port: int, p
     )
 
 @tool(parse_docstring=True)
+@tool_cache.cached(NETWORK_POLICIES_IN_NAMESPACE)
 def contains_egress_rule(network_policy_name: str, namespace: str, port: int, peer_selector: dict, protocol: str = "TCP") -> bool:
     """
-    Check if a network policy contains an egress rule matching the specified port, the selector of the peer pod, and protocol.
+    Check if a network policy contains an egress rule matching the specified port, the labels of the peer pod, and protocol.
 
     Args:
         network_policy_name: The name of the V1NetworkPolicy to check
         namespace: The namespace where the NetworkPolicy is located
         port: The port number of the egress traffic
-        peer_selector: Pod selector labels to match (e.g., {"app": "pod-a"}) for the target of the egress rule
+        peer_selector: Labels of the destination pod of the traffic (e.g., {"app": "pod-b"}), evaluated against
+            the pod selectors of the egress rules. A selector matches pods having at least its labels
         protocol: The protocol to match (default: "TCP")
 
     Returns:
-        True if the network policy contains a matching egress rule, False otherwise
+        True if the network policy contains a matching egress rule, False otherwise or if the policy doesn't exist
 
     Example:
         allowed = contains_egress_rule(
@@ -394,16 +522,342 @@ def contains_egress_rule(network_policy_name: str, namespace: str, port: int, pe
             protocol="TCP"
         )
     """
-    networking_v1 = client.NetworkingV1Api()
+    network_policy = networkpolicy.read_network_policy(name=network_policy_name, namespace=namespace)
+    if network_policy is None:
+        return False
 
-    network_policy = networking_v1.read_namespaced_network_policy(
-        name=network_policy_name,
-        namespace=namespace
+    return networkpolicy.contains_egress_rule(
+        network_policy=network_policy,
+        port=port,
+        selector=peer_selector,
+        protocol=protocol
     )
 
-    return networkpolicy.contains_egress_rule(
+@tool(parse_docstring=True)
+def test_pod_connectivity_batch(
+    source_pod_name: str,
+    namespace: str,
+    targets: List[debug.ProbeTarget],
+    image: str = "nicolaka/netshoot"
+) -> List[PortConnectivityResult]:
+    """
+    Test connectivity from a source pod to many target IPs and ports at once.
+    All netcat probes run in parallel inside a single ephemeral container within the source pod,
+    so prefer this tool over test_pod_connectivity when more than one target or port has to be tested.
+
+    Args:
+        source_pod_name: The name of the pod to run the tests from
+        namespace: The Kubernetes namespace where the pod is located
+        targets: The targets to test, each with target_ip, target_port, protocol (default: "TCP") and timeout in seconds (default: 5)
+        image: The container image to use for debugging (default: "nicolaka/netshoot")
+
+    Returns:
+        A list of PortConnectivityResult objects, one per target in the order of the targets
+
+    Example:
+        results = test_pod_connectivity_batch(
+            source_pod_name="backend",
+            namespace="test-app",
+            targets=[
+                {"target_ip": "10.96.1.156", "target_port": 3306},
+                {"target_ip": "10.96.1.157", "target_port": 8080}
+            ]
+        )
+        for result in results:
+            print(f"{result['command']}: {result['success']}")
+    """
+    results = debug.run_batch_connectivity_probe(
+        namespace=namespace,
+        pod_name=source_pod_name,
+        targets=targets,
+        image=image
+    )
+
+    return [
+        PortConnectivityResult(
+            output=output,
+            success=success,
+            command=" ".join(debug.create_netcat_command_fot_connectivity_test(
+                target_ip=target.target_ip,
+                target_port=target.target_port,
+                protocol=target.protocol,
+                timeout=target.timeout
+            ))
+        )
+        for target, (output, success) in zip(targets, results)
+    ]
+
+
+@tool(parse_docstring=True)
+def diagnose_pod_connectivity(
+    source_pod: str,
+    target_pod: str,
+    port: int,
+    protocol: str = "TCP",
+    namespace: str = "default",
+    probe: bool = True
+) -> diagnosis.ConnectivityDiagnosis:
+    """
+    Diagnose whether a source pod can connect to a port of a target pod in a single call.
+    Runs all analysis steps at once: gets both pods, checks that the target exposes the port, gets the
+    target IPs, evaluates the egress policies of the source and the ingress policies of the target and,
+    if the policies allow the traffic, tests the connection with netcat from an ephemeral container.
+    Prefer this tool over calling the individual tools step by step.
+
+    Args:
+        source_pod: The source pod as "namespace/name" or "name"
+        target_pod: The target pod as "namespace/name" or "name"
+        port: The target port
+        protocol: The protocol (default: "TCP")
+        namespace: The namespace of pods given without namespace (default: "default")
+        probe: Test the actual connection if the policies allow it (default: True)
+
+    Returns:
+        An object of type ConnectivityDiagnosis with the verdict (source_not_found, target_not_found,
+        port_not_exposed, no_target_ip, egress_denied, ingress_denied, allowed, connected or probe_failed),
+        the evaluated policies, the probe result and human readable findings
+
+    Example:
+        result = diagnose_pod_connectivity(source_pod="backend/backend", target_pod="db/mysql", port=3306)
+        print(f"Verdict: {result['verdict']}, findings: {result['findings']}")
+    """
+    return diagnosis.diagnose_connectivity(
+        source=source_pod,
+        target=target_pod,
+        port=port,
+        protocol=protocol,
+        namespace=namespace,
+        probe=probe
+    )
+
+
+# Native async implementations of the tools. LangChain runs them when a tool is
+# called through ainvoke, e.g. by an agent on an event loop, instead of running
+# the sync implementation in a thread pool. They require the optional "async"
+# dependencies, without them ainvoke falls back to the sync implementation.
+try:
+    from kubernetes_tools.aio import clients as aio_clients
+    from kubernetes_tools.aio import debug as aio_debug
+    from kubernetes_tools.aio import networkpolicy as aio_networkpolicy
+    from kubernetes_tools.aio import pods as aio_pods
+except ImportError:
+    aio_clients = None
+
+
+@tool_cache.cached(PODS_IN_NAMESPACE, name="get_pod_by_name")
+async def _aget_pod_by_name(
+    name: str,
+    namespace: str = "default",
+    fields: Optional[List[str]] = None
+) -> Optional[dict]:
+    pod = await aio_pods.get_pod_by_name(name=name, namespace=namespace)
+    if pod:
+        return projection.summarize_pod(pod, fields)
+    return None
+
+
+@tool_cache.cached(PODS_IN_NAMESPACE, name="get_pod_ip_addresses")
+async def _aget_pod_ip_addresses(pod_name: str, namespace: str = "default") -> Optional[List[str]]:
+    pod = await aio_pods.get_pod_by_name(name=pod_name, namespace=namespace)
+    if pod is None:
+        return None
+
+    return aio_pods.get_pod_ips(pod)
+
+
+@tool_cache.cached(PODS_IN_NAMESPACE, name="check_pod_exposes_port")
+async def _acheck_pod_exposes_port(
+    pod_name: str,
+    namespace: str,
+    port: int,
+    protocol: str = "TCP"
+) -> Optional[ExposedContainerPort]:
+    pod = await aio_pods.get_pod_by_name(name=pod_name, namespace=namespace)
+    if pod is None:
+        return None
+
+    exposed = aio_pods.find_exposed_port(pod, port=port, protocol=protocol)
+
+    if exposed:
+        return ExposedContainerPort(
+            container_name=exposed.container_name,
+            port=exposed.port.to_dict()
+        )
+    return None
+
+
+@tool_cache.cached(PODS_IN_NAMESPACE, NETWORK_POLICIES_IN_NAMESPACE, name="get_network_policies_for_pod")
+async def _aget_network_policies_for_pod(pod_name: str, namespace: str) -> List[dict]:
+    pod = await aio_pods.get_pod_by_name(name=pod_name, namespace=namespace)
+    if pod is None:
+        return []
+
+    policies = await aio_networkpolicy.get_network_policies_matching_pod(pod)
+    return [fastjson.as_json_dict(policy) for policy in policies]
+
+
+@tool_cache.cached(NETWORK_POLICIES_IN_NAMESPACE, name="check_network_policy_allows_ingress")
+async def _acheck_network_policy_allows_ingress(
+    policy_name: str,
+    namespace: str,
+    port: int,
+    peer_selector: Dict[str, str],
+    protocol: str = "TCP"
+) -> bool:
+    network_policy = await aio_networkpolicy.read_network_policy(name=policy_name, namespace=namespace)
+    if network_policy is None:
+        return False
+
+    return aio_networkpolicy.contains_ingress_rule(
+        network_policy=network_policy,
+        port=port,
+        peer_selector=peer_selector,
+        protocol=protocol
+    )
+
+
+@tool_cache.cached(NETWORK_POLICIES_IN_NAMESPACE, name="check_network_policy_allows_egress")
+async def _acheck_network_policy_allows_egress(
+    policy_name: str,
+    namespace: str,
+    port: int,
+    selector: Dict[str, str],
+    protocol: str = "TCP"
+) -> bool:
+    network_policy = await aio_networkpolicy.read_network_policy(name=policy_name, namespace=namespace)
+    if network_policy is None:
+        return False
+
+    return aio_networkpolicy.contains_egress_rule(
+        network_policy=network_policy,
+        port=port,
+        selector=selector,
+        protocol=protocol
+    )
+
+
+async def _atest_pod_connectivity(
+    source_pod_name: str,
+    namespace: str,
+    target_ip: str,
+    target_port: int,
+    protocol: str = "TCP",
+    timeout: int = 5,
+    image: str = "nicolaka/netshoot",
+    reuse_probe_container: bool = False
+) -> PortConnectivityResult:
+    command = aio_debug.create_netcat_command_fot_connectivity_test(
+        target_ip=target_ip,
+        target_port=target_port,
+        protocol=protocol,
+        timeout=timeout
+    )
+
+    if reuse_probe_container:
+        output, success = await aio_debug.run_persistent_probe_command(
+            namespace=namespace,
+            pod_name=source_pod_name,
+            command=command,
+            image=image,
+            max_wait=timeout + 30
+        )
+    else:
+        output, success = await aio_debug.run_debug_command(
+            namespace=namespace,
+            pod_name=source_pod_name,
+            command=command,
+            image=image,
+            max_wait=timeout + 30
+        )
+
+    return PortConnectivityResult(
+        output=output,
+        success=success,
+        command=" ".join(command)
+    )
+
+
+@tool_cache.cached(NETWORK_POLICIES_IN_NAMESPACE, name="contains_ingress_rule")
+async def _acontains_ingress_rule(
+    network_policy_name: str,
+    namespace: str,
+    port: int,
+    peer_selector: dict,
+    protocol: str = "TCP"
+) -> bool:
+    network_policy = await aio_networkpolicy.read_network_policy(name=network_policy_name, namespace=namespace)
+    if network_policy is None:
+        return False
+
+    return aio_networkpolicy.contains_ingress_rule(
+        network_policy=network_policy,
+        port=port,
+        peer_selector=peer_selector,
+        protocol=protocol
+    )
+
+
+@tool_cache.cached(NETWORK_POLICIES_IN_NAMESPACE, name="contains_egress_rule")
+async def _acontains_egress_rule(
+    network_policy_name: str,
+    namespace: str,
+    port: int,
+    peer_selector: dict,
+    protocol: str = "TCP"
+) -> bool:
+    network_policy = await aio_networkpolicy.read_network_policy(name=network_policy_name, namespace=namespace)
+    if network_policy is None:
+        return False
+
+    return aio_networkpolicy.contains_egress_rule(
         network_policy=network_policy,
         port=port,
         selector=peer_selector,
         protocol=protocol
     )
+
+
+async def _atest_pod_connectivity_batch(
+    source_pod_name: str,
+    namespace: str,
+    targets: List[debug.ProbeTarget],
+    image: str = "nicolaka/netshoot"
+) -> List[PortConnectivityResult]:
+    results = await aio_debug.run_batch_connectivity_probe(
+        namespace=namespace,
+        pod_name=source_pod_name,
+        targets=targets,
+        image=image
+    )
+
+    return [
+        PortConnectivityResult(
+            output=output,
+            success=success,
+            command=" ".join(aio_debug.create_netcat_command_fot_connectivity_test(
+                target_ip=target.target_ip,
+                target_port=target.target_port,
+                protocol=target.protocol,
+                timeout=target.timeout
+            ))
+        )
+        for target, (output, success) in zip(targets, results)
+    ]
+
+
+if aio_clients is not None:
+    get_pod_by_name.coroutine = _aget_pod_by_name
+    get_pod_ip_addresses.coroutine = _aget_pod_ip_addresses
+    check_pod_exposes_port.coroutine = _acheck_pod_exposes_port
+    get_network_policies_for_pod.coroutine = _aget_network_policies_for_pod
+    check_network_policy_allows_ingress.coroutine = _acheck_network_policy_allows_ingress
+    check_network_policy_allows_egress.coroutine = _acheck_network_policy_allows_egress
+    test_pod_connectivity.coroutine = _atest_pod_connectivity
+    contains_ingress_rule.coroutine = _acontains_ingress_rule
+    contains_egress_rule.coroutine = _acontains_egress_rule
+    test_pod_connectivity_batch.coroutine = _atest_pod_connectivity_batch
+
+
+# Measure every tool call, see kubernetes_tools.instrumentation
+for _tool in [value for value in globals().values() if isinstance(value, BaseTool)]:
+    instrumentation.instrument_tool(_tool)
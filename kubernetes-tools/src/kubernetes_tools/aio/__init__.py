@@ -0,0 +1,10 @@
+"""
+Async variants of the kubernetes_tools helpers built on kubernetes_asyncio.
+
+The modules mirror pods, networkpolicy and debug. Functions calling the API
+server are coroutines, pure helpers working on already fetched objects are
+re-exported from the sync modules since the kubernetes_asyncio models have
+the same attributes.
+
+Requires the optional "async" dependencies: pip install kubernetes-tools[async]
+"""
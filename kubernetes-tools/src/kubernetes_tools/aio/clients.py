@@ -0,0 +1,122 @@
+"""
+Shared async Kubernetes API client, the asyncio counterpart of kubernetes_tools.clients.
+
+aiohttp sessions are bound to the event loop they were created in, so one
+ApiClient is kept per running event loop. The configuration is loaded on first
+use from the settings of kubernetes_tools.kubeconfig, i.e. the same kube config
+file and context, in-cluster configuration or explicit Configuration as the sync
+clients. After kubeconfig.configure() the ApiClients are recreated on next use.
+Their requests are measured, see kubernetes_tools.aio.instrumentation.
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import os
+import weakref
+from typing import Optional, Tuple
+
+from kubernetes_asyncio import client, config
+
+from kubernetes_tools import kubeconfig
+from kubernetes_tools.aio import instrumentation
+from kubernetes_tools.clients import DEFAULT_CONNECTION_POOL_MAXSIZE
+
+# Attributes of a sync Configuration given to kubeconfig.configure() that apply to the async one
+_CONFIGURATION_ATTRIBUTES = (
+    "host", "api_key", "api_key_prefix", "username", "password", "ssl_ca_cert", "cert_file", "key_file",
+    "verify_ssl", "assert_hostname", "tls_server_name", "proxy", "proxy_headers",
+)
+
+_api_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[kubeconfig.Settings, client.ApiClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+_loaded: Optional[Tuple[kubeconfig.Settings, client.Configuration]] = None
+_connection_pool_maxsize = DEFAULT_CONNECTION_POOL_MAXSIZE
+
+
+def configure_api_client(connection_pool_maxsize: int = DEFAULT_CONNECTION_POOL_MAXSIZE) -> None:
+    """
+    Configure the shared async ApiClients. Applies to clients created afterwards.
+
+    Args:
+        connection_pool_maxsize: Maximum number of pooled connections to the API server (default: 32)
+    """
+    global _connection_pool_maxsize
+    _connection_pool_maxsize = connection_pool_maxsize
+
+
+# Event loops and their sessions are not usable in a forked child
+os.register_at_fork(after_in_child=_api_clients.clear)
+
+
+async def _load_configuration(settings: kubeconfig.Settings) -> client.Configuration:
+    global _loaded
+    if _loaded is None or _loaded[0] is not settings:
+        configuration = client.Configuration()
+        if settings.configuration is not None:
+            for name in _CONFIGURATION_ATTRIBUTES:
+                setattr(configuration, name, getattr(settings.configuration, name))
+        elif settings.in_cluster:
+            config.load_incluster_config(client_configuration=configuration)
+        else:
+            await config.load_kube_config(
+                config_file=settings.config_file,
+                context=settings.context,
+                client_configuration=configuration
+            )
+        _loaded = (settings, configuration)
+    return _loaded[1]
+
+
+async def get_api_client() -> client.ApiClient:
+    """
+    Get the shared async ApiClient of the running event loop, creating it on first use.
+
+    Returns:
+        The shared ApiClient
+    """
+    loop = asyncio.get_running_loop()
+    settings = kubeconfig.get_settings()
+    entry = _api_clients.get(loop)
+    if entry is None or entry[0] is not settings:
+        loaded = await _load_configuration(settings)
+        # Another task of the loop may have created the client while the config was
+        # loaded. Nothing is awaited from here on, so only one client is created.
+        previous = _api_clients.get(loop)
+        if previous is not None and previous[0] is settings:
+            return previous[1]
+
+        configuration = copy.deepcopy(loaded)
+        configuration.connection_pool_maxsize = _connection_pool_maxsize
+        entry = (settings, instrumentation.InstrumentedApiClient(configuration))
+        _api_clients[loop] = entry
+        if previous is not None:
+            # The configuration has been reloaded since the previous client was created
+            await previous[1].close()
+    return entry[1]
+
+
+async def close_api_client() -> None:
+    """Close the shared async ApiClient of the running event loop."""
+    entry = _api_clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[1].close()
+
+
+async def core_v1(api_client: Optional[client.ApiClient] = None) -> client.CoreV1Api:
+    """Get a CoreV1Api using the given ApiClient or the shared one."""
+    return client.CoreV1Api(api_client or await get_api_client())
+
+
+async def networking_v1(api_client: Optional[client.ApiClient] = None) -> client.NetworkingV1Api:
+    """Get a NetworkingV1Api using the given ApiClient or the shared one."""
+    return client.NetworkingV1Api(api_client or await get_api_client())
+
+
+async def ws_core_v1(api_client: Optional[client.ApiClient] = None) -> client.CoreV1Api:
+    """
+    Get a CoreV1Api on a WsApiClient for exec calls. The caller has to close its api_client.
+    """
+    configuration = (api_client or await get_api_client()).configuration
+    return client.CoreV1Api(instrumentation.InstrumentedWsApiClient(configuration))
@@ -0,0 +1,430 @@
+import asyncio
+import contextlib
+import logging
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from aiohttp import WSMsgType
+from kubernetes_asyncio import client, watch
+from kubernetes_asyncio.stream import WsApiClient
+from kubernetes_asyncio.stream.ws_client import ERROR_CHANNEL, STDERR_CHANNEL, STDOUT_CHANNEL
+
+from kubernetes_tools import instrumentation
+from kubernetes_tools.aio import clients
+from kubernetes_tools.debug import (
+    EPHEMERAL_CONTAINER_PHASES,
+    ProbeContainer,
+    ProbeTarget,
+    create_batch_probe_script,
+    create_netcat_command_fot_connectivity_test,
+    find_probe_container,
+    observe_phases,
+    parse_batch_probe_output,
+    probe_container_lock,
+    register_probe_container,
+)
+
+__all__ = [
+    "ProbeContainer",
+    "ProbeTarget",
+    "create_batch_probe_script",
+    "create_netcat_command_fot_connectivity_test",
+    "exec_in_probe_container",
+    "get_probe_container",
+    "parse_batch_probe_output",
+    "run_batch_connectivity_probe",
+    "run_debug_command",
+    "run_persistent_probe_command",
+]
+
+logger = logging.getLogger(__name__)
+
+
+async def run_debug_command(
+    namespace: str,
+    pod_name: str,
+    command: List[str],
+    image: str = "busybox",
+    max_wait: int = 60,
+    api_client: Optional[client.ApiClient] = None
+) -> Tuple[str, bool]:
+    """
+    Run a debug command in an ephemeral container attached to a pod.
+
+    Args:
+        namespace: The Kubernetes namespace where the pod is located
+        pod_name: The name of the pod to debug
+        command: The command to run in the debug container (as a list of strings)
+        image: The container image to use for debugging (default: busybox)
+        max_wait: How long to wait for debugging (default: 60)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.aio.clients)
+
+    Returns:
+        A tuple of (output: str, success: bool) with the combined stdout/stderr from the
+        command and whether it exited with exit code 0
+
+    Example:
+        output, success = await run_debug_command(
+            namespace="backend",
+            pod_name="backend",
+            command=["nc", "-vz", "mysql.db", "3306"]
+        )
+    """
+    v1 = await clients.core_v1(api_client)
+    phases = instrumentation.PhaseTimer(EPHEMERAL_CONTAINER_PHASES)
+
+    debug_container_name = await _attach_ephemeral_container(v1, namespace, pod_name, command, image)
+    phases.reached("patch")
+
+    container_status = await _wait_for_ephemeral_container(
+        v1, namespace, pod_name, debug_container_name, max_wait, phases=phases
+    )
+
+    logs = await v1.read_namespaced_pod_log(
+        name=pod_name,
+        namespace=namespace,
+        container=debug_container_name,
+    )
+
+    return logs, container_status.state.terminated.exit_code == 0
+
+
+async def run_batch_connectivity_probe(
+    namespace: str,
+    pod_name: str,
+    targets: List[ProbeTarget],
+    image: str = "nicolaka/netshoot",
+    max_wait: Optional[int] = None,
+    api_client: Optional[client.ApiClient] = None
+) -> List[Tuple[str, bool]]:
+    """
+    Probe the connectivity to many targets in parallel from a single ephemeral container.
+
+    Args:
+        namespace: The Kubernetes namespace where the pod is located
+        pod_name: The name of the pod to run the probes from
+        targets: The targets to probe
+        image: The container image to use for debugging (default: nicolaka/netshoot)
+        max_wait: How long to wait for all probes (default: the largest target timeout + 30)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.aio.clients)
+
+    Returns:
+        A list with one (output: str, success: bool) tuple per target
+    """
+    if not targets:
+        return []
+
+    if max_wait is None:
+        max_wait = max(target.timeout for target in targets) + 30
+
+    output, _ = await run_debug_command(
+        namespace=namespace,
+        pod_name=pod_name,
+        command=["sh", "-c", create_batch_probe_script(targets)],
+        image=image,
+        max_wait=max_wait,
+        api_client=api_client
+    )
+
+    return parse_batch_probe_output(output, len(targets))
+
+
+async def _attach_ephemeral_container(
+    v1: client.CoreV1Api,
+    namespace: str,
+    pod_name: str,
+    command: List[str],
+    image: str
+) -> str:
+    debug_container_name = f"debug-{int(time.time())}-{uuid.uuid4().hex[:5]}"
+
+    pod = await v1.read_namespaced_pod(name=pod_name, namespace=namespace)
+
+    ephemeral_container = client.V1EphemeralContainer(
+        name=debug_container_name,
+        image=image,
+        command=command,
+        stdin=True,
+        tty=False,
+        target_container_name=None,
+    )
+
+    if pod.spec.ephemeral_containers is None:
+        pod.spec.ephemeral_containers = []
+
+    pod.spec.ephemeral_containers.append(ephemeral_container)
+
+    await v1.patch_namespaced_pod_ephemeralcontainers(
+        name=pod_name,
+        namespace=namespace,
+        body=pod,
+    )
+
+    return debug_container_name
+
+
+def _is_terminated(status: client.V1ContainerStatus) -> bool:
+    return status.state.terminated is not None
+
+
+def _is_started(status: client.V1ContainerStatus) -> bool:
+    return status.state.running is not None or status.state.terminated is not None
+
+
+def _find_ephemeral_container_status(pod: client.V1Pod, debug_container_name: str) -> Optional[client.V1ContainerStatus]:
+    for status in pod.status.ephemeral_container_statuses or []:
+        if status.name == debug_container_name:
+            return status
+    return None
+
+
+async def _wait_for_ephemeral_container(
+    v1: client.CoreV1Api,
+    namespace: str,
+    pod_name: str,
+    debug_container_name: str,
+    max_wait: int,
+    condition: Callable[[client.V1ContainerStatus], bool] = _is_terminated,
+    phases: Optional[instrumentation.PhaseTimer] = None
+) -> client.V1ContainerStatus:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_wait
+
+    try:
+        container_status = await asyncio.wait_for(
+            _watch_ephemeral_container(v1, namespace, pod_name, debug_container_name, deadline, condition, phases),
+            timeout=max_wait
+        )
+    except asyncio.TimeoutError:
+        container_status = None
+    except Exception as e:
+        logger.debug("Watch for ephemeral container %s failed, falling back to polling: %s", debug_container_name, e)
+        container_status = await _poll_ephemeral_container(
+            v1, namespace, pod_name, debug_container_name, deadline, condition, phases
+        )
+
+    if not container_status or not condition(container_status):
+        raise Exception(f"Timeout waiting for ephemeral container {debug_container_name} to complete")
+
+    return container_status
+
+
+async def _watch_ephemeral_container(
+    v1: client.CoreV1Api,
+    namespace: str,
+    pod_name: str,
+    debug_container_name: str,
+    deadline: float,
+    condition: Callable[[client.V1ContainerStatus], bool],
+    phases: Optional[instrumentation.PhaseTimer] = None
+) -> Optional[client.V1ContainerStatus]:
+    loop = asyncio.get_running_loop()
+    container_status = None
+
+    while loop.time() < deadline:
+        async with watch.Watch() as pod_watch:
+            async for event in pod_watch.stream(
+                v1.list_namespaced_pod,
+                namespace=namespace,
+                field_selector=f"metadata.name={pod_name}",
+                timeout_seconds=max(1, int(deadline - loop.time()))
+            ):
+                if event["type"] == "DELETED":
+                    return container_status
+
+                container_status = _find_ephemeral_container_status(event["object"], debug_container_name)
+                observe_phases(phases, container_status)
+                if container_status and condition(container_status):
+                    return container_status
+
+    return container_status
+
+
+async def _poll_ephemeral_container(
+    v1: client.CoreV1Api,
+    namespace: str,
+    pod_name: str,
+    debug_container_name: str,
+    deadline: float,
+    condition: Callable[[client.V1ContainerStatus], bool],
+    phases: Optional[instrumentation.PhaseTimer] = None
+) -> Optional[client.V1ContainerStatus]:
+    loop = asyncio.get_running_loop()
+    wait_interval = 0.2
+
+    while True:
+        pod = await v1.read_namespaced_pod(name=pod_name, namespace=namespace)
+
+        container_status = _find_ephemeral_container_status(pod, debug_container_name)
+        observe_phases(phases, container_status)
+        if container_status and condition(container_status):
+            return container_status
+
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return container_status
+
+        await asyncio.sleep(min(wait_interval, remaining))
+        wait_interval = min(wait_interval * 2, 5)
+
+
+@contextlib.asynccontextmanager
+async def _holding(lock: threading.Lock) -> AsyncIterator[None]:
+    # The lock is awaited in a worker thread, so that the event loop is not blocked
+    if not lock.acquire(blocking=False):
+        acquiring = asyncio.ensure_future(asyncio.to_thread(lock.acquire))
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # Release the lock once the worker thread got it
+            acquiring.add_done_callback(lambda _: lock.release())
+            raise
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+async def get_probe_container(
+    namespace: str,
+    pod_name: str,
+    image: str = "nicolaka/netshoot",
+    max_wait: int = 60,
+    api_client: Optional[client.ApiClient] = None
+) -> ProbeContainer:
+    """
+    Get the probe container of a pod, attaching a new one if needed. The containers are
+    registered with kubernetes_tools.debug, so that sync and async callers share them.
+    Concurrent calls for the same pod wait for each other, so that only one container is attached.
+
+    Args:
+        namespace: The Kubernetes namespace where the pod is located
+        pod_name: The name of the pod to attach the probe container to
+        image: The container image of the probe container (default: nicolaka/netshoot)
+        max_wait: How long to wait for the probe container to start (default: 60)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.aio.clients)
+
+    Returns:
+        The running ProbeContainer
+    """
+    v1 = await clients.core_v1(api_client)
+
+    async with _holding(probe_container_lock(namespace, pod_name)):
+        pod = await v1.read_namespaced_pod(name=pod_name, namespace=namespace)
+        probe_container = find_probe_container(namespace, pod, image)
+        if probe_container is not None:
+            return probe_container
+
+        phases = instrumentation.PhaseTimer(EPHEMERAL_CONTAINER_PHASES)
+        container_name = await _attach_ephemeral_container(v1, namespace, pod_name, ["sleep", "infinity"], image)
+        phases.reached("patch")
+        status = await _wait_for_ephemeral_container(
+            v1, namespace, pod_name, container_name, max_wait, _is_started, phases
+        )
+        if status.state.running is None:
+            raise Exception(f"Probe container {container_name} terminated unexpectedly")
+
+        probe_container = ProbeContainer(
+            namespace=namespace,
+            pod_name=pod_name,
+            pod_uid=pod.metadata.uid,
+            container_name=container_name,
+            image=image
+        )
+
+        register_probe_container(probe_container)
+        return probe_container
+
+
+async def exec_in_probe_container(
+    probe_container: ProbeContainer,
+    command: List[str],
+    timeout: int = 60,
+    api_client: Optional[client.ApiClient] = None
+) -> Tuple[str, bool]:
+    """
+    Run a command in a probe container through the exec API.
+
+    Args:
+        probe_container: The ProbeContainer to run the command in
+        command: The command to run (as a list of strings)
+        timeout: How long to wait for the command to finish in seconds (default: 60)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.aio.clients)
+
+    Returns:
+        A tuple of (output: str, success: bool) with the combined stdout/stderr and
+        whether the command exited with exit code 0
+    """
+    v1 = await clients.ws_core_v1(api_client)
+    output: List[str] = []
+    exit_code = None
+
+    try:
+        websocket = await v1.connect_get_namespaced_pod_exec(
+            name=probe_container.pod_name,
+            namespace=probe_container.namespace,
+            container=probe_container.container_name,
+            command=command,
+            stderr=True,
+            stdin=False,
+            stdout=True,
+            tty=False,
+            _preload_content=False
+        )
+
+        async with asyncio.timeout(timeout):
+            async with websocket as ws:
+                async for message in ws:
+                    if message.type not in (WSMsgType.BINARY, WSMsgType.TEXT):
+                        continue
+                    data = message.data if isinstance(message.data, bytes) else message.data.encode()
+                    channel, payload = data[0], data[1:]
+                    if channel in (STDOUT_CHANNEL, STDERR_CHANNEL):
+                        output.append(payload.decode(errors="replace"))
+                    elif channel == ERROR_CHANNEL and payload:
+                        exit_code = WsApiClient.parse_error_data(payload)
+    finally:
+        await v1.api_client.close()
+
+    return "".join(output), exit_code == 0
+
+
+async def run_persistent_probe_command(
+    namespace: str,
+    pod_name: str,
+    command: List[str],
+    image: str = "nicolaka/netshoot",
+    max_wait: int = 60,
+    api_client: Optional[client.ApiClient] = None
+) -> Tuple[str, bool]:
+    """
+    Run a command in the reusable probe container of a pod. If the exec fails because the
+    probe container is no longer running, a new one is attached and the command is retried
+    once. Other errors are raised, since ephemeral containers cannot be removed from the pod.
+
+    Args:
+        namespace: The Kubernetes namespace where the pod is located
+        pod_name: The name of the pod to run the command from
+        command: The command to run (as a list of strings)
+        image: The container image of the probe container (default: nicolaka/netshoot)
+        max_wait: How long to wait for the probe container and the command (default: 60)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.aio.clients)
+
+    Returns:
+        A tuple of (output: str, success: bool)
+    """
+    probe_container = await get_probe_container(namespace, pod_name, image, max_wait, api_client)
+
+    try:
+        return await exec_in_probe_container(probe_container, command, max_wait, api_client)
+    except Exception as e:
+        # Only attaches a new container if the registered one is no longer running
+        reattached = await get_probe_container(namespace, pod_name, image, max_wait, api_client)
+        if reattached.container_name == probe_container.container_name:
+            raise
+        logger.debug("Exec in probe container %s failed, re-attached %s: %s",
+                     probe_container.container_name, reattached.container_name, e)
+
+    return await exec_in_probe_container(reattached, command, max_wait, api_client)
@@ -0,0 +1,56 @@
+"""
+Instrumented async ApiClients, the asyncio counterpart of kubernetes_tools.instrumentation.InstrumentedApiClient.
+
+The requests of the shared ApiClients of kubernetes_tools.aio.clients are measured
+like the sync ones, as API measurements nested in the measurement of the tool call.
+"""
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from kubernetes_asyncio import client
+from kubernetes_asyncio.stream import WsApiClient
+
+from kubernetes_tools import instrumentation
+
+
+class InstrumentedApiClient(client.ApiClient):
+    """
+    ApiClient measuring every request as API measurement named after the method and
+    path template, e.g. "GET /api/v1/namespaces/{namespace}/pods/{name}".
+    """
+
+    def call_api(self, resource_path, method, *args, **kwargs):
+        # call_api returns the coroutine making the request
+        coroutine = super().call_api(resource_path, method, *args, **kwargs)
+        if not instrumentation.is_enabled():
+            return coroutine
+        return self._measure(f"{method} {resource_path}", coroutine)
+
+    async def _measure(self, name: str, coroutine: Any) -> Any:
+        with instrumentation.measure(instrumentation.API, name) as measurement:
+            result = await coroutine
+            if measurement is not None:
+                measurement.objects = instrumentation.count_objects(result)
+            return result
+
+    async def request(self, method, url, *args, **kwargs):
+        response = await super().request(method, url, *args, **kwargs)
+        measurement = instrumentation.current()
+        if measurement is not None and measurement.kind == instrumentation.API:
+            measurement.bytes = _response_size(response)
+        return response
+
+
+class InstrumentedWsApiClient(InstrumentedApiClient, WsApiClient):
+    """WsApiClient for exec calls measuring the requests like InstrumentedApiClient."""
+
+
+def _response_size(response: Any) -> Optional[int]:
+    # A raw response may be a stream, e.g. of a watch, so it is not read here
+    data = getattr(response, "data", None) if hasattr(response, "aiohttp_response") else None
+    if isinstance(data, (bytes, str)):
+        return len(data)
+    headers = getattr(response, "headers", None)
+    length = headers.get("Content-Length") if headers is not None else None
+    return int(length) if length else None
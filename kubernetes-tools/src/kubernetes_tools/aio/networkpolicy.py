@@ -0,0 +1,114 @@
+from typing import List, Optional
+
+from kubernetes_asyncio import client
+
+from kubernetes_tools import informer, networkpolicy
+from kubernetes_tools.aio import clients
+from kubernetes_tools.networkpolicy import contains_egress_rule, contains_ingress_rule, rule_allows_port
+from kubernetes_tools.policy_index import PolicyIndex
+
+__all__ = [
+    "contains_egress_rule",
+    "contains_ingress_rule",
+    "get_network_policies_matching_pod",
+    "get_policy_index",
+    "list_network_policies",
+    "read_network_policy",
+    "rule_allows_port",
+]
+
+
+async def list_network_policies(
+    namespace: str,
+    api_client: Optional[client.ApiClient] = None
+) -> List[client.V1NetworkPolicy]:
+    """
+    List all NetworkPolicies in a namespace, served from the informer or snapshot store if it is available.
+
+    Args:
+        namespace: The namespace of the NetworkPolicies
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.aio.clients)
+
+    Returns:
+        List of NetworkPolicies
+    """
+    # Don't block the event loop on the initial LIST of an informer, the
+    # policies are listed from the API server until the store has synced
+    store = informer.get_store(informer.NETWORK_POLICIES, namespace, sync_timeout=0) if api_client is None else None
+    if store is not None:
+        return store.list()
+
+    networking_v1 = await clients.networking_v1(api_client)
+    network_policies = await networking_v1.list_namespaced_network_policy(namespace=namespace)
+    return network_policies.items
+
+
+async def read_network_policy(
+    name: str,
+    namespace: str,
+    api_client: Optional[client.ApiClient] = None
+) -> Optional[client.V1NetworkPolicy]:
+    """
+    Get a NetworkPolicy by name, served from the informer or snapshot store if it is available.
+
+    Args:
+        name: The name of the NetworkPolicy
+        namespace: The namespace of the NetworkPolicy
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.aio.clients)
+
+    Returns:
+        The V1NetworkPolicy, None if it doesn't exist
+    """
+    store = informer.get_store(informer.NETWORK_POLICIES, namespace, sync_timeout=0) if api_client is None else None
+    if store is not None:
+        return store.get(name)
+
+    networking_v1 = await clients.networking_v1(api_client)
+
+    try:
+        return await networking_v1.read_namespaced_network_policy(name=name, namespace=namespace)
+    except client.exceptions.ApiException as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+async def get_policy_index(
+    namespace: str,
+    api_client: Optional[client.ApiClient] = None
+) -> PolicyIndex:
+    """
+    Get a PolicyIndex over all NetworkPolicies in a namespace.
+
+    If the informer or snapshot store is available, the index is built once per
+    store revision like networkpolicy.get_policy_index, otherwise from a fresh LIST.
+
+    Args:
+        namespace: The namespace of the NetworkPolicies
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.aio.clients)
+
+    Returns:
+        PolicyIndex of the namespace
+    """
+    if api_client is None and informer.get_store(informer.NETWORK_POLICIES, namespace, sync_timeout=0) is not None:
+        return networkpolicy.get_policy_index(namespace)
+
+    return PolicyIndex(await list_network_policies(namespace, api_client))
+
+
+async def get_network_policies_matching_pod(
+    pod: client.V1Pod,
+    api_client: Optional[client.ApiClient] = None
+) -> List[client.V1NetworkPolicy]:
+    """
+    Get the all NetworkPolicies whose selector matches the given pod.
+
+    Args:
+        pod: Kubernetes Pod object (V1Pod)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.aio.clients)
+
+    Returns:
+        List of NetworkPolicies
+    """
+    index = await get_policy_index(pod.metadata.namespace, api_client)
+    return index.match(pod.metadata.labels or {})
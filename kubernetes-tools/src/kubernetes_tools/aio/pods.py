@@ -0,0 +1,79 @@
+from typing import Optional
+
+from kubernetes_asyncio import client
+
+from kubernetes_tools import informer
+from kubernetes_tools.aio import clients
+from kubernetes_tools.pods import ExposedContainerPort, filter_by_labels, find_exposed_port, get_pod_ips
+
+__all__ = [
+    "ExposedContainerPort",
+    "filter_by_labels",
+    "find_exposed_port",
+    "get_pod_by_name",
+    "get_pod_ips",
+    "get_pods_by_labels",
+]
+
+
+async def get_pod_by_name(
+    name: str,
+    namespace: str = "default",
+    api_client: Optional[client.ApiClient] = None
+) -> Optional[client.V1Pod]:
+    """
+    Get a pod by name from a specific namespace, served from the informer or snapshot store if it is available.
+
+    Args:
+        name: The name of the pod to retrieve
+        namespace: The Kubernetes namespace where the pod is located (default: "default")
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.aio.clients)
+
+    Returns:
+        A V1Pod object if found, None if the pod doesn't exist
+
+    Example:
+        pod = await get_pod_by_name(name="backend", namespace="backend")
+    """
+    # Don't block the event loop on the initial LIST of an informer, the
+    # pod is read from the API server until the store has synced
+    store = informer.get_store(informer.PODS, namespace, sync_timeout=0) if api_client is None else None
+    if store is not None:
+        return store.get(name)
+
+    v1 = await clients.core_v1(api_client)
+
+    try:
+        return await v1.read_namespaced_pod(name=name, namespace=namespace)
+    except client.exceptions.ApiException as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+async def get_pods_by_labels(
+    labels: dict,
+    namespace: str = "default",
+    api_client: Optional[client.ApiClient] = None
+) -> client.V1PodList:
+    """
+    Get pods by labels from a specific namespace, served from the informer or snapshot store if it is available.
+
+    Args:
+        labels: The labels of the pod to retrieve
+        namespace: The Kubernetes namespace where the pod is located (default: "default")
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.aio.clients)
+
+    Returns:
+        V1PodList containing the pods matching the labels or an empty list if none found
+    """
+    store = informer.get_store(informer.PODS, namespace, sync_timeout=0) if api_client is None else None
+    if store is not None:
+        return client.V1PodList(items=filter_by_labels(store.list(), labels))
+
+    v1 = await clients.core_v1(api_client)
+    label_selector = ",".join([f"{key}={value}" for key, value in labels.items()])
+
+    return await v1.list_namespaced_pod(
+        namespace=namespace,
+        label_selector=label_selector)
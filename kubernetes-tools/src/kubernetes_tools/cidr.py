@@ -0,0 +1,159 @@
+"""
+CIDR matching for the ipBlock peers of NetworkPolicies.
+
+An ipBlock selects the addresses of its CIDR except those of its except
+CIDRs. PrefixTrie stores values under IPv4 and IPv6 prefixes in a binary
+trie per address family, so all prefixes containing an address are found by
+walking at most prefix length (32 or 128) nodes, independent of the number
+of stored prefixes.
+
+Example:
+    trie = PrefixTrie()
+    trie.insert(ipaddress.ip_network("10.0.0.0/8"), "internal")
+    trie.insert(ipaddress.ip_network("fd00::/8"), "internal")
+    print(trie.lookup(parse_address("10.2.3.4")))
+"""
+from __future__ import annotations
+
+import ipaddress
+from typing import Generic, Iterable, List, Optional, Tuple, TypeVar, Union
+
+from kubernetes import client
+
+T = TypeVar("T")
+
+Address = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_address(address: Union[str, Address]) -> Address:
+    """
+    Parse an IPv4 or IPv6 address, e.g. one returned by pods.get_pod_ips().
+
+    Raises:
+        ValueError: If the address is invalid
+    """
+    if isinstance(address, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
+        return address
+    return ipaddress.ip_address(address)
+
+
+def parse_addresses(addresses: Optional[Iterable[Union[str, Address]]]) -> Tuple[Address, ...]:
+    """Parse IPv4 and IPv6 addresses, e.g. all addresses of a dual-stack pod."""
+    return tuple(parse_address(address) for address in addresses or ())
+
+
+def parse_network(cidr: str) -> Network:
+    """
+    Parse an IPv4 or IPv6 CIDR. Host bits are ignored like by the API server.
+
+    Raises:
+        ValueError: If the CIDR is invalid
+    """
+    return ipaddress.ip_network(cidr, strict=False)
+
+
+class _Node(Generic[T]):
+    __slots__ = ("children", "values")
+
+    def __init__(self):
+        self.children: List[Optional[_Node[T]]] = [None, None]
+        self.values: List[T] = []
+
+
+class PrefixTrie(Generic[T]):
+    """
+    Binary trie of IPv4 and IPv6 prefixes with values.
+
+    Several values can be stored under the same prefix. IPv4 and IPv6 prefixes are
+    kept in separate tries, so an IPv4 address never matches an IPv6 prefix.
+    """
+
+    def __init__(self):
+        self._roots = {4: _Node(), 6: _Node()}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, network: Network, value: T) -> None:
+        """Store a value under a prefix."""
+        node = self._roots[network.version]
+        bits = int(network.network_address)
+        for position in range(network.max_prefixlen - 1, network.max_prefixlen - 1 - network.prefixlen, -1):
+            bit = bits >> position & 1
+            child = node.children[bit]
+            if child is None:
+                child = node.children[bit] = _Node()
+            node = child
+        node.values.append(value)
+        self._size += 1
+
+    def lookup(self, address: Address) -> List[T]:
+        """
+        Get the values of all prefixes containing an address.
+
+        Args:
+            address: The IPv4 or IPv6 address
+
+        Returns:
+            The values ordered from the shortest to the longest prefix
+        """
+        node: Optional[_Node[T]] = self._roots[address.version]
+        bits = int(address)
+        values: List[T] = []
+        position = address.max_prefixlen - 1
+        while node is not None:
+            values.extend(node.values)
+            if position < 0:
+                break
+            node = node.children[bits >> position & 1]
+            position -= 1
+        return values
+
+
+class CompiledIPBlock:
+    """
+    Precompiled ipBlock of a NetworkPolicy peer.
+
+    Args:
+        network: The CIDR of the block
+        excepts: The CIDRs excluded from the block
+    """
+    __slots__ = ("network", "excepts")
+
+    def __init__(self, network: Network, excepts: Tuple[Network, ...] = ()):
+        self.network = network
+        self.excepts = excepts
+
+    def __repr__(self) -> str:
+        return f"CompiledIPBlock({self.network}, excepts={[str(network) for network in self.excepts]})"
+
+    def contains(self, address: Address) -> bool:
+        """Check whether the block selects an address, i.e. it is in the CIDR and not excepted."""
+        if address.version != self.network.version or address not in self.network:
+            return False
+        return not any(address.version == network.version and address in network for network in self.excepts)
+
+    def contains_any(self, addresses: Iterable[Address]) -> bool:
+        """Check whether the block selects one of the addresses, e.g. of a dual-stack pod."""
+        return any(self.contains(address) for address in addresses)
+
+
+def compile_ip_block(ip_block: client.V1IPBlock) -> CompiledIPBlock:
+    """
+    Compile the ipBlock of a NetworkPolicy peer.
+
+    Args:
+        ip_block: The V1IPBlock
+
+    Returns:
+        The CompiledIPBlock
+
+    Raises:
+        ValueError: If the CIDR or one of the except CIDRs is invalid
+    """
+    return CompiledIPBlock(
+        network=parse_network(ip_block.cidr),
+        excepts=tuple(parse_network(cidr) for cidr in ip_block._except or ())
+    )
@@ -0,0 +1,246 @@
+"""
+Process-wide Kubernetes API client.
+
+Instead of creating a new CoreV1Api()/NetworkingV1Api() with its own urllib3
+connection pool for every call, all helpers share one ApiClient whose pool
+size and TCP keep-alive are configurable. Every helper also accepts an
+explicit ApiClient, e.g. one connected to another cluster.
+
+The shared ApiClients measure their requests, see kubernetes_tools.instrumentation.
+Long-running watches, e.g. of kubernetes_tools.informer, use a separate shared
+ApiClient so that they do not hold the pooled connections of the requests.
+The kube config is loaded on first use through kubernetes_tools.kubeconfig. A
+forked child process drops the inherited ApiClient and creates its own, since
+pooled connections must not be shared between processes.
+
+Example:
+    from kubernetes_tools import clients, pods
+
+    clients.configure_api_client(connection_pool_maxsize=64)
+    pod = pods.get_pod_by_name(name="backend", namespace="test-app")
+"""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from kubernetes import client
+from urllib3.connection import HTTPConnection
+
+from kubernetes_tools import instrumentation, kubeconfig
+
+DEFAULT_CONNECTION_POOL_MAXSIZE = 32
+DEFAULT_MAX_CONCURRENT_REQUESTS = 8
+KEEP_ALIVE_IDLE = 30
+KEEP_ALIVE_INTERVAL = 15
+KEEP_ALIVE_COUNT = 9
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_lock = threading.Lock()
+_api_client: Optional[client.ApiClient] = None
+_watch_api_client: Optional[client.ApiClient] = None
+_accept_api_clients: Dict[str, client.ApiClient] = {}
+_connection_pool_maxsize = DEFAULT_CONNECTION_POOL_MAXSIZE
+_keep_alive = True
+
+
+def keep_alive_socket_options() -> List[Tuple[int, int, int]]:
+    """
+    Get urllib3 socket options enabling TCP keep-alive, so that idle pooled
+    connections and long-running watches are not dropped silently.
+    """
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+
+    for name, value in (
+        ("TCP_KEEPIDLE", KEEP_ALIVE_IDLE),
+        ("TCP_KEEPINTVL", KEEP_ALIVE_INTERVAL),
+        ("TCP_KEEPCNT", KEEP_ALIVE_COUNT)
+    ):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+
+    return options
+
+
+def configure_api_client(
+    connection_pool_maxsize: int = DEFAULT_CONNECTION_POOL_MAXSIZE,
+    keep_alive: bool = True
+) -> None:
+    """
+    Configure the shared ApiClient. The client is recreated on next use.
+
+    Args:
+        connection_pool_maxsize: Maximum number of pooled connections to the API server (default: 32)
+        keep_alive: Enable TCP keep-alive on the pooled connections (default: True)
+    """
+    global _connection_pool_maxsize, _keep_alive
+    with _lock:
+        _connection_pool_maxsize = connection_pool_maxsize
+        _keep_alive = keep_alive
+        _reset()
+
+
+def reset_api_client() -> None:
+    """Close the shared ApiClients, e.g. after the kube config has been reloaded."""
+    with _lock:
+        _reset()
+
+
+def _reset() -> None:
+    global _api_client, _watch_api_client
+    if _api_client is not None:
+        _api_client.close()
+    _api_client = None
+    if _watch_api_client is not None:
+        _watch_api_client.close()
+    _watch_api_client = None
+    for accept_api_client in _accept_api_clients.values():
+        accept_api_client.close()
+    _accept_api_clients.clear()
+
+
+def get_api_client() -> client.ApiClient:
+    """
+    Get the shared ApiClient, creating it from the default configuration on first use.
+
+    Returns:
+        The shared ApiClient
+    """
+    global _api_client
+    kubeconfig.ensure_configured()
+    with _lock:
+        if _api_client is None:
+            configuration = client.Configuration.get_default_copy()
+            configuration.connection_pool_maxsize = _connection_pool_maxsize
+            _api_client = instrumentation.InstrumentedApiClient(configuration)
+            if _keep_alive:
+                _enable_keep_alive(_api_client)
+        return _api_client
+
+
+def get_watch_api_client() -> client.ApiClient:
+    """
+    Get the shared ApiClient for watches, created with the configuration of the shared ApiClient.
+
+    A watch holds its connection for up to its timeout, so the watches get their own
+    connection pool and cannot exhaust the one of the shared ApiClient.
+
+    Returns:
+        The shared ApiClient for watches
+    """
+    global _watch_api_client
+    configuration = get_api_client().configuration
+    with _lock:
+        if _watch_api_client is None:
+            _watch_api_client = instrumentation.InstrumentedApiClient(configuration)
+            if _keep_alive:
+                _enable_keep_alive(_watch_api_client)
+        return _watch_api_client
+
+
+def _enable_keep_alive(api_client: client.ApiClient) -> None:
+    # Configuration.socket_options is not available in all supported client
+    # versions, so the options are passed to the pools of the pool manager
+    api_client.rest_client.pool_manager.connection_pool_kw["socket_options"] = keep_alive_socket_options()
+
+
+def _after_fork_in_child() -> None:
+    global _lock, _api_client, _watch_api_client
+    # The lock may have been held by another thread at fork time and the
+    # inherited connections belong to the parent, so neither is closed
+    _lock = threading.Lock()
+    _api_client = None
+    _watch_api_client = None
+    _accept_api_clients.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def core_v1(api_client: Optional[client.ApiClient] = None) -> client.CoreV1Api:
+    """Get a CoreV1Api using the given ApiClient or the shared one."""
+    return client.CoreV1Api(api_client or get_api_client())
+
+
+def stream_core_v1(api_client: Optional[client.ApiClient] = None) -> client.CoreV1Api:
+    """
+    Get a CoreV1Api for exec/attach calls through kubernetes.stream.
+
+    The stream helper temporarily patches the ApiClient it is called with, so it
+    must not run on the shared ApiClient concurrently used by other requests.
+    A separate ApiClient with the same configuration is returned instead.
+    """
+    configuration = (api_client or get_api_client()).configuration
+    return client.CoreV1Api(instrumentation.InstrumentedApiClient(configuration))
+
+
+def accepting_core_v1(accept: str, api_client: Optional[client.ApiClient] = None) -> client.CoreV1Api:
+    """
+    Get a CoreV1Api whose requests ask the API server for another representation,
+    e.g. a server-side Table. Calls must pass _preload_content=False and decode
+    the JSON response themselves, since it does not match the generated models.
+
+    The generated API methods do not allow to override the Accept header per call,
+    so a separate ApiClient with the Accept header as default header is used. The
+    ApiClient of the shared configuration is kept per Accept header.
+
+    Args:
+        accept: The Accept header, e.g. "application/json;as=Table;v=v1;g=meta.k8s.io"
+        api_client: The ApiClient whose configuration to use (default: the shared ApiClient)
+    """
+    if api_client is not None:
+        accept_api_client = client.ApiClient(api_client.configuration)
+        accept_api_client.set_default_header("Accept", accept)
+        return client.CoreV1Api(accept_api_client)
+
+    configuration = get_api_client().configuration
+    with _lock:
+        accept_api_client = _accept_api_clients.get(accept)
+        if accept_api_client is None:
+            accept_api_client = instrumentation.InstrumentedApiClient(configuration)
+            accept_api_client.set_default_header("Accept", accept)
+            if _keep_alive:
+                _enable_keep_alive(accept_api_client)
+            _accept_api_clients[accept] = accept_api_client
+        return client.CoreV1Api(accept_api_client)
+
+
+def networking_v1(api_client: Optional[client.ApiClient] = None) -> client.NetworkingV1Api:
+    """Get a NetworkingV1Api using the given ApiClient or the shared one."""
+    return client.NetworkingV1Api(api_client or get_api_client())
+
+
+def map_concurrently(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    max_workers: int = DEFAULT_MAX_CONCURRENT_REQUESTS
+) -> List[R]:
+    """
+    Call a request function for every item concurrently, e.g. once per namespace.
+
+    The shared ApiClient is thread-safe and its connection pool is larger than the
+    default number of workers, so the requests do not wait for free connections.
+
+    Args:
+        func: The function to call
+        items: The items to call the function with
+        max_workers: The maximum number of concurrent calls (default: 8)
+
+    Returns:
+        The results in the order of the items
+
+    Example:
+        pod_lists = map_concurrently(lambda namespace: core_v1().list_namespaced_pod(namespace), ["a", "b"])
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(func, items))
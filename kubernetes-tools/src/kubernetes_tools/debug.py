@@ -1,13 +1,38 @@
+import logging
+import shlex
+import threading
 import time
-from typing import Tuple, List
-from kubernetes import client
+import uuid
+from typing import Callable, Dict, Tuple, List, Optional
+from kubernetes import client, watch
+from kubernetes.stream import stream
+from pydantic import BaseModel
+
+from kubernetes_tools import clients, instrumentation
+
+logger = logging.getLogger(__name__)
+
+BATCH_PROBE_PREFIX = "PROBE"
+
+# Prefix of the phase measurements of ephemeral containers, see kubernetes_tools.instrumentation
+EPHEMERAL_CONTAINER_PHASES = "ephemeral_container"
+
+class ProbeTarget(BaseModel):
+    """
+    Target of a connectivity probe.
+    """
+    target_ip: str
+    target_port: int
+    protocol: str = "TCP"
+    timeout: int = 5
 
 def run_debug_command(
     namespace: str,
     pod_name: str,
     command: List[str],
     image: str = "busybox",
-    max_wait: int = 60
+    max_wait: int = 60,
+    api_client: Optional[client.ApiClient] = None
 ) -> Tuple[str, bool]:
     """
     Run a debug command in an ephemeral container attached to a pod.
@@ -21,6 +46,7 @@ def run_debug_command(
         command: The command to run in the debug container (as a list of strings)
         image: The container image to use for debugging (default: busybox)
         max_wait: How long to wait for debugging (default: 60)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
 
     Returns:
         A tuple of (output: str, success: bool) where:
@@ -34,9 +60,35 @@ def run_debug_command(
             command=["nc", "-vz", "mysql.db", "3306"]
         )
     """
-    v1 = client.CoreV1Api()
+    v1 = clients.core_v1(api_client)
+    phases = instrumentation.PhaseTimer(EPHEMERAL_CONTAINER_PHASES)
+
+    debug_container_name = _attach_ephemeral_container(v1, namespace, pod_name, command, image)
+    phases.reached("patch")
+
+    container_status = _wait_for_ephemeral_container(
+        v1, namespace, pod_name, debug_container_name, max_wait, phases=phases
+    )
 
-    debug_container_name = f"debug-{int(time.time())}"
+    logs = v1.read_namespaced_pod_log(
+        name=pod_name,
+        namespace=namespace,
+        container=debug_container_name,
+    )
+
+    exit_code = container_status.state.terminated.exit_code
+
+    return logs, exit_code == 0
+
+def _attach_ephemeral_container(
+    v1: client.CoreV1Api,
+    namespace: str,
+    pod_name: str,
+    command: List[str],
+    image: str
+) -> str:
+    """Add an ephemeral container running the command to the pod and return its name."""
+    debug_container_name = f"debug-{int(time.time())}-{uuid.uuid4().hex[:5]}"
 
     pod = v1.read_namespaced_pod(name=pod_name, namespace=namespace)
 
@@ -61,40 +113,131 @@ def run_debug_command(
         body=pod,
     )
 
-    # Wait for the ephemeral container to complete (running or terminated)
-    wait_interval = 0.2
-    elapsed = 0
-    container_status = None
+    return debug_container_name
 
-    while elapsed < max_wait:
-        pod = v1.read_namespaced_pod(name=pod_name, namespace=namespace)
+def _is_terminated(status: client.V1ContainerStatus) -> bool:
+    return status.state.terminated is not None
 
-        # Check if ephemeral container exists in status and wait for it to terminate
-        if pod.status.ephemeral_container_statuses:
-            for status in pod.status.ephemeral_container_statuses:
-                if status.name == debug_container_name:
-                    container_status = status
-                    if status.state.terminated:
-                        break
+def _is_started(status: client.V1ContainerStatus) -> bool:
+    return status.state.running is not None or status.state.terminated is not None
 
-        if container_status and container_status.state.terminated:
-            break
+def _wait_for_ephemeral_container(
+    v1: client.CoreV1Api,
+    namespace: str,
+    pod_name: str,
+    debug_container_name: str,
+    max_wait: int,
+    condition: Callable[[client.V1ContainerStatus], bool] = _is_terminated,
+    phases: Optional[instrumentation.PhaseTimer] = None
+) -> client.V1ContainerStatus:
+    """
+    Wait for the ephemeral container to terminate (or to reach another condition) and return its status.
 
-        time.sleep(wait_interval)
-        elapsed += wait_interval
+    Watches the single pod via a field selector and returns as soon as the container
+    status fulfills the condition. If the watch fails, falls back to polling the pod with
+    exponential backoff until max_wait is reached. The phases the container passes are
+    recorded with the PhaseTimer if given.
+    """
+    deadline = time.monotonic() + max_wait
 
-    if not container_status or not container_status.state.terminated:
+    try:
+        container_status = _watch_ephemeral_container(
+            v1, namespace, pod_name, debug_container_name, deadline, condition, phases
+        )
+    except Exception as e:
+        logger.debug("Watch for ephemeral container %s failed, falling back to polling: %s", debug_container_name, e)
+        container_status = _poll_ephemeral_container(
+            v1, namespace, pod_name, debug_container_name, deadline, condition, phases
+        )
+
+    if not container_status or not condition(container_status):
         raise Exception(f"Timeout waiting for ephemeral container {debug_container_name} to complete")
 
-    logs = v1.read_namespaced_pod_log(
-        name=pod_name,
-        namespace=namespace,
-        container=debug_container_name,
-    )
+    return container_status
 
-    exit_code = container_status.state.terminated.exit_code
+def observe_phases(phases: Optional[instrumentation.PhaseTimer], status: Optional[client.V1ContainerStatus]) -> None:
+    """
+    Record the phases an observed ephemeral container status has reached, e.g. while
+    waiting for the container in kubernetes_tools.aio.debug.
+    """
+    if phases is None or status is None:
+        return
 
-    return logs, exit_code == 0
+    phases.reached("scheduled")
+    started = _is_started(status)
+    # The image ID is set once the image has been pulled
+    if status.image_id or started:
+        phases.reached("image_pulled")
+    if started:
+        phases.reached("running")
+    if _is_terminated(status):
+        phases.reached("terminated")
+
+def _find_ephemeral_container_status(pod: client.V1Pod, debug_container_name: str) -> Optional[client.V1ContainerStatus]:
+    for status in pod.status.ephemeral_container_statuses or []:
+        if status.name == debug_container_name:
+            return status
+    return None
+
+def _watch_ephemeral_container(
+    v1: client.CoreV1Api,
+    namespace: str,
+    pod_name: str,
+    debug_container_name: str,
+    deadline: float,
+    condition: Callable[[client.V1ContainerStatus], bool],
+    phases: Optional[instrumentation.PhaseTimer] = None
+) -> Optional[client.V1ContainerStatus]:
+    container_status = None
+    pod_watch = watch.Watch()
+
+    while time.monotonic() < deadline:
+        # The initial ADDED event carries the current state, so a container that
+        # terminated before the watch was established is not missed
+        for event in pod_watch.stream(
+            v1.list_namespaced_pod,
+            namespace=namespace,
+            field_selector=f"metadata.name={pod_name}",
+            timeout_seconds=max(1, int(deadline - time.monotonic()))
+        ):
+            if event["type"] == "DELETED":
+                pod_watch.stop()
+                return container_status
+
+            container_status = _find_ephemeral_container_status(event["object"], debug_container_name)
+            observe_phases(phases, container_status)
+            if container_status and condition(container_status):
+                pod_watch.stop()
+                return container_status
+
+    return container_status
+
+def _poll_ephemeral_container(
+    v1: client.CoreV1Api,
+    namespace: str,
+    pod_name: str,
+    debug_container_name: str,
+    deadline: float,
+    condition: Callable[[client.V1ContainerStatus], bool],
+    phases: Optional[instrumentation.PhaseTimer] = None
+) -> Optional[client.V1ContainerStatus]:
+    wait_interval = 0.2
+    container_status = None
+
+    while True:
+        pod = v1.read_namespaced_pod(name=pod_name, namespace=namespace)
+
+        container_status = _find_ephemeral_container_status(pod, debug_container_name)
+        observe_phases(phases, container_status)
+        if container_status and condition(container_status):
+            return container_status
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return container_status
+
+        time.sleep(min(wait_interval, remaining))
+        wait_interval = min(wait_interval * 2, 5)
 
 def create_netcat_command_fot_connectivity_test(
     target_ip: str,
@@ -140,3 +283,305 @@ def create_netcat_command_fot_connectivity_test(
     command.append(str(target_port))
 
     return command
+
+def create_batch_probe_script(targets: List[ProbeTarget]) -> str:
+    """
+    Create a shell script running the netcat command of every target in parallel.
+
+    After all probes have finished the script prints one line per target in the order
+    of the targets: PROBE<TAB><index><TAB><exit code><TAB><output on a single line>.
+
+    Args:
+        targets: The targets to probe
+
+    Returns:
+        The shell script to be run with "sh -c"
+
+    Example:
+        script = create_batch_probe_script([
+            ProbeTarget(target_ip="10.2.3.123", target_port=3306),
+            ProbeTarget(target_ip="10.2.3.123", target_port=53, protocol="UDP")
+        ])
+    """
+    lines = [
+        'probe() { i=$1; shift; "$@" > /tmp/probe-$i.out 2>&1; echo $? > /tmp/probe-$i.rc; }'
+    ]
+
+    for index, target in enumerate(targets):
+        command = create_netcat_command_fot_connectivity_test(
+            target_ip=target.target_ip,
+            target_port=target.target_port,
+            protocol=target.protocol,
+            timeout=target.timeout
+        )
+        lines.append(f"probe {index} {shlex.join(command)} &")
+
+    lines.append("wait")
+    lines.append(
+        f"for i in {' '.join(str(index) for index in range(len(targets)))}; do "
+        f"printf '{BATCH_PROBE_PREFIX}\\t%s\\t%s\\t%s\\n' \"$i\" \"$(cat /tmp/probe-$i.rc)\" "
+        f"\"$(tr '\\n' ' ' < /tmp/probe-$i.out)\"; done"
+    )
+
+    return "\n".join(lines)
+
+def parse_batch_probe_output(output: str, target_count: int) -> List[Tuple[str, bool]]:
+    """
+    Parse the output of a script created by create_batch_probe_script.
+
+    Args:
+        output: The logs of the container that ran the script
+        target_count: The number of probed targets
+
+    Returns:
+        A list with one (output: str, success: bool) tuple per target. Targets without
+        a result line are reported as failed with an empty output.
+    """
+    results: List[Tuple[str, bool]] = [("", False)] * target_count
+
+    for line in output.splitlines():
+        fields = line.split("\t", 3)
+        if len(fields) < 3 or fields[0] != BATCH_PROBE_PREFIX:
+            continue
+
+        index = int(fields[1])
+        if 0 <= index < target_count:
+            probe_output = fields[3].strip() if len(fields) > 3 else ""
+            results[index] = (probe_output, fields[2].strip() == "0")
+
+    return results
+
+def run_batch_connectivity_probe(
+    namespace: str,
+    pod_name: str,
+    targets: List[ProbeTarget],
+    image: str = "nicolaka/netshoot",
+    max_wait: Optional[int] = None,
+    api_client: Optional[client.ApiClient] = None
+) -> List[Tuple[str, bool]]:
+    """
+    Probe the connectivity to many targets in parallel from a single ephemeral container.
+
+    Args:
+        namespace: The Kubernetes namespace where the pod is located
+        pod_name: The name of the pod to run the probes from
+        targets: The targets to probe
+        image: The container image to use for debugging (default: nicolaka/netshoot)
+        max_wait: How long to wait for all probes (default: the largest target timeout + 30)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+
+    Returns:
+        A list with one (output: str, success: bool) tuple per target
+
+    Example:
+        results = run_batch_connectivity_probe(
+            namespace="test-app",
+            pod_name="backend",
+            targets=[ProbeTarget(target_ip="10.2.3.123", target_port=port) for port in (3306, 8080)]
+        )
+    """
+    if not targets:
+        return []
+
+    if max_wait is None:
+        max_wait = max(target.timeout for target in targets) + 30
+
+    output, _ = run_debug_command(
+        namespace=namespace,
+        pod_name=pod_name,
+        command=["sh", "-c", create_batch_probe_script(targets)],
+        image=image,
+        max_wait=max_wait,
+        api_client=api_client
+    )
+
+    return parse_batch_probe_output(output, len(targets))
+
+
+class ProbeContainer(BaseModel):
+    """
+    Long-running ephemeral container used to run repeated probes through exec.
+    """
+    namespace: str
+    pod_name: str
+    pod_uid: str
+    container_name: str
+    image: str
+
+
+# Shared with kubernetes_tools.aio.debug, so that sync and async callers reuse the same containers
+_probe_containers: Dict[str, ProbeContainer] = {}
+_probe_containers_lock = threading.Lock()
+_pod_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+def probe_container_lock(namespace: str, pod_name: str) -> threading.Lock:
+    """Get the lock to hold while the probe container of a pod is looked up and attached."""
+    with _probe_containers_lock:
+        return _pod_locks.setdefault((namespace, pod_name), threading.Lock())
+
+def find_probe_container(namespace: str, pod: client.V1Pod, image: str) -> Optional[ProbeContainer]:
+    """Get the registered probe container of the pod if it runs the image and is still running."""
+    pod_uid = pod.metadata.uid
+
+    with _probe_containers_lock:
+        # Drop containers registered for previous incarnations of the pod
+        for uid, registered in list(_probe_containers.items()):
+            if uid != pod_uid and registered.namespace == namespace and registered.pod_name == pod.metadata.name:
+                del _probe_containers[uid]
+
+        probe_container = _probe_containers.get(pod_uid)
+
+    if probe_container is None or probe_container.image != image:
+        return None
+
+    status = _find_ephemeral_container_status(pod, probe_container.container_name)
+    if status is None or status.state.running is None:
+        return None
+    return probe_container
+
+def register_probe_container(probe_container: ProbeContainer) -> None:
+    """Register a started probe container for reuse by find_probe_container."""
+    with _probe_containers_lock:
+        _probe_containers[probe_container.pod_uid] = probe_container
+
+def get_probe_container(
+    namespace: str,
+    pod_name: str,
+    image: str = "nicolaka/netshoot",
+    max_wait: int = 60,
+    api_client: Optional[client.ApiClient] = None
+) -> ProbeContainer:
+    """
+    Get the probe container of a pod, attaching a new one if needed.
+
+    Probe containers run "sleep infinity" and are registered by pod UID. A registered
+    container is reused as long as it is running. If the pod was recreated (new UID) or
+    the container is no longer running, a new probe container is attached. Concurrent
+    calls for the same pod wait for each other, so that only one container is attached.
+
+    Args:
+        namespace: The Kubernetes namespace where the pod is located
+        pod_name: The name of the pod to attach the probe container to
+        image: The container image of the probe container (default: nicolaka/netshoot)
+        max_wait: How long to wait for the probe container to start (default: 60)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+
+    Returns:
+        The running ProbeContainer
+    """
+    v1 = clients.core_v1(api_client)
+
+    with probe_container_lock(namespace, pod_name):
+        pod = v1.read_namespaced_pod(name=pod_name, namespace=namespace)
+        probe_container = find_probe_container(namespace, pod, image)
+        if probe_container is not None:
+            return probe_container
+
+        phases = instrumentation.PhaseTimer(EPHEMERAL_CONTAINER_PHASES)
+        container_name = _attach_ephemeral_container(v1, namespace, pod_name, ["sleep", "infinity"], image)
+        phases.reached("patch")
+        status = _wait_for_ephemeral_container(v1, namespace, pod_name, container_name, max_wait, _is_started, phases)
+        if status.state.running is None:
+            raise Exception(f"Probe container {container_name} terminated unexpectedly")
+
+        probe_container = ProbeContainer(
+            namespace=namespace,
+            pod_name=pod_name,
+            pod_uid=pod.metadata.uid,
+            container_name=container_name,
+            image=image
+        )
+
+        register_probe_container(probe_container)
+        return probe_container
+
+def exec_in_probe_container(
+    probe_container: ProbeContainer,
+    command: List[str],
+    timeout: int = 60,
+    api_client: Optional[client.ApiClient] = None
+) -> Tuple[str, bool]:
+    """
+    Run a command in a probe container through the exec API.
+
+    Args:
+        probe_container: The ProbeContainer to run the command in
+        command: The command to run (as a list of strings)
+        timeout: How long to wait for the command to finish in seconds (default: 60)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+
+    Returns:
+        A tuple of (output: str, success: bool) with the combined stdout/stderr and
+        whether the command exited with exit code 0
+    """
+    v1 = clients.stream_core_v1(api_client)
+
+    response = stream(
+        v1.connect_get_namespaced_pod_exec,
+        name=probe_container.pod_name,
+        namespace=probe_container.namespace,
+        container=probe_container.container_name,
+        command=command,
+        stderr=True,
+        stdin=False,
+        stdout=True,
+        tty=False,
+        _preload_content=False
+    )
+
+    try:
+        response.run_forever(timeout=timeout)
+        output = response.read_all()
+        return output, response.returncode == 0
+    finally:
+        response.close()
+        v1.api_client.close()
+
+def run_persistent_probe_command(
+    namespace: str,
+    pod_name: str,
+    command: List[str],
+    image: str = "nicolaka/netshoot",
+    max_wait: int = 60,
+    api_client: Optional[client.ApiClient] = None
+) -> Tuple[str, bool]:
+    """
+    Run a command in the reusable probe container of a pod.
+
+    In contrast to run_debug_command only the first call for a pod adds an ephemeral
+    container. Later calls run the command through exec in the same container. If the
+    exec fails because the probe container is no longer running, e.g. because the pod
+    was recreated, a new probe container is attached and the command is retried once.
+    Other errors are raised, since ephemeral containers cannot be removed from the pod.
+
+    Args:
+        namespace: The Kubernetes namespace where the pod is located
+        pod_name: The name of the pod to run the command from
+        command: The command to run (as a list of strings)
+        image: The container image of the probe container (default: nicolaka/netshoot)
+        max_wait: How long to wait for the probe container and the command (default: 60)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+
+    Returns:
+        A tuple of (output: str, success: bool)
+
+    Example:
+        output, success = run_persistent_probe_command(
+            namespace="test-app",
+            pod_name="backend",
+            command=["nc", "-vz", "-w", "1", "10.2.3.123", "3306"]
+        )
+    """
+    probe_container = get_probe_container(namespace, pod_name, image, max_wait, api_client)
+
+    try:
+        return exec_in_probe_container(probe_container, command, max_wait, api_client)
+    except Exception as e:
+        # Only attaches a new container if the registered one is no longer running
+        reattached = get_probe_container(namespace, pod_name, image, max_wait, api_client)
+        if reattached.container_name == probe_container.container_name:
+            raise
+        logger.debug("Exec in probe container %s failed, re-attached %s: %s",
+                     probe_container.container_name, reattached.container_name, e)
+
+    return exec_in_probe_container(reattached, command, max_wait, api_client)
@@ -0,0 +1,303 @@
+"""
+Deterministic diagnosis of the connectivity between two pods.
+
+diagnose_connectivity() runs the procedure of the pod connectivity agent
+without a model in the loop: get both pods, check the target port, get the
+target IPs, evaluate the egress policies of the source and the ingress
+policies of the target and, if the policies allow the traffic, probe it with
+netcat from an ephemeral container. Independent requests (both pods and the
+NetworkPolicies of both namespaces) are made concurrently.
+
+Example:
+    diagnosis = diagnose_connectivity("backend/backend", "db/mysql", 3306)
+    print(diagnosis.verdict, diagnosis.findings)
+"""
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+from kubernetes import client
+from pydantic import BaseModel
+
+from kubernetes_tools import clients, debug, networkpolicy, pods, ports
+from kubernetes_tools.selectors import default_namespace_labels
+
+# Verdicts of a diagnosis
+SOURCE_NOT_FOUND = "source_not_found"
+TARGET_NOT_FOUND = "target_not_found"
+PORT_NOT_EXPOSED = "port_not_exposed"
+NO_TARGET_IP = "no_target_ip"
+EGRESS_DENIED = "egress_denied"
+INGRESS_DENIED = "ingress_denied"
+ALLOWED = "allowed"
+CONNECTED = "connected"
+PROBE_FAILED = "probe_failed"
+
+
+class PolicyEvaluation(BaseModel):
+    """
+    A NetworkPolicy selecting the source (egress) or the target (ingress) pod.
+    """
+    name: str
+    namespace: str
+    allows: bool
+
+
+class ProbeResult(BaseModel):
+    """
+    The result of the netcat probe from the source to the target pod.
+    """
+    command: str
+    output: str
+    success: bool
+
+
+class ConnectivityDiagnosis(BaseModel):
+    """
+    The verdict of a connectivity diagnosis with the findings of all steps.
+
+    Fields of steps that were not reached, e.g. the policies if a pod does not
+    exist, are left at their defaults.
+    """
+    verdict: str
+    source: str
+    target: str
+    port: int
+    protocol: str
+    exposing_container: Optional[str] = None
+    target_ips: List[str] = []
+    egress_policies: List[PolicyEvaluation] = []
+    ingress_policies: List[PolicyEvaluation] = []
+    egress_allowed: Optional[bool] = None
+    ingress_allowed: Optional[bool] = None
+    probe: Optional[ProbeResult] = None
+    findings: List[str] = []
+
+
+def parse_pod_reference(reference: str, namespace: str = "default") -> Tuple[str, str]:
+    """
+    Split a "namespace/name" pod reference.
+
+    Args:
+        reference: The pod as "namespace/name" or "name"
+        namespace: The namespace of a reference without namespace (default: "default")
+
+    Returns:
+        The (namespace, name) pair
+    """
+    if "/" in reference:
+        namespace, name = reference.split("/", 1)
+        return namespace, name
+    return namespace, reference
+
+
+def diagnose_connectivity(
+    source: str,
+    target: str,
+    port: int,
+    protocol: str = "TCP",
+    namespace: str = "default",
+    probe: bool = True,
+    timeout: int = 5,
+    image: str = "nicolaka/netshoot",
+    reuse_probe_container: bool = False,
+    api_client: Optional[client.ApiClient] = None
+) -> ConnectivityDiagnosis:
+    """
+    Diagnose whether a pod can connect to a port of another pod.
+
+    The verdict is the first failing step in the order of the agent procedure:
+    SOURCE_NOT_FOUND, TARGET_NOT_FOUND, PORT_NOT_EXPOSED, NO_TARGET_IP,
+    EGRESS_DENIED, INGRESS_DENIED. If the policies allow the traffic the verdict
+    is CONNECTED or PROBE_FAILED depending on the probe, or ALLOWED without probe.
+    Namespace selectors are evaluated against the kubernetes.io/metadata.name label,
+    ipBlock peers against the IP addresses of the pods and named ports against the
+    container ports of the target pod.
+
+    Args:
+        source: The source pod as "namespace/name" or "name"
+        target: The target pod as "namespace/name" or "name"
+        port: The target port
+        protocol: The protocol (default: "TCP")
+        namespace: The namespace of pod references without namespace (default: "default")
+        probe: Test the connection from an ephemeral container of the source pod if the
+            policies allow it (default: True)
+        timeout: Connection timeout of the probe in seconds (default: 5)
+        image: The container image of the probe (default: "nicolaka/netshoot")
+        reuse_probe_container: Run the probe in the reusable probe container of the source
+            pod, see debug.run_persistent_probe_command() (default: False)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+
+    Returns:
+        The ConnectivityDiagnosis
+
+    Example:
+        diagnosis = diagnose_connectivity("backend", "mysql", 3306, namespace="test-app", probe=False)
+        if diagnosis.verdict == INGRESS_DENIED:
+            print([policy.name for policy in diagnosis.ingress_policies])
+    """
+    protocol = protocol.upper()
+    source_namespace, source_name = parse_pod_reference(source, namespace)
+    target_namespace, target_name = parse_pod_reference(target, namespace)
+
+    diagnosis = ConnectivityDiagnosis(
+        verdict=ALLOWED,
+        source=f"{source_namespace}/{source_name}",
+        target=f"{target_namespace}/{target_name}",
+        port=port,
+        protocol=protocol
+    )
+
+    # The pods and the policies of their namespaces are independent of each other
+    policy_namespaces = list(dict.fromkeys([source_namespace, target_namespace]))
+    results = clients.map_concurrently(
+        lambda request: request(),
+        [
+            lambda: pods.get_pod_by_name(source_name, source_namespace, api_client),
+            lambda: pods.get_pod_by_name(target_name, target_namespace, api_client),
+        ] + [
+            lambda policy_namespace=policy_namespace: networkpolicy.get_policy_index(policy_namespace, api_client)
+            for policy_namespace in policy_namespaces
+        ]
+    )
+    source_pod, target_pod = results[:2]
+    policy_indexes = dict(zip(policy_namespaces, results[2:]))
+
+    if source_pod is None:
+        return _conclude(diagnosis, SOURCE_NOT_FOUND, f"Source pod {diagnosis.source} does not exist")
+    if target_pod is None:
+        return _conclude(diagnosis, TARGET_NOT_FOUND, f"Target pod {diagnosis.target} does not exist")
+
+    exposed = pods.find_exposed_port(target_pod, port=port, protocol=protocol)
+    if exposed is None:
+        diagnosis.findings.append(f"No container of {diagnosis.target} exposes {port}/{protocol}")
+    else:
+        diagnosis.exposing_container = exposed.container_name
+
+    diagnosis.target_ips = pods.get_pod_ips(target_pod)
+    if not diagnosis.target_ips:
+        diagnosis.findings.append(f"Target pod {diagnosis.target} has no IP address")
+
+    source_ips = pods.get_pod_ips(source_pod)
+    # Named ports of the rules refer to the container ports of the target in both directions
+    target_port_names = ports.get_port_names(target_pod)
+    source_labels = source_pod.metadata.labels or {}
+    target_labels = target_pod.metadata.labels or {}
+
+    diagnosis.egress_policies = [
+        PolicyEvaluation(
+            name=network_policy.metadata.name,
+            namespace=source_namespace,
+            allows=networkpolicy.contains_egress_rule(
+                network_policy, port, target_labels, protocol,
+                peer_namespace=target_namespace,
+                peer_namespace_labels=default_namespace_labels(target_namespace),
+                peer_ips=diagnosis.target_ips,
+                port_names=target_port_names
+            )
+        )
+        for network_policy in policy_indexes[source_namespace].match(source_labels)
+        if "Egress" in networkpolicy.policy_types(network_policy)
+    ]
+    diagnosis.ingress_policies = [
+        PolicyEvaluation(
+            name=network_policy.metadata.name,
+            namespace=target_namespace,
+            allows=networkpolicy.contains_ingress_rule(
+                network_policy, port, source_labels, protocol,
+                peer_namespace=source_namespace,
+                peer_namespace_labels=default_namespace_labels(source_namespace),
+                peer_ips=source_ips,
+                port_names=target_port_names
+            )
+        )
+        for network_policy in policy_indexes[target_namespace].match(target_labels)
+        if "Ingress" in networkpolicy.policy_types(network_policy)
+    ]
+
+    # A pod not selected by any policy of a direction is not isolated in it
+    diagnosis.egress_allowed = not diagnosis.egress_policies or any(
+        policy.allows for policy in diagnosis.egress_policies
+    )
+    diagnosis.ingress_allowed = not diagnosis.ingress_policies or any(
+        policy.allows for policy in diagnosis.ingress_policies
+    )
+    if not diagnosis.egress_allowed:
+        diagnosis.findings.append(
+            f"No egress rule of the policies selecting {diagnosis.source} allows {diagnosis.target} on {port}/{protocol}"
+        )
+    if not diagnosis.ingress_allowed:
+        diagnosis.findings.append(
+            f"No ingress rule of the policies selecting {diagnosis.target} allows {diagnosis.source} on {port}/{protocol}"
+        )
+
+    if exposed is None:
+        return _conclude(diagnosis, PORT_NOT_EXPOSED)
+    if not diagnosis.target_ips:
+        return _conclude(diagnosis, NO_TARGET_IP)
+    if not diagnosis.egress_allowed:
+        return _conclude(diagnosis, EGRESS_DENIED)
+    if not diagnosis.ingress_allowed:
+        return _conclude(diagnosis, INGRESS_DENIED)
+
+    diagnosis.findings.append(f"The NetworkPolicies allow {diagnosis.source} to connect to {diagnosis.target} on {port}/{protocol}")
+    if not probe:
+        return _conclude(diagnosis, ALLOWED)
+
+    diagnosis.probe = _probe(
+        source_namespace, source_name, diagnosis.target_ips[0], port, protocol,
+        timeout, image, reuse_probe_container, api_client
+    )
+    if diagnosis.probe.success:
+        return _conclude(diagnosis, CONNECTED, f"Connected to {diagnosis.target_ips[0]}:{port} from {diagnosis.source}")
+    return _conclude(
+        diagnosis, PROBE_FAILED,
+        f"Connecting to {diagnosis.target_ips[0]}:{port} from {diagnosis.source} failed although the policies allow it"
+    )
+
+
+def _conclude(diagnosis: ConnectivityDiagnosis, verdict: str, finding: Optional[str] = None) -> ConnectivityDiagnosis:
+    diagnosis.verdict = verdict
+    if finding is not None:
+        diagnosis.findings.append(finding)
+    return diagnosis
+
+
+def _probe(
+    namespace: str,
+    pod_name: str,
+    target_ip: str,
+    port: int,
+    protocol: str,
+    timeout: int,
+    image: str,
+    reuse_probe_container: bool,
+    api_client: Optional[client.ApiClient]
+) -> ProbeResult:
+    command = debug.create_netcat_command_fot_connectivity_test(
+        target_ip=target_ip,
+        target_port=port,
+        protocol=protocol,
+        timeout=timeout
+    )
+
+    if reuse_probe_container:
+        output, success = debug.run_persistent_probe_command(
+            namespace=namespace,
+            pod_name=pod_name,
+            command=command,
+            image=image,
+            max_wait=timeout + 30,
+            api_client=api_client
+        )
+    else:
+        output, success = debug.run_debug_command(
+            namespace=namespace,
+            pod_name=pod_name,
+            command=command,
+            image=image,
+            max_wait=timeout + 30,
+            api_client=api_client
+        )
+
+    return ProbeResult(command=" ".join(command), output=output, success=success)
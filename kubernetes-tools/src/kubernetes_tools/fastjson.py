@@ -0,0 +1,139 @@
+"""
+Fast path for API responses without OpenAPI model deserialization.
+
+The kubernetes client turns every response into nested model objects through
+reflection, which dominates the CPU time of listing large namespaces. Requests
+made with _preload_content=False return the raw body instead, which is decoded
+here with orjson if installed (pip install kubernetes-tools[fast]) and the
+json module otherwise.
+
+The decoded objects are wrapped in JsonObject, a dict that also provides the
+snake_case attributes of the models. The pods, selectors and networkpolicy
+logic therefore runs on them unchanged:
+
+    network_policies = networkpolicy.list_network_policies("test-app", raw=True)
+    print(network_policies[0].spec.pod_selector.match_labels)
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List
+
+from kubernetes import client
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data: bytes) -> Any:
+    """Decode a JSON document with orjson if installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode a JSON document without whitespace, with orjson if installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def _generic_json_key(name: str) -> str:
+    # Model attribute names are the snake_case form of the JSON keys, with a
+    # leading underscore for Python keywords, e.g. _from, _continue, end_port
+    parts = name.lstrip("_").split("_")
+    return parts[0] + "".join(part[:1].upper() + part[1:] for part in parts[1:])
+
+
+def _model_json_keys() -> Dict[str, str]:
+    # Acronyms like podIP cannot be derived from the attribute name, so the
+    # attribute maps of the models are used where they differ from the generic
+    # form. A few attributes map to different keys in different models, for
+    # those the generic form is preferred.
+    candidates: Dict[str, set] = {}
+    for model in vars(client.models).values():
+        attribute_map = getattr(model, "attribute_map", None)
+        if isinstance(attribute_map, dict):
+            for name, key in attribute_map.items():
+                candidates.setdefault(name, set()).add(key)
+
+    json_keys = {}
+    for name, keys in candidates.items():
+        generic_key = _generic_json_key(name)
+        if generic_key not in keys:
+            json_keys[name] = min(keys)
+    return json_keys
+
+
+_json_keys: Dict[str, str] = _model_json_keys()
+
+# Serializing models needs no configuration, unlike the shared ApiClient of
+# kubernetes_tools.clients it doesn't load the kubeconfig, e.g. for snapshots
+_serializer = client.ApiClient()
+
+
+class JsonObject(dict):
+    """
+    A decoded JSON object with attribute access like the kubernetes client models.
+
+    Attributes are looked up by their snake_case model name, e.g. pod.status.pod_ip
+    reads the "podIP" key. Missing keys are None like unset model fields. Nested
+    objects are wrapped when they are first accessed.
+
+    Since JsonObject is a dict, keys like "items" or "values" have to be read with
+    item access, the attributes are the dict methods.
+    """
+    __slots__ = ()
+
+    def __getattr__(self, name: str) -> Any:
+        key = _json_keys.get(name)
+        if key is None:
+            if name.startswith("__"):
+                raise AttributeError(name)
+            key = _json_keys.setdefault(name, _generic_json_key(name))
+
+        value = self.get(key)
+        if type(value) is dict:
+            value = JsonObject(value)
+            self[key] = value
+        elif type(value) is list and value and type(value[0]) is dict:
+            value = [JsonObject(item) for item in value]
+            self[key] = value
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the object as JSON compatible dict, using the JSON keys of the API."""
+        return self
+
+
+def read_json(response: Any) -> Any:
+    """Decode the body of a response requested with _preload_content=False."""
+    return loads(response.data)
+
+
+def read_object(response: Any) -> JsonObject:
+    """Decode a single object from a response requested with _preload_content=False."""
+    return JsonObject(read_json(response))
+
+
+def read_items(response: Any) -> List[JsonObject]:
+    """Decode the items of a list response requested with _preload_content=False."""
+    return [JsonObject(item) for item in read_json(response).get("items") or []]
+
+
+def to_json_object(model: Any) -> JsonObject:
+    """Convert a model object, e.g. from an informer store, to a JsonObject."""
+    return JsonObject(_serializer.sanitize_for_serialization(model))
+
+
+def as_json_dict(obj: Any) -> Dict[str, Any]:
+    """
+    Get the JSON representation of a model object or JsonObject, using the JSON keys
+    of the API for both, e.g. for tool results.
+    """
+    if isinstance(obj, dict):
+        return obj
+    return _serializer.sanitize_for_serialization(obj)
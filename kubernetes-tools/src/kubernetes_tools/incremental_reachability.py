@@ -0,0 +1,632 @@
+"""
+Reachability between pods kept up to date by watch events.
+
+compute_reachability() evaluates a snapshot from scratch. IncrementalReachability
+holds the same allow relation, applies pod, namespace and NetworkPolicy events
+and reports the pod pairs whose verdict flipped between allowed and denied:
+
+- Pods are grouped into the classes of reachability.PodClass. A pod event moves
+  a single pod between classes, so only the row and column of that pod are
+  compared. A new class is added to the peer bitsets of the rules selecting it.
+- A NetworkPolicy event touches the classes selected by its old and new
+  version, whose egress rows and ingress columns are recomputed.
+- A namespace label change touches the rules with namespace selectors and the
+  classes selected by their policies.
+
+The egress and ingress bitsets of a class are cached per (port, protocol) and
+only invalidated for the touched classes. Deltas are computed for the tracked
+ports; other ports can still be queried.
+
+Example:
+    engine = IncrementalReachability(ports=[(3306, "TCP")])
+    engine.add_listener(lambda deltas: print([(delta.source, delta.target, delta.allowed) for delta in deltas]))
+    engine.subscribe(["test-app"])
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from kubernetes import client
+from pydantic import BaseModel
+
+from kubernetes_tools import informer
+from kubernetes_tools.networkpolicy import policy_types
+from kubernetes_tools.ports import CompiledPorts, PortNames, get_port_names
+from kubernetes_tools.reachability import ClusterSnapshot, PodClass, PortKey, pod_key
+from kubernetes_tools.selectors import CompiledPeer, CompiledSelector, compile_policy, default_namespace_labels
+
+logger = logging.getLogger(__name__)
+
+INGRESS = "Ingress"
+EGRESS = "Egress"
+
+# Bitset of all classes, including the classes added later
+ALL = -1
+
+ClassKey = Tuple[str, FrozenSet[Tuple[str, str]], FrozenSet[Tuple[str, tuple]]]
+
+# Per tracked port the (row, column) bitsets of a class
+Relation = Dict[PortKey, Tuple[int, int]]
+
+
+class ReachabilityDelta(BaseModel):
+    """
+    A pod pair whose verdict for a port changed.
+    """
+    source: str
+    target: str
+    port: int
+    protocol: str
+    allowed: bool
+
+
+DeltaListener = Callable[[List[ReachabilityDelta]], None]
+
+
+class _Rule:
+    __slots__ = ("ports", "peers", "bitset")
+
+    def __init__(self, ports: CompiledPorts, peers: Tuple[CompiledPeer, ...]):
+        self.ports = ports
+        self.peers = peers
+        # A rule without peers allows traffic from and to all pods
+        self.bitset = 0 if peers else ALL
+
+
+class _Policy:
+    __slots__ = ("namespace", "resource_version", "pod_selector", "directions", "ingress_rules", "egress_rules", "subjects")
+
+    def __init__(self, network_policy: client.V1NetworkPolicy):
+        compiled_policy = compile_policy(network_policy)
+        self.namespace: str = network_policy.metadata.namespace
+        self.resource_version: Optional[str] = network_policy.metadata.resource_version
+        self.pod_selector: CompiledSelector = compiled_policy.pod_selector
+        self.directions = policy_types(network_policy)
+        self.ingress_rules = [
+            _Rule(ports, peers) for ports, peers in zip(compiled_policy.ingress_ports, compiled_policy.ingress_peers)
+        ]
+        self.egress_rules = [
+            _Rule(ports, peers) for ports, peers in zip(compiled_policy.egress_ports, compiled_policy.egress_peers)
+        ]
+        # The ids of the classes the policy selects
+        self.subjects: Set[int] = set()
+
+    def rules(self) -> List[_Rule]:
+        return self.ingress_rules + self.egress_rules
+
+
+class IncrementalReachability:
+    """
+    Allow relation between all known pods, updated by watch events.
+
+    The event handlers and queries are thread-safe, listeners are called while the
+    relation is locked, in the order of the events.
+
+    Args:
+        ports: The (port, protocol) pairs to report deltas for
+        snapshot: The initial pods, namespaces and NetworkPolicies (default: none)
+    """
+
+    def __init__(self, ports: Iterable[PortKey] = (), snapshot: Optional[ClusterSnapshot] = None):
+        self.ports: List[PortKey] = list(dict.fromkeys((port, protocol.upper()) for port, protocol in ports))
+
+        self._lock = threading.RLock()
+        self._listeners: List[DeltaListener] = []
+        self._namespace_labels: Dict[str, Dict[str, str]] = {}
+        self._classes: Dict[int, PodClass] = {}
+        self._class_keys: Dict[int, ClassKey] = {}
+        self._class_ids: Dict[ClassKey, int] = {}
+        self._class_policies: Dict[int, Set[str]] = {}
+        self._free_ids: List[int] = []
+        self._next_id = 0
+        self._pods: Dict[str, int] = {}
+        self._policies: Dict[str, _Policy] = {}
+        self._egress: Dict[PortKey, Dict[int, int]] = {}
+        self._ingress: Dict[PortKey, Dict[int, int]] = {}
+
+        if snapshot is not None:
+            for namespace in snapshot.namespaces:
+                self._upsert_namespace(namespace)
+            for network_policy in snapshot.network_policies:
+                self._upsert_policy(network_policy)
+            for pod in snapshot.pods:
+                self._upsert_pod(pod)
+
+    def add_listener(self, listener: DeltaListener) -> None:
+        """Register a callback invoked with the deltas of every event that changed a verdict."""
+        self._listeners.append(listener)
+
+    def subscribe(self, namespaces: Iterable[str], sync_timeout: float = 30) -> None:
+        """
+        Follow the pods and NetworkPolicies of namespaces and the labels of all namespaces
+        with the informers of kubernetes_tools.informer, starting them if needed.
+
+        Args:
+            namespaces: The namespaces of the pods and NetworkPolicies
+            sync_timeout: How long to wait for the initial LIST of each informer in seconds (default: 30)
+        """
+        subscriptions: List[Tuple[str, Optional[str], Callable[[str, Any, Optional[str]], List[ReachabilityDelta]]]] = [
+            (informer.NAMESPACES, None, lambda event_type, obj, _: self.handle_namespace_event(event_type, obj))
+        ]
+        for namespace in namespaces:
+            subscriptions.append((informer.NETWORK_POLICIES, namespace, self.handle_policy_event))
+            subscriptions.append((informer.PODS, namespace, self.handle_pod_event))
+
+        for kind, namespace, handler in subscriptions:
+            watched = informer.get_informer(kind, namespace)
+            watched.add_event_handler(
+                lambda event_type, obj, handler=handler, namespace=namespace: handler(event_type, obj, namespace)
+            )
+            # Events applied to the store before the list are applied again, which is
+            # a no-op, later events wait for the lock
+            if watched.wait_for_sync(sync_timeout):
+                with self._lock:
+                    handler("SYNC", watched.store.list(), namespace)
+            else:
+                logger.warning("Informer for %s/%s has not synced, see the log of the informer", namespace, kind)
+
+    def handle_pod_event(self, event_type: str, obj: Any, namespace: Optional[str] = None) -> List[ReachabilityDelta]:
+        """
+        Apply a pod event, e.g. from the event handler of a pod informer.
+
+        Pods that are added or deleted do not cause deltas, only pods whose labels or
+        named ports change.
+
+        Args:
+            event_type: ADDED, MODIFIED, DELETED or SYNC
+            obj: The pod, or for SYNC the list of all pods of the namespace
+            namespace: The namespace of a SYNC list, None for the pods of all namespaces
+
+        Returns:
+            The deltas caused by the event, which are also passed to the listeners
+        """
+        with self._lock:
+            if event_type == "SYNC":
+                deltas = self._sync(obj, self._keys_in(self._pods, namespace), self._upsert_pod, self._delete_pod)
+            elif event_type == "DELETED":
+                deltas = self._delete_pod(pod_key(obj))
+            else:
+                deltas = self._upsert_pod(obj)
+            self._publish(deltas)
+        return deltas
+
+    def handle_policy_event(self, event_type: str, obj: Any, namespace: Optional[str] = None) -> List[ReachabilityDelta]:
+        """
+        Apply a NetworkPolicy event, e.g. from the event handler of a NetworkPolicy informer.
+
+        Args:
+            event_type: ADDED, MODIFIED, DELETED or SYNC
+            obj: The NetworkPolicy, or for SYNC the list of all NetworkPolicies of the namespace
+            namespace: The namespace of a SYNC list, None for the NetworkPolicies of all namespaces
+
+        Returns:
+            The deltas caused by the event, which are also passed to the listeners
+        """
+        with self._lock:
+            if event_type == "SYNC":
+                deltas = self._sync(obj, self._keys_in(self._policies, namespace), self._upsert_policy, self._delete_policy)
+            elif event_type == "DELETED":
+                deltas = self._delete_policy(pod_key(obj))
+            else:
+                deltas = self._upsert_policy(obj)
+            self._publish(deltas)
+        return deltas
+
+    def handle_namespace_event(self, event_type: str, obj: Any) -> List[ReachabilityDelta]:
+        """
+        Apply a namespace event, e.g. from the event handler of the namespace informer.
+
+        Args:
+            event_type: ADDED, MODIFIED, DELETED or SYNC
+            obj: The namespace, or for SYNC the list of all namespaces
+
+        Returns:
+            The deltas caused by the event, which are also passed to the listeners
+        """
+        with self._lock:
+            if event_type == "SYNC":
+                deltas = self._sync(
+                    obj, list(self._namespace_labels), self._upsert_namespace, self._delete_namespace,
+                    key=lambda namespace: namespace.metadata.name
+                )
+            elif event_type == "DELETED":
+                deltas = self._delete_namespace(obj.metadata.name)
+            else:
+                deltas = self._upsert_namespace(obj)
+            self._publish(deltas)
+        return deltas
+
+    def allows(self, source: str, target: str, port: int, protocol: str = "TCP") -> bool:
+        """
+        Check whether the NetworkPolicies allow traffic from one pod to another.
+
+        Args:
+            source: The "namespace/name" key of the source pod
+            target: The "namespace/name" key of the target pod
+            port: The destination port
+            protocol: The protocol (default: "TCP")
+
+        Returns:
+            True if egress of the source and ingress of the target allow the traffic, False otherwise
+
+        Raises:
+            KeyError: If one of the pods is unknown
+        """
+        with self._lock:
+            source_class = self._pods[source]
+            target_class = self._pods[target]
+            return self._allows(source_class, target_class, (port, protocol.upper()))
+
+    def reachable_targets(self, source: str, port: int, protocol: str = "TCP") -> List[str]:
+        """
+        Get all pods a pod is allowed to reach on a port.
+
+        Returns:
+            The "namespace/name" keys of the reachable pods
+        """
+        with self._lock:
+            row = self._row(self._pods[source], (port, protocol.upper()))
+            return self._pods_of(row)
+
+    def allowed_sources(self, target: str, port: int, protocol: str = "TCP") -> List[str]:
+        """
+        Get all pods allowed to reach a pod on a port.
+
+        Returns:
+            The "namespace/name" keys of the allowed source pods
+        """
+        with self._lock:
+            column = self._column(self._pods[target], (port, protocol.upper()))
+            return self._pods_of(column)
+
+    def _publish(self, deltas: List[ReachabilityDelta]) -> None:
+        if not deltas:
+            return
+        for listener in self._listeners:
+            try:
+                listener(deltas)
+            except Exception:
+                logger.exception("Reachability delta listener failed")
+
+    @staticmethod
+    def _keys_in(objects: Dict[str, Any], namespace: Optional[str]) -> List[str]:
+        return [key for key in objects if namespace is None or key.startswith(f"{namespace}/")]
+
+    @staticmethod
+    def _sync(
+        objects: List[Any],
+        known: List[str],
+        upsert: Callable[[Any], List[ReachabilityDelta]],
+        delete: Callable[[str], List[ReachabilityDelta]],
+        key: Callable[[Any], str] = pod_key
+    ) -> List[ReachabilityDelta]:
+        listed = {key(obj) for obj in objects}
+        deltas = []
+        for stale in known:
+            if stale not in listed:
+                deltas.extend(delete(stale))
+        for obj in objects:
+            deltas.extend(upsert(obj))
+        return deltas
+
+    # Pods
+
+    def _upsert_pod(self, pod: client.V1Pod) -> List[ReachabilityDelta]:
+        key = pod_key(pod)
+        namespace = pod.metadata.namespace
+        labels = pod.metadata.labels or {}
+        port_names = get_port_names(pod)
+        class_key = (namespace, frozenset(labels.items()), frozenset(port_names.items()))
+
+        old_class = self._pods.get(key)
+        if old_class is not None and self._class_keys[old_class] == class_key:
+            return []
+
+        before = self._relation(old_class) if old_class is not None else None
+        if old_class is not None:
+            self._remove_pod(key, old_class)
+
+        new_class = self._class_ids.get(class_key)
+        created = new_class is None
+        if new_class is None:
+            new_class = self._add_class(class_key, namespace, labels, port_names)
+        self._classes[new_class].pods.append(key)
+        self._pods[key] = new_class
+
+        if before is None:
+            return []
+        # A new class only contains the pod itself
+        return self._pod_deltas(key, before, self._relation(new_class), new_class if created else None)
+
+    def _delete_pod(self, key: str) -> List[ReachabilityDelta]:
+        class_id = self._pods.get(key)
+        if class_id is not None:
+            self._remove_pod(key, class_id)
+        return []
+
+    def _remove_pod(self, key: str, class_id: int) -> None:
+        del self._pods[key]
+        pod_class = self._classes[class_id]
+        pod_class.pods.remove(key)
+        if not pod_class.pods:
+            self._remove_class(class_id)
+
+    def _pod_deltas(self, key: str, before: Relation, after: Relation, skip: Optional[int]) -> List[ReachabilityDelta]:
+        deltas = []
+        for port, protocol in self.ports:
+            row_before, column_before = before[(port, protocol)]
+            row_after, column_after = after[(port, protocol)]
+            for pod_class in self._classes.values():
+                if pod_class.index == skip:
+                    continue
+                if (row_before ^ row_after) >> pod_class.index & 1:
+                    allowed = bool(row_after >> pod_class.index & 1)
+                    deltas.extend(
+                        ReachabilityDelta(source=key, target=target, port=port, protocol=protocol, allowed=allowed)
+                        for target in pod_class.pods if target != key
+                    )
+                if (column_before ^ column_after) >> pod_class.index & 1:
+                    allowed = bool(column_after >> pod_class.index & 1)
+                    deltas.extend(
+                        ReachabilityDelta(source=source, target=key, port=port, protocol=protocol, allowed=allowed)
+                        for source in pod_class.pods if source != key
+                    )
+        return deltas
+
+    # Classes
+
+    def _add_class(self, class_key: ClassKey, namespace: str, labels: Dict[str, str], port_names: PortNames) -> int:
+        if self._free_ids:
+            class_id = self._free_ids.pop()
+        else:
+            class_id = self._next_id
+            self._next_id += 1
+
+        pod_class = PodClass(
+            index=class_id,
+            namespace=namespace,
+            labels=labels,
+            namespace_labels=self._labels_of(namespace),
+            port_names=port_names
+        )
+        self._classes[class_id] = pod_class
+        self._class_keys[class_id] = class_key
+        self._class_ids[class_key] = class_id
+        self._class_policies[class_id] = set()
+
+        touched = {class_id}
+        for name, policy in self._policies.items():
+            if policy.namespace == namespace and policy.pod_selector.matches(labels):
+                policy.subjects.add(class_id)
+                self._class_policies[class_id].add(name)
+            for rule in policy.rules():
+                if rule.peers and self._peer_matches(policy, rule, pod_class):
+                    rule.bitset |= 1 << class_id
+                    touched |= policy.subjects
+                elif not rule.peers and rule.ports.names:
+                    # Named egress ports are resolved per destination class
+                    touched |= policy.subjects
+
+        self._invalidate(touched)
+        return class_id
+
+    def _remove_class(self, class_id: int) -> None:
+        bit = 1 << class_id
+        touched = {class_id}
+        for name in self._class_policies.pop(class_id):
+            self._policies[name].subjects.discard(class_id)
+        for policy in self._policies.values():
+            for rule in policy.rules():
+                if rule.peers and rule.bitset & bit:
+                    rule.bitset &= ~bit
+                    touched |= policy.subjects
+                elif not rule.peers and rule.ports.names:
+                    touched |= policy.subjects
+
+        del self._class_ids[self._class_keys.pop(class_id)]
+        del self._classes[class_id]
+        self._free_ids.append(class_id)
+        self._invalidate(touched)
+
+    @staticmethod
+    def _peer_matches(policy: _Policy, rule: _Rule, pod_class: PodClass, namespace_labels: Optional[Dict[str, str]] = None) -> bool:
+        if namespace_labels is None:
+            namespace_labels = pod_class.namespace_labels
+        return any(
+            peer.matches_pod(policy.namespace, pod_class.labels, pod_class.namespace, namespace_labels)
+            for peer in rule.peers
+        )
+
+    # NetworkPolicies
+
+    def _upsert_policy(self, network_policy: client.V1NetworkPolicy) -> List[ReachabilityDelta]:
+        key = pod_key(network_policy)
+        old = self._policies.get(key)
+        resource_version = network_policy.metadata.resource_version
+        if old is not None and resource_version is not None and old.resource_version == resource_version:
+            return []
+
+        new = _Policy(network_policy)
+        for pod_class in self._classes.values():
+            if pod_class.namespace == new.namespace and new.pod_selector.matches(pod_class.labels):
+                new.subjects.add(pod_class.index)
+            for rule in new.rules():
+                if rule.peers and self._peer_matches(new, rule, pod_class):
+                    rule.bitset |= 1 << pod_class.index
+
+        def replace():
+            if old is not None:
+                for class_id in old.subjects:
+                    self._class_policies[class_id].discard(key)
+            self._policies[key] = new
+            for class_id in new.subjects:
+                self._class_policies[class_id].add(key)
+
+        return self._apply((old.subjects if old is not None else set()) | new.subjects, replace)
+
+    def _delete_policy(self, key: str) -> List[ReachabilityDelta]:
+        old = self._policies.get(key)
+        if old is None:
+            return []
+
+        def remove():
+            del self._policies[key]
+            for class_id in old.subjects:
+                self._class_policies[class_id].discard(key)
+
+        return self._apply(set(old.subjects), remove)
+
+    # Namespaces
+
+    def _labels_of(self, namespace: str) -> Dict[str, str]:
+        return self._namespace_labels.get(namespace) or default_namespace_labels(namespace)
+
+    def _upsert_namespace(self, namespace: client.V1Namespace) -> List[ReachabilityDelta]:
+        name = namespace.metadata.name
+        return self._set_namespace_labels(name, namespace.metadata.labels or default_namespace_labels(name))
+
+    def _delete_namespace(self, name: str) -> List[ReachabilityDelta]:
+        return self._set_namespace_labels(name, None)
+
+    def _set_namespace_labels(self, name: str, labels: Optional[Dict[str, str]]) -> List[ReachabilityDelta]:
+        effective = labels if labels is not None else default_namespace_labels(name)
+        members = [pod_class for pod_class in self._classes.values() if pod_class.namespace == name]
+
+        # The new peer bitsets of the rules selecting namespaces by labels
+        changes: List[Tuple[_Rule, int]] = []
+        touched: Set[int] = set()
+        if effective != self._labels_of(name):
+            for policy in self._policies.values():
+                for rule in policy.rules():
+                    if not any(peer.namespace_selector is not None for peer in rule.peers):
+                        continue
+                    bitset = rule.bitset
+                    for pod_class in members:
+                        if self._peer_matches(policy, rule, pod_class, effective):
+                            bitset |= 1 << pod_class.index
+                        else:
+                            bitset &= ~(1 << pod_class.index)
+                    if bitset != rule.bitset:
+                        changes.append((rule, bitset))
+                        touched |= policy.subjects
+
+        def relabel():
+            if labels is None:
+                self._namespace_labels.pop(name, None)
+            else:
+                self._namespace_labels[name] = labels
+            for pod_class in members:
+                pod_class.namespace_labels = effective
+            for rule, bitset in changes:
+                rule.bitset = bitset
+
+        return self._apply(touched, relabel)
+
+    # Relation
+
+    def _apply(self, touched: Set[int], mutate: Callable[[], None]) -> List[ReachabilityDelta]:
+        # Only the egress and ingress of the touched classes change, so the verdicts
+        # of all other pairs are the same before and after the mutation
+        before = {class_id: self._relation(class_id) for class_id in touched}
+        mutate()
+        self._invalidate(touched)
+
+        deltas = []
+        for class_id in touched:
+            after = self._relation(class_id)
+            for port_key in self.ports:
+                row_before, column_before = before[class_id][port_key]
+                row_after, column_after = after[port_key]
+                for other in self._classes.values():
+                    if (row_before ^ row_after) >> other.index & 1:
+                        deltas.extend(self._class_deltas(class_id, other.index, port_key, bool(row_after >> other.index & 1)))
+                    # Pairs of two touched classes are reported with the row of the source
+                    if other.index not in touched and (column_before ^ column_after) >> other.index & 1:
+                        deltas.extend(self._class_deltas(other.index, class_id, port_key, bool(column_after >> other.index & 1)))
+        return deltas
+
+    def _class_deltas(self, source: int, target: int, port_key: PortKey, allowed: bool) -> List[ReachabilityDelta]:
+        port, protocol = port_key
+        return [
+            ReachabilityDelta(source=source_pod, target=target_pod, port=port, protocol=protocol, allowed=allowed)
+            for source_pod in self._classes[source].pods
+            for target_pod in self._classes[target].pods
+            if source_pod != target_pod
+        ]
+
+    def _relation(self, class_id: int) -> Relation:
+        return {port_key: (self._row(class_id, port_key), self._column(class_id, port_key)) for port_key in self.ports}
+
+    def _invalidate(self, class_ids: Iterable[int]) -> None:
+        class_ids = list(class_ids)
+        for cache in (self._egress, self._ingress):
+            for bitsets in cache.values():
+                for class_id in class_ids:
+                    bitsets.pop(class_id, None)
+
+    def _allows(self, source: int, target: int, port_key: PortKey) -> bool:
+        return bool(self._egress_bitset(source, port_key) >> target & 1 and self._ingress_bitset(target, port_key) >> source & 1)
+
+    def _row(self, source: int, port_key: PortKey) -> int:
+        row = 0
+        for target in self._classes:
+            if self._allows(source, target, port_key):
+                row |= 1 << target
+        return row
+
+    def _column(self, target: int, port_key: PortKey) -> int:
+        column = 0
+        for source in self._classes:
+            if self._allows(source, target, port_key):
+                column |= 1 << source
+        return column
+
+    def _pods_of(self, bitset: int) -> List[str]:
+        return [pod for pod_class in self._classes.values() if bitset >> pod_class.index & 1 for pod in pod_class.pods]
+
+    def _egress_bitset(self, class_id: int, port_key: PortKey) -> int:
+        bitsets = self._egress.setdefault(port_key, {})
+        bitset = bitsets.get(class_id)
+        if bitset is None:
+            bitset = bitsets[class_id] = self._allowed_bitset(class_id, EGRESS, port_key)
+        return bitset
+
+    def _ingress_bitset(self, class_id: int, port_key: PortKey) -> int:
+        bitsets = self._ingress.setdefault(port_key, {})
+        bitset = bitsets.get(class_id)
+        if bitset is None:
+            bitset = bitsets[class_id] = self._allowed_bitset(class_id, INGRESS, port_key)
+        return bitset
+
+    def _allowed_bitset(self, class_id: int, direction: str, port_key: PortKey) -> int:
+        # The classes a class may send to (egress) or receive from (ingress)
+        port, protocol = port_key
+        policies = [
+            self._policies[name] for name in self._class_policies[class_id]
+            if direction in self._policies[name].directions
+        ]
+        # A class not selected by any policy of a direction is not isolated in it
+        if not policies:
+            return ALL
+
+        bitset = 0
+        for policy in policies:
+            if direction == INGRESS:
+                # Named ports resolve against the destination, the class itself
+                port_names = self._classes[class_id].port_names
+                for rule in policy.ingress_rules:
+                    if rule.ports.allows(port, protocol, port_names):
+                        bitset |= rule.bitset
+                continue
+
+            for rule in policy.egress_rules:
+                if rule.ports.allows(port, protocol):
+                    bitset |= rule.bitset
+                elif rule.ports.names:
+                    # Named ports resolve against each destination class
+                    for pod_class in self._classes.values():
+                        if rule.bitset >> pod_class.index & 1 and rule.ports.allows(port, protocol, pod_class.port_names):
+                            bitset |= 1 << pod_class.index
+        return bitset
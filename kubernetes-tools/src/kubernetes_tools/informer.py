@@ -0,0 +1,318 @@
+"""
+Watch-backed informer cache for Kubernetes resources.
+
+An informer performs one LIST per resource kind and namespace and then keeps
+an in-memory store up to date by following a WATCH stream. The watch resumes
+from the last seen resourceVersion and falls back to a full relist when the
+API server answers with 410 Gone. Failed requests are retried with an
+increasing delay, the watches use their own ApiClient, see
+kubernetes_tools.clients.get_watch_api_client.
+
+Informers are disabled by default. Once enabled, the read helpers in
+``pods`` and ``networkpolicy`` serve their results from the store instead
+of issuing a new request for every call:
+
+    from kubernetes_tools import informer, pods
+
+    informer.enable()
+    pod = pods.get_pod_by_name(name="backend", namespace="test-app")
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from kubernetes import client, watch
+
+from kubernetes_tools import clients, instrumentation
+
+logger = logging.getLogger(__name__)
+
+PODS = "pods"
+NETWORK_POLICIES = "networkpolicies"
+# Cluster-scoped, its informer is created with namespace None
+NAMESPACES = "namespaces"
+
+HTTP_STATUS_GONE = 410
+RETRY_DELAY = 1
+MAX_RETRY_DELAY = 30
+
+EventHandler = Callable[[str, Any], None]
+
+
+class Store:
+    """
+    Thread-safe in-memory store of Kubernetes objects keyed by name.
+
+    Every modification increments ``revision`` so that derived structures
+    (e.g. indexes) can detect whether they need to be rebuilt.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._objects: Dict[str, Any] = {}
+        self.revision = 0
+
+    def get(self, name: str) -> Optional[Any]:
+        with self._lock:
+            return self._objects.get(name)
+
+    def list(self) -> List[Any]:
+        with self._lock:
+            return list(self._objects.values())
+
+    def upsert(self, obj: Any) -> None:
+        with self._lock:
+            self._objects[obj.metadata.name] = obj
+            self.revision += 1
+
+    def delete(self, obj: Any) -> None:
+        with self._lock:
+            self._objects.pop(obj.metadata.name, None)
+            self.revision += 1
+
+    def replace(self, objects: List[Any]) -> None:
+        with self._lock:
+            self._objects = {obj.metadata.name: obj for obj in objects}
+            self.revision += 1
+
+
+class Informer:
+    """
+    Keeps a Store in sync with one resource kind in one namespace.
+
+    Args:
+        kind: The resource kind, one of PODS, NETWORK_POLICIES or NAMESPACES
+        namespace: The namespace to watch, None for cluster-scoped kinds
+        list_func: The list function of the API, e.g. CoreV1Api().list_namespaced_pod
+        watch_timeout: Server side timeout of a single watch request in seconds (default: 300)
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        namespace: Optional[str],
+        list_func: Callable[..., Any],
+        watch_timeout: int = 300
+    ):
+        self.kind = kind
+        self.namespace = namespace
+        self.store = Store()
+        self.resource_version: Optional[str] = None
+
+        self._list_func = list_func
+        self._watch_timeout = watch_timeout
+        self._handlers: List[EventHandler] = []
+        self._synced = threading.Event()
+        self._list_attempted = threading.Event()
+        self._stopped = threading.Event()
+        self._watch: Optional[watch.Watch] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def add_event_handler(self, handler: EventHandler) -> None:
+        """
+        Register a callback invoked with (event_type, object) for every change
+        applied to the store. Relists are reported as "SYNC" with the list of objects.
+        """
+        self._handlers.append(handler)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"informer-{self.kind}-{self.namespace or 'cluster'}",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._watch is not None:
+            self._watch.stop()
+
+    def wait_for_sync(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the initial LIST has been loaded into the store.
+
+        Does not wait once the initial LIST has failed, so that callers fall back to
+        direct requests while the LIST is retried in the background.
+
+        Returns:
+            True if the store is synced, False if the LIST failed or the timeout expired
+        """
+        self._list_attempted.wait(timeout)
+        return self._synced.is_set()
+
+    def has_synced(self) -> bool:
+        return self._synced.is_set()
+
+    def _run(self) -> None:
+        retry_delay = RETRY_DELAY
+        while not self._stopped.is_set():
+            try:
+                if self.resource_version is None:
+                    self._list()
+                    retry_delay = RETRY_DELAY
+                self._watch_once()
+                retry_delay = RETRY_DELAY
+            except client.exceptions.ApiException as e:
+                if e.status == HTTP_STATUS_GONE:
+                    logger.debug("Watch on %s/%s expired, relisting", self.namespace, self.kind)
+                    self.resource_version = None
+                    continue
+                logger.warning("Informer for %s/%s failed: %s", self.namespace, self.kind, e)
+                self._stopped.wait(retry_delay)
+                retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+            except Exception as e:
+                logger.warning("Informer for %s/%s failed: %s", self.namespace, self.kind, e)
+                self._stopped.wait(retry_delay)
+                retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+
+    def _list(self) -> None:
+        try:
+            object_list = self._list_func(**self._scope())
+        except Exception:
+            self._list_attempted.set()
+            raise
+        self.store.replace(object_list.items)
+        self.resource_version = object_list.metadata.resource_version
+        self._synced.set()
+        self._list_attempted.set()
+        self._notify("SYNC", object_list.items)
+
+    def _watch_once(self) -> None:
+        self._watch = watch.Watch()
+        for event in self._watch.stream(
+            self._list_func,
+            **self._scope(),
+            resource_version=self.resource_version,
+            timeout_seconds=self._watch_timeout,
+            allow_watch_bookmarks=True
+        ):
+            event_type = event["type"]
+
+            if event_type == "BOOKMARK":
+                # The client does not take the resourceVersion of bookmarks, so both the
+                # informer and the reconnects of the watch resume from it explicitly
+                self.resource_version = event["raw_object"]["metadata"]["resourceVersion"]
+                self._watch.resource_version = self.resource_version
+                continue
+
+            obj = event["object"]
+            if event_type == "DELETED":
+                self.store.delete(obj)
+            else:
+                self.store.upsert(obj)
+            self.resource_version = obj.metadata.resource_version
+            self._notify(event_type, obj)
+
+            if self._stopped.is_set():
+                break
+
+    def _scope(self) -> Dict[str, str]:
+        return {"namespace": self.namespace} if self.namespace is not None else {}
+
+    def _notify(self, event_type: str, obj: Any) -> None:
+        for handler in self._handlers:
+            try:
+                handler(event_type, obj)
+            except Exception:
+                logger.exception("Informer event handler failed")
+
+
+_lock = threading.Lock()
+_enabled = False
+_informers: Dict[Tuple[str, str], Informer] = {}
+
+
+def _after_fork_in_child() -> None:
+    global _lock
+    # Informer threads do not survive a fork, the child starts its own on demand
+    _lock = threading.Lock()
+    _informers.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _list_func_for(kind: str) -> Callable[..., Any]:
+    api_client = clients.get_watch_api_client()
+    if kind == PODS:
+        return clients.core_v1(api_client).list_namespaced_pod
+    if kind == NETWORK_POLICIES:
+        return clients.networking_v1(api_client).list_namespaced_network_policy
+    if kind == NAMESPACES:
+        return clients.core_v1(api_client).list_namespace
+    raise ValueError(f"Unsupported resource kind: {kind}")
+
+
+def enable() -> None:
+    """Serve reads of the pods and networkpolicy helpers from informer stores."""
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    """Stop all informers and fall back to direct API requests."""
+    global _enabled
+    with _lock:
+        _enabled = False
+        for informer in _informers.values():
+            informer.stop()
+        _informers.clear()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def get_informer(kind: str, namespace: Optional[str]) -> Informer:
+    """
+    Get the informer for a resource kind and namespace, starting it if needed.
+
+    Args:
+        kind: The resource kind, one of PODS, NETWORK_POLICIES or NAMESPACES
+        namespace: The namespace to watch, None for NAMESPACES
+
+    Returns:
+        The running Informer
+    """
+    with _lock:
+        informer = _informers.get((kind, namespace))
+        if informer is None:
+            informer = Informer(kind, namespace, _list_func_for(kind))
+            _informers[(kind, namespace)] = informer
+            informer.start()
+    return informer
+
+
+def get_store(kind: str, namespace: Optional[str], sync_timeout: float = 30) -> Optional[Store]:
+    """
+    Get the synced store for a resource kind and namespace.
+
+    Args:
+        kind: The resource kind, one of PODS or NETWORK_POLICIES
+        namespace: The namespace of the objects
+        sync_timeout: How long to wait for the initial LIST in seconds (default: 30),
+            a failed LIST is not waited for again while it is retried
+
+    Returns:
+        The Store if informers are enabled and the store has synced, None otherwise.
+        If a snapshot is enabled, the read-only store of the snapshot, see kubernetes_tools.snapshot
+    """
+    # Imported here since snapshot depends on this module
+    from kubernetes_tools import snapshot
+    snapshot_store = snapshot.get_store(kind, namespace)
+    if snapshot_store is not None:
+        return snapshot_store
+
+    if not _enabled:
+        return None
+
+    informer = get_informer(kind, namespace)
+    synced = informer.wait_for_sync(sync_timeout)
+    instrumentation.record_cache("informer", synced)
+    return informer.store if synced else None
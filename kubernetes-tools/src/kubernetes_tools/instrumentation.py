@@ -0,0 +1,495 @@
+"""
+Instrumentation of tool calls, API requests and ephemeral container phases.
+
+Every tool of agent_tools and every request of the shared ApiClient is measured:
+duration, bytes returned, object count, cache hits and errors. Instrumentation
+is disabled by default and costs a single check per call then. Measurements are
+passed to backends, which can be combined:
+
+- PrometheusBackend: histograms and counters (pip install prometheus-client)
+- OpenTelemetryBackend: one span per measurement, nested like the calls (pip install opentelemetry-api)
+- RecordingBackend: keeps the measurements in memory, e.g. for tests
+
+Example:
+    from kubernetes_tools import instrumentation
+
+    instrumentation.enable(instrumentation.PrometheusBackend())
+    prometheus_client.start_http_server(9100)
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from kubernetes import client
+from pydantic import BaseModel
+
+TOOL = "tool"
+API = "api"
+PHASE = "phase"
+
+
+class Measurement:
+    """
+    A measured tool call, API request or phase.
+
+    Attributes:
+        kind: TOOL, API or PHASE
+        name: The tool name, "<method> <path template>" of a request or the phase name
+        start_time_ns: The wall clock start time in nanoseconds since the epoch
+        duration: The duration in seconds, set when the measurement is finished
+        bytes: The size of the response or tool result, None if unknown
+        objects: The number of returned objects, None if unknown
+        cache_hits: The number of cache hits during the measurement
+        cache_misses: The number of cache misses during the measurement
+        error: The error type if the call failed, e.g. "ApiException 404"
+        context: Backend specific state, e.g. the span of the measurement
+    """
+    __slots__ = (
+        "kind", "name", "start_time_ns", "duration", "bytes", "objects",
+        "cache_hits", "cache_misses", "error", "context", "_start"
+    )
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.start_time_ns = time.time_ns()
+        self.duration: Optional[float] = None
+        self.bytes: Optional[int] = None
+        self.objects: Optional[int] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.error: Optional[str] = None
+        self.context: Dict[str, Any] = {}
+        self._start = time.perf_counter()
+
+    def __repr__(self) -> str:
+        return (
+            f"Measurement(kind={self.kind!r}, name={self.name!r}, duration={self.duration!r}, "
+            f"bytes={self.bytes!r}, objects={self.objects!r}, cache_hits={self.cache_hits!r}, "
+            f"cache_misses={self.cache_misses!r}, error={self.error!r})"
+        )
+
+
+class Backend:
+    """Base class of the backends, which ignores all measurements."""
+
+    def start(self, measurement: Measurement) -> None:
+        """Called when a measurement starts, before the measured call."""
+
+    def finish(self, measurement: Measurement) -> None:
+        """Called when a measurement is finished and all its values are set."""
+
+    def cache(self, cache: str, hit: bool) -> None:
+        """Called for every lookup in one of the caches, e.g. "informer" or "compiled_policy"."""
+
+
+class RecordingBackend(Backend):
+    """
+    Keeps the finished measurements and cache lookups in memory.
+
+    Args:
+        max_measurements: The number of measurements to keep, older ones are dropped (default: 10000)
+    """
+
+    def __init__(self, max_measurements: int = 10000):
+        self.max_measurements = max_measurements
+        self.measurements: List[Measurement] = []
+        self.cache_lookups: Dict[str, Dict[bool, int]] = {}
+        self._lock = threading.Lock()
+
+    def finish(self, measurement: Measurement) -> None:
+        with self._lock:
+            self.measurements.append(measurement)
+            if len(self.measurements) > self.max_measurements:
+                del self.measurements[0]
+
+    def cache(self, cache: str, hit: bool) -> None:
+        with self._lock:
+            lookups = self.cache_lookups.setdefault(cache, {True: 0, False: 0})
+            lookups[hit] += 1
+
+    def find(self, kind: Optional[str] = None, name: Optional[str] = None) -> List[Measurement]:
+        """Get the measurements of a kind and/or name."""
+        with self._lock:
+            return [
+                measurement for measurement in self.measurements
+                if (kind is None or measurement.kind == kind) and (name is None or measurement.name == name)
+            ]
+
+
+class PrometheusBackend(Backend):
+    """
+    Exports the measurements as Prometheus metrics:
+
+    - <prefix>_duration_seconds: histogram by kind and name
+    - <prefix>_response_bytes_total, <prefix>_objects_total: counters by kind and name
+    - <prefix>_errors_total: counter by kind, name and error
+    - <prefix>_cache_lookups_total: counter by cache and result (hit or miss)
+
+    Args:
+        registry: The registry of the metrics (default: the default registry of prometheus_client)
+        prefix: The prefix of the metric names (default: "kubernetes_tools")
+
+    Raises:
+        ImportError: If prometheus_client is not installed
+    """
+
+    def __init__(self, registry: Any = None, prefix: str = "kubernetes_tools"):
+        import prometheus_client
+
+        if registry is None:
+            registry = prometheus_client.REGISTRY
+
+        self.duration = prometheus_client.Histogram(
+            f"{prefix}_duration_seconds",
+            "Duration of tool calls, API requests and ephemeral container phases",
+            ["kind", "name"],
+            registry=registry,
+            buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+        )
+        self.response_bytes = prometheus_client.Counter(
+            f"{prefix}_response_bytes",
+            "Bytes returned by tool calls and API requests",
+            ["kind", "name"],
+            registry=registry
+        )
+        self.objects = prometheus_client.Counter(
+            f"{prefix}_objects",
+            "Objects returned by tool calls and API requests",
+            ["kind", "name"],
+            registry=registry
+        )
+        self.errors = prometheus_client.Counter(
+            f"{prefix}_errors",
+            "Failed tool calls and API requests",
+            ["kind", "name", "error"],
+            registry=registry
+        )
+        self.cache_lookups = prometheus_client.Counter(
+            f"{prefix}_cache_lookups",
+            "Lookups in the informer, policy index and compiled policy caches",
+            ["cache", "result"],
+            registry=registry
+        )
+
+    def finish(self, measurement: Measurement) -> None:
+        labels = (measurement.kind, measurement.name)
+        self.duration.labels(*labels).observe(measurement.duration)
+        if measurement.bytes is not None:
+            self.response_bytes.labels(*labels).inc(measurement.bytes)
+        if measurement.objects is not None:
+            self.objects.labels(*labels).inc(measurement.objects)
+        if measurement.error is not None:
+            self.errors.labels(*labels, measurement.error).inc()
+
+    def cache(self, cache: str, hit: bool) -> None:
+        self.cache_lookups.labels(cache, "hit" if hit else "miss").inc()
+
+
+class OpenTelemetryBackend(Backend):
+    """
+    Creates an OpenTelemetry span per measurement. Spans of API requests made by a
+    tool are children of the span of the tool call.
+
+    Args:
+        tracer: The tracer creating the spans (default: the tracer "kubernetes_tools" of the
+            global tracer provider)
+
+    Raises:
+        ImportError: If opentelemetry-api is not installed
+    """
+
+    def __init__(self, tracer: Any = None):
+        from opentelemetry import context, trace
+
+        self._context = context
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer("kubernetes_tools")
+
+    def start(self, measurement: Measurement) -> None:
+        span = self.tracer.start_span(
+            f"{measurement.kind} {measurement.name}",
+            start_time=measurement.start_time_ns,
+            attributes={"kubernetes_tools.kind": measurement.kind}
+        )
+        measurement.context["otel_span"] = span
+        measurement.context["otel_token"] = self._context.attach(self._trace.set_span_in_context(span))
+
+    def finish(self, measurement: Measurement) -> None:
+        span = measurement.context.pop("otel_span")
+        self._context.detach(measurement.context.pop("otel_token"))
+
+        if measurement.bytes is not None:
+            span.set_attribute("kubernetes_tools.bytes", measurement.bytes)
+        if measurement.objects is not None:
+            span.set_attribute("kubernetes_tools.objects", measurement.objects)
+        span.set_attribute("kubernetes_tools.cache_hits", measurement.cache_hits)
+        span.set_attribute("kubernetes_tools.cache_misses", measurement.cache_misses)
+        if measurement.error is not None:
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, measurement.error))
+
+        span.end(end_time=measurement.start_time_ns + int(measurement.duration * 1e9))
+
+
+_backends: List[Backend] = []
+_current: contextvars.ContextVar[Optional[Measurement]] = contextvars.ContextVar("measurement", default=None)
+
+
+def enable(*backends: Backend) -> None:
+    """
+    Pass all measurements to the backends, replacing previously enabled ones.
+
+    Example:
+        recording = instrumentation.RecordingBackend()
+        instrumentation.enable(recording, instrumentation.OpenTelemetryBackend())
+    """
+    global _backends
+    _backends = list(backends)
+
+
+def disable() -> None:
+    """Stop measuring."""
+    global _backends
+    _backends = []
+
+
+def is_enabled() -> bool:
+    return bool(_backends)
+
+
+@contextmanager
+def measure(kind: str, name: str) -> Iterator[Optional[Measurement]]:
+    """
+    Measure the enclosed block. The block can set bytes and objects of the yielded
+    Measurement, which is None if instrumentation is disabled.
+
+    Example:
+        with measure(API, "GET /api/v1/namespaces/{namespace}/pods") as measurement:
+            pod_list = v1.list_namespaced_pod(namespace)
+            if measurement:
+                measurement.objects = len(pod_list.items)
+    """
+    backends = _backends
+    if not backends:
+        yield None
+        return
+
+    measurement = Measurement(kind, name)
+    for backend in backends:
+        backend.start(measurement)
+    token = _current.set(measurement)
+
+    try:
+        yield measurement
+    except BaseException as e:
+        measurement.error = _error_name(e)
+        raise
+    finally:
+        _current.reset(token)
+        _finish(measurement, backends)
+
+
+def record(kind: str, name: str, duration: float, **values: Any) -> None:
+    """
+    Record a measurement that has already ended, e.g. a phase observed in a watch.
+
+    Args:
+        kind: The kind of the measurement, e.g. PHASE
+        name: The name of the measurement
+        duration: The duration in seconds
+        values: Further values of the Measurement, e.g. objects=3
+    """
+    backends = _backends
+    if not backends:
+        return
+
+    measurement = Measurement(kind, name)
+    measurement.start_time_ns -= int(duration * 1e9)
+    for key, value in values.items():
+        setattr(measurement, key, value)
+
+    for backend in backends:
+        backend.start(measurement)
+    measurement.duration = duration
+    for backend in backends:
+        backend.finish(measurement)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """
+    Record a lookup in a cache. It is counted for the current measurement as well.
+
+    Args:
+        cache: The name of the cache, e.g. "informer"
+        hit: Whether the lookup was served from the cache
+    """
+    backends = _backends
+    if not backends:
+        return
+
+    measurement = _current.get()
+    if measurement is not None:
+        if hit:
+            measurement.cache_hits += 1
+        else:
+            measurement.cache_misses += 1
+    for backend in backends:
+        backend.cache(cache, hit)
+
+
+def current() -> Optional[Measurement]:
+    """Get the innermost running measurement, None if there is none."""
+    return _current.get()
+
+
+def _finish(measurement: Measurement, backends: List[Backend]) -> None:
+    measurement.duration = time.perf_counter() - measurement._start
+    for backend in reversed(backends):
+        backend.finish(measurement)
+
+
+def _error_name(e: BaseException) -> str:
+    status = getattr(e, "status", None)
+    return f"{type(e).__name__} {status}" if status else type(e).__name__
+
+
+class PhaseTimer:
+    """
+    Records the time between consecutive phases of a process as PHASE measurements
+    named "<prefix>.<phase>". Every phase is recorded once, when it is first reached.
+
+    Example:
+        timer = PhaseTimer("ephemeral_container")
+        patch_pod()
+        timer.reached("patch")
+        wait_until_running()
+        timer.reached("running")
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.reached_phases: List[str] = []
+        self._last = time.perf_counter()
+
+    def reached(self, phase: str) -> None:
+        if phase in self.reached_phases:
+            return
+        now = time.perf_counter()
+        self.reached_phases.append(phase)
+        record(PHASE, f"{self.prefix}.{phase}", now - self._last)
+        self._last = now
+
+
+class InstrumentedApiClient(client.ApiClient):
+    """
+    ApiClient measuring every request as API measurement named after the method and
+    path template, e.g. "GET /api/v1/namespaces/{namespace}/pods/{name}". The shared
+    ApiClients of kubernetes_tools.clients are InstrumentedApiClients, see
+    kubernetes_tools.aio.instrumentation for the async ones.
+    """
+
+    def call_api(self, resource_path, method, *args, **kwargs):
+        if not _backends:
+            return super().call_api(resource_path, method, *args, **kwargs)
+
+        with measure(API, f"{method} {resource_path}") as measurement:
+            result = super().call_api(resource_path, method, *args, **kwargs)
+            measurement.objects = count_objects(result)
+            return result
+
+    def request(self, method, url, *args, **kwargs):
+        response = super().request(method, url, *args, **kwargs)
+        measurement = _current.get()
+        if measurement is not None and measurement.kind == API:
+            measurement.bytes = _response_size(response)
+        return response
+
+
+def count_objects(result: Any) -> Optional[int]:
+    """Get the number of objects returned by an API request, None for raw responses."""
+    if isinstance(result, tuple):
+        result = result[0]
+    if result is None:
+        return 0
+    if hasattr(result, "openapi_types"):
+        items = getattr(result, "items", None)
+        return len(items) if isinstance(items, list) else 1
+    # Raw responses of _preload_content=False are decoded by the caller
+    return None
+
+
+def _response_size(response: Any) -> Optional[int]:
+    # A raw response may be a stream, e.g. of a watch, so it is not read here
+    data = getattr(response, "data", None) if hasattr(response, "urllib3_response") else None
+    if isinstance(data, (bytes, str)):
+        return len(data)
+    length = response.getheader("Content-Length") if hasattr(response, "getheader") else None
+    return int(length) if length else None
+
+
+def instrument_tool(tool: Any) -> Any:
+    """
+    Measure the calls of a LangChain tool as TOOL measurements, for its sync and async
+    implementation. The bytes of a measurement are the size of the JSON result.
+
+    Args:
+        tool: The tool created with @tool
+
+    Returns:
+        The tool
+    """
+    if tool.func is not None:
+        tool.func = _instrumented(tool.name, tool.func)
+    if tool.coroutine is not None:
+        tool.coroutine = _instrumented(tool.name, tool.coroutine)
+    return tool
+
+
+def _instrumented(name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+    if getattr(func, "__instrumented__", False):
+        return func
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def instrumented(*args, **kwargs):
+            with measure(TOOL, name) as measurement:
+                result = await func(*args, **kwargs)
+                if measurement is not None:
+                    _describe_result(measurement, result)
+                return result
+    else:
+        @functools.wraps(func)
+        def instrumented(*args, **kwargs):
+            with measure(TOOL, name) as measurement:
+                result = func(*args, **kwargs)
+                if measurement is not None:
+                    _describe_result(measurement, result)
+                return result
+
+    instrumented.__instrumented__ = True
+    return instrumented
+
+
+def _describe_result(measurement: Measurement, result: Any) -> None:
+    if result is None:
+        measurement.objects = 0
+    elif isinstance(result, (list, tuple)):
+        measurement.objects = len(result)
+    else:
+        measurement.objects = 1
+    measurement.bytes = len(json.dumps(result, default=_json_default))
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    return str(obj)
@@ -0,0 +1,123 @@
+"""
+Lazy loading of the Kubernetes client configuration.
+
+Importing kubernetes_tools does not read any kube config. The configuration is
+loaded once on first use of the shared ApiClient, or explicitly with configure().
+Inside a pod the in-cluster service account configuration is detected
+automatically. Since the loaded configuration is kept for the lifetime of the
+process, forked workers inherit it without loading it again. The async clients
+of kubernetes_tools.aio load their configuration from the same settings.
+
+Example:
+    from kubernetes_tools import kubeconfig, pods
+
+    kubeconfig.configure(context="kind-cks")
+    pod = pods.get_pod_by_name(name="backend", namespace="test-app")
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import NamedTuple, Optional
+
+from kubernetes import client, config
+
+SERVICE_HOST_ENV = "KUBERNETES_SERVICE_HOST"
+KUBECONFIG_ENV = "KUBECONFIG"
+
+
+class Settings(NamedTuple):
+    """Where the loaded client configuration came from, see configure()."""
+    config_file: Optional[str]
+    context: Optional[str]
+    in_cluster: bool
+    configuration: Optional[client.Configuration]
+
+
+_lock = threading.Lock()
+_configured = False
+_settings: Optional[Settings] = None
+
+
+def running_in_cluster() -> bool:
+    """
+    Check whether the in-cluster configuration should be used, i.e. the process runs
+    inside a pod and no kube config file was set explicitly through KUBECONFIG.
+    """
+    return SERVICE_HOST_ENV in os.environ and KUBECONFIG_ENV not in os.environ
+
+
+def configure(
+    config_file: Optional[str] = None,
+    context: Optional[str] = None,
+    in_cluster: Optional[bool] = None,
+    configuration: Optional[client.Configuration] = None
+) -> None:
+    """
+    Load the client configuration used by all helpers, replacing a previously loaded one.
+
+    Args:
+        config_file: Path of the kube config file (default: KUBECONFIG or ~/.kube/config)
+        context: The kube config context to use (default: the current context)
+        in_cluster: Use the service account of the pod instead of a kube config file
+            (default: auto-detected with running_in_cluster())
+        configuration: Use this Configuration as is instead of loading one, e.g. for a test server
+
+    Example:
+        configure(configuration=client.Configuration(host="http://127.0.0.1:8001"))
+    """
+    global _configured
+    with _lock:
+        _load(config_file, context, in_cluster, configuration)
+        _configured = True
+
+    # Imported here since clients depends on this module
+    from kubernetes_tools import clients
+    clients.reset_api_client()
+
+
+def ensure_configured() -> None:
+    """Load the client configuration with the defaults of configure() unless it is loaded already."""
+    global _configured
+    if _configured:
+        return
+    with _lock:
+        if not _configured:
+            _load(None, None, None, None)
+            _configured = True
+
+
+def is_configured() -> bool:
+    return _configured
+
+
+def get_settings() -> Settings:
+    """
+    Get the settings the client configuration was loaded with, loading it with the defaults
+    of configure() if needed. Every load returns new Settings, so that clients built from
+    them can detect a reload by identity.
+    """
+    ensure_configured()
+    return _settings
+
+
+def _load(
+    config_file: Optional[str],
+    context: Optional[str],
+    in_cluster: Optional[bool],
+    configuration: Optional[client.Configuration]
+) -> None:
+    global _settings
+    if configuration is not None:
+        client.Configuration.set_default(configuration)
+        _settings = Settings(None, None, False, configuration)
+        return
+
+    if in_cluster is None:
+        in_cluster = running_in_cluster() and config_file is None and context is None
+
+    if in_cluster:
+        config.load_incluster_config()
+    else:
+        config.load_kube_config(config_file=config_file, context=context)
+    _settings = Settings(config_file, context, in_cluster, None)
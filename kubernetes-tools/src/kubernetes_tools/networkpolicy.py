@@ -1,149 +1,512 @@
 from __future__ import annotations
 
-from typing import List
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 from kubernetes import client
 
-def get_network_policies_matching_pod(
-    pod: client.V1Pod
+from kubernetes_tools import clients, fastjson, informer, instrumentation, selector_matrix, snapshot
+from kubernetes_tools.cidr import parse_addresses
+from kubernetes_tools.policy_index import EGRESS, INGRESS, IPBlockIndex, PolicyIndex
+from kubernetes_tools.ports import CompiledPorts, PortNames, compile_ports, get_port_names
+from kubernetes_tools.selectors import CompiledPeer, compile_policy, default_namespace_labels
+
+_policy_indexes: Dict[str, Tuple[int, PolicyIndex]] = {}
+_ip_block_indexes: Dict[str, Tuple[int, IPBlockIndex]] = {}
+_policy_indexes_lock = threading.Lock()
+
+def list_network_policies(
+    namespace: str,
+    api_client: Optional[client.ApiClient] = None,
+    raw: bool = False
 ) -> List[client.V1NetworkPolicy]:
     """
-    Get the all NetworkPolicies whose selector matches the given pod.
+    List all NetworkPolicies in a namespace, served from the informer store if enabled.
 
     Args:
-        pod: Kubernetes Pod object (V1Pod)
+        namespace: The namespace of the NetworkPolicies
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+        raw: Decode the response as JsonObjects instead of building V1NetworkPolicy objects, see
+            kubernetes_tools.fastjson. Policies of an informer store are returned as models (default: False)
 
     Returns:
         List of NetworkPolicies
     """
+    store = informer.get_store(informer.NETWORK_POLICIES, namespace) if api_client is None else None
+    if store is not None:
+        return store.list()
+
+    networking_v1 = clients.networking_v1(api_client)
+    if raw:
+        return fastjson.read_items(networking_v1.list_namespaced_network_policy(
+            namespace=namespace,
+            _preload_content=False
+        ))
+    return networking_v1.list_namespaced_network_policy(namespace=namespace).items
+
+def read_network_policy(
+    name: str,
+    namespace: str,
+    api_client: Optional[client.ApiClient] = None
+) -> Optional[client.V1NetworkPolicy]:
+    """
+    Get a NetworkPolicy by name, served from the informer store if enabled.
 
-    networking_v1 = client.NetworkingV1Api()
+    Args:
+        name: The name of the NetworkPolicy
+        namespace: The namespace of the NetworkPolicy
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
 
-    # Get pod labels and namespace
-    pod_labels = pod.metadata.labels or {}
-    pod_namespace = pod.metadata.namespace
+    Returns:
+        The V1NetworkPolicy, None if it doesn't exist
+    """
+    store = informer.get_store(informer.NETWORK_POLICIES, namespace) if api_client is None else None
+    if store is not None:
+        return store.get(name)
+
+    networking_v1 = clients.networking_v1(api_client)
+
+    try:
+        return networking_v1.read_namespaced_network_policy(name=name, namespace=namespace)
+    except client.exceptions.ApiException as e:
+        if e.status == 404:
+            return None
+        raise
+
+def get_policy_index(
+    namespace: str,
+    api_client: Optional[client.ApiClient] = None,
+    raw: bool = False
+) -> PolicyIndex:
+    """
+    Get a PolicyIndex over all NetworkPolicies in a namespace.
 
-    # List all NetworkPolicies in the pod's namespace
-    network_policies = networking_v1.list_namespaced_network_policy(
-        namespace=pod_namespace
-    )
+    If informers are enabled the index is built once per store revision and
+    reused by subsequent calls, otherwise it is built from a fresh LIST.
 
-    matching_policies = []
+    Args:
+        namespace: The namespace of the NetworkPolicies
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+        raw: Build the index from JsonObjects instead of models if the policies are listed (default: False)
 
-    for network_policy in network_policies.items:
-        pod_selector = network_policy.spec.pod_selector
+    Returns:
+        PolicyIndex of the namespace
+    """
+    store = informer.get_store(informer.NETWORK_POLICIES, namespace) if api_client is None else None
+    if store is None:
+        return PolicyIndex(list_network_policies(namespace, api_client, raw))
+
+    with _policy_indexes_lock:
+        revision = store.revision
+        cached = _policy_indexes.get(namespace)
+        hit = cached is not None and cached[0] == revision
+        if not hit:
+            cached = (revision, PolicyIndex(store.list()))
+            _policy_indexes[namespace] = cached
+    instrumentation.record_cache("policy_index", hit)
+    return cached[1]
+
+def get_ip_block_index(
+    namespace: str,
+    api_client: Optional[client.ApiClient] = None,
+    raw: bool = False
+) -> IPBlockIndex:
+    """
+    Get an IPBlockIndex over all NetworkPolicies in a namespace.
 
-        # Empty selector (no match_labels) matches all pods
-        if not pod_selector.match_labels:
-            matching_policies.append(network_policy)
-            continue
+    Like get_policy_index() the index is built once per informer store revision
+    if informers are enabled, otherwise from a fresh LIST.
 
-        # Check if all selector labels match the pod's labels
-        if all(
-            pod_labels.get(key) == value
-            for key, value in pod_selector.match_labels.items()
-        ):
-            matching_policies.append(network_policy)
+    Args:
+        namespace: The namespace of the NetworkPolicies
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+        raw: Build the index from JsonObjects instead of models if the policies are listed (default: False)
 
-    return matching_policies
+    Returns:
+        IPBlockIndex of the namespace
+    """
+    store = informer.get_store(informer.NETWORK_POLICIES, namespace) if api_client is None else None
+    if store is None:
+        return IPBlockIndex(list_network_policies(namespace, api_client, raw))
+
+    with _policy_indexes_lock:
+        revision = store.revision
+        cached = _ip_block_indexes.get(namespace)
+        hit = cached is not None and cached[0] == revision
+        if not hit:
+            cached = (revision, IPBlockIndex(store.list()))
+            _ip_block_indexes[namespace] = cached
+    instrumentation.record_cache("ip_block_index", hit)
+    return cached[1]
 
-# TODO: Examine whether is it possible to refactor a generic method for both ingress and egress rules functions.
-def contains_ingress_rule(network_policy: client.V1NetworkPolicy, port: int, peer_selector: dict, protocol: str = "TCP") -> bool:
+def get_network_policies_matching_pod(
+    pod: client.V1Pod,
+    api_client: Optional[client.ApiClient] = None,
+    raw: bool = False
+) -> List[client.V1NetworkPolicy]:
     """
-    Check if a network policy contains an ingress rule matching the specified port, peer selector, and protocol.
+    Get the all NetworkPolicies whose selector matches the given pod.
 
     Args:
-        network_policy: The V1NetworkPolicy to check
-        port: The port number to match
-        peer_selector: Pod selector labels to match (e.g., {"app": "pod-a"})
-        protocol: The protocol to match (default: "TCP")
+        pod: Kubernetes Pod object (V1Pod or JsonObject)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+        raw: List the policies as JsonObjects instead of models, see kubernetes_tools.fastjson (default: False)
 
     Returns:
-        True if the network policy contains a matching ingress rule, False otherwise
+        List of NetworkPolicies
     """
-    if not network_policy.spec.ingress:
-        return False
+    pod_labels = pod.metadata.labels or {}
 
-    protocol = protocol.upper()
+    return get_policy_index(pod.metadata.namespace, api_client, raw).match(pod_labels)
 
-    # Iterate through all ingress rules
-    for ingress_rule in network_policy.spec.ingress:
+def get_network_policies_matching_labels_in_namespaces(
+    labels: dict,
+    namespaces: Optional[Iterable[str]] = None,
+    api_client: Optional[client.ApiClient] = None,
+    raw: bool = False
+) -> Dict[str, List[client.V1NetworkPolicy]]:
+    """
+    Get the NetworkPolicies selecting pods with the given labels in several or all namespaces.
 
-        if not ingress_rule._from:
-            continue
+    Without namespaces a single list_network_policy_for_all_namespaces request is made,
+    otherwise the namespaces are queried concurrently.
 
-        # Check if any peer matches the selector
-        peer_matches = False
-        for peer in ingress_rule._from:
-            if peer.pod_selector and peer.pod_selector.match_labels:
-                # Check if all selector labels match
-                if peer.pod_selector.match_labels == peer_selector:
-                    peer_matches = True
-                    break
+    Args:
+        labels: The labels of the pods
+        namespaces: The namespaces to search (default: all namespaces)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+        raw: List the policies as JsonObjects instead of models, see kubernetes_tools.fastjson (default: False)
 
-        if not peer_matches:
-            continue
+    Returns:
+        The matching NetworkPolicies grouped by namespace. Namespaces given explicitly are
+        always contained, with an empty list if no policy matches
 
-        # If ports are not specified, rule applies to all ports
-        if not ingress_rule.ports:
-            return True
+    Example:
+        policies_by_namespace = get_network_policies_matching_labels_in_namespaces({"app": "db"})
+        for namespace, policies in policies_by_namespace.items():
+            print(f"{namespace}: {[policy.metadata.name for policy in policies]}")
+    """
+    if namespaces is None:
+        loaded = snapshot.get_snapshot() if api_client is None else None
+        if loaded is not None:
+            network_policies = loaded.list(informer.NETWORK_POLICIES)
+        elif raw:
+            network_policies = fastjson.read_items(
+                clients.networking_v1(api_client).list_network_policy_for_all_namespaces(_preload_content=False)
+            )
+        else:
+            network_policies = clients.networking_v1(api_client).list_network_policy_for_all_namespaces().items
+
+        policies_by_namespace: Dict[str, List[client.V1NetworkPolicy]] = {}
+        for network_policy in network_policies:
+            policies_by_namespace.setdefault(network_policy.metadata.namespace, []).append(network_policy)
+
+        matching = {
+            namespace: PolicyIndex(network_policies).match(labels)
+            for namespace, network_policies in policies_by_namespace.items()
+        }
+        return {namespace: policies for namespace, policies in matching.items() if policies}
+
+    namespaces = list(dict.fromkeys(namespaces))
+    policy_lists = clients.map_concurrently(
+        lambda namespace: get_policy_index(namespace, api_client, raw).match(labels),
+        namespaces
+    )
+    return dict(zip(namespaces, policy_lists))
 
-        # Check if any port matches
-        for policy_port in ingress_rule.ports:
-            port_matches = policy_port.port == port
-            protocol_matches = (policy_port.protocol or "TCP").upper() == protocol
+def get_network_policies_matching_pods(
+    pods: Iterable[client.V1Pod],
+    api_client: Optional[client.ApiClient] = None
+) -> Dict[str, Dict[str, List[client.V1NetworkPolicy]]]:
+    """
+    Get the NetworkPolicies matching each of the given pods, which may be in different namespaces.
 
-            if port_matches and protocol_matches:
-                return True
+    The policies of the namespaces of the pods are fetched concurrently, once per namespace.
+    With NumPy installed all selectors are evaluated for all pods at once, see
+    selector_matrix.compute_selection_matrix().
 
-    return False
+    Args:
+        pods: Kubernetes Pod objects (V1Pod)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+
+    Returns:
+        For every namespace the matching NetworkPolicies by pod name
+    """
+    pods_by_namespace: Dict[str, List[client.V1Pod]] = {}
+    for pod in pods:
+        pods_by_namespace.setdefault(pod.metadata.namespace, []).append(pod)
+
+    namespaces = list(pods_by_namespace)
+    indexes = clients.map_concurrently(lambda namespace: get_policy_index(namespace, api_client), namespaces)
+
+    if selector_matrix.is_available():
+        pod_list = [pod for namespace in namespaces for pod in pods_by_namespace[namespace]]
+        # The policies of each index are ordered by name like the results of PolicyIndex.match()
+        matrix = selector_matrix.compute_selection_matrix(
+            pod_list, [network_policy for index in indexes for network_policy in index.policies()]
+        )
+        matching: Dict[str, Dict[str, List[client.V1NetworkPolicy]]] = {namespace: {} for namespace in namespaces}
+        for row, pod in enumerate(pod_list):
+            matching[pod.metadata.namespace][pod.metadata.name] = matrix.policies_for(row)
+        return matching
+
+    return {
+        namespace: {
+            pod.metadata.name: index.match(pod.metadata.labels or {})
+            for pod in pods_by_namespace[namespace]
+        }
+        for namespace, index in zip(namespaces, indexes)
+    }
+
+def get_network_policies_allowing_egress_to_ip(
+    pod: client.V1Pod,
+    addresses: Union[str, Iterable[str]],
+    port: int,
+    protocol: str = "TCP",
+    api_client: Optional[client.ApiClient] = None
+) -> Optional[List[client.V1NetworkPolicy]]:
+    """
+    Get the NetworkPolicies of a pod whose egress rules allow traffic to an IP address,
+    evaluating the ipBlock peers including their except CIDRs.
+
+    Args:
+        pod: Kubernetes Pod object (V1Pod or JsonObject)
+        addresses: The IPv4 or IPv6 destination address, or all addresses of a dual-stack destination
+        port: The destination port
+        protocol: The protocol (default: "TCP")
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+
+    Returns:
+        The allowing NetworkPolicies ordered by name, None if no policy isolates the egress
+        of the pod, i.e. all egress traffic is allowed
+
+    Example:
+        policies = get_network_policies_allowing_egress_to_ip(pod, "10.2.3.4", 443)
+        if policies is None or policies:
+            print("Egress to 10.2.3.4:443 is allowed")
+    """
+    return _get_network_policies_allowing_ip(EGRESS, pod, addresses, port, protocol, api_client)
+
+def get_network_policies_allowing_ingress_from_ip(
+    pod: client.V1Pod,
+    addresses: Union[str, Iterable[str]],
+    port: int,
+    protocol: str = "TCP",
+    api_client: Optional[client.ApiClient] = None
+) -> Optional[List[client.V1NetworkPolicy]]:
+    """
+    Get the NetworkPolicies of a pod whose ingress rules allow traffic from an IP address
+    to a port of the pod, evaluating the ipBlock peers including their except CIDRs.
+
+    Args:
+        pod: Kubernetes Pod object (V1Pod or JsonObject)
+        addresses: The IPv4 or IPv6 source address, or all addresses of a dual-stack source
+        port: The port of the pod
+        protocol: The protocol (default: "TCP")
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+
+    Returns:
+        The allowing NetworkPolicies ordered by name, None if no policy isolates the ingress
+        of the pod, i.e. all ingress traffic is allowed
+    """
+    return _get_network_policies_allowing_ip(INGRESS, pod, addresses, port, protocol, api_client)
+
+def _get_network_policies_allowing_ip(
+    direction: str,
+    pod: client.V1Pod,
+    addresses: Union[str, Iterable[str]],
+    port: int,
+    protocol: str,
+    api_client: Optional[client.ApiClient]
+) -> Optional[List[client.V1NetworkPolicy]]:
+    namespace = pod.metadata.namespace
+    if isinstance(addresses, str):
+        addresses = [addresses]
+
+    # Named ports refer to the destination, which is only a pod for ingress
+    port_names = get_port_names(pod) if direction == INGRESS else None
+    isolating = {
+        network_policy.metadata.name
+        for network_policy in get_policy_index(namespace, api_client).match(pod.metadata.labels or {})
+        if direction in policy_types(network_policy)
+    }
+    if not isolating:
+        return None
+
+    ip_block_index = get_ip_block_index(namespace, api_client)
+    rules = ip_block_index.egress_rules(*addresses) if direction == EGRESS else ip_block_index.ingress_rules(*addresses)
+
+    allowing = {}
+    for network_policy, rule_ports in rules:
+        name = network_policy.metadata.name
+        if name in isolating and name not in allowing and rule_ports.allows(port, protocol, port_names):
+            allowing[name] = network_policy
+    return [allowing[name] for name in sorted(allowing)]
+
+def contains_ingress_rule(
+    network_policy: client.V1NetworkPolicy,
+    port: int,
+    peer_selector: dict,
+    protocol: str = "TCP",
+    peer_namespace: Optional[str] = None,
+    peer_namespace_labels: Optional[dict] = None,
+    peer_ips: Optional[Iterable[str]] = None,
+    port_names: Optional[PortNames] = None
+) -> bool:
+    """
+    Check if a network policy contains an ingress rule matching the specified port, peer selector, and protocol.
+
+    Args:
+        network_policy: The V1NetworkPolicy to check
+        port: The port number to match
+        peer_selector: Labels of the peer pod (e.g., {"app": "pod-a"}) evaluated against the rule's pod selectors
+        protocol: The protocol to match (default: "TCP")
+        peer_namespace: The namespace of the peer pod (default: the namespace of the policy)
+        peer_namespace_labels: The labels of the peer namespace (default: the kubernetes.io/metadata.name label)
+        peer_ips: The IP addresses of the peer, matched against the ipBlock peers of the rules. Without
+            addresses ipBlock peers never match (default: None)
+        port_names: The named container ports of the pods selected by the policy, see
+            ports.get_port_names(). Without them named ports of the rules never match (default: None)
+
+    Returns:
+        True if the network policy contains a matching ingress rule, False otherwise
+    """
+    compiled_policy = compile_policy(network_policy)
+
+    return _contains_rule(
+        network_policy=network_policy,
+        rules=network_policy.spec.ingress,
+        rule_peers=compiled_policy.ingress_peers,
+        rule_ports=compiled_policy.ingress_ports,
+        port=port,
+        peer_labels=peer_selector,
+        protocol=protocol,
+        peer_namespace=peer_namespace,
+        peer_namespace_labels=peer_namespace_labels,
+        peer_ips=peer_ips,
+        port_names=port_names
+    )
 
-def contains_egress_rule(network_policy: client.V1NetworkPolicy, port: int, selector: dict, protocol: str = "TCP") -> bool:
+def contains_egress_rule(
+    network_policy: client.V1NetworkPolicy,
+    port: int,
+    selector: dict,
+    protocol: str = "TCP",
+    peer_namespace: Optional[str] = None,
+    peer_namespace_labels: Optional[dict] = None,
+    peer_ips: Optional[Iterable[str]] = None,
+    port_names: Optional[PortNames] = None
+) -> bool:
     """
     Check if a network policy contains an egress rule matching the specified port, selector, and protocol.
 
     Args:
         network_policy: The V1NetworkPolicy to check
         port: The port number to match
-        selector: Pod selector labels to match (e.g., {"app": "pod-b"})
+        selector: Labels of the peer pod (e.g., {"app": "pod-b"}) evaluated against the rule's pod selectors
         protocol: The protocol to match (default: "TCP")
+        peer_namespace: The namespace of the peer pod (default: the namespace of the policy)
+        peer_namespace_labels: The labels of the peer namespace (default: the kubernetes.io/metadata.name label)
+        peer_ips: The IP addresses of the peer, e.g. from pods.get_pod_ips(), matched against the ipBlock
+            peers of the rules. Without addresses ipBlock peers never match (default: None)
+        port_names: The named container ports of the peer pod, see ports.get_port_names(). Without
+            them named ports of the rules never match (default: None)
 
     Returns:
         True if the network policy contains a matching egress rule, False otherwise
     """
-    if not network_policy.spec.egress:
+    compiled_policy = compile_policy(network_policy)
+
+    return _contains_rule(
+        network_policy=network_policy,
+        rules=network_policy.spec.egress,
+        rule_peers=compiled_policy.egress_peers,
+        rule_ports=compiled_policy.egress_ports,
+        port=port,
+        peer_labels=selector,
+        protocol=protocol,
+        peer_namespace=peer_namespace,
+        peer_namespace_labels=peer_namespace_labels,
+        peer_ips=peer_ips,
+        port_names=port_names
+    )
+
+def _contains_rule(
+    network_policy: client.V1NetworkPolicy,
+    rules: Optional[list],
+    rule_peers: Tuple[Tuple[CompiledPeer, ...], ...],
+    rule_ports: Tuple[CompiledPorts, ...],
+    port: int,
+    peer_labels: dict,
+    protocol: str,
+    peer_namespace: Optional[str],
+    peer_namespace_labels: Optional[dict],
+    peer_ips: Optional[Iterable[str]] = None,
+    port_names: Optional[PortNames] = None
+) -> bool:
+    if not rules:
         return False
 
+    peer_addresses = parse_addresses(peer_ips)
+
     protocol = protocol.upper()
+    policy_namespace = network_policy.metadata.namespace
+    peer_namespace = peer_namespace or policy_namespace
+    if peer_namespace_labels is None:
+        peer_namespace_labels = default_namespace_labels(peer_namespace)
+
+    for peers, ports in zip(rule_peers, rule_ports):
+
+        # A rule without peers allows all sources or destinations, otherwise
+        # check if any peer selects the peer pod or one of its addresses
+        if peers and not any(
+            peer.matches_pod(policy_namespace, peer_labels, peer_namespace, peer_namespace_labels)
+            or peer.matches_ip(peer_addresses)
+            for peer in peers
+        ):
+            continue
 
-    # Iterate through all egress rules
-    for egress_rule in network_policy.spec.egress:
+        if ports.allows(port, protocol, port_names):
+            return True
 
-        if not egress_rule.to:
-            continue
+    return False
 
-        # Check if any peer matches the selector
-        peer_matches = False
-        for peer in egress_rule.to:
-            if peer.pod_selector and peer.pod_selector.match_labels:
-                # Check if all selector labels match
-                if peer.pod_selector.match_labels == selector:
-                    peer_matches = True
-                    break
+def policy_types(network_policy: client.V1NetworkPolicy) -> List[str]:
+    """
+    Get the directions a NetworkPolicy isolates the pods it selects in.
 
-        if not peer_matches:
-            continue
+    Args:
+        network_policy: The V1NetworkPolicy
 
-        # If ports are not specified, rule applies to all ports
-        if not egress_rule.ports:
-            return True
+    Returns:
+        The policy types, "Ingress" and/or "Egress"
+    """
+    # Without explicit policy types a policy always affects ingress and
+    # affects egress only if it has egress rules
+    if network_policy.spec.policy_types:
+        return network_policy.spec.policy_types
+    return ["Ingress", "Egress"] if network_policy.spec.egress else ["Ingress"]
+
+def rule_allows_port(
+    policy_ports: Optional[List[client.V1NetworkPolicyPort]],
+    port: int,
+    protocol: str = "TCP",
+    port_names: Optional[PortNames] = None
+) -> bool:
+    """
+    Check if the ports of an ingress or egress rule allow traffic to a port.
 
-        # Check if any port matches
-        for policy_port in egress_rule.ports:
-            port_matches = policy_port.port == port
-            protocol_matches = (policy_port.protocol or "TCP").upper() == protocol
+    Ports with endPort match the whole range, named ports the container ports of that
+    name. Rules evaluated repeatedly should use the ports compiled by compile_policy().
 
-            if port_matches and protocol_matches:
-                return True
+    Args:
+        policy_ports: The ports of the rule
+        port: The port number to match
+        protocol: The protocol to match (default: "TCP")
+        port_names: The named container ports of the destination pod, see ports.get_port_names().
+            Without them named ports never match (default: None)
 
-    return False
+    Returns:
+        True if the rule allows the port, False otherwise
+    """
+    return compile_ports(policy_ports).allows(port, protocol, port_names)
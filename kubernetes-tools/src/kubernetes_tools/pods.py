@@ -1,9 +1,13 @@
 from kubernetes import client
-from typing import Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
 
 from kubernetes.client import V1ContainerPort
 from pydantic import BaseModel, ConfigDict
 
+from kubernetes_tools import clients, fastjson, informer, snapshot
+
+DEFAULT_PAGE_SIZE = 500
+
 class ExposedContainerPort(BaseModel):
     """
     TODO: Refactor to use other types than the kubernetes client models.
@@ -16,14 +20,19 @@ class ExposedContainerPort(BaseModel):
 
 def get_pod_by_name(
     name: str,
-    namespace: str = "default"
-) -> Optional[client.V1Pod]:
+    namespace: str = "default",
+    api_client: Optional[client.ApiClient] = None,
+    raw: bool = False
+) -> Optional[Union[client.V1Pod, fastjson.JsonObject]]:
     """
     Get a pod by name from a specific namespace.
 
     Args:
         name: The name of the pod to retrieve
         namespace: The Kubernetes namespace where the pod is located (default: "default")
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+        raw: Decode the response as JsonObject instead of building a V1Pod, see kubernetes_tools.fastjson.
+            Pods of an informer store are returned as V1Pod (default: False)
 
     Returns:
         A V1Pod object if found, None if the pod doesn't exist
@@ -35,9 +44,19 @@ def get_pod_by_name(
         else:
             print("Pod not found")
     """
-    v1 = client.CoreV1Api()
+    store = informer.get_store(informer.PODS, namespace) if api_client is None else None
+    if store is not None:
+        return store.get(name)
+
+    v1 = clients.core_v1(api_client)
 
     try:
+        if raw:
+            return fastjson.read_object(v1.read_namespaced_pod(
+                name=name,
+                namespace=namespace,
+                _preload_content=False
+            ))
         pod = v1.read_namespaced_pod(name=name, namespace=namespace)
         return pod
     except client.exceptions.ApiException as e:
@@ -47,7 +66,8 @@ def get_pod_by_name(
 
 def get_pods_by_labels(
     labels: dict,
-    namespace: str = "default"
+    namespace: str = "default",
+    api_client: Optional[client.ApiClient] = None
 ) -> client.V1PodList:
     """
     Get a pod by labels from a specific namespace.
@@ -55,17 +75,141 @@ def get_pods_by_labels(
     Args:
         labels: The labels of the pod to retrieve
         namespace: The Kubernetes namespace where the pod is located (default: "default")
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
 
     Returns:
         V1PodList containing the pods matching the labels or an empty list if none found
     """
-    v1 = client.CoreV1Api()
+    store = informer.get_store(informer.PODS, namespace) if api_client is None else None
+    if store is not None:
+        return client.V1PodList(items=filter_by_labels(store.list(), labels))
+
+    v1 = clients.core_v1(api_client)
     label_selector = ",".join([f"{key}={value}" for key, value in labels.items()])
 
     return v1.list_namespaced_pod(
         namespace=namespace,
         label_selector=label_selector)
 
+def get_pods_by_labels_in_namespaces(
+    labels: dict,
+    namespaces: Optional[Iterable[str]] = None,
+    api_client: Optional[client.ApiClient] = None
+) -> Dict[str, List[client.V1Pod]]:
+    """
+    Get pods by labels from several or all namespaces.
+
+    Without namespaces a single list_pod_for_all_namespaces request is made, otherwise
+    the namespaces are queried concurrently.
+
+    Args:
+        labels: The labels of the pods to retrieve
+        namespaces: The namespaces to search (default: all namespaces)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+
+    Returns:
+        The matching pods grouped by namespace. Namespaces given explicitly are always
+        contained, with an empty list if no pod matches
+
+    Example:
+        pods_by_namespace = get_pods_by_labels_in_namespaces({"app": "db"})
+        for namespace, pods in pods_by_namespace.items():
+            print(f"{namespace}: {[pod.metadata.name for pod in pods]}")
+    """
+    if namespaces is None:
+        loaded = snapshot.get_snapshot() if api_client is None else None
+        if loaded is not None:
+            all_pods = filter_by_labels(loaded.list(informer.PODS), labels)
+        else:
+            v1 = clients.core_v1(api_client)
+            label_selector = ",".join([f"{key}={value}" for key, value in labels.items()])
+            all_pods = v1.list_pod_for_all_namespaces(label_selector=label_selector).items
+
+        pods_by_namespace: Dict[str, List[client.V1Pod]] = {}
+        for pod in all_pods:
+            pods_by_namespace.setdefault(pod.metadata.namespace, []).append(pod)
+        return pods_by_namespace
+
+    namespaces = list(dict.fromkeys(namespaces))
+    pod_lists = clients.map_concurrently(
+        lambda namespace: get_pods_by_labels(labels, namespace, api_client).items,
+        namespaces
+    )
+    return dict(zip(namespaces, pod_lists))
+
+def iter_pods_by_labels(
+    labels: dict,
+    namespace: str = "default",
+    page_size: int = DEFAULT_PAGE_SIZE,
+    raw: bool = False,
+    api_client: Optional[client.ApiClient] = None
+) -> Iterator[Union[client.V1Pod, Dict[str, Any]]]:
+    """
+    Iterate over the pods matching labels in a namespace, one page of pods at a time.
+
+    Pages are requested with limit/continue while the iteration proceeds, so only one
+    page is held in memory and stopping the iteration early skips the remaining pages.
+
+    Args:
+        labels: The labels of the pods to retrieve
+        namespace: The Kubernetes namespace where the pods are located (default: "default")
+        page_size: The maximum number of pods requested per page (default: 500)
+        raw: Yield the pods as JsonObject instead of V1Pod objects, which skips
+            building the OpenAPI models, see kubernetes_tools.fastjson (default: False)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+
+    Returns:
+        An iterator over V1Pod objects or, if raw is True, JsonObjects
+
+    Example:
+        for pod in iter_pods_by_labels({"app": "backend"}, namespace="test-app"):
+            if pod.status.phase != "Running":
+                print(f"Pod {pod.metadata.name} is not running")
+                break
+    """
+    store = informer.get_store(informer.PODS, namespace) if api_client is None else None
+    if store is not None:
+        for pod in filter_by_labels(store.list(), labels):
+            yield fastjson.to_json_object(pod) if raw else pod
+        return
+
+    v1 = clients.core_v1(api_client)
+    label_selector = ",".join([f"{key}={value}" for key, value in labels.items()])
+    continue_token = None
+
+    while True:
+        if raw:
+            response = v1.list_namespaced_pod(
+                namespace=namespace,
+                label_selector=label_selector,
+                limit=page_size,
+                _continue=continue_token,
+                _preload_content=False
+            )
+            page = fastjson.read_json(response)
+            for item in page.get("items") or []:
+                yield fastjson.JsonObject(item)
+            continue_token = page.get("metadata", {}).get("continue")
+        else:
+            page = v1.list_namespaced_pod(
+                namespace=namespace,
+                label_selector=label_selector,
+                limit=page_size,
+                _continue=continue_token
+            )
+            yield from page.items
+            continue_token = page.metadata._continue
+
+        if not continue_token:
+            return
+
+def filter_by_labels(pods: list, labels: dict) -> list:
+    """Get the pods having all the given labels, like a label selector of equality requirements."""
+    return [
+        pod for pod in pods
+        if all((pod.metadata.labels or {}).get(key) == value for key, value in labels.items())
+    ]
+
 def find_exposed_port(
     pod: client.V1Pod,
     port: int,
@@ -107,6 +251,11 @@ def find_exposed_port(
                 # Default protocol is TCP if not specified
                 port_protocol = (container_port.protocol or "TCP").upper()
                 if port_protocol == protocol:
+                    if not isinstance(container_port, V1ContainerPort):
+                        # Pods decoded as JsonObject, e.g. read from a snapshot
+                        container_port = V1ContainerPort(**{
+                            attribute: getattr(container_port, attribute) for attribute in V1ContainerPort.attribute_map
+                        })
                     return ExposedContainerPort(
                         container_name=container.name,
                         port=container_port
@@ -136,11 +285,12 @@ def get_pod_ips(pod: client.V1Pod) -> list[str]:
     if pod.status.pod_ip:
         ips.append(pod.status.pod_ip)
 
-    # Additional Pod IPs (for dual-stack or multiple IPs)
-    if pod.status.pod_i_ps:
-        for pod_ip in pod.status.pod_i_ps:
-            if pod_ip.ip not in ips:
-                ips.append(pod_ip.ip)
+    # Additional Pod IPs (for dual-stack or multiple IPs). The attribute is named
+    # pod_i_ps in the kubernetes models and pod_ips in the kubernetes_asyncio ones
+    pod_ips = getattr(pod.status, "pod_i_ps", None) or getattr(pod.status, "pod_ips", None)
+    for pod_ip in pod_ips or []:
+        if pod_ip.ip not in ips:
+            ips.append(pod_ip.ip)
 
     return ips
 
@@ -0,0 +1,198 @@
+"""
+Inverted index from pod labels to the NetworkPolicies selecting them.
+
+Instead of testing the pod selector of every NetworkPolicy in a namespace,
+the index maps each (label key, label value) pair of a selector to the
+policies requiring it. Policies without match_labels are kept in a
+separate bucket since they select every pod unless restricted by match
+expressions. Match expressions are verified with the compiled selector of
+the candidate policies only.
+
+IPBlockIndex indexes the ingress and egress rules of the policies by the
+CIDRs of their ipBlock peers, with the compiled ports of each rule.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from kubernetes import client
+
+from kubernetes_tools.cidr import Address, CompiledIPBlock, PrefixTrie, parse_addresses
+from kubernetes_tools.ports import CompiledPorts
+from kubernetes_tools.selectors import CompiledPeer, CompiledSelector, compile_policy
+
+INGRESS = "Ingress"
+EGRESS = "Egress"
+
+
+class PolicyIndex:
+    """
+    Index of the NetworkPolicies of one namespace by their pod selector labels.
+
+    Example:
+        index = PolicyIndex(network_policies)
+        policies = index.match({"app": "backend"})
+    """
+
+    def __init__(self, network_policies: Iterable[client.V1NetworkPolicy] = ()):
+        self._policies: Dict[str, client.V1NetworkPolicy] = {}
+        self._selectors: Dict[str, CompiledSelector] = {}
+        self._postings: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+        self._selector_sizes: Dict[str, int] = {}
+        self._unindexed: Set[str] = set()
+
+        for network_policy in network_policies:
+            self.add(network_policy)
+
+    def __len__(self) -> int:
+        return len(self._policies)
+
+    def policies(self) -> List[client.V1NetworkPolicy]:
+        """Get all indexed NetworkPolicies ordered by name."""
+        return [self._policies[name] for name in sorted(self._policies)]
+
+    def add(self, network_policy: client.V1NetworkPolicy) -> None:
+        """Add a NetworkPolicy to the index, replacing one with the same name."""
+        name = network_policy.metadata.name
+        if name in self._policies:
+            self.remove(network_policy)
+
+        selector = compile_policy(network_policy).pod_selector
+
+        self._policies[name] = network_policy
+        self._selectors[name] = selector
+        self._selector_sizes[name] = len(selector.match_labels)
+
+        if not selector.match_labels:
+            self._unindexed.add(name)
+            return
+
+        for label in selector.match_labels:
+            self._postings[label].add(name)
+
+    def remove(self, network_policy: client.V1NetworkPolicy) -> None:
+        """Remove a NetworkPolicy from the index."""
+        name = network_policy.metadata.name
+        if self._policies.pop(name, None) is None:
+            return
+
+        selector = self._selectors.pop(name)
+        del self._selector_sizes[name]
+        self._unindexed.discard(name)
+
+        for label in selector.match_labels:
+            names = self._postings.get(label)
+            if names is None:
+                continue
+            names.discard(name)
+            if not names:
+                del self._postings[label]
+
+    def match(self, labels: Dict[str, str]) -> List[client.V1NetworkPolicy]:
+        """
+        Get the NetworkPolicies whose pod selector matches the given labels.
+
+        Args:
+            labels: The labels of the pod
+
+        Returns:
+            List of matching NetworkPolicies ordered by name
+        """
+        # A policy matches if every pair of its selector is found in the posting
+        # lists of the pod's labels, i.e. the hit count equals the selector size
+        hits: Dict[str, int] = defaultdict(int)
+        for label in labels.items():
+            for name in self._postings.get(label, ()):
+                hits[name] += 1
+
+        candidates = set(self._unindexed)
+        candidates.update(name for name, count in hits.items() if count == self._selector_sizes[name])
+
+        return [
+            self._policies[name] for name in sorted(candidates)
+            if not self._selectors[name].requirements or self._selectors[name].matches(labels)
+        ]
+
+
+class IPBlockIndex:
+    """
+    Index of the ingress and egress rules of the NetworkPolicies of one namespace by
+    the CIDRs of their ipBlock peers.
+
+    The ipBlocks are stored in a PrefixTrie per direction, so the rules selecting an
+    address are found in O(prefix length). Rules without peers select all addresses
+    and are returned for every address.
+
+    Example:
+        index = IPBlockIndex(network_policies)
+        for network_policy, ports in index.egress_rules("10.2.3.4"):
+            print(network_policy.metadata.name, ports.allows(443))
+    """
+
+    def __init__(self, network_policies: Iterable[client.V1NetworkPolicy] = ()):
+        self._tries: Dict[str, PrefixTrie[Tuple[client.V1NetworkPolicy, Any, CompiledPorts, CompiledIPBlock]]] = {
+            INGRESS: PrefixTrie(),
+            EGRESS: PrefixTrie(),
+        }
+        self._unrestricted: Dict[str, List[Tuple[client.V1NetworkPolicy, Any, CompiledPorts]]] = {INGRESS: [], EGRESS: []}
+
+        for network_policy in sorted(network_policies, key=lambda network_policy: network_policy.metadata.name):
+            compiled_policy = compile_policy(network_policy)
+            self._add_rules(
+                INGRESS, network_policy, network_policy.spec.ingress,
+                compiled_policy.ingress_peers, compiled_policy.ingress_ports
+            )
+            self._add_rules(
+                EGRESS, network_policy, network_policy.spec.egress,
+                compiled_policy.egress_peers, compiled_policy.egress_ports
+            )
+
+    def _add_rules(
+        self,
+        direction: str,
+        network_policy: client.V1NetworkPolicy,
+        rules: Optional[List[Any]],
+        rule_peers: Tuple[Tuple[CompiledPeer, ...], ...],
+        rule_ports: Tuple[CompiledPorts, ...]
+    ) -> None:
+        for rule, peers, ports in zip(rules or [], rule_peers, rule_ports):
+            if not peers:
+                self._unrestricted[direction].append((network_policy, rule, ports))
+            for peer in peers:
+                if peer.ip_block is not None:
+                    self._tries[direction].insert(peer.ip_block.network, (network_policy, rule, ports, peer.ip_block))
+
+    def _rules(self, direction: str, addresses: Iterable[Union[str, Address]]) -> List[Tuple[client.V1NetworkPolicy, CompiledPorts]]:
+        rules = [(network_policy, ports) for network_policy, _, ports in self._unrestricted[direction]]
+        seen = {id(rule) for _, rule, _ in self._unrestricted[direction]}
+        for address in parse_addresses(addresses):
+            for network_policy, rule, ports, ip_block in self._tries[direction].lookup(address):
+                if id(rule) not in seen and ip_block.contains(address):
+                    seen.add(id(rule))
+                    rules.append((network_policy, ports))
+        return rules
+
+    def ingress_rules(self, *addresses: Union[str, Address]) -> List[Tuple[client.V1NetworkPolicy, CompiledPorts]]:
+        """
+        Get the ingress rules allowing traffic from one of the addresses, regardless of ports.
+
+        Args:
+            addresses: The IPv4 or IPv6 addresses of the peer, e.g. all addresses of a dual-stack pod
+
+        Returns:
+            (NetworkPolicy, CompiledPorts of the rule) pairs
+        """
+        return self._rules(INGRESS, addresses)
+
+    def egress_rules(self, *addresses: Union[str, Address]) -> List[Tuple[client.V1NetworkPolicy, CompiledPorts]]:
+        """
+        Get the egress rules allowing traffic to one of the addresses, regardless of ports.
+
+        Args:
+            addresses: The IPv4 or IPv6 addresses of the peer
+
+        Returns:
+            (NetworkPolicy, CompiledPorts of the rule) pairs
+        """
+        return self._rules(EGRESS, addresses)
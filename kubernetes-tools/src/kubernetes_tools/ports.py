@@ -0,0 +1,164 @@
+"""
+Port matching for the ingress and egress rules of NetworkPolicies.
+
+The ports of a rule are numbers, ranges from port to endPort, or names like
+"http" that refer to a named container port of the destination pod. A rule's
+ports are compiled once into CompiledPorts, holding a sorted list of disjoint
+intervals per protocol and the named ports, so checking a port is a binary
+search regardless of the number of ranges.
+
+Example:
+    compiled = compile_ports(rule.ports)
+    if compiled.allows(8080, "TCP", get_port_names(target_pod)):
+        print("The rule allows port 8080")
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from kubernetes import client
+
+# Container port name -> the (port, protocol) pairs of the containers using it
+PortNames = Dict[str, Tuple[Tuple[int, str], ...]]
+
+MIN_PORT = 1
+MAX_PORT = 65535
+
+
+def get_port_names(pod: client.V1Pod) -> PortNames:
+    """
+    Get the named container ports of a pod, which named ports of NetworkPolicy rules refer to.
+
+    Args:
+        pod: The Kubernetes Pod object (V1Pod or JsonObject)
+
+    Returns:
+        The (port, protocol) pairs by port name
+
+    Example:
+        port_names = get_port_names(pod)
+        print(port_names.get("http"))
+    """
+    port_names: Dict[str, List[Tuple[int, str]]] = {}
+    for container in (pod.spec.containers or []) if pod.spec else []:
+        for container_port in container.ports or []:
+            if container_port.name:
+                port_names.setdefault(container_port.name, []).append(
+                    (container_port.container_port, (container_port.protocol or "TCP").upper())
+                )
+    return {name: tuple(ports) for name, ports in port_names.items()}
+
+
+class CompiledPorts:
+    """
+    Precompiled ports of a NetworkPolicy rule.
+
+    Args:
+        intervals: Per protocol the sorted, disjoint (start, end) port intervals
+        names: The (name, protocol) pairs of the named ports
+        all_ports: True if the rule has no ports, i.e. allows all ports and protocols
+    """
+    __slots__ = ("starts", "ends", "names", "all_ports")
+
+    def __init__(
+        self,
+        intervals: Dict[str, List[Tuple[int, int]]],
+        names: FrozenSet[Tuple[str, str]] = frozenset(),
+        all_ports: bool = False
+    ):
+        self.starts = {protocol: [start for start, _ in ranges] for protocol, ranges in intervals.items()}
+        self.ends = {protocol: [end for _, end in ranges] for protocol, ranges in intervals.items()}
+        self.names = names
+        self.all_ports = all_ports
+
+    def __repr__(self) -> str:
+        if self.all_ports:
+            return "CompiledPorts(all)"
+        intervals = {protocol: list(zip(self.starts[protocol], self.ends[protocol])) for protocol in self.starts}
+        return f"CompiledPorts(intervals={intervals}, names={set(self.names)})"
+
+    def allows(self, port: int, protocol: str = "TCP", port_names: Optional[PortNames] = None) -> bool:
+        """
+        Check whether the ports allow traffic to a port.
+
+        Args:
+            port: The destination port number
+            protocol: The protocol (default: "TCP")
+            port_names: The named container ports of the destination pod, see get_port_names().
+                Without them named ports never match (default: None)
+
+        Returns:
+            True if a port, range or named port of the rule matches, False otherwise
+        """
+        if self.all_ports:
+            return True
+
+        protocol = protocol.upper()
+        starts = self.starts.get(protocol)
+        if starts:
+            index = bisect_right(starts, port) - 1
+            if index >= 0 and self.ends[protocol][index] >= port:
+                return True
+
+        if self.names and port_names:
+            for name, name_protocol in self.names:
+                if name_protocol == protocol and (port, protocol) in port_names.get(name, ()):
+                    return True
+
+        return False
+
+
+ALL_PORTS = CompiledPorts({}, all_ports=True)
+
+
+def compile_ports(policy_ports: Optional[Iterable[client.V1NetworkPolicyPort]]) -> CompiledPorts:
+    """
+    Compile the ports of an ingress or egress rule.
+
+    A port without number allows all ports of its protocol, a port with endPort
+    the range from port to endPort.
+
+    Args:
+        policy_ports: The ports of the rule (V1NetworkPolicyPort or JsonObject)
+
+    Returns:
+        The CompiledPorts, ALL_PORTS if the rule has no ports
+    """
+    policy_ports = list(policy_ports or [])
+    if not policy_ports:
+        return ALL_PORTS
+
+    ranges: Dict[str, List[Tuple[int, int]]] = {}
+    names = set()
+    for policy_port in policy_ports:
+        protocol = (policy_port.protocol or "TCP").upper()
+        port = _port_number(policy_port.port)
+        if isinstance(port, str):
+            names.add((port, protocol))
+        elif port is None:
+            ranges.setdefault(protocol, []).append((MIN_PORT, MAX_PORT))
+        else:
+            ranges.setdefault(protocol, []).append((port, max(policy_port.end_port or port, port)))
+
+    return CompiledPorts(
+        intervals={protocol: _merge(protocol_ranges) for protocol, protocol_ranges in ranges.items()},
+        names=frozenset(names)
+    )
+
+
+def _port_number(port: Any) -> Any:
+    # IntOrString: names of container ports cannot consist of digits only
+    if isinstance(port, str) and port.isdigit():
+        return int(port)
+    return port
+
+
+def _merge(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
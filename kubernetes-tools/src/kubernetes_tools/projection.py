@@ -0,0 +1,310 @@
+"""
+Compact projections of pods for LLM tools.
+
+V1Pod.to_dict() contains managedFields, volumes, tolerations and all status
+conditions, which is tens of KB per pod in the model context. A PodSummary
+keeps only the fields relevant for connectivity questions. The fields of a
+projection can be selected by name or by one of the FIELD_SETS.
+
+Summaries can also be listed without transferring full pod objects, either as
+a server-side Table (the representation kubectl get uses) or as metadata only:
+
+    summaries = list_pod_summaries("test-app", {"app": "backend"}, fields="metadata")
+    print([summary.to_dict() for summary in summaries])
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from kubernetes import client
+
+from kubernetes_tools import clients, fastjson, informer, pods, snapshot
+
+POD_FIELDS = ("name", "namespace", "labels", "ips", "ports", "phase", "node", "images")
+
+FIELD_SETS: Dict[str, Tuple[str, ...]] = {
+    "metadata": ("name", "namespace", "labels"),
+    "network": ("name", "namespace", "labels", "ips", "ports"),
+    "default": ("name", "namespace", "labels", "ips", "ports", "phase", "node"),
+    "all": POD_FIELDS,
+}
+
+# Fields available from the server-side representations
+TABLE_FIELDS = frozenset(("name", "namespace", "labels", "ips", "phase", "node"))
+METADATA_FIELDS = frozenset(("name", "namespace", "labels"))
+
+OBJECTS = "objects"
+TABLE = "table"
+METADATA = "metadata"
+
+TABLE_ACCEPT = "application/json;as=Table;v=v1;g=meta.k8s.io"
+METADATA_ACCEPT = "application/json;as=PartialObjectMetadataList;v=v1;g=meta.k8s.io"
+
+Fields = Union[None, str, Sequence[str]]
+
+
+class PodSummary:
+    """
+    The connectivity relevant fields of a pod.
+
+    Fields that are not known, e.g. ports of a summary built from a server-side
+    Table, are None and left out by to_dict().
+    """
+    __slots__ = POD_FIELDS
+
+    def __init__(
+        self,
+        name: str,
+        namespace: str,
+        labels: Optional[Dict[str, str]] = None,
+        ips: Optional[List[str]] = None,
+        ports: Optional[List[Dict[str, Any]]] = None,
+        phase: Optional[str] = None,
+        node: Optional[str] = None,
+        images: Optional[List[str]] = None
+    ):
+        self.name = name
+        self.namespace = namespace
+        self.labels = labels
+        self.ips = ips
+        self.ports = ports
+        self.phase = phase
+        self.node = node
+        self.images = images
+
+    @classmethod
+    def from_pod(cls, pod: client.V1Pod) -> PodSummary:
+        containers = (pod.spec.containers or []) if pod.spec else []
+        return cls(
+            name=pod.metadata.name,
+            namespace=pod.metadata.namespace,
+            labels=pod.metadata.labels or {},
+            ips=pods.get_pod_ips(pod) if pod.status else [],
+            ports=[
+                {
+                    "container": container.name,
+                    "name": container_port.name,
+                    "port": container_port.container_port,
+                    "protocol": container_port.protocol or "TCP",
+                }
+                for container in containers
+                for container_port in container.ports or []
+            ],
+            phase=pod.status.phase if pod.status else None,
+            node=pod.spec.node_name if pod.spec else None,
+            images=[container.image for container in containers]
+        )
+
+    @classmethod
+    def from_table_row(cls, row: Dict[str, Any], columns: List[str]) -> PodSummary:
+        cells = dict(zip(columns, row["cells"]))
+        metadata = (row.get("object") or {}).get("metadata", {})
+        ip = cells.get("IP")
+        node = cells.get("Node")
+        return cls(
+            name=metadata.get("name", cells.get("Name")),
+            namespace=metadata.get("namespace"),
+            labels=metadata.get("labels", {}),
+            ips=[ip] if ip and ip != "<none>" else [],
+            phase=cells.get("Status"),
+            node=node if node and node != "<none>" else None
+        )
+
+    @classmethod
+    def from_metadata(cls, item: Dict[str, Any]) -> PodSummary:
+        metadata = item["metadata"]
+        return cls(
+            name=metadata["name"],
+            namespace=metadata.get("namespace"),
+            labels=metadata.get("labels", {})
+        )
+
+    def to_dict(self, fields: Fields = None) -> Dict[str, Any]:
+        """
+        Get the selected fields as a dict, leaving out unknown fields.
+
+        Args:
+            fields: Field names or the name of a field set (default: the "default" field set)
+        """
+        result = {}
+        for field in resolve_fields(fields):
+            value = getattr(self, field)
+            if value is not None:
+                result[field] = value
+        return result
+
+    def __repr__(self) -> str:
+        return f"PodSummary({self.to_dict('all')!r})"
+
+
+def resolve_fields(fields: Fields = None) -> Tuple[str, ...]:
+    """
+    Resolve a field selection to field names.
+
+    Args:
+        fields: None for the "default" field set, the name of a field set, or a list of
+            field and field set names
+
+    Returns:
+        The selected field names in the order of POD_FIELDS
+
+    Raises:
+        ValueError: If a name is neither a field nor a field set
+    """
+    if fields is None:
+        return FIELD_SETS["default"]
+    if isinstance(fields, str):
+        fields = [fields]
+
+    selected = set()
+    for name in fields:
+        if name in FIELD_SETS:
+            selected.update(FIELD_SETS[name])
+        elif name in POD_FIELDS:
+            selected.add(name)
+        else:
+            raise ValueError(f"Unknown pod field or field set: {name}")
+
+    return tuple(field for field in POD_FIELDS if field in selected)
+
+
+def summarize_pod(pod: client.V1Pod, fields: Fields = None) -> Dict[str, Any]:
+    """
+    Get the compact dict representation of a pod.
+
+    Args:
+        pod: The Kubernetes Pod object (V1Pod)
+        fields: Field names or the name of a field set (default: the "default" field set)
+
+    Returns:
+        The selected fields of the pod
+
+    Example:
+        pod = pods.get_pod_by_name(name="backend", namespace="test-app")
+        print(summarize_pod(pod, fields="network"))
+    """
+    return PodSummary.from_pod(pod).to_dict(fields)
+
+
+def list_pod_summaries(
+    namespace: str,
+    labels: Optional[Dict[str, str]] = None,
+    fields: Fields = None,
+    source: Optional[str] = None,
+    api_client: Optional[client.ApiClient] = None
+) -> List[PodSummary]:
+    """
+    List summaries of the pods matching labels in a namespace.
+
+    Args:
+        namespace: The Kubernetes namespace where the pods are located
+        labels: The labels of the pods to list (default: all pods)
+        fields: The fields that will be used. Determines the source if none is given
+        source: Where to get the pods from: OBJECTS lists full pods, TABLE a server-side
+            Table and METADATA metadata only (default: the cheapest source providing the
+            fields, OBJECTS if informers or a snapshot are enabled)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+
+    Returns:
+        List of PodSummary objects
+
+    Raises:
+        ValueError: If the source is unknown
+    """
+    return list(iter_pod_summaries(namespace, labels, fields, source, api_client=api_client))
+
+
+def iter_pod_summaries(
+    namespace: str,
+    labels: Optional[Dict[str, str]] = None,
+    fields: Fields = None,
+    source: Optional[str] = None,
+    page_size: int = pods.DEFAULT_PAGE_SIZE,
+    api_client: Optional[client.ApiClient] = None
+) -> Iterator[PodSummary]:
+    """
+    Iterate over summaries of the pods matching labels in a namespace, requesting
+    the pods page by page while the iteration proceeds.
+
+    Args:
+        namespace: The Kubernetes namespace where the pods are located
+        labels: The labels of the pods to list (default: all pods)
+        fields: The fields that will be used. Determines the source if none is given
+        source: Where to get the pods from, see list_pod_summaries()
+        page_size: The maximum number of pods requested per page (default: 500)
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+
+    Returns:
+        An iterator over PodSummary objects
+
+    Raises:
+        ValueError: If the source is unknown
+
+    Example:
+        first_ten = list(itertools.islice(iter_pod_summaries("test-app"), 10))
+    """
+    labels = labels or {}
+
+    if source is None:
+        source = _cheapest_source(resolve_fields(fields), api_client)
+
+    if source == OBJECTS:
+        for pod in pods.iter_pods_by_labels(labels, namespace, page_size, api_client=api_client):
+            yield PodSummary.from_pod(pod)
+
+    elif source == TABLE:
+        for table in _iter_pages_as(TABLE_ACCEPT, namespace, labels, page_size, api_client):
+            columns = [column["name"] for column in table.get("columnDefinitions", [])]
+            for row in table.get("rows") or []:
+                yield PodSummary.from_table_row(row, columns)
+
+    elif source == METADATA:
+        for metadata_list in _iter_pages_as(METADATA_ACCEPT, namespace, labels, page_size, api_client):
+            for item in metadata_list.get("items") or []:
+                yield PodSummary.from_metadata(item)
+
+    else:
+        raise ValueError(f"Unknown source: {source}")
+
+
+def _cheapest_source(fields: Iterable[str], api_client: Optional[client.ApiClient]) -> str:
+    if api_client is None and (informer.is_enabled() or snapshot.is_enabled()):
+        return OBJECTS
+    fields = set(fields)
+    if fields <= METADATA_FIELDS:
+        return METADATA
+    if fields <= TABLE_FIELDS:
+        return TABLE
+    return OBJECTS
+
+
+def _iter_pages_as(
+    accept: str,
+    namespace: str,
+    labels: Dict[str, str],
+    page_size: int,
+    api_client: Optional[client.ApiClient]
+) -> Iterator[Dict[str, Any]]:
+    v1 = clients.accepting_core_v1(accept, api_client)
+    label_selector = ",".join(f"{key}={value}" for key, value in labels.items())
+    continue_token = None
+
+    try:
+        while True:
+            response = v1.list_namespaced_pod(
+                namespace=namespace,
+                label_selector=label_selector,
+                limit=page_size,
+                _continue=continue_token,
+                _preload_content=False
+            )
+            page = fastjson.read_json(response)
+            yield page
+
+            continue_token = page.get("metadata", {}).get("continue")
+            if not continue_token:
+                return
+    finally:
+        # Only the ApiClients of the shared configuration are kept
+        if api_client is not None:
+            v1.api_client.close()
@@ -0,0 +1,357 @@
+"""
+Cluster-wide reachability matrix computed from a snapshot of pods, namespaces and NetworkPolicies.
+
+Pods are grouped into equivalence classes of (namespace, labels, named container ports)
+since NetworkPolicies cannot distinguish pods with the same labels in the same namespace
+apart from the ports their named rule ports resolve to. The allow relation
+is then computed between classes instead of pods, so the work scales with the number of
+distinct label sets. For every (port, protocol) each source class has a row stored as an
+int bitset over the destination classes.
+
+Example:
+    snapshot = take_snapshot()
+    matrix = compute_reachability(snapshot, ports=[(3306, "TCP")])
+    if matrix.allows("test-app/backend", "test-app/mysql", 3306):
+        print("backend can reach mysql")
+"""
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from kubernetes import client
+
+from kubernetes_tools import clients, informer
+from kubernetes_tools import snapshot as snapshot_file
+from kubernetes_tools.networkpolicy import policy_types
+from kubernetes_tools.ports import CompiledPorts, PortNames, get_port_names
+from kubernetes_tools.selectors import CompiledPeer, CompiledPolicy, compile_policy, default_namespace_labels
+
+PortKey = Tuple[int, str]
+
+
+class ClusterSnapshot:
+    """
+    Point in time view of the objects relevant for reachability.
+
+    Args:
+        pods: All pods
+        namespaces: All namespaces, used to evaluate namespace selectors
+        network_policies: All NetworkPolicies
+    """
+
+    def __init__(
+        self,
+        pods: List[client.V1Pod],
+        namespaces: List[client.V1Namespace],
+        network_policies: List[client.V1NetworkPolicy]
+    ):
+        self.pods = pods
+        self.namespaces = namespaces
+        self.network_policies = network_policies
+
+
+def take_snapshot(api_client: Optional[client.ApiClient] = None) -> ClusterSnapshot:
+    """
+    List all pods, namespaces and NetworkPolicies of the cluster.
+
+    Args:
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+
+    Returns:
+        The ClusterSnapshot, from the enabled snapshot file if api_client is None, see kubernetes_tools.snapshot
+    """
+    loaded = snapshot_file.get_snapshot() if api_client is None else None
+    if loaded is not None:
+        return ClusterSnapshot(
+            pods=loaded.list(informer.PODS),
+            namespaces=loaded.list(informer.NAMESPACES),
+            network_policies=loaded.list(informer.NETWORK_POLICIES)
+        )
+
+    v1 = clients.core_v1(api_client)
+    networking_v1 = clients.networking_v1(api_client)
+
+    return ClusterSnapshot(
+        pods=v1.list_pod_for_all_namespaces().items,
+        namespaces=v1.list_namespace().items,
+        network_policies=networking_v1.list_network_policy_for_all_namespaces().items
+    )
+
+
+class PodClass:
+    """
+    Equivalence class of pods with the same namespace, labels and named container ports.
+    """
+    __slots__ = ("index", "namespace", "labels", "namespace_labels", "port_names", "pods")
+
+    def __init__(
+        self,
+        index: int,
+        namespace: str,
+        labels: Dict[str, str],
+        namespace_labels: Dict[str, str],
+        port_names: Optional[PortNames] = None
+    ):
+        self.index = index
+        self.namespace = namespace
+        self.labels = labels
+        self.namespace_labels = namespace_labels
+        self.port_names: PortNames = port_names or {}
+        self.pods: List[str] = []
+
+
+def pod_key(pod: client.V1Pod) -> str:
+    """Get the "namespace/name" key of a pod used by the ReachabilityMatrix."""
+    return f"{pod.metadata.namespace}/{pod.metadata.name}"
+
+
+class ReachabilityMatrix:
+    """
+    Allow relation between all pods of a snapshot.
+
+    Rows for a (port, protocol) are computed on first use and cached, so ports
+    that were not requested up front can still be queried.
+    """
+
+    def __init__(self, snapshot: ClusterSnapshot):
+        self.classes: List[PodClass] = []
+        self._pod_classes: Dict[str, int] = {}
+        self._rows: Dict[PortKey, List[int]] = {}
+
+        namespace_labels = {
+            namespace.metadata.name: namespace.metadata.labels or default_namespace_labels(namespace.metadata.name)
+            for namespace in snapshot.namespaces
+        }
+
+        class_indexes: Dict[Tuple[str, FrozenSet[Tuple[str, str]], FrozenSet[Tuple[str, tuple]]], int] = {}
+        for pod in snapshot.pods:
+            labels = pod.metadata.labels or {}
+            port_names = get_port_names(pod)
+            key = (pod.metadata.namespace, frozenset(labels.items()), frozenset(port_names.items()))
+            index = class_indexes.get(key)
+            if index is None:
+                index = len(self.classes)
+                class_indexes[key] = index
+                self.classes.append(PodClass(
+                    index=index,
+                    namespace=pod.metadata.namespace,
+                    labels=labels,
+                    namespace_labels=namespace_labels.get(
+                        pod.metadata.namespace, default_namespace_labels(pod.metadata.namespace)
+                    ),
+                    port_names=port_names
+                ))
+            self.classes[index].pods.append(pod_key(pod))
+            self._pod_classes[pod_key(pod)] = index
+
+        self._all = (1 << len(self.classes)) - 1
+        self._policies = [compile_policy(network_policy) for network_policy in snapshot.network_policies]
+
+        # Per class: the (compiled rule ports, peer bitset) pairs of the policies selecting it
+        self._ingress_rules: List[List[Tuple[CompiledPorts, int]]] = [[] for _ in self.classes]
+        self._egress_rules: List[List[Tuple[CompiledPorts, int]]] = [[] for _ in self.classes]
+        self._ingress_isolated = 0
+        self._egress_isolated = 0
+
+        for compiled_policy in self._policies:
+            self._add_policy(compiled_policy)
+
+    def _add_policy(self, compiled_policy: CompiledPolicy) -> None:
+        network_policy = compiled_policy.network_policy
+        policy_namespace = network_policy.metadata.namespace
+        directions = policy_types(network_policy)
+
+        subjects = [
+            pod_class for pod_class in self.classes
+            if pod_class.namespace == policy_namespace and compiled_policy.pod_selector.matches(pod_class.labels)
+        ]
+        if not subjects:
+            return
+
+        ingress_rules = [
+            (ports, self._peer_bitset(policy_namespace, peers))
+            for ports, peers in zip(compiled_policy.ingress_ports, compiled_policy.ingress_peers)
+        ] if "Ingress" in directions else []
+        egress_rules = [
+            (ports, self._peer_bitset(policy_namespace, peers))
+            for ports, peers in zip(compiled_policy.egress_ports, compiled_policy.egress_peers)
+        ] if "Egress" in directions else []
+
+        for pod_class in subjects:
+            if "Ingress" in directions:
+                self._ingress_isolated |= 1 << pod_class.index
+                self._ingress_rules[pod_class.index].extend(ingress_rules)
+            if "Egress" in directions:
+                self._egress_isolated |= 1 << pod_class.index
+                self._egress_rules[pod_class.index].extend(egress_rules)
+
+    def _peer_bitset(self, policy_namespace: str, peers: Tuple[CompiledPeer, ...]) -> int:
+        # A rule without peers allows traffic from and to all pods
+        if not peers:
+            return self._all
+
+        bitset = 0
+        for pod_class in self.classes:
+            if any(
+                peer.matches_pod(policy_namespace, pod_class.labels, pod_class.namespace, pod_class.namespace_labels)
+                for peer in peers
+            ):
+                bitset |= 1 << pod_class.index
+        return bitset
+
+    def _allowed_bitset(
+        self,
+        rules: List[Tuple[CompiledPorts, int]],
+        port: int,
+        protocol: str,
+        port_names: Optional[PortNames] = None
+    ) -> int:
+        # Ingress rules resolve named ports against the destination class itself
+        bitset = 0
+        for ports, peers in rules:
+            if ports.allows(port, protocol, port_names):
+                bitset |= peers
+        return bitset
+
+    def _egress_bitset(self, rules: List[Tuple[CompiledPorts, int]], port: int, protocol: str) -> int:
+        # Egress rules resolve named ports against each destination class among the peers
+        bitset = 0
+        for ports, peers in rules:
+            if ports.allows(port, protocol):
+                bitset |= peers
+            elif ports.names:
+                for pod_class in self.classes:
+                    if peers >> pod_class.index & 1 and ports.allows(port, protocol, pod_class.port_names):
+                        bitset |= 1 << pod_class.index
+        return bitset
+
+    def rows(self, port: int, protocol: str = "TCP") -> List[int]:
+        """
+        Get the allow rows for a port and protocol.
+
+        Args:
+            port: The destination port
+            protocol: The protocol (default: "TCP")
+
+        Returns:
+            For every source class index a bitset of the destination class indexes it may reach
+        """
+        port_key = (port, protocol.upper())
+        rows = self._rows.get(port_key)
+        if rows is not None:
+            return rows
+
+        protocol = port_key[1]
+        class_count = len(self.classes)
+
+        # accepts[source] = bitset of destinations whose ingress allows the source
+        accepts = [0] * class_count
+        for destination in range(class_count):
+            if not self._ingress_isolated >> destination & 1:
+                sources = self._all
+            else:
+                sources = self._allowed_bitset(
+                    self._ingress_rules[destination], port, protocol, self.classes[destination].port_names
+                )
+            destination_bit = 1 << destination
+            while sources:
+                lowest = sources & -sources
+                accepts[lowest.bit_length() - 1] |= destination_bit
+                sources ^= lowest
+
+        rows = []
+        for source in range(class_count):
+            if not self._egress_isolated >> source & 1:
+                destinations = self._all
+            else:
+                destinations = self._egress_bitset(self._egress_rules[source], port, protocol)
+            rows.append(destinations & accepts[source])
+
+        self._rows[port_key] = rows
+        return rows
+
+    def allows(self, source: str, target: str, port: int, protocol: str = "TCP") -> bool:
+        """
+        Check whether the NetworkPolicies allow traffic from one pod to another.
+
+        Args:
+            source: The "namespace/name" key of the source pod
+            target: The "namespace/name" key of the target pod
+            port: The destination port
+            protocol: The protocol (default: "TCP")
+
+        Returns:
+            True if egress of the source and ingress of the target allow the traffic, False otherwise
+
+        Raises:
+            KeyError: If one of the pods is not part of the snapshot
+        """
+        source_class = self._pod_classes[source]
+        target_class = self._pod_classes[target]
+        return bool(self.rows(port, protocol)[source_class] >> target_class & 1)
+
+    def reachable_targets(self, source: str, port: int, protocol: str = "TCP") -> List[str]:
+        """
+        Get all pods a pod is allowed to reach on a port.
+
+        Args:
+            source: The "namespace/name" key of the source pod
+            port: The destination port
+            protocol: The protocol (default: "TCP")
+
+        Returns:
+            The "namespace/name" keys of the reachable pods
+        """
+        row = self.rows(port, protocol)[self._pod_classes[source]]
+        return [pod for pod_class in self.classes if row >> pod_class.index & 1 for pod in pod_class.pods]
+
+    def allowed_sources(self, target: str, port: int, protocol: str = "TCP") -> List[str]:
+        """
+        Get all pods allowed to reach a pod on a port.
+
+        Args:
+            target: The "namespace/name" key of the target pod
+            port: The destination port
+            protocol: The protocol (default: "TCP")
+
+        Returns:
+            The "namespace/name" keys of the allowed source pods
+        """
+        target_bit = 1 << self._pod_classes[target]
+        rows = self.rows(port, protocol)
+        return [pod for pod_class in self.classes if rows[pod_class.index] & target_bit for pod in pod_class.pods]
+
+
+def compute_reachability(
+    snapshot: ClusterSnapshot,
+    ports: Optional[Iterable[PortKey]] = None
+) -> ReachabilityMatrix:
+    """
+    Compute the allow matrix for all pods of a snapshot.
+
+    Args:
+        snapshot: The ClusterSnapshot to evaluate
+        ports: The (port, protocol) pairs to compute up front. Defaults to all container
+            ports exposed by the pods of the snapshot
+
+    Returns:
+        The ReachabilityMatrix
+
+    Example:
+        matrix = compute_reachability(take_snapshot())
+        print(matrix.reachable_targets("test-app/backend", 3306))
+    """
+    matrix = ReachabilityMatrix(snapshot)
+
+    if ports is None:
+        ports = {
+            (container_port.container_port, (container_port.protocol or "TCP").upper())
+            for pod in snapshot.pods
+            for container in pod.spec.containers or []
+            for container_port in container.ports or []
+        }
+
+    for port, protocol in ports:
+        matrix.rows(port, protocol)
+
+    return matrix
@@ -0,0 +1,211 @@
+"""
+Batch evaluation of NetworkPolicy pod selectors for many pods at once.
+
+Auditing a namespace asks for the policies of every pod, which evaluates each
+selector once per pod. compute_selection_matrix() evaluates all selectors for
+all pods in one go instead. With NumPy installed (pip install
+kubernetes-tools[matrix]) the labels are encoded as a boolean matrix:
+
+- Features are the (key, value) pairs and keys referenced by any selector,
+  interned to column indexes. Pod labels no selector refers to are dropped.
+- Terms are the disjunctions a selector requires or forbids: a matchLabels pair
+  or the values of an In expression are required, the values of a NotIn
+  expression forbidden, Exists and DoesNotExist require or forbid a key.
+- (pods x features) @ (features x terms) tells which terms hold for a pod, and
+  two products with the (terms x policies) requirement matrices count the
+  required and forbidden terms per pod and policy.
+- Pods of a namespace with the same features, e.g. the replicas of a
+  deployment, and policies of a namespace with the same selector share a row
+  or column, so the products run over distinct label sets and selectors only.
+
+Without NumPy the policies are matched per pod through a PolicyIndex.
+
+Example:
+    matrix = compute_selection_matrix(pods, network_policies)
+    for index, pod in enumerate(matrix.pods):
+        print(pod.metadata.name, [policy.metadata.name for policy in matrix.policies_for(index)])
+"""
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+from kubernetes import client
+
+from kubernetes_tools.policy_index import PolicyIndex
+from kubernetes_tools.selectors import DOES_NOT_EXIST, EXISTS, IN, NOT_IN, compile_policy
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# ("pair", key, value) or ("key", key)
+Feature = Tuple[str, ...]
+
+
+def is_available() -> bool:
+    """Check whether NumPy is installed, i.e. selectors are evaluated as matrix products."""
+    return np is not None
+
+
+class SelectionMatrix:
+    """
+    Which NetworkPolicies select which pods.
+
+    Args:
+        pods: The pods, in the order of the rows
+        network_policies: The NetworkPolicies, in the order of the columns
+        selected: The (pods x policies) boolean NumPy array, or without NumPy the
+            column indexes of the selecting policies per pod
+    """
+
+    def __init__(self, pods: List[client.V1Pod], network_policies: List[client.V1NetworkPolicy], selected):
+        self.pods = pods
+        self.network_policies = network_policies
+        self.selected = selected
+
+    def policies_for(self, pod_index: int) -> List[client.V1NetworkPolicy]:
+        """Get the NetworkPolicies selecting a pod, in the order of network_policies."""
+        if np is not None and isinstance(self.selected, np.ndarray):
+            columns = np.flatnonzero(self.selected[pod_index]).tolist()
+        else:
+            columns = self.selected[pod_index]
+        return [self.network_policies[column] for column in columns]
+
+    def pods_for(self, policy_index: int) -> List[client.V1Pod]:
+        """Get the pods selected by a NetworkPolicy, in the order of pods."""
+        if np is not None and isinstance(self.selected, np.ndarray):
+            rows = np.flatnonzero(self.selected[:, policy_index]).tolist()
+        else:
+            rows = [row for row, columns in enumerate(self.selected) if policy_index in columns]
+        return [self.pods[row] for row in rows]
+
+    def count(self) -> int:
+        """Get the number of (pod, policy) pairs where the policy selects the pod."""
+        if np is not None and isinstance(self.selected, np.ndarray):
+            return int(self.selected.sum())
+        return sum(len(columns) for columns in self.selected)
+
+
+def compute_selection_matrix(
+    pods: Sequence[client.V1Pod],
+    network_policies: Sequence[client.V1NetworkPolicy]
+) -> SelectionMatrix:
+    """
+    Evaluate the pod selectors of NetworkPolicies for many pods at once.
+
+    A policy only selects pods of its own namespace, so pods and policies of several
+    namespaces can be evaluated together.
+
+    Args:
+        pods: Kubernetes Pod objects (V1Pod or JsonObject)
+        network_policies: The NetworkPolicies (V1NetworkPolicy or JsonObject)
+
+    Returns:
+        The SelectionMatrix
+
+    Example:
+        matrix = compute_selection_matrix(pods, networkpolicy.list_network_policies("test-app"))
+        unselected = [pod for index, pod in enumerate(matrix.pods) if not matrix.policies_for(index)]
+    """
+    pods = list(pods)
+    network_policies = list(network_policies)
+
+    if np is None:
+        selected = _select_with_index(pods, network_policies)
+    else:
+        selected = _select_with_numpy(pods, network_policies)
+
+    return SelectionMatrix(pods, network_policies, selected)
+
+
+def _select_with_index(pods: List[client.V1Pod], network_policies: List[client.V1NetworkPolicy]) -> List[List[int]]:
+    columns_by_namespace: Dict[str, Dict[str, int]] = {}
+    policies_by_namespace: Dict[str, List[client.V1NetworkPolicy]] = {}
+    for column, network_policy in enumerate(network_policies):
+        namespace = network_policy.metadata.namespace
+        columns_by_namespace.setdefault(namespace, {})[network_policy.metadata.name] = column
+        policies_by_namespace.setdefault(namespace, []).append(network_policy)
+    indexes = {namespace: PolicyIndex(policies) for namespace, policies in policies_by_namespace.items()}
+
+    selected = []
+    for pod in pods:
+        index = indexes.get(pod.metadata.namespace)
+        if index is None:
+            selected.append([])
+            continue
+        columns = columns_by_namespace[pod.metadata.namespace]
+        selected.append(sorted(columns[policy.metadata.name] for policy in index.match(pod.metadata.labels or {})))
+    return selected
+
+
+def _select_with_numpy(pods: List[client.V1Pod], network_policies: List[client.V1NetworkPolicy]):
+    features: Dict[Feature, int] = {}
+    terms: Dict[FrozenSet[int], int] = {}
+    namespace_ids: Dict[str, int] = {}
+
+    def term(*term_features: Feature) -> int:
+        feature_ids = frozenset(features.setdefault(feature, len(features)) for feature in term_features)
+        return terms.setdefault(feature_ids, len(terms))
+
+    # Policies with the same namespace and selector share a column
+    selector_columns: Dict[Tuple[int, FrozenSet[int], FrozenSet[int]], int] = {}
+    policy_columns: List[int] = []
+    for network_policy in network_policies:
+        selector = compile_policy(network_policy).pod_selector
+        required = {term(("pair", key, value)) for key, value in selector.match_labels}
+        forbidden = set()
+        for key, operator, values in selector.requirements:
+            if operator == IN:
+                required.add(term(*(("pair", key, value) for value in values)))
+            elif operator == NOT_IN:
+                forbidden.add(term(*(("pair", key, value) for value in values)))
+            elif operator == EXISTS:
+                required.add(term(("key", key)))
+            elif operator == DOES_NOT_EXIST:
+                forbidden.add(term(("key", key)))
+        namespace = namespace_ids.setdefault(network_policy.metadata.namespace, len(namespace_ids))
+        policy_columns.append(
+            selector_columns.setdefault((namespace, frozenset(required), frozenset(forbidden)), len(selector_columns))
+        )
+
+    # Only labels referenced by a selector become features, and pods of a namespace
+    # with the same features (e.g. replicas) share a row
+    feature_rows: Dict[Tuple[int, Tuple[int, ...]], int] = {}
+    pod_rows: List[int] = []
+    for pod in pods:
+        pod_features = []
+        for key, value in (pod.metadata.labels or {}).items():
+            for feature in (("pair", key, value), ("key", key)):
+                column = features.get(feature)
+                if column is not None:
+                    pod_features.append(column)
+        namespace = namespace_ids.setdefault(pod.metadata.namespace, len(namespace_ids))
+        pod_rows.append(feature_rows.setdefault((namespace, tuple(sorted(pod_features))), len(feature_rows)))
+
+    row_features = np.zeros((len(feature_rows), len(features)), dtype=np.float32)
+    row_namespaces = np.zeros(len(feature_rows), dtype=np.int64)
+    for (namespace, feature_ids), row in feature_rows.items():
+        row_features[row, list(feature_ids)] = 1
+        row_namespaces[row] = namespace
+
+    term_features = np.zeros((len(features), len(terms)), dtype=np.float32)
+    for feature_ids, column in terms.items():
+        term_features[list(feature_ids), column] = 1
+    row_terms = (row_features @ term_features > 0).astype(np.float32)
+
+    required_terms = np.zeros((len(terms), len(selector_columns)), dtype=np.float32)
+    forbidden_terms = np.zeros((len(terms), len(selector_columns)), dtype=np.float32)
+    column_namespaces = np.zeros(len(selector_columns), dtype=np.int64)
+    for (namespace, required, forbidden), column in selector_columns.items():
+        required_terms[list(required), column] = 1
+        forbidden_terms[list(forbidden), column] = 1
+        column_namespaces[column] = namespace
+
+    # The counts are small integers, which float32 represents exactly
+    selected = (
+        (row_terms @ required_terms == required_terms.sum(axis=0))
+        & (row_terms @ forbidden_terms == 0)
+        & (row_namespaces[:, None] == column_namespaces[None, :])
+    )
+    return selected[np.array(pod_rows, dtype=np.int64)][:, np.array(policy_columns, dtype=np.int64)]
@@ -0,0 +1,255 @@
+"""
+Compilation of Kubernetes label selectors into reusable matcher objects.
+
+A V1LabelSelector is translated once into a CompiledSelector holding its
+match_labels as a frozenset of pairs and its match_expressions as frozensets
+of values, so that evaluating it against the labels of a pod only takes a
+few set lookups. Compiled NetworkPolicies are cached by UID and
+resourceVersion.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from kubernetes import client
+
+from kubernetes_tools import instrumentation
+from kubernetes_tools.cidr import Address, CompiledIPBlock, compile_ip_block
+from kubernetes_tools.ports import CompiledPorts, compile_ports
+
+IN = "In"
+NOT_IN = "NotIn"
+EXISTS = "Exists"
+DOES_NOT_EXIST = "DoesNotExist"
+
+NAMESPACE_NAME_LABEL = "kubernetes.io/metadata.name"
+
+Requirement = Tuple[str, str, FrozenSet[str]]
+
+
+class CompiledSelector:
+    """
+    Precompiled label selector.
+
+    Args:
+        match_labels: The required (key, value) pairs
+        requirements: The match expressions as (key, operator, values) tuples
+    """
+    __slots__ = ("match_labels", "requirements")
+
+    def __init__(self, match_labels: FrozenSet[Tuple[str, str]], requirements: Tuple[Requirement, ...]):
+        self.match_labels = match_labels
+        self.requirements = requirements
+
+    def __repr__(self) -> str:
+        return f"CompiledSelector(match_labels={set(self.match_labels)}, requirements={self.requirements})"
+
+    def is_empty(self) -> bool:
+        """An empty selector matches all objects."""
+        return not self.match_labels and not self.requirements
+
+    def matches(self, labels: Optional[Dict[str, str]]) -> bool:
+        """
+        Check whether the selector matches the given labels.
+
+        Args:
+            labels: The labels of the object, e.g. the pod or namespace labels
+
+        Returns:
+            True if all match_labels and all match_expressions are satisfied, False otherwise
+        """
+        labels = labels or {}
+
+        for key, value in self.match_labels:
+            if labels.get(key) != value:
+                return False
+
+        for key, operator, values in self.requirements:
+            if operator == IN:
+                if labels.get(key) not in values:
+                    return False
+            elif operator == NOT_IN:
+                if key in labels and labels[key] in values:
+                    return False
+            elif operator == EXISTS:
+                if key not in labels:
+                    return False
+            elif operator == DOES_NOT_EXIST:
+                if key in labels:
+                    return False
+
+        return True
+
+
+MATCH_ALL = CompiledSelector(frozenset(), ())
+
+
+def compile_selector(selector: Optional[client.V1LabelSelector]) -> CompiledSelector:
+    """
+    Compile a label selector into a CompiledSelector.
+
+    Args:
+        selector: The V1LabelSelector to compile. None is compiled into a selector matching everything
+
+    Returns:
+        The CompiledSelector
+
+    Raises:
+        ValueError: If a match expression uses an unknown operator
+
+    Example:
+        selector = compile_selector(network_policy.spec.pod_selector)
+        if selector.matches(pod.metadata.labels):
+            print("Pod is selected")
+    """
+    if selector is None:
+        return MATCH_ALL
+
+    requirements: List[Requirement] = []
+    for expression in selector.match_expressions or []:
+        if expression.operator not in (IN, NOT_IN, EXISTS, DOES_NOT_EXIST):
+            raise ValueError(f"Unknown label selector operator: {expression.operator}")
+        requirements.append((expression.key, expression.operator, frozenset(expression.values or ())))
+
+    return CompiledSelector(
+        match_labels=frozenset((selector.match_labels or {}).items()),
+        requirements=tuple(requirements)
+    )
+
+
+class CompiledPeer:
+    """
+    Precompiled NetworkPolicyPeer.
+
+    Args:
+        pod_selector: The compiled pod selector, None if the peer has none
+        namespace_selector: The compiled namespace selector, None if the peer has none
+        ip_block: The compiled ip block of the peer, if any
+    """
+    __slots__ = ("pod_selector", "namespace_selector", "ip_block")
+
+    def __init__(
+        self,
+        pod_selector: Optional[CompiledSelector],
+        namespace_selector: Optional[CompiledSelector],
+        ip_block: Optional[CompiledIPBlock]
+    ):
+        self.pod_selector = pod_selector
+        self.namespace_selector = namespace_selector
+        self.ip_block = ip_block
+
+    def matches_pod(
+        self,
+        policy_namespace: str,
+        pod_labels: Optional[Dict[str, str]],
+        pod_namespace: str,
+        namespace_labels: Optional[Dict[str, str]]
+    ) -> bool:
+        """
+        Check whether the peer selects a pod.
+
+        A peer without namespace selector only selects pods in the namespace of the
+        policy. A peer with a namespace selector but without pod selector selects all
+        pods of the matching namespaces. IP block peers never select pods.
+        """
+        if self.ip_block is not None:
+            return False
+
+        if self.namespace_selector is None:
+            if self.pod_selector is None or pod_namespace != policy_namespace:
+                return False
+        elif not self.namespace_selector.matches(namespace_labels):
+            return False
+
+        return self.pod_selector is None or self.pod_selector.matches(pod_labels)
+
+    def matches_ip(self, addresses: Iterable[Address]) -> bool:
+        """
+        Check whether the ip block of the peer selects one of the addresses.
+
+        Peers without ip block never select addresses, they select pods.
+        """
+        return self.ip_block is not None and self.ip_block.contains_any(addresses)
+
+
+class CompiledPolicy:
+    """
+    Precompiled NetworkPolicy with its pod selector and the peers and ports of all ingress and egress rules.
+    """
+    __slots__ = ("network_policy", "pod_selector", "ingress_peers", "egress_peers", "ingress_ports", "egress_ports")
+
+    def __init__(self, network_policy: client.V1NetworkPolicy):
+        spec = network_policy.spec
+
+        self.network_policy = network_policy
+        self.pod_selector = compile_selector(spec.pod_selector)
+        self.ingress_peers: Tuple[Tuple[CompiledPeer, ...], ...] = tuple(
+            _compile_peers(rule._from) for rule in spec.ingress or []
+        )
+        self.egress_peers: Tuple[Tuple[CompiledPeer, ...], ...] = tuple(
+            _compile_peers(rule.to) for rule in spec.egress or []
+        )
+        self.ingress_ports: Tuple[CompiledPorts, ...] = tuple(compile_ports(rule.ports) for rule in spec.ingress or [])
+        self.egress_ports: Tuple[CompiledPorts, ...] = tuple(compile_ports(rule.ports) for rule in spec.egress or [])
+
+
+def _compile_peers(peers: Optional[List[client.V1NetworkPolicyPeer]]) -> Tuple[CompiledPeer, ...]:
+    return tuple(
+        CompiledPeer(
+            pod_selector=compile_selector(peer.pod_selector) if peer.pod_selector is not None else None,
+            namespace_selector=compile_selector(peer.namespace_selector) if peer.namespace_selector is not None else None,
+            ip_block=compile_ip_block(peer.ip_block) if peer.ip_block is not None else None
+        )
+        for peer in peers or []
+    )
+
+
+_CACHE_SIZE = 4096
+_cache: "OrderedDict[Tuple[str, str], CompiledPolicy]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def compile_policy(network_policy: client.V1NetworkPolicy) -> CompiledPolicy:
+    """
+    Get the CompiledPolicy of a NetworkPolicy.
+
+    Policies read from the API server are cached by UID and resourceVersion, so each
+    version of a policy is compiled only once. Policies without UID (e.g. not yet
+    created ones) are compiled on every call.
+
+    Args:
+        network_policy: The V1NetworkPolicy to compile
+
+    Returns:
+        The CompiledPolicy
+    """
+    metadata = network_policy.metadata
+    if metadata is None or not metadata.uid:
+        return CompiledPolicy(network_policy)
+
+    key = (metadata.uid, metadata.resource_version)
+    with _cache_lock:
+        compiled = _cache.get(key)
+        if compiled is not None:
+            _cache.move_to_end(key)
+    instrumentation.record_cache("compiled_policy", compiled is not None)
+    if compiled is not None:
+        return compiled
+
+    compiled = CompiledPolicy(network_policy)
+
+    with _cache_lock:
+        _cache[key] = compiled
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return compiled
+
+
+def default_namespace_labels(namespace: str) -> Dict[str, str]:
+    """
+    Get the labels Kubernetes sets on every namespace, to be used if the real labels are unknown.
+    """
+    return {NAMESPACE_NAME_LABEL: namespace}
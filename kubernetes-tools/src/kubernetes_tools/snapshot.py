@@ -0,0 +1,421 @@
+"""
+Offline cluster snapshots in a compact, memory-mapped file.
+
+write_snapshot() lists the pods, namespaces, services and NetworkPolicies of a
+cluster once and writes them to a file. Once a snapshot file is enabled, the
+read helpers in ``pods`` and ``networkpolicy``, and the tools built on them,
+are served from the file instead of the API server, e.g. to replay an incident
+or to run the agents without a cluster:
+
+    snapshot.write_snapshot("cluster.snap")
+
+    snapshot.enable("cluster.snap")
+    pod = pods.get_pod_by_name(name="backend", namespace="test-app")
+
+The file consists of
+
+- a header with magic, format version, encoding and the positions of the sections
+- the encoded objects, sorted by kind, namespace and name
+- the offsets of the objects as little-endian uint64 array, one more than objects
+- the index: per kind and namespace the sorted names and the position of the first object
+
+Objects are encoded with msgpack if installed (pip install kubernetes-tools[snapshot])
+and as JSON otherwise. Loading a snapshot maps the file and decodes the index only.
+The offsets are read in place and an object is decoded from its slice of the mapping
+when it is first read, so loading takes milliseconds even for large clusters.
+Objects are returned as JsonObjects, see kubernetes_tools.fastjson.
+"""
+from __future__ import annotations
+
+import itertools
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from kubernetes import client
+
+from kubernetes_tools import clients, fastjson, informer
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+SERVICES = "services"
+# The kinds of a snapshot written by write_snapshot()
+KINDS = (informer.NAMESPACES, informer.PODS, SERVICES, informer.NETWORK_POLICIES)
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+MAGIC = b"KTSNAP\x00\x00"
+VERSION = 1
+
+# Magic, version, encoding, reserved, positions of the offsets and the index, length of the index
+_HEADER = struct.Struct("<8sHHIQQQ")
+_ENCODINGS = {JSON: 1, MSGPACK: 2}
+# Index key of the objects of cluster-scoped kinds like namespaces
+_CLUSTER = ""
+
+_generations = itertools.count(1)
+
+
+def _encode(encoding: str, obj: Any) -> bytes:
+    if encoding == MSGPACK:
+        return msgpack.packb(obj)
+    return fastjson.dumps(obj)
+
+
+def _decode(encoding: str, data: memoryview) -> Any:
+    if encoding == MSGPACK:
+        return msgpack.unpackb(data)
+    if fastjson.orjson is None:
+        # The json module only decodes bytes and str
+        data = bytes(data)
+    return fastjson.loads(data)
+
+
+def _default_encoding() -> str:
+    return MSGPACK if msgpack is not None else JSON
+
+
+def _compact(obj: Any) -> Dict[str, Any]:
+    # managedFields make up a large part of the objects and are of no use offline
+    document = dict(fastjson.as_json_dict(obj))
+    metadata = dict(document.get("metadata") or {})
+    metadata.pop("managedFields", None)
+    document["metadata"] = metadata
+    return document
+
+
+def dump_snapshot(path: str, objects: Dict[str, Iterable[Any]], encoding: Optional[str] = None) -> int:
+    """
+    Write objects to a snapshot file, replacing an existing file atomically.
+
+    Args:
+        path: The path of the snapshot file
+        objects: The objects by kind, e.g. {informer.PODS: pods}, as models, JsonObjects or dicts
+        encoding: JSON or MSGPACK (default: MSGPACK if msgpack is installed, JSON otherwise)
+
+    Returns:
+        The number of objects written
+
+    Example:
+        dump_snapshot("test-app.snap", {informer.PODS: pods, informer.NETWORK_POLICIES: network_policies})
+    """
+    encoding = encoding or _default_encoding()
+    if encoding not in _ENCODINGS:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    if encoding == MSGPACK and msgpack is None:
+        raise ValueError("The msgpack encoding requires msgpack, pip install kubernetes-tools[snapshot]")
+
+    documents: List[Tuple[str, str, str, Dict[str, Any]]] = []
+    for kind, kind_objects in objects.items():
+        for obj in kind_objects:
+            document = _compact(obj)
+            metadata = document["metadata"]
+            documents.append((kind, metadata.get("namespace") or _CLUSTER, metadata["name"], document))
+    documents.sort(key=lambda document: document[:3])
+
+    index: Dict[str, Dict[str, list]] = {}
+    offsets = array("Q")
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(bytes(_HEADER.size))
+        position = _HEADER.size
+        for number, (kind, namespace, name, document) in enumerate(documents):
+            table = index.setdefault(kind, {}).setdefault(namespace, [number, []])
+            table[1].append(name)
+            offsets.append(position)
+            position += file.write(_encode(encoding, document))
+        offsets.append(position)
+
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        offsets_position = position
+        position += file.write(offsets.tobytes())
+        index_data = _encode(encoding, {"created": time.time(), "kinds": index})
+        file.write(index_data)
+
+        file.seek(0)
+        file.write(_HEADER.pack(
+            MAGIC, VERSION, _ENCODINGS[encoding], 0, offsets_position, position, len(index_data)
+        ))
+    os.replace(temporary_path, path)
+    return len(documents)
+
+
+def write_snapshot(
+    path: str,
+    api_client: Optional[client.ApiClient] = None,
+    encoding: Optional[str] = None
+) -> int:
+    """
+    List the pods, namespaces, services and NetworkPolicies of the cluster and write them to a snapshot file.
+
+    The lists are requested concurrently and decoded without building models.
+
+    Args:
+        path: The path of the snapshot file
+        api_client: The ApiClient to use (default: the shared ApiClient of kubernetes_tools.clients)
+        encoding: JSON or MSGPACK (default: MSGPACK if msgpack is installed, JSON otherwise)
+
+    Returns:
+        The number of objects written
+
+    Example:
+        count = write_snapshot("cluster.snap")
+        print(f"Wrote {count} objects")
+    """
+    v1 = clients.core_v1(api_client)
+    networking_v1 = clients.networking_v1(api_client)
+    requests = {
+        informer.NAMESPACES: lambda: v1.list_namespace(_preload_content=False),
+        informer.PODS: lambda: v1.list_pod_for_all_namespaces(_preload_content=False),
+        SERVICES: lambda: v1.list_service_for_all_namespaces(_preload_content=False),
+        informer.NETWORK_POLICIES: lambda: networking_v1.list_network_policy_for_all_namespaces(_preload_content=False),
+    }
+    responses = clients.map_concurrently(lambda request: request(), list(requests.values()))
+    return dump_snapshot(
+        path,
+        {kind: fastjson.read_items(response) for kind, response in zip(requests, responses)},
+        encoding
+    )
+
+
+class Snapshot:
+    """
+    A snapshot file mapped into memory.
+
+    Objects are decoded on first access and the decoded JsonObject is returned by
+    subsequent reads. Call close() to unmap the file, objects read before stay valid.
+
+    Args:
+        path: The path of the snapshot file
+
+    Raises:
+        ValueError: If the file is not a snapshot or of an unsupported version or encoding
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        with open(self.path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        try:
+            if len(self._view) < _HEADER.size:
+                raise ValueError(f"{self.path} is not a snapshot file")
+            magic, version, encoding, _, offsets_position, index_position, index_length = _HEADER.unpack_from(self._view)
+            if magic != MAGIC:
+                raise ValueError(f"{self.path} is not a snapshot file")
+            if version != VERSION:
+                raise ValueError(f"Unsupported snapshot version {version} of {self.path}")
+            self.encoding = next((name for name, code in _ENCODINGS.items() if code == encoding), None)
+            if self.encoding is None or (self.encoding == MSGPACK and msgpack is None):
+                raise ValueError(f"Unsupported snapshot encoding {encoding} of {self.path}")
+
+            # Slices are released at once, the mapping cannot be closed while views of it exist
+            with self._view[offsets_position:index_position] as offsets:
+                if sys.byteorder == "little":
+                    self._offsets = offsets.cast("Q")
+                else:
+                    self._offsets = array("Q", offsets)
+                    self._offsets.byteswap()
+            with self._view[index_position:index_position + index_length] as index_data:
+                index = _decode(self.encoding, index_data)
+        except Exception:
+            self.close()
+            raise
+
+        self.created: float = index["created"]
+        self._tables: Dict[str, Dict[str, Tuple[int, List[str]]]] = {
+            kind: {namespace: (first, names) for namespace, (first, names) in tables.items()}
+            for kind, tables in index["kinds"].items()
+        }
+        self._decoded: Dict[int, fastjson.JsonObject] = {}
+        # Never equal to the integer revisions of informer stores
+        self.revision = f"snapshot-{next(_generations)}"
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Unmap the file."""
+        for view in (getattr(self, "_offsets", None), self._view):
+            if isinstance(view, memoryview):
+                view.release()
+        self._mmap.close()
+
+    def count(self, kind: Optional[str] = None) -> int:
+        """Get the number of objects of a kind, or of all kinds."""
+        kinds = [kind] if kind is not None else list(self._tables)
+        return sum(len(names) for kind in kinds for _, names in self._tables.get(kind, {}).values())
+
+    def namespaces(self, kind: str) -> List[str]:
+        """Get the namespaces with objects of a namespaced kind, sorted by name."""
+        return sorted(namespace for namespace in self._tables.get(kind, {}) if namespace != _CLUSTER)
+
+    def get(self, kind: str, namespace: Optional[str], name: str) -> Optional[fastjson.JsonObject]:
+        """
+        Get an object by name.
+
+        Args:
+            kind: The kind, e.g. informer.PODS
+            namespace: The namespace of the object, None for cluster-scoped kinds
+            name: The name of the object
+
+        Returns:
+            The JsonObject, None if the snapshot has no such object
+        """
+        table = self._tables.get(kind, {}).get(namespace or _CLUSTER)
+        if table is None:
+            return None
+        first, names = table
+        position = bisect_left(names, name)
+        if position == len(names) or names[position] != name:
+            return None
+        return self._object(first + position)
+
+    def list(self, kind: str, namespace: Optional[str] = None) -> List[fastjson.JsonObject]:
+        """
+        List the objects of a kind, sorted by namespace and name.
+
+        Args:
+            kind: The kind, e.g. informer.PODS
+            namespace: The namespace of the objects (default: all namespaces)
+
+        Returns:
+            The JsonObjects
+        """
+        tables = self._tables.get(kind, {})
+        if namespace is not None:
+            tables = {namespace: tables[namespace]} if namespace in tables else {}
+        return [
+            self._object(number)
+            for first, names in tables.values()
+            for number in range(first, first + len(names))
+        ]
+
+    def store(self, kind: str, namespace: Optional[str]) -> "SnapshotStore":
+        """Get a read-only view of the objects of a kind in a namespace with the interface of informer.Store."""
+        return SnapshotStore(self, kind, namespace)
+
+    def _object(self, number: int) -> fastjson.JsonObject:
+        obj = self._decoded.get(number)
+        if obj is None:
+            with self._view[self._offsets[number]:self._offsets[number + 1]] as data:
+                obj = self._decoded.setdefault(number, fastjson.JsonObject(_decode(self.encoding, data)))
+        return obj
+
+
+class SnapshotStore:
+    """
+    Read-only view of the objects of one kind and namespace of a Snapshot.
+
+    Provides get(), list() and revision like informer.Store, so that the helpers
+    serve snapshots and informer stores the same way.
+    """
+
+    def __init__(self, snapshot: Snapshot, kind: str, namespace: Optional[str]):
+        self.snapshot = snapshot
+        self.kind = kind
+        self.namespace = namespace
+
+    @property
+    def revision(self) -> str:
+        return self.snapshot.revision
+
+    def get(self, name: str) -> Optional[fastjson.JsonObject]:
+        return self.snapshot.get(self.kind, self.namespace, name)
+
+    def list(self) -> List[fastjson.JsonObject]:
+        return self.snapshot.list(self.kind, self.namespace or _CLUSTER)
+
+
+def load_snapshot(path: str) -> Snapshot:
+    """
+    Map a snapshot file written by write_snapshot() or dump_snapshot().
+
+    Args:
+        path: The path of the snapshot file
+
+    Returns:
+        The Snapshot
+
+    Example:
+        with load_snapshot("cluster.snap") as loaded:
+            print(loaded.count(informer.PODS), [pod.metadata.name for pod in loaded.list(informer.PODS, "test-app")])
+    """
+    return Snapshot(path)
+
+
+_lock = threading.Lock()
+_snapshot: Optional[Snapshot] = None
+
+
+def enable(path: str) -> Snapshot:
+    """
+    Serve reads of the pods and networkpolicy helpers from a snapshot file instead of the API server.
+
+    A snapshot takes precedence over informers. Helpers called with an explicit
+    api_client still query that client.
+
+    Args:
+        path: The path of the snapshot file
+
+    Returns:
+        The loaded Snapshot
+    """
+    global _snapshot
+    loaded = load_snapshot(path)
+    with _lock:
+        previous, _snapshot = _snapshot, loaded
+    if previous is not None:
+        previous.close()
+    return loaded
+
+
+def disable() -> None:
+    """Unmap the enabled snapshot and fall back to informers or direct API requests."""
+    global _snapshot
+    with _lock:
+        previous, _snapshot = _snapshot, None
+    if previous is not None:
+        previous.close()
+
+
+def is_enabled() -> bool:
+    return _snapshot is not None
+
+
+def get_snapshot() -> Optional[Snapshot]:
+    """Get the enabled Snapshot, None if reads are not served from a snapshot."""
+    return _snapshot
+
+
+def get_store(kind: str, namespace: Optional[str]) -> Optional[SnapshotStore]:
+    """
+    Get the objects of a kind and namespace of the enabled snapshot.
+
+    Args:
+        kind: The resource kind, e.g. informer.PODS
+        namespace: The namespace of the objects, None for cluster-scoped kinds
+
+    Returns:
+        The SnapshotStore if a snapshot is enabled, None otherwise. The store of a
+        namespace without objects in the snapshot is empty
+    """
+    loaded = _snapshot
+    if loaded is None:
+        return None
+    return loaded.store(kind, namespace)
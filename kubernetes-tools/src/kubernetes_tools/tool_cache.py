@@ -0,0 +1,300 @@
+"""
+Cache of read-only tool results within a conversation.
+
+Agents often call the same read-only tool with the same arguments several
+times in one reasoning chain. Once enabled, the results of the tools decorated
+with cached() are kept per LangGraph thread and checkpoint namespace (i.e. per
+conversation and subgraph) and returned again while the objects they depend on
+are unchanged:
+
+- Entries expire after a TTL and the least recently used entries are evicted
+  once the cache is full.
+- With informers or a snapshot enabled, an entry is only used while the
+  revision of the stores of the pods/NetworkPolicies it depends on is unchanged.
+  Without them only the TTL bounds the age of a result: the resourceVersion of
+  a LIST is the revision of the whole cluster, which any write (e.g. a Lease
+  renewal) changes, and checking it costs about as much as the request it saves.
+- With reference_unchanged=True a repeated result is replaced by a short note
+  "unchanged since call #N", so that it is not added to the context again.
+
+Tool calls outside of a LangGraph thread, i.e. without thread_id in the
+configurable of the run, are never cached.
+
+Example:
+    from kubernetes_tools import tool_cache
+
+    tool_cache.enable(ttl=60, reference_unchanged=True)
+    agent.invoke({"messages": [...]}, config={"configurable": {"thread_id": "1"}})
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple, TypeVar
+
+from langchain_core.runnables.config import ensure_config
+
+from kubernetes_tools import informer, instrumentation, snapshot
+
+DEFAULT_TTL = 60.0
+DEFAULT_MAX_ENTRIES = 256
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# A resource kind of the informer module and the name of the tool argument holding
+# the namespace, a list of namespaces or None for all namespaces
+Dependency = Tuple[str, str]
+
+Scope = Tuple[str, str]
+
+
+class CacheEntry:
+    """A cached tool result with the resource versions it was computed at."""
+    __slots__ = ("result", "versions", "call_number", "expires_at")
+
+    def __init__(self, result: Any, versions: Tuple[Hashable, ...], call_number: int, expires_at: float):
+        self.result = result
+        self.versions = versions
+        self.call_number = call_number
+        self.expires_at = expires_at
+
+
+class ToolResultCache:
+    """
+    Size-bounded LRU cache of tool results per scope (thread and checkpoint namespace).
+
+    Args:
+        ttl: Seconds after which a result is requested again (default: 60)
+        max_entries: The maximum number of results over all scopes (default: 256)
+        reference_unchanged: Return a note referencing the call with the full result
+            instead of repeating it (default: False)
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        reference_unchanged: bool = False
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.reference_unchanged = reference_unchanged
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[Scope, Hashable], CacheEntry]" = OrderedDict()
+        self._call_numbers: "OrderedDict[Scope, int]" = OrderedDict()
+
+    def next_call_number(self, scope: Scope) -> int:
+        """Count a call of a cached tool in the scope and get its number, starting with 1."""
+        with self._lock:
+            call_number = self._call_numbers.pop(scope, 0) + 1
+            self._call_numbers[scope] = call_number
+            # The least recently active scopes are dropped like the entries
+            if len(self._call_numbers) > self.max_entries:
+                self._call_numbers.popitem(last=False)
+            return call_number
+
+    def get(self, scope: Scope, key: Hashable, versions: Tuple[Hashable, ...]) -> Optional[CacheEntry]:
+        """Get the entry of a key if it has neither expired nor been computed at other versions."""
+        with self._lock:
+            entry = self._entries.get((scope, key))
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic() or entry.versions != versions:
+                del self._entries[(scope, key)]
+                return None
+            self._entries.move_to_end((scope, key))
+            return entry
+
+    def put(self, scope: Scope, key: Hashable, result: Any, versions: Tuple[Hashable, ...], call_number: int) -> None:
+        with self._lock:
+            self._entries[(scope, key)] = CacheEntry(result, versions, call_number, time.monotonic() + self.ttl)
+            self._entries.move_to_end((scope, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, thread_id: Optional[str] = None) -> None:
+        """Remove the entries of a thread or all entries."""
+        with self._lock:
+            if thread_id is None:
+                self._entries.clear()
+                self._call_numbers.clear()
+                return
+            for scope, key in [entry_key for entry_key in self._entries if entry_key[0][0] == thread_id]:
+                del self._entries[(scope, key)]
+            for scope in [scope for scope in self._call_numbers if scope[0] == thread_id]:
+                del self._call_numbers[scope]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache: Optional[ToolResultCache] = None
+
+
+def enable(
+    ttl: float = DEFAULT_TTL,
+    max_entries: int = DEFAULT_MAX_ENTRIES,
+    reference_unchanged: bool = False
+) -> ToolResultCache:
+    """
+    Cache the results of the read-only tools, replacing a previously enabled cache.
+
+    Args:
+        ttl: Seconds after which a result is requested again (default: 60)
+        max_entries: The maximum number of cached results (default: 256)
+        reference_unchanged: Return a note "unchanged since call #N" instead of repeating
+            an unchanged result (default: False)
+
+    Returns:
+        The enabled ToolResultCache
+    """
+    global _cache
+    _cache = ToolResultCache(ttl, max_entries, reference_unchanged)
+    return _cache
+
+
+def disable() -> None:
+    """Stop caching and drop all cached results."""
+    global _cache
+    _cache = None
+
+
+def is_enabled() -> bool:
+    return _cache is not None
+
+
+def get_cache() -> Optional[ToolResultCache]:
+    return _cache
+
+
+def unchanged_note(tool_name: str, call_number: int) -> Dict[str, Any]:
+    """Get the result returned for an unchanged result in reference_unchanged mode."""
+    return {
+        "unchanged_since_call": call_number,
+        "message": (
+            f"The result of {tool_name} with these arguments is unchanged since "
+            f"call #{call_number} of the read-only tools in this conversation."
+        ),
+    }
+
+
+def cached(*dependencies: Dependency, name: Optional[str] = None) -> Callable[[F], F]:
+    """
+    Decorate a read-only tool function (sync or async) to cache its results while enabled.
+    Apply it below @tool, so that the tool schema is built from the original function.
+
+    Args:
+        dependencies: The resources the result depends on as (kind, argument name) pairs,
+            e.g. (informer.PODS, "namespace")
+        name: The tool name, e.g. to share the results of the sync and async implementation
+            of a tool (default: the function name)
+
+    Example:
+        @tool(parse_docstring=True)
+        @tool_cache.cached((informer.PODS, "namespace"))
+        def get_pod_ip_addresses(pod_name: str, namespace: str = "default") -> Optional[List[str]]:
+            ...
+    """
+    def decorator(func: F) -> F:
+        signature = inspect.signature(func)
+        tool_name = name or func.__name__
+
+        def prepare(args: tuple, kwargs: dict) -> Optional[Tuple[ToolResultCache, Scope, Hashable, Dict[str, Any]]]:
+            cache = _cache
+            scope = _current_scope() if cache is not None else None
+            if scope is None:
+                return None
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (tool_name, json.dumps(bound.arguments, sort_keys=True, default=str))
+            return cache, scope, key, bound.arguments
+
+        def lookup(cache: ToolResultCache, scope: Scope, key: Hashable, versions: Tuple[Hashable, ...]) -> Tuple[int, Optional[CacheEntry]]:
+            call_number = cache.next_call_number(scope)
+            entry = cache.get(scope, key, versions)
+            instrumentation.record_cache("tool_result", entry is not None)
+            return call_number, entry
+
+        def cached_result(cache: ToolResultCache, entry: CacheEntry) -> Any:
+            if cache.reference_unchanged:
+                return unchanged_note(tool_name, entry.call_number)
+            return entry.result
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                prepared = prepare(args, kwargs)
+                if prepared is None:
+                    return await func(*args, **kwargs)
+
+                cache, scope, key, arguments = prepared
+                versions = await asyncio.to_thread(resource_versions, dependencies, arguments)
+                call_number, entry = lookup(cache, scope, key, versions)
+                if entry is not None:
+                    return cached_result(cache, entry)
+
+                result = await func(*args, **kwargs)
+                cache.put(scope, key, result, versions, call_number)
+                return result
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                prepared = prepare(args, kwargs)
+                if prepared is None:
+                    return func(*args, **kwargs)
+
+                cache, scope, key, arguments = prepared
+                versions = resource_versions(dependencies, arguments)
+                call_number, entry = lookup(cache, scope, key, versions)
+                if entry is not None:
+                    return cached_result(cache, entry)
+
+                result = func(*args, **kwargs)
+                cache.put(scope, key, result, versions, call_number)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def _current_scope() -> Optional[Scope]:
+    configurable = ensure_config().get("configurable") or {}
+    thread_id = configurable.get("thread_id")
+    if thread_id is None:
+        return None
+    return str(thread_id), configurable.get("checkpoint_ns") or ""
+
+
+def resource_versions(dependencies: Sequence[Dependency], arguments: Dict[str, Any]) -> Tuple[Hashable, ...]:
+    """
+    Get the versions of the resources a tool result depends on.
+
+    Args:
+        dependencies: (kind, argument name) pairs, see cached()
+        arguments: The arguments of the tool call by name
+
+    Returns:
+        The informer store or snapshot revisions per kind, None for a kind without store
+    """
+    versions: List[Hashable] = []
+    for kind, argument in dependencies:
+        namespaces = arguments.get(argument)
+        if isinstance(namespaces, str):
+            namespaces = [namespaces]
+
+        stores = [informer.get_store(kind, namespace) for namespace in namespaces or []]
+        loaded = snapshot.get_snapshot()
+        if stores and all(store is not None for store in stores):
+            versions.append((kind, tuple(store.revision for store in stores)))
+        elif loaded is not None:
+            # A snapshot does not change, all its namespaces have its revision
+            versions.append((kind, loaded.revision))
+        else:
+            versions.append((kind, None))
+    return tuple(versions)
@@ -1,3 +0,0 @@
-from kubernetes import config
-
-config.load_kube_config()
\ No newline at end of file
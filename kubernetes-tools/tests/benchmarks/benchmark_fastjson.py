@@ -0,0 +1,105 @@
+"""
+Benchmark of the raw JSON fast path against the OpenAPI model path for
+matching the NetworkPolicies of a large namespace to a pod.
+
+Runs without a cluster on a synthetic NetworkPolicyList response:
+
+    PYTHONPATH=src python -m tests.benchmarks.benchmark_fastjson --policies 5000
+"""
+import argparse
+import json
+import time
+from typing import Callable, List
+
+from kubernetes import client
+
+from kubernetes_tools import fastjson
+from kubernetes_tools.policy_index import PolicyIndex
+
+
+class FakeResponse:
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def create_network_policy_list(count: int) -> bytes:
+    items = []
+    for i in range(count):
+        items.append({
+            "apiVersion": "networking.k8s.io/v1",
+            "kind": "NetworkPolicy",
+            "metadata": {
+                "name": f"policy-{i}",
+                "namespace": "bench",
+                "labels": {"team": f"team-{i % 20}"},
+                "annotations": {"description": "synthetic policy " * 4},
+            },
+            "spec": {
+                "podSelector": {"matchLabels": {"app": f"app-{i % 100}"}},
+                "policyTypes": ["Ingress", "Egress"],
+                "ingress": [{
+                    "from": [
+                        {"podSelector": {"matchLabels": {"app": f"app-{(i + 1) % 100}"}}},
+                        {"namespaceSelector": {"matchLabels": {"team": f"team-{i % 20}"}}},
+                    ],
+                    "ports": [{"port": 8080, "protocol": "TCP"}, {"port": 8443, "protocol": "TCP"}],
+                }],
+                "egress": [{
+                    "to": [{"ipBlock": {"cidr": "10.0.0.0/8", "except": ["10.1.0.0/16"]}}],
+                    "ports": [{"port": 53, "protocol": "UDP"}],
+                }],
+            },
+        })
+
+    return json.dumps({
+        "apiVersion": "networking.k8s.io/v1",
+        "kind": "NetworkPolicyList",
+        "metadata": {"resourceVersion": "1"},
+        "items": items,
+    }).encode()
+
+
+def model_path(api_client: client.ApiClient, data: bytes) -> List[dict]:
+    network_policies = api_client.deserialize(FakeResponse(data), "V1NetworkPolicyList").items
+    matching = PolicyIndex(network_policies).match({"app": "app-7"})
+    return [policy.to_dict() for policy in matching]
+
+
+def fast_path(data: bytes) -> List[dict]:
+    network_policies = fastjson.read_items(FakeResponse(data))
+    matching = PolicyIndex(network_policies).match({"app": "app-7"})
+    return [fastjson.as_json_dict(policy) for policy in matching]
+
+
+def measure(func: Callable[[], object], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--policies", type=int, default=2000, help="Number of NetworkPolicies in the namespace")
+    parser.add_argument("--rounds", type=int, default=5, help="Number of rounds, the best one is reported")
+    args = parser.parse_args()
+
+    data = create_network_policy_list(args.policies)
+    api_client = client.ApiClient(client.Configuration())
+
+    assert len(model_path(api_client, data)) == len(fast_path(data))
+
+    model_seconds = measure(lambda: model_path(api_client, data), args.rounds)
+    fast_seconds = measure(lambda: fast_path(data), args.rounds)
+
+    decoder = "orjson" if fastjson.orjson is not None else "json"
+    print(f"{args.policies} NetworkPolicies, {len(data) / 1024:.0f} KiB response")
+    print(f"model objects: {model_seconds * 1000:8.1f} ms")
+    print(f"fast path ({decoder}): {fast_seconds * 1000:8.1f} ms  ({model_seconds / fast_seconds:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
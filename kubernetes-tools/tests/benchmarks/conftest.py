@@ -0,0 +1,109 @@
+"""
+Benchmarks of the tool and helper hot paths on synthetic objects.
+
+The benchmarks run without a cluster against tests.fake_apiserver and are not
+part of the unit test run. Results are saved to .benchmarks, so that a later
+run can be compared with an earlier commit:
+
+    pytest tests/benchmarks
+    pytest tests/benchmarks --benchmark-compare --benchmark-compare-fail=mean:10%
+
+The object counts can be restricted with BENCHMARK_SIZES, e.g. BENCHMARK_SIZES=10,1000.
+"""
+import os
+from pathlib import Path
+from typing import List
+
+import pytest
+from kubernetes import client
+
+from tests.fake_apiserver import FakeApiServer
+from tests.test_utils import create_nwp
+
+from kubernetes_tools import kubeconfig
+
+NAMESPACE = "bench"
+SIZES = [int(size) for size in os.environ.get("BENCHMARK_SIZES", "10,1000,100000").split(",")]
+STORAGE = Path(__file__).resolve().parents[2] / ".benchmarks"
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    if not hasattr(config.option, "benchmark_autosave"):
+        return
+    # Always keep the results, so that regressions show up across commits
+    config.option.benchmark_autosave = True
+    if config.option.benchmark_storage == "file://./.benchmarks":
+        config.option.benchmark_storage = f"file://{STORAGE}"
+
+
+def rounds_for(size: int) -> int:
+    """Fewer rounds for large object counts to keep the runtime of a benchmark bounded."""
+    return max(1, min(20, 20_000 // size))
+
+
+def create_pod(index: int) -> client.V1Pod:
+    return client.V1Pod(
+        api_version="v1",
+        kind="Pod",
+        metadata=client.V1ObjectMeta(
+            name=f"pod-{index}",
+            namespace=NAMESPACE,
+            uid=f"pod-uid-{index}",
+            labels={"app": f"app-{index % 100}", "tier": ("web", "api", "db")[index % 3]}
+        ),
+        spec=client.V1PodSpec(
+            node_name=f"node-{index % 10}",
+            containers=[
+                client.V1Container(
+                    name="app",
+                    image="python:3.12-slim",
+                    ports=[
+                        client.V1ContainerPort(container_port=8080, name="http"),
+                        client.V1ContainerPort(container_port=9090, name="metrics")
+                    ]
+                ),
+                client.V1Container(name="sidecar", image="envoyproxy/envoy:v1.30")
+            ]
+        ),
+        status=client.V1PodStatus(phase="Running", pod_ip=f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}")
+    )
+
+
+def create_pods(count: int) -> List[client.V1Pod]:
+    return [create_pod(index) for index in range(count)]
+
+
+def create_policies(count: int) -> List[client.V1NetworkPolicy]:
+    policies = []
+    for index in range(count):
+        ingress = index % 2 == 0
+        policy = create_nwp(
+            pod_match_labels={"app": f"app-{index % 100}"},
+            peer_match_labels={"app": f"app-{(index + 1) % 100}"},
+            namespace=NAMESPACE,
+            name=f"policy-{index}",
+            port=8080 + index % 10,
+            ingress=ingress
+        )
+        policy.api_version = "networking.k8s.io/v1"
+        policy.kind = "NetworkPolicy"
+        policy.metadata.uid = f"policy-uid-{index}"
+        policies.append(policy)
+    return policies
+
+
+def to_json(obj) -> dict:
+    return client.ApiClient().sanitize_for_serialization(obj)
+
+
+@pytest.fixture(scope="session")
+def fake_apiserver():
+    with FakeApiServer() as server:
+        kubeconfig.configure(configuration=server.configuration())
+        yield server
+
+
+@pytest.fixture(scope="session", params=SIZES, ids=lambda size: f"{size}-objects")
+def size(request) -> int:
+    return request.param
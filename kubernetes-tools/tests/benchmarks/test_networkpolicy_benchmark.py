@@ -0,0 +1,95 @@
+import pytest
+
+from tests.benchmarks.conftest import NAMESPACE, create_pod, create_pods, create_policies, rounds_for, to_json
+
+from kubernetes_tools import fastjson, networkpolicy, selector_matrix
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture(scope="module")
+def policy_objects(size):
+    return create_policies(size)
+
+
+@pytest.fixture(scope="module")
+def served_policies(fake_apiserver, size):
+    fake_apiserver.clear()
+    fake_apiserver.add_all([to_json(policy) for policy in create_policies(size)])
+    return size
+
+
+def test_get_network_policies_matching_pod(benchmark, served_policies, size):
+    pod = create_pod(7)
+
+    matching = benchmark.pedantic(
+        networkpolicy.get_network_policies_matching_pod,
+        args=(pod,),
+        rounds=rounds_for(size)
+    )
+
+    assert all(policy.metadata.namespace == NAMESPACE for policy in matching)
+
+
+def test_get_network_policies_matching_pod_raw(benchmark, served_policies, size):
+    pod = create_pod(7)
+
+    matching = benchmark.pedantic(
+        networkpolicy.get_network_policies_matching_pod,
+        args=(pod,),
+        kwargs={"raw": True},
+        rounds=rounds_for(size)
+    )
+
+    assert all(policy.metadata.namespace == NAMESPACE for policy in matching)
+
+
+def test_contains_ingress_rule(benchmark, policy_objects, size):
+    def check_all():
+        return [
+            networkpolicy.contains_ingress_rule(policy, port=8080, peer_selector={"app": "app-1"})
+            for policy in policy_objects
+        ]
+
+    results = benchmark.pedantic(check_all, rounds=rounds_for(size))
+
+    assert results[0] is True
+
+
+def test_contains_egress_rule(benchmark, policy_objects, size):
+    def check_all():
+        return [
+            networkpolicy.contains_egress_rule(policy, port=8081, selector={"app": "app-2"})
+            for policy in policy_objects
+        ]
+
+    results = benchmark.pedantic(check_all, rounds=rounds_for(size))
+
+    assert results[1] is (size > 1)
+
+
+def test_policy_to_dict(benchmark, policy_objects, size):
+    dicts = benchmark.pedantic(lambda: [policy.to_dict() for policy in policy_objects], rounds=rounds_for(size))
+
+    assert len(dicts) == size
+
+
+def test_policy_as_json_dict(benchmark, policy_objects, size):
+    dicts = benchmark.pedantic(
+        lambda: [fastjson.as_json_dict(policy) for policy in policy_objects],
+        rounds=rounds_for(size)
+    )
+
+    assert len(dicts) == size
+
+
+def test_compute_selection_matrix(benchmark, policy_objects, size):
+    pods = create_pods(size)
+
+    matrix = benchmark.pedantic(
+        selector_matrix.compute_selection_matrix,
+        args=(pods, policy_objects),
+        rounds=rounds_for(size)
+    )
+
+    assert matrix.policies_for(0) == policy_objects[0:size:100]
@@ -0,0 +1,69 @@
+import itertools
+
+import pytest
+
+from tests.benchmarks.conftest import NAMESPACE, create_pods, rounds_for, to_json
+
+from kubernetes_tools import pods, projection
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture(scope="module")
+def pod_objects(size):
+    return create_pods(size)
+
+
+@pytest.fixture(scope="module")
+def served_pods(fake_apiserver, size):
+    fake_apiserver.clear()
+    fake_apiserver.add_all([to_json(pod) for pod in create_pods(size)])
+    return size
+
+
+def test_find_exposed_port(benchmark, pod_objects, size):
+    def find_all():
+        return [pods.find_exposed_port(pod, port=9090) for pod in pod_objects]
+
+    exposed = benchmark.pedantic(find_all, rounds=rounds_for(size))
+
+    assert all(exposed)
+
+
+def test_get_pods_by_labels(benchmark, served_pods, size):
+    pod_list = benchmark.pedantic(pods.get_pods_by_labels, args=({}, NAMESPACE), rounds=rounds_for(size))
+
+    assert len(pod_list.items) == size
+
+
+def test_iter_pods_by_labels_raw(benchmark, served_pods, size):
+    def list_raw():
+        return list(pods.iter_pods_by_labels({}, NAMESPACE, raw=True))
+
+    pod_list = benchmark.pedantic(list_raw, rounds=rounds_for(size))
+
+    assert len(pod_list) == size
+
+
+def test_first_page_of_pods(benchmark, served_pods, size):
+    def first_page():
+        return list(itertools.islice(pods.iter_pods_by_labels({}, NAMESPACE, page_size=100), 100))
+
+    first = benchmark.pedantic(first_page, rounds=rounds_for(size))
+
+    assert len(first) == min(size, 100)
+
+
+def test_pod_to_dict(benchmark, pod_objects, size):
+    dicts = benchmark.pedantic(lambda: [pod.to_dict() for pod in pod_objects], rounds=rounds_for(size))
+
+    assert len(dicts) == size
+
+
+def test_pod_summaries(benchmark, pod_objects, size):
+    summaries = benchmark.pedantic(
+        lambda: [projection.summarize_pod(pod) for pod in pod_objects],
+        rounds=rounds_for(size)
+    )
+
+    assert len(summaries) == size
@@ -0,0 +1,48 @@
+import pytest
+
+from tests.benchmarks.conftest import NAMESPACE, create_pods, create_policies, rounds_for, to_json
+
+from kubernetes_tools import informer, snapshot
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture(scope="module")
+def snapshot_path(tmp_path_factory, size):
+    path = str(tmp_path_factory.mktemp("snapshot") / f"{size}.snap")
+    snapshot.dump_snapshot(path, {
+        informer.PODS: [to_json(pod) for pod in create_pods(size)],
+        informer.NETWORK_POLICIES: [to_json(policy) for policy in create_policies(size)],
+    })
+    return path
+
+
+def test_load_snapshot(benchmark, snapshot_path, size):
+    def load():
+        loaded = snapshot.load_snapshot(snapshot_path)
+        loaded.close()
+        return loaded
+
+    loaded = benchmark.pedantic(load, rounds=rounds_for(size))
+
+    assert loaded.count() == 2 * size
+
+
+def test_get_pod_from_snapshot(benchmark, snapshot_path, size):
+    def load_and_get():
+        with snapshot.load_snapshot(snapshot_path) as loaded:
+            return loaded.get(informer.PODS, NAMESPACE, f"pod-{size - 1}")
+
+    pod = benchmark.pedantic(load_and_get, rounds=rounds_for(size))
+
+    assert pod.metadata.labels["app"] == f"app-{(size - 1) % 100}"
+
+
+def test_list_pods_from_snapshot(benchmark, snapshot_path, size):
+    def load_and_list():
+        with snapshot.load_snapshot(snapshot_path) as loaded:
+            return loaded.list(informer.PODS, NAMESPACE)
+
+    pod_list = benchmark.pedantic(load_and_list, rounds=rounds_for(size))
+
+    assert len(pod_list) == size
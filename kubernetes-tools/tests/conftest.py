@@ -0,0 +1,38 @@
+from pathlib import Path
+
+from kubernetes import client
+from pytest import fixture
+
+from tests.fake_apiserver import FakeApiServer
+
+from kubernetes_tools import clients, kubeconfig
+
+TEST_APP_MANIFEST = Path(__file__).resolve().parents[2] / "cluster-setup" / "network-policies" / "test-app.yaml"
+
+
+@fixture
+def fake_apiserver():
+    """A FakeApiServer serving the pods of the test-app manifest."""
+    with FakeApiServer() as server:
+        server.load_manifests(str(TEST_APP_MANIFEST))
+        yield server
+
+
+@fixture
+def fake_api_client(fake_apiserver):
+    """An ApiClient connected to the fake_apiserver, to pass to the helpers."""
+    api_client = client.ApiClient(fake_apiserver.configuration())
+    yield api_client
+    api_client.close()
+
+
+@fixture
+def fake_cluster(fake_apiserver, monkeypatch):
+    """The fake_apiserver as configuration of the shared ApiClient, e.g. for the agent tools."""
+    monkeypatch.setattr(kubeconfig, "_configured", False)
+    monkeypatch.setattr(kubeconfig, "_settings", None)
+    previous = client.Configuration._default
+    kubeconfig.configure(configuration=fake_apiserver.configuration())
+    yield fake_apiserver
+    client.Configuration.set_default(previous)
+    clients.reset_api_client()
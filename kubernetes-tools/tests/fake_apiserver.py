@@ -0,0 +1,567 @@
+"""
+Minimal in-process fake of the Kubernetes API server for tests and benchmarks
+that must run without a cluster.
+
+Objects are kept as JSON dicts and served for pods and NetworkPolicies, and
+namespaces and services for list and watch only:
+
+- list (namespaced and all namespaces) with label and field selectors,
+  limit/continue pagination and watches
+- a BOOKMARK event with the current resourceVersion when a watch with
+  allowWatchBookmarks times out, and 410 Gone for watches from a resourceVersion
+  older than the last compact()
+- get, create and delete of single objects
+- the ephemeralcontainers subresource and the log of ephemeral containers
+
+Pods are scheduled on creation, i.e. they are Running with a pod IP at once.
+Ephemeral containers terminate at once with the output and exit code returned
+by ephemeral_container_handler. The latency of the responses is configurable,
+so that the client side of a slow API server can be benchmarked:
+
+    with FakeApiServer(latency=0.05) as server:
+        server.load_manifests("../cluster-setup/network-policies/test-app.yaml")
+        api_client = client.ApiClient(server.configuration())
+        pod = pods.get_pod_by_name("backend", "backend", api_client=api_client)
+"""
+import copy
+import itertools
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import yaml
+from kubernetes import client
+
+# Path prefix and kind of the list response by resource
+RESOURCES = {
+    "pods": ("/api/v1", "PodList"),
+    "networkpolicies": ("/apis/networking.k8s.io/v1", "NetworkPolicyList"),
+    "namespaces": ("/api/v1", "NamespaceList"),
+    "services": ("/api/v1", "ServiceList"),
+}
+
+KINDS = {
+    "Pod": "pods",
+    "NetworkPolicy": "networkpolicies",
+    "Namespace": "namespaces",
+    "Service": "services",
+}
+
+API_VERSIONS = {
+    "pods": "v1",
+    "networkpolicies": "networking.k8s.io/v1",
+    "namespaces": "v1",
+    "services": "v1",
+}
+
+NODE_NAME = "fake-node"
+POD_CIDR_PREFIX = "10.244.0."
+
+# Output and exit code of an ephemeral container, None to keep it running
+EphemeralContainerResult = Optional[Tuple[str, int]]
+
+
+def succeed(pod: dict, container: dict) -> EphemeralContainerResult:
+    """Default ephemeral container handler: terminate with exit code 0 and no output."""
+    return "", 0
+
+
+class FakeApiServer:
+    """
+    Serves the objects added to it on a random local port.
+
+    Args:
+        latency: Seconds added to every response (default: 0)
+        latency_per_object: Seconds added to list responses per returned object (default: 0)
+        ephemeral_container_handler: Called with the pod and the container dict when an
+            ephemeral container is added, returns its output and exit code or None to keep
+            it running (default: succeed())
+
+    Set send_bookmarks to False to ignore allowWatchBookmarks. active_watches is the
+    number of watches in progress.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_per_object: float = 0.0,
+        ephemeral_container_handler: Callable[[dict, dict], EphemeralContainerResult] = succeed
+    ):
+        self.latency = latency
+        self.latency_per_object = latency_per_object
+        self.ephemeral_container_handler = ephemeral_container_handler
+        self.requests: List[Tuple[str, str]] = []
+        self.send_bookmarks = True
+        self.active_watches = 0
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._objects: Dict[str, Dict[Tuple[str, str], dict]] = {resource: {} for resource in RESOURCES}
+        self._logs: Dict[Tuple[str, str, str], str] = {}
+        # Watch events as (resource version, resource, type, object)
+        self._events: List[Tuple[int, str, str, dict]] = []
+        self._resource_version = 0
+        self._compacted_version = 0
+        self._pod_ips = itertools.count(2)
+        self._responses: Dict[str, Tuple[int, bytes, str, int]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "FakeApiServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def configuration(self) -> client.Configuration:
+        """Get a client Configuration connecting to the server."""
+        return client.Configuration(host=self.url)
+
+    def start(self) -> None:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests.append(("GET", self.path))
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if _is_true(query.get("watch")):
+                    server.delay(0)
+                    self.send_watch(server.watch(url.path, query))
+                else:
+                    self.send(*server.handle_get(self.path))
+
+            def do_POST(self):
+                server.requests.append(("POST", self.path))
+                self.send(*server.handle_post(self.path, self.read_body()))
+
+            def do_PATCH(self):
+                server.requests.append(("PATCH", self.path))
+                self.send(*server.handle_patch(self.path, self.read_body()))
+
+            def do_DELETE(self):
+                server.requests.append(("DELETE", self.path))
+                self.read_body()
+                self.send(*server.handle_delete(self.path))
+
+            def read_body(self) -> Optional[dict]:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length)) if length else None
+
+            def send(self, status: int, body: bytes, content_type: str = "application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_watch(self, events: Iterator[bytes]):
+                # Every event is sent as a chunk like the API server does, so that
+                # the client receives it before the watch ends
+                self.close_connection = True
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                try:
+                    for event in events:
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            with self._changed:
+                self._changed.notify_all()
+
+    def add(self, obj: dict) -> dict:
+        """
+        Add or replace an object given in its JSON representation with kind and metadata.
+        Pods without a phase are scheduled, i.e. they become Running with a pod IP.
+        """
+        resource = KINDS[obj["kind"]]
+        with self._lock:
+            return self._store(resource, obj)
+
+    def add_all(self, objects: List[dict]) -> None:
+        for obj in objects:
+            self.add(obj)
+
+    def load_manifests(self, path: str) -> List[dict]:
+        """
+        Add the pods, NetworkPolicies, namespaces and services of a YAML manifest file, other kinds are skipped.
+
+        Returns:
+            The added objects
+        """
+        with open(path) as manifest:
+            documents = [document for document in yaml.safe_load_all(manifest) if document]
+        return [self.add(document) for document in documents if document.get("kind") in KINDS]
+
+    def get(self, kind: str, namespace: str, name: str) -> Optional[dict]:
+        """Get a copy of a stored object, e.g. to check the result of a request."""
+        with self._lock:
+            obj = self._objects[KINDS[kind]].get((namespace, name))
+            return copy.deepcopy(obj)
+
+    def compact(self) -> None:
+        """
+        Drop the history of watch events like an etcd compaction. Watches from an older
+        resourceVersion fail with 410 Gone, watches in progress are not affected.
+        """
+        with self._lock:
+            self._compacted_version = self._resource_version
+
+    def clear(self) -> None:
+        with self._lock:
+            for objects in self._objects.values():
+                objects.clear()
+            self._logs.clear()
+            self._events.clear()
+            self._responses.clear()
+            self.requests.clear()
+
+    def delay(self, object_count: int) -> None:
+        seconds = self.latency + self.latency_per_object * object_count
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def handle_get(self, path: str) -> Tuple[int, bytes, str]:
+        with self._lock:
+            # Encoded responses are cached, so that the server does not
+            # dominate the client side timings of benchmarks
+            cached = self._responses.get(path)
+            if cached is None:
+                status, response = self._get(path)
+                if isinstance(response, str):
+                    cached = (status, response.encode(), "text/plain", 0)
+                else:
+                    cached = (status, json.dumps(response).encode(), "application/json", len(response.get("items") or []))
+                if status == 200:
+                    self._responses[path] = cached
+
+        status, body, content_type, object_count = cached
+        self.delay(object_count)
+        return status, body, content_type
+
+    def handle_post(self, path: str, body: dict) -> Tuple[int, bytes]:
+        self.delay(0)
+        with self._lock:
+            route = self._route(urlparse(path).path)
+            if route is None or route[1] is None or route[2] is not None:
+                return _not_found()
+
+            resource, namespace, _, _ = route
+            body.setdefault("metadata", {})["namespace"] = namespace
+            name = body["metadata"].get("name")
+            if (namespace, name) in self._objects[resource]:
+                return _error(409, "AlreadyExists", f'{resource} "{name}" already exists')
+
+            body["kind"] = next(kind for kind, kind_resource in KINDS.items() if kind_resource == resource)
+            body["apiVersion"] = API_VERSIONS[resource]
+            return 201, json.dumps(self._store(resource, body)).encode()
+
+    def handle_patch(self, path: str, body: dict) -> Tuple[int, bytes]:
+        self.delay(0)
+        with self._lock:
+            route = self._route(urlparse(path).path)
+            if route is None or route[0] != "pods" or route[3] != "ephemeralcontainers":
+                return _not_found()
+
+            _, namespace, name, _ = route
+            pod = self._objects["pods"].get((namespace, name))
+            if pod is None:
+                return _error(404, "NotFound", f'pods "{name}" not found')
+
+            pod = copy.deepcopy(pod)
+            self._add_ephemeral_containers(pod, (body.get("spec") or {}).get("ephemeralContainers") or [])
+            return 200, json.dumps(self._store("pods", pod)).encode()
+
+    def handle_delete(self, path: str) -> Tuple[int, bytes]:
+        self.delay(0)
+        with self._lock:
+            route = self._route(urlparse(path).path)
+            if route is None or route[2] is None or route[3] is not None:
+                return _not_found()
+
+            resource, namespace, name, _ = route
+            obj = self._objects[resource].pop((namespace, name), None)
+            if obj is None:
+                return _error(404, "NotFound", f'{resource} "{name}" not found')
+
+            self._record("DELETED", resource, obj)
+            return 200, json.dumps(obj).encode()
+
+    def watch(self, path: str, query: Dict[str, str]) -> Iterator[bytes]:
+        """
+        Stream the watch events of a list path as JSON lines until timeoutSeconds.
+        Without resourceVersion the current objects are sent as ADDED events first.
+        """
+        route = self._route(path)
+        if route is None or route[2] is not None:
+            return
+
+        resource, namespace, _, _ = route
+        deadline = time.monotonic() + float(query.get("timeoutSeconds") or 60)
+
+        def matches(obj: dict) -> bool:
+            return (namespace is None or obj["metadata"]["namespace"] == namespace) and _matches(obj, query)
+
+        with self._lock:
+            if query.get("resourceVersion"):
+                last_version = int(query["resourceVersion"])
+                initial = []
+                if last_version < self._compacted_version:
+                    message = f"too old resource version: {last_version} ({self._compacted_version})"
+                    initial = [_event("ERROR", _status(410, "Expired", message))]
+                    last_version = None
+            else:
+                last_version = self._resource_version
+                initial = [_event("ADDED", obj) for obj in self._objects[resource].values() if matches(obj)]
+            if last_version is not None:
+                self.active_watches += 1
+
+        yield from initial
+        if last_version is None:
+            return
+
+        try:
+            yield from self._watch_events(resource, last_version, deadline, matches, query)
+        finally:
+            with self._lock:
+                self.active_watches -= 1
+
+    def _watch_events(
+        self,
+        resource: str,
+        last_version: int,
+        deadline: float,
+        matches: Callable[[dict], bool],
+        query: Dict[str, str]
+    ) -> Iterator[bytes]:
+        bookmark = None
+        while self._server is not None:
+            with self._changed:
+                events = [event for event in self._events if event[0] > last_version]
+                if not events:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        if _is_true(query.get("allowWatchBookmarks")):
+                            bookmark = self._bookmark(resource)
+                        break
+                    self._changed.wait(remaining)
+                    continue
+                last_version = events[-1][0]
+
+            for _, event_resource, event_type, obj in events:
+                if event_resource == resource and matches(obj):
+                    yield _event(event_type, obj)
+
+        if bookmark is not None:
+            yield bookmark
+
+    def _bookmark(self, resource: str) -> Optional[bytes]:
+        # Like the API server, a bookmark is sent before the watch times out
+        if not self.send_bookmarks:
+            return None
+        kind = next(kind for kind, kind_resource in KINDS.items() if kind_resource == resource)
+        return _event("BOOKMARK", {
+            "kind": kind,
+            "apiVersion": API_VERSIONS[resource],
+            "metadata": {"resourceVersion": str(self._resource_version)}
+        })
+
+    def _store(self, resource: str, obj: dict) -> dict:
+        # Namespaces are cluster-scoped and stored with namespace None
+        key = (obj["metadata"].get("namespace"), obj["metadata"]["name"])
+        event_type = "MODIFIED" if key in self._objects[resource] else "ADDED"
+        if resource == "pods" and not (obj.get("status") or {}).get("phase"):
+            self._schedule(obj)
+
+        self._resource_version += 1
+        obj["metadata"]["resourceVersion"] = str(self._resource_version)
+        obj["metadata"].setdefault("uid", str(uuid.uuid4()))
+        self._objects[resource][key] = obj
+        self._record(event_type, resource, obj)
+        return obj
+
+    def _record(self, event_type: str, resource: str, obj: dict) -> None:
+        if event_type == "DELETED":
+            self._resource_version += 1
+        # Stored objects are replaced instead of modified, so no copy is needed
+        self._events.append((self._resource_version, resource, event_type, obj))
+        self._responses.clear()
+        self._changed.notify_all()
+
+    def _schedule(self, pod: dict) -> None:
+        pod_ip = f"{POD_CIDR_PREFIX}{next(self._pod_ips)}"
+        pod.setdefault("spec", {})["nodeName"] = NODE_NAME
+        pod["status"] = {
+            "phase": "Running",
+            "podIP": pod_ip,
+            "podIPs": [{"ip": pod_ip}],
+            "containerStatuses": [
+                {
+                    "name": container["name"],
+                    "image": container.get("image"),
+                    "imageID": "",
+                    "ready": True,
+                    "restartCount": 0,
+                    "state": {"running": {"startedAt": _now()}},
+                }
+                for container in pod["spec"].get("containers") or []
+            ],
+        }
+
+    def _add_ephemeral_containers(self, pod: dict, ephemeral_containers: List[dict]) -> None:
+        pod["spec"]["ephemeralContainers"] = ephemeral_containers
+        statuses = pod["status"].setdefault("ephemeralContainerStatuses", [])
+        known = {status["name"] for status in statuses}
+
+        for container in ephemeral_containers:
+            if container["name"] in known:
+                continue
+
+            result = self.ephemeral_container_handler(pod, container)
+            if result is None:
+                state = {"running": {"startedAt": _now()}}
+            else:
+                output, exit_code = result
+                self._logs[(pod["metadata"]["namespace"], pod["metadata"]["name"], container["name"])] = output
+                state = {"terminated": {"exitCode": exit_code, "reason": "Completed" if exit_code == 0 else "Error"}}
+
+            statuses.append({
+                "name": container["name"],
+                "image": container.get("image"),
+                "imageID": "",
+                "ready": False,
+                "restartCount": 0,
+                "state": state,
+            })
+
+    def _route(self, path: str) -> Optional[Tuple[str, Optional[str], Optional[str], Optional[str]]]:
+        # Returns resource, namespace, name and subresource of a path
+        for resource, (prefix, _) in RESOURCES.items():
+            if not path.startswith(prefix + "/"):
+                continue
+
+            parts = path[len(prefix) + 1:].split("/")
+            if parts == [resource]:
+                return resource, None, None, None
+            if len(parts) >= 3 and parts[0] == "namespaces" and parts[2] == resource:
+                return resource, parts[1], (parts[3:4] or [None])[0], (parts[4:5] or [None])[0]
+        return None
+
+    def _get(self, path: str) -> Tuple[int, object]:
+        url = urlparse(path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        route = self._route(url.path)
+        if route is None:
+            return _not_found_status()
+
+        resource, namespace, name, subresource = route
+        list_kind = RESOURCES[resource][1]
+        if name is None:
+            return 200, self._list(resource, list_kind, namespace, query)
+
+        obj = self._objects[resource].get((namespace, name))
+        if obj is None:
+            return 404, _status(404, "NotFound", f'{resource} "{name}" not found')
+        if subresource is None:
+            return 200, obj
+        if resource == "pods" and subresource == "log":
+            log = self._logs.get((namespace, name, query.get("container")))
+            if log is None:
+                return 400, _status(400, "BadRequest", f'container "{query.get("container")}" has no log')
+            return 200, log
+        return _not_found_status()
+
+    def _list(self, resource: str, list_kind: str, namespace: Optional[str], query: Dict[str, str]) -> dict:
+        items = [
+            obj for (obj_namespace, _), obj in sorted(self._objects[resource].items())
+            if (namespace is None or obj_namespace == namespace) and _matches(obj, query)
+        ]
+
+        metadata = {"resourceVersion": str(self._resource_version)}
+        limit = int(query.get("limit", 0))
+        if limit:
+            start = int(query.get("continue") or 0)
+            if start + limit < len(items):
+                metadata["continue"] = str(start + limit)
+            items = items[start:start + limit]
+
+        return {"kind": list_kind, "apiVersion": "v1", "metadata": metadata, "items": items}
+
+
+def _matches(obj: dict, query: Dict[str, str]) -> bool:
+    labels = obj["metadata"].get("labels") or {}
+    if any(labels.get(key) != value for key, value in _parse_selector(query.get("labelSelector", "")).items()):
+        return False
+
+    for field, value in _parse_selector(query.get("fieldSelector", "")).items():
+        section, _, key = field.partition(".")
+        if (obj.get(section) or {}).get(key) != value:
+            return False
+    return True
+
+
+def _parse_selector(selector: str) -> Dict[str, str]:
+    requirements = {}
+    for requirement in filter(None, selector.split(",")):
+        key, _, value = requirement.partition("=")
+        requirements[key] = value.lstrip("=")
+    return requirements
+
+
+def _is_true(value: Optional[str]) -> bool:
+    return (value or "").lower() in ("true", "1")
+
+
+def _event(event_type: str, obj: dict) -> bytes:
+    return json.dumps({"type": event_type, "object": obj}).encode() + b"\n"
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _status(code: int, reason: str, message: str) -> dict:
+    return {"kind": "Status", "apiVersion": "v1", "status": "Failure", "code": code, "reason": reason, "message": message}
+
+
+def _error(code: int, reason: str, message: str) -> Tuple[int, bytes]:
+    return code, json.dumps(_status(code, reason, message)).encode()
+
+
+def _not_found_status() -> Tuple[int, dict]:
+    return 404, _status(404, "NotFound", "the server could not find the requested resource")
+
+
+def _not_found() -> Tuple[int, bytes]:
+    return _error(404, "NotFound", "the server could not find the requested resource")
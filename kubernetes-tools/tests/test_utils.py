@@ -1,6 +1,8 @@
 from kubernetes import client
 from kubernetes.client import V1NetworkPolicyIngressRule
 
+from kubernetes_tools import clients
+
 def create_nwp(pod_match_labels: dict, peer_match_labels: dict, namespace: str, name: str, port : int, protocol: str = "TCP", ingress: bool = True) -> client.V1NetworkPolicy:
     """Helper to create a network policy for testing"""
     policy_rule = create_nwp_policy_rule(ingress, peer_match_labels, port, protocol)
@@ -48,7 +50,7 @@ def create_nwp_policy_rule(ingress: bool, peer_match_labels: dict, port: int, pr
 
 def apply_nwp(nwp: client.V1NetworkPolicy) -> client.V1NetworkPolicy:
     """Helper to apply a network policy for testing"""
-    api_instance = client.NetworkingV1Api()
+    api_instance = clients.networking_v1()
     return api_instance.create_namespaced_network_policy(
         namespace=nwp.metadata.namespace,
         body=nwp
@@ -56,7 +58,7 @@ def apply_nwp(nwp: client.V1NetworkPolicy) -> client.V1NetworkPolicy:
 
 def delete_nwp(name: str, namespace: str):
     """Helper to delete a network policy for testing"""
-    api_instance = client.NetworkingV1Api()
+    api_instance = clients.networking_v1()
     api_instance.delete_namespaced_network_policy(
         name=name,
         namespace=namespace
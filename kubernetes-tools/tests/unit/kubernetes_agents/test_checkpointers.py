@@ -0,0 +1,153 @@
+import asyncio
+from typing import Annotated, List, TypedDict
+
+import pytest
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from kubernetes_agents import checkpointers
+
+
+class State(TypedDict):
+    messages: Annotated[List[AnyMessage], add_messages]
+
+
+def call_tool(state: State) -> dict:
+    call_id = f"call-{len(state['messages'])}"
+    return {"messages": [
+        AIMessage(content="", tool_calls=[{"name": "get_pod_by_name", "args": {}, "id": call_id}]),
+        ToolMessage(content="x" * 1000, tool_call_id=call_id),
+    ]}
+
+
+def answer(state: State) -> dict:
+    return {"messages": [AIMessage(content=f"{len(state['messages'])} messages")]}
+
+
+def create_graph(checkpointer):
+    builder = StateGraph(State)
+    builder.add_node("call_tool", call_tool)
+    builder.add_node("answer", answer)
+    builder.add_edge(START, "call_tool")
+    builder.add_edge("call_tool", "answer")
+    builder.add_edge("answer", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def thread(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+class TestSqliteCheckpointer:
+
+    def test_conversation_is_continued(self):
+        graph = create_graph(checkpointers.create_checkpointer())
+
+        graph.invoke({"messages": [HumanMessage(content="first")]}, thread("1"))
+        result = graph.invoke({"messages": [HumanMessage(content="second")]}, thread("1"))
+
+        assert [message.content for message in result["messages"] if isinstance(message, HumanMessage)] == ["first", "second"]
+        assert result["messages"][-1].content == "7 messages"
+
+    def test_persisted_in_file(self, tmp_path):
+        path = str(tmp_path / "agents" / "checkpoints.sqlite")
+        with checkpointers.create_checkpointer(path) as checkpointer:
+            create_graph(checkpointer).invoke({"messages": [HumanMessage(content="first")]}, thread("1"))
+
+        with checkpointers.create_checkpointer(path) as checkpointer:
+            state = create_graph(checkpointer).get_state(thread("1"))
+
+        assert len(state.values["messages"]) == 4
+
+    def test_history(self):
+        checkpointer = checkpointers.create_checkpointer(max_checkpoints_per_thread=None)
+        graph = create_graph(checkpointer)
+        graph.invoke({"messages": [HumanMessage(content="first")]}, thread("1"))
+
+        history = list(graph.get_state_history(thread("1")))
+        limited = list(checkpointer.list(thread("1"), limit=2))
+        before = list(checkpointer.list(thread("1"), before=history[1].config))
+
+        assert [len(state.values.get("messages", [])) for state in history] == [4, 3, 1, 0]
+        assert [item.config for item in limited] == [state.config for state in history[:2]]
+        assert [item.config for item in before] == [state.config for state in history[2:]]
+
+    def test_checkpoints_are_pruned(self):
+        checkpointer = checkpointers.create_checkpointer(max_checkpoints_per_thread=2)
+        graph = create_graph(checkpointer)
+
+        graph.invoke({"messages": [HumanMessage(content="first")]}, thread("1"))
+        result = graph.invoke({"messages": [HumanMessage(content="second")]}, thread("1"))
+
+        assert len(list(checkpointer.list(thread("1")))) == 2
+        assert graph.get_state(thread("1")).values["messages"] == result["messages"]
+
+    def test_least_recently_used_threads_are_evicted(self):
+        checkpointer = checkpointers.create_checkpointer(max_threads=2)
+        graph = create_graph(checkpointer)
+
+        for thread_id in ("1", "2"):
+            graph.invoke({"messages": [HumanMessage(content="first")]}, thread(thread_id))
+        graph.get_state(thread("1"))
+        graph.invoke({"messages": [HumanMessage(content="first")]}, thread("3"))
+
+        assert checkpointer.thread_ids() == ["3", "1"]
+        assert graph.get_state(thread("2")).values == {}
+
+    def test_size_is_capped(self):
+        checkpointer = checkpointers.create_checkpointer(max_bytes=10000)
+        graph = create_graph(checkpointer)
+
+        for thread_id in ("1", "2", "3"):
+            graph.invoke({"messages": [HumanMessage(content="first")]}, thread(thread_id))
+
+        assert checkpointer.thread_ids()[0] == "3"
+        assert len(checkpointer.thread_ids()) < 3
+        assert checkpointer.size() <= 10000
+
+    def test_tool_results_are_compacted(self):
+        graph = create_graph(checkpointers.create_checkpointer(keep_tool_results=1))
+
+        graph.invoke({"messages": [HumanMessage(content="first")]}, thread("1"))
+        graph.invoke({"messages": [HumanMessage(content="second")]}, thread("1"))
+
+        tool_messages = [
+            message for message in graph.get_state(thread("1")).values["messages"] if isinstance(message, ToolMessage)
+        ]
+        assert [message.content for message in tool_messages] == [checkpointers.COMPACTED_TOOL_RESULT, "x" * 1000]
+
+    def test_delete_thread(self):
+        checkpointer = checkpointers.create_checkpointer()
+        graph = create_graph(checkpointer)
+        graph.invoke({"messages": [HumanMessage(content="first")]}, thread("1"))
+
+        checkpointer.delete_thread("1")
+
+        assert checkpointer.thread_ids() == []
+        assert checkpointer.size() == 0
+
+    def test_async(self):
+        graph = create_graph(checkpointers.create_checkpointer())
+
+        result = asyncio.run(graph.ainvoke({"messages": [HumanMessage(content="first")]}, thread("1")))
+
+        assert result["messages"][-1].content == "3 messages"
+
+    def test_invalid_max_checkpoints(self):
+        with pytest.raises(ValueError):
+            checkpointers.SqliteCheckpointer(max_checkpoints_per_thread=0)
+
+
+class TestDefaultCheckpointer:
+
+    def test_per_agent_file(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(checkpointers.CHECKPOINT_DIR_ENV, str(tmp_path))
+        checkpointers.get_default_checkpointer.cache_clear()
+        try:
+            checkpointer = checkpointers.get_default_checkpointer("pod_agent")
+        finally:
+            checkpointers.get_default_checkpointer.cache_clear()
+
+        assert checkpointer.path == str(tmp_path / "pod_agent.sqlite")
+        checkpointer.close()
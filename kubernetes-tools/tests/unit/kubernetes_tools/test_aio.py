@@ -0,0 +1,244 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("kubernetes_asyncio")
+
+from kubernetes_asyncio import client as aio_client
+
+from tests.test_utils import apply_nwp, create_nwp
+
+from kubernetes_tools import agent_tools, instrumentation
+from kubernetes_tools import debug as sync_debug
+from kubernetes_tools.aio import clients, debug, networkpolicy, pods
+
+
+def run(coroutine):
+    async def run_and_close():
+        try:
+            return await coroutine
+        finally:
+            await clients.close_api_client()
+
+    return asyncio.run(run_and_close())
+
+
+class TestAioClients:
+
+    def test_concurrent_tasks_share_one_api_client(self, fake_cluster, monkeypatch):
+        created = []
+        load_configuration = clients._load_configuration
+
+        async def slow_load_configuration(settings):
+            await asyncio.sleep(0.01)
+            return await load_configuration(settings)
+
+        class ApiClient(clients.instrumentation.InstrumentedApiClient):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                created.append(self)
+
+        monkeypatch.setattr(clients, "_load_configuration", slow_load_configuration)
+        monkeypatch.setattr(clients.instrumentation, "InstrumentedApiClient", ApiClient)
+
+        async def get_api_clients():
+            return await asyncio.gather(*(clients.get_api_client() for _ in range(5)))
+
+        api_clients = run(get_api_clients())
+
+        assert len(created) == 1
+        assert all(api_client is created[0] for api_client in api_clients)
+
+    def test_configuration_follows_kubeconfig(self, fake_cluster):
+        async def get_host():
+            return (await clients.get_api_client()).configuration.host
+
+        assert run(get_host()) == fake_cluster.url
+        assert run(pods.get_pod_by_name(name="backend", namespace="backend")).metadata.name == "backend"
+
+
+class TestAioPods:
+
+    def test_get_pod_ips(self):
+        pod = aio_client.V1Pod(status=aio_client.V1PodStatus(
+            pod_ip="10.244.0.2",
+            pod_ips=[aio_client.V1PodIP(ip="10.244.0.2"), aio_client.V1PodIP(ip="fd00::2")]
+        ))
+
+        assert pods.get_pod_ips(pod) == ["10.244.0.2", "fd00::2"]
+
+    def test_get_pod_found(self, fake_cluster):
+        pod = run(pods.get_pod_by_name(name="backend", namespace="backend"))
+
+        assert pod is not None
+        assert pod.metadata.name == "backend"
+        assert pod.metadata.namespace == "backend"
+
+    def test_get_pod_not_found(self, fake_cluster):
+        assert run(pods.get_pod_by_name(name="nonexistent-pod", namespace="backend")) is None
+
+    def test_get_pods_by_labels(self, fake_cluster):
+        pod_list = run(pods.get_pods_by_labels({"app": "backend"}, namespace="backend"))
+
+        assert [pod.metadata.name for pod in pod_list.items] == ["backend"]
+        assert ("GET", "/api/v1/namespaces/backend/pods?labelSelector=app%3Dbackend") in fake_cluster.requests
+
+    def test_concurrent_requests(self, fake_cluster):
+        async def get_pods():
+            return await asyncio.gather(*(
+                pods.get_pod_by_name(name=name, namespace=namespace)
+                for name, namespace in (("backend", "backend"), ("mysql", "db"), ("frontend", "frontend"))
+            ))
+
+        found = run(get_pods())
+
+        assert [pod.metadata.name for pod in found] == ["backend", "mysql", "frontend"]
+
+
+class TestAioNetworkPolicy:
+
+    def test_read_network_policy(self, fake_cluster):
+        apply_nwp(create_nwp({"app": "db"}, {"app": "backend"}, "db", "mysql-ingress", 3306))
+
+        network_policy = run(networkpolicy.read_network_policy(name="mysql-ingress", namespace="db"))
+
+        assert network_policy.spec.pod_selector.match_labels == {"app": "db"}
+        assert networkpolicy.contains_ingress_rule(network_policy, 3306, {"app": "backend"})
+
+    def test_read_network_policy_not_found(self, fake_cluster):
+        assert run(networkpolicy.read_network_policy(name="nonexistent", namespace="db")) is None
+
+    def test_get_network_policies_matching_pod(self, fake_cluster):
+        apply_nwp(create_nwp({"app": "db"}, {"app": "backend"}, "db", "mysql-ingress", 3306))
+        apply_nwp(create_nwp({"app": "other"}, {"app": "backend"}, "db", "other-ingress", 80))
+
+        async def get_matching_policies():
+            pod = await pods.get_pod_by_name(name="mysql", namespace="db")
+            return await networkpolicy.get_network_policies_matching_pod(pod)
+
+        assert [policy.metadata.name for policy in run(get_matching_policies())] == ["mysql-ingress"]
+
+
+class TestAioDebug:
+
+    def test_run_debug_command(self, fake_cluster):
+        fake_cluster.ephemeral_container_handler = lambda pod, container: ("hello\n", 0)
+
+        output, success = run(debug.run_debug_command(
+            namespace="backend",
+            pod_name="backend",
+            command=["echo", "hello"]
+        ))
+
+        assert success is True
+        assert output.strip() == "hello"
+
+    def test_run_debug_command_timeout(self, fake_cluster):
+        fake_cluster.ephemeral_container_handler = lambda pod, container: None
+
+        with pytest.raises(Exception, match="Timeout"):
+            run(debug.run_debug_command(namespace="backend", pod_name="backend", command=["sleep", "3"], max_wait=1))
+
+
+class TestAioProbeContainer:
+
+    def test_attached_once_for_concurrent_calls(self, fake_cluster):
+        fake_cluster.ephemeral_container_handler = lambda pod, container: None
+        fake_cluster.latency = 0.05
+
+        async def get_probe_containers():
+            return await asyncio.gather(*(debug.get_probe_container("backend", "backend") for _ in range(4)))
+
+        probe_containers = run(get_probe_containers())
+
+        assert len({probe_container.container_name for probe_container in probe_containers}) == 1
+        assert len(fake_cluster.get("Pod", "backend", "backend")["spec"]["ephemeralContainers"]) == 1
+
+    def test_shared_with_sync_callers(self, fake_cluster):
+        fake_cluster.ephemeral_container_handler = lambda pod, container: None
+
+        sync_probe_container = sync_debug.get_probe_container("backend", "backend")
+        async_probe_container = run(debug.get_probe_container("backend", "backend"))
+
+        assert async_probe_container.container_name == sync_probe_container.container_name
+        assert len(fake_cluster.get("Pod", "backend", "backend")["spec"]["ephemeralContainers"]) == 1
+
+    def test_persistent_probe_keeps_running_container_on_exec_error(self, fake_cluster, monkeypatch):
+        fake_cluster.ephemeral_container_handler = lambda pod, container: None
+
+        async def exec_in_probe_container(probe_container, command, timeout, api_client):
+            raise ConnectionError("websocket closed")
+
+        monkeypatch.setattr(debug, "exec_in_probe_container", exec_in_probe_container)
+
+        with pytest.raises(ConnectionError):
+            run(debug.run_persistent_probe_command("backend", "backend", ["true"]))
+
+        assert len(fake_cluster.get("Pod", "backend", "backend")["spec"]["ephemeralContainers"]) == 1
+
+
+class TestAsyncTools:
+
+    def test_tools_have_native_coroutines(self):
+        for tool in (
+            agent_tools.get_pod_by_name,
+            agent_tools.get_pod_ip_addresses,
+            agent_tools.check_pod_exposes_port,
+            agent_tools.get_network_policies_for_pod,
+            agent_tools.check_network_policy_allows_ingress,
+            agent_tools.check_network_policy_allows_egress,
+            agent_tools.test_pod_connectivity,
+            agent_tools.contains_ingress_rule,
+            agent_tools.contains_egress_rule,
+            agent_tools.test_pod_connectivity_batch,
+        ):
+            assert asyncio.iscoroutinefunction(tool.coroutine), tool.name
+
+    def test_ainvoke_get_pod_by_name(self, fake_cluster):
+        pod = run(agent_tools.get_pod_by_name.ainvoke({"name": "backend", "namespace": "backend"}))
+
+        assert pod["name"] == "backend"
+        assert pod["namespace"] == "backend"
+
+    def test_ainvoke_check_network_policy_allows_ingress(self, fake_cluster):
+        apply_nwp(create_nwp({"app": "db"}, {"app": "backend"}, "db", "mysql-ingress", 3306))
+        arguments = {"policy_name": "mysql-ingress", "namespace": "db", "peer_selector": {"app": "backend"}}
+
+        assert run(agent_tools.check_network_policy_allows_ingress.ainvoke({**arguments, "port": 3306})) is True
+        assert run(agent_tools.check_network_policy_allows_ingress.ainvoke({**arguments, "port": 3307})) is False
+
+
+class TestAioInstrumentation:
+
+    @pytest.fixture
+    def recording(self):
+        backend = instrumentation.RecordingBackend()
+        instrumentation.enable(backend)
+        yield backend
+        instrumentation.disable()
+
+    def test_api_requests(self, recording, fake_cluster):
+        run(pods.get_pod_by_name(name="backend", namespace="backend"))
+        run(pods.get_pod_by_name(name="missing", namespace="backend"))
+        run(pods.get_pods_by_labels({}, "backend"))
+
+        found, missing = recording.find(instrumentation.API, "GET /api/v1/namespaces/{namespace}/pods/{name}")
+        assert found.objects == 1
+        assert found.bytes > 0
+        assert found.error is None
+        assert missing.error == "ApiException 404"
+        assert recording.find(instrumentation.API, "GET /api/v1/namespaces/{namespace}/pods")[0].objects == 1
+
+    def test_requests_nested_in_tool_call(self, recording, fake_cluster):
+        api_measurements = []
+
+        class NestingBackend(instrumentation.Backend):
+            def start(self, measurement):
+                if measurement.kind == instrumentation.API:
+                    api_measurements.append(instrumentation.current())
+
+        instrumentation.enable(recording, NestingBackend())
+        run(agent_tools.get_pod_ip_addresses.ainvoke({"pod_name": "mysql", "namespace": "db"}))
+
+        assert len(recording.find(instrumentation.TOOL, "get_pod_ip_addresses")) == 1
+        assert [measurement.name for measurement in api_measurements] == ["get_pod_ip_addresses"]
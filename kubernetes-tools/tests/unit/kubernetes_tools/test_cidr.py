@@ -0,0 +1,66 @@
+import ipaddress
+
+import pytest
+from kubernetes import client
+
+from kubernetes_tools.cidr import PrefixTrie, compile_ip_block, parse_address, parse_network
+
+
+class TestPrefixTrie:
+
+    def test_lookup_returns_all_containing_prefixes(self):
+        trie = PrefixTrie()
+        trie.insert(parse_network("0.0.0.0/0"), "any")
+        trie.insert(parse_network("10.0.0.0/8"), "internal")
+        trie.insert(parse_network("10.2.0.0/16"), "team")
+        trie.insert(parse_network("10.3.0.0/16"), "other-team")
+
+        assert trie.lookup(parse_address("10.2.3.4")) == ["any", "internal", "team"]
+        assert trie.lookup(parse_address("192.168.0.1")) == ["any"]
+        assert len(trie) == 4
+
+    def test_host_prefix(self):
+        trie = PrefixTrie()
+        trie.insert(parse_network("10.2.3.4/32"), "host")
+
+        assert trie.lookup(parse_address("10.2.3.4")) == ["host"]
+        assert trie.lookup(parse_address("10.2.3.5")) == []
+
+    def test_address_families_are_separated(self):
+        trie = PrefixTrie()
+        trie.insert(parse_network("0.0.0.0/0"), "ipv4")
+        trie.insert(parse_network("fd00::/8"), "ipv6")
+
+        assert trie.lookup(parse_address("fd00::1")) == ["ipv6"]
+        assert trie.lookup(parse_address("::ffff:10.0.0.1")) == []
+        assert trie.lookup(parse_address("10.0.0.1")) == ["ipv4"]
+
+    def test_several_values_per_prefix(self):
+        trie = PrefixTrie()
+        trie.insert(parse_network("10.0.0.0/8"), "a")
+        trie.insert(parse_network("10.0.0.0/8"), "b")
+
+        assert trie.lookup(parse_address("10.1.1.1")) == ["a", "b"]
+
+
+class TestCompiledIPBlock:
+
+    def test_except(self):
+        ip_block = compile_ip_block(client.V1IPBlock(cidr="10.0.0.0/8", _except=["10.2.0.0/16"]))
+
+        assert ip_block.contains(parse_address("10.1.2.3"))
+        assert not ip_block.contains(parse_address("10.2.3.4"))
+        assert not ip_block.contains(parse_address("192.168.0.1"))
+
+    def test_dual_stack(self):
+        ip_block = compile_ip_block(client.V1IPBlock(cidr="fd00::/8"))
+
+        assert ip_block.contains_any([parse_address("10.244.0.2"), parse_address("fd00::2")])
+        assert not ip_block.contains_any([parse_address("10.244.0.2")])
+
+    def test_host_bits_are_ignored(self):
+        assert compile_ip_block(client.V1IPBlock(cidr="10.2.3.4/8")).network == ipaddress.ip_network("10.0.0.0/8")
+
+    def test_invalid_cidr(self):
+        with pytest.raises(ValueError):
+            compile_ip_block(client.V1IPBlock(cidr="10.0.0.0/33"))
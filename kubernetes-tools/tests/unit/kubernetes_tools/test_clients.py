@@ -0,0 +1,65 @@
+import socket
+import threading
+import time
+
+from kubernetes import client
+
+from kubernetes_tools import clients
+
+
+class TestClients:
+
+    def test_shared_api_client(self):
+        assert clients.get_api_client() is clients.get_api_client()
+        assert clients.core_v1().api_client is clients.networking_v1().api_client
+
+    def test_injected_api_client(self):
+        api_client = client.ApiClient()
+
+        assert clients.core_v1(api_client).api_client is api_client
+        assert clients.networking_v1(api_client).api_client is api_client
+
+    def test_configure_api_client(self):
+        try:
+            clients.configure_api_client(connection_pool_maxsize=64)
+            api_client = clients.get_api_client()
+            socket_options = api_client.rest_client.pool_manager.connection_pool_kw["socket_options"]
+
+            assert api_client.configuration.connection_pool_maxsize == 64
+            assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in socket_options
+        finally:
+            clients.configure_api_client()
+
+    def test_configure_api_client_without_keep_alive(self):
+        try:
+            clients.configure_api_client(keep_alive=False)
+
+            assert "socket_options" not in clients.get_api_client().rest_client.pool_manager.connection_pool_kw
+        finally:
+            clients.configure_api_client()
+
+    def test_stream_core_v1_not_shared(self):
+        assert clients.stream_core_v1().api_client is not clients.get_api_client()
+
+    def test_watch_api_client_not_shared(self):
+        assert clients.get_watch_api_client() is clients.get_watch_api_client()
+        assert clients.get_watch_api_client() is not clients.get_api_client()
+
+    def test_accepting_core_v1(self):
+        accept = "application/json;as=Table;v=v1;g=meta.k8s.io"
+        api_client = clients.accepting_core_v1(accept).api_client
+
+        assert api_client.default_headers["Accept"] == accept
+        assert clients.accepting_core_v1(accept).api_client is api_client
+        assert api_client is not clients.get_api_client()
+
+    def test_map_concurrently(self):
+        threads = set()
+
+        def record(item):
+            threads.add(threading.get_ident())
+            time.sleep(0.05)
+            return item * 2
+
+        assert clients.map_concurrently(record, [1, 2, 3, 4]) == [2, 4, 6, 8]
+        assert len(threads) > 1
@@ -1,5 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
-from kubernetes_tools import debug
+from kubernetes_tools import debug, pods
+
+
+def keep_running(pod, container):
+    return None
+
+
+def terminate_ephemeral_containers(fake_apiserver, namespace: str, pod_name: str) -> None:
+    pod = fake_apiserver.get("Pod", namespace, pod_name)
+    for status in pod["status"]["ephemeralContainerStatuses"]:
+        status["state"] = {"terminated": {"exitCode": 137, "reason": "Error"}}
+    fake_apiserver.add(pod)
 
 
 class TestDebug:
@@ -103,3 +116,167 @@ class TestDebug:
         assert command == ["nc", "-vz", "-w", "1", "-u", "10.2.3.123", "53"]
 
 
+    def test_create_batch_probe_script(self):
+        """Test that the batch script runs one netcat command per target in the background"""
+        script = debug.create_batch_probe_script([
+            debug.ProbeTarget(target_ip="10.2.3.123", target_port=3306, timeout=1),
+            debug.ProbeTarget(target_ip="10.2.3.123", target_port=53, protocol="UDP", timeout=2)
+        ])
+
+        assert "probe 0 nc -vz -w 1 10.2.3.123 3306 &" in script
+        assert "probe 1 nc -vz -w 2 -u 10.2.3.123 53 &" in script
+        assert "wait" in script.splitlines()
+
+    def test_parse_batch_probe_output(self):
+        """Test parsing the per target result lines of a batch probe"""
+        output = (
+            "PROBE\t0\t0\tConnection to 10.2.3.123 3306 port [tcp/mysql] succeeded! \n"
+            "PROBE\t1\t1\tnc: connect to 10.2.3.123 port 3307 (tcp) timed out: Operation in progress \n"
+        )
+
+        results = debug.parse_batch_probe_output(output, 2)
+
+        assert results[0] == ("Connection to 10.2.3.123 3306 port [tcp/mysql] succeeded!", True)
+        assert results[1][1] is False
+        assert "timed out" in results[1][0]
+
+    def test_parse_batch_probe_output_missing_target(self):
+        """Test that targets without result line are reported as failed"""
+        results = debug.parse_batch_probe_output("PROBE\t1\t0\tsucceeded\n", 2)
+
+        assert results == [("", False), ("succeeded", True)]
+
+    def test_batch_probe(self):
+        mysql = pods.get_pod_by_name(name="mysql", namespace="test-app")
+        mysql_ip = pods.get_pod_ips(mysql)[0]
+
+        results = debug.run_batch_connectivity_probe(
+            namespace="test-app",
+            pod_name="backend",
+            targets=[
+                debug.ProbeTarget(target_ip=mysql_ip, target_port=3306, timeout=1),
+                debug.ProbeTarget(target_ip=mysql_ip, target_port=3307, timeout=1)
+            ]
+        )
+
+        assert len(results) == 2
+        assert results[1][1] is False
+        assert "timed out" in results[1][0] or "refused" in results[1][0]
+
+    def test_persistent_probe_container_reused(self):
+        first = debug.get_probe_container(namespace="test-app", pod_name="backend")
+        second = debug.get_probe_container(namespace="test-app", pod_name="backend")
+
+        assert first.container_name == second.container_name
+
+    def test_persistent_probe_command_fails(self):
+        output, success = debug.run_persistent_probe_command(
+            namespace="test-app",
+            pod_name="backend",
+            command=["nc", "-vz", "-w", "1", "mysql", "3307"]
+        )
+
+        assert "timed out" in output
+        assert success is False
+
+
+class TestDebugOffline:
+
+    def test_debug_command_succeeds(self, fake_apiserver, fake_api_client):
+        fake_apiserver.ephemeral_container_handler = lambda pod, container: ("mysql (10.244.0.4:3306) open", 0)
+
+        output, success = debug.run_debug_command(
+            namespace="backend",
+            pod_name="backend",
+            command=["nc", "-vz", "-w", "1", "mysql.db", "3306"],
+            api_client=fake_api_client
+        )
+
+        assert output == "mysql (10.244.0.4:3306) open"
+        assert success is True
+        pod = fake_apiserver.get("Pod", "backend", "backend")
+        assert pod["spec"]["ephemeralContainers"][0]["command"] == ["nc", "-vz", "-w", "1", "mysql.db", "3306"]
+
+    def test_debug_command_fails(self, fake_apiserver, fake_api_client):
+        fake_apiserver.ephemeral_container_handler = lambda pod, container: ("Connection timed out", 1)
+
+        output, success = debug.run_debug_command(
+            namespace="backend",
+            pod_name="backend",
+            command=["nc", "-vz", "-w", "1", "mysql.db", "3307"],
+            api_client=fake_api_client
+        )
+
+        assert "timed out" in output
+        assert success is False
+
+    def test_debug_command_timeout(self, fake_apiserver, fake_api_client):
+        fake_apiserver.ephemeral_container_handler = lambda pod, container: None
+
+        with pytest.raises(Exception, match="Timeout"):
+            debug.run_debug_command(
+                namespace="backend",
+                pod_name="backend",
+                command=["sleep", "3"],
+                max_wait=1,
+                api_client=fake_api_client
+            )
+
+    def test_batch_probe(self, fake_apiserver, fake_api_client):
+        fake_apiserver.ephemeral_container_handler = lambda pod, container: (
+            f"{debug.BATCH_PROBE_PREFIX}\t0\t0\topen\n{debug.BATCH_PROBE_PREFIX}\t1\t1\ttimed out\n", 0
+        )
+
+        results = debug.run_batch_connectivity_probe(
+            namespace="backend",
+            pod_name="backend",
+            targets=[
+                debug.ProbeTarget(target_ip="10.244.0.4", target_port=3306),
+                debug.ProbeTarget(target_ip="10.244.0.4", target_port=3307),
+            ],
+            api_client=fake_api_client
+        )
+
+        assert results == [("open", True), ("timed out", False)]
+
+    def test_probe_container_attached_once_for_concurrent_calls(self, fake_apiserver, fake_api_client):
+        fake_apiserver.ephemeral_container_handler = keep_running
+        fake_apiserver.latency = 0.05
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            probe_containers = list(executor.map(
+                lambda _: debug.get_probe_container("backend", "backend", api_client=fake_api_client), range(4)
+            ))
+
+        assert len({probe_container.container_name for probe_container in probe_containers}) == 1
+        assert len(fake_apiserver.get("Pod", "backend", "backend")["spec"]["ephemeralContainers"]) == 1
+
+    def test_persistent_probe_keeps_running_container_on_exec_error(self, fake_apiserver, fake_api_client, monkeypatch):
+        fake_apiserver.ephemeral_container_handler = keep_running
+
+        def exec_in_probe_container(probe_container, command, timeout, api_client):
+            raise ConnectionError("websocket closed")
+
+        monkeypatch.setattr(debug, "exec_in_probe_container", exec_in_probe_container)
+
+        with pytest.raises(ConnectionError):
+            debug.run_persistent_probe_command("backend", "backend", ["true"], api_client=fake_api_client)
+
+        assert len(fake_apiserver.get("Pod", "backend", "backend")["spec"]["ephemeralContainers"]) == 1
+
+    def test_persistent_probe_reattached_when_container_stopped(self, fake_apiserver, fake_api_client, monkeypatch):
+        fake_apiserver.ephemeral_container_handler = keep_running
+        executed = []
+
+        def exec_in_probe_container(probe_container, command, timeout, api_client):
+            executed.append(probe_container.container_name)
+            if len(executed) == 1:
+                terminate_ephemeral_containers(fake_apiserver, "backend", "backend")
+                raise ConnectionError("container not running")
+            return "ok", True
+
+        monkeypatch.setattr(debug, "exec_in_probe_container", exec_in_probe_container)
+
+        assert debug.run_persistent_probe_command("backend", "backend", ["true"], api_client=fake_api_client) == ("ok", True)
+        assert len(set(executed)) == 2
+        assert len(fake_apiserver.get("Pod", "backend", "backend")["spec"]["ephemeralContainers"]) == 2
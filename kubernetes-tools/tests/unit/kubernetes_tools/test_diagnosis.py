@@ -0,0 +1,131 @@
+from kubernetes import client
+from tests.test_utils import apply_nwp, create_nwp
+
+from kubernetes_tools import agent_tools, diagnosis
+
+
+def allow_from_namespace(namespace: str, name: str, pod_labels: dict, peer_namespace: str, port: int) -> client.V1NetworkPolicy:
+    nwp = create_nwp(pod_labels, {"app": peer_namespace}, namespace, name, port)
+    nwp.spec.ingress[0]._from[0].namespace_selector = client.V1LabelSelector(
+        match_labels={"kubernetes.io/metadata.name": peer_namespace}
+    )
+    return nwp
+
+
+class TestParsePodReference:
+
+    def test_with_namespace(self):
+        assert diagnosis.parse_pod_reference("db/mysql") == ("db", "mysql")
+
+    def test_without_namespace(self):
+        assert diagnosis.parse_pod_reference("mysql", "db") == ("db", "mysql")
+
+
+class TestDiagnoseConnectivityOffline:
+
+    def test_allowed_without_policies(self, fake_cluster):
+        result = diagnosis.diagnose_connectivity("backend/backend", "db/mysql", 3306, probe=False)
+
+        assert result.verdict == diagnosis.ALLOWED
+        assert result.exposing_container == "mysql"
+        assert result.target_ips == [fake_cluster.get("Pod", "db", "mysql")["status"]["podIP"]]
+        assert result.egress_allowed is True
+        assert result.ingress_allowed is True
+        assert result.probe is None
+
+    def test_connected(self, fake_cluster):
+        fake_cluster.ephemeral_container_handler = lambda pod, container: ("open", 0)
+
+        result = diagnosis.diagnose_connectivity("backend/backend", "db/mysql", 3306)
+
+        assert result.verdict == diagnosis.CONNECTED
+        assert result.probe.success is True
+        assert result.probe.command.endswith(f"{result.target_ips[0]} 3306")
+        assert fake_cluster.get("Pod", "backend", "backend")["spec"]["ephemeralContainers"]
+
+    def test_probe_failed(self, fake_cluster):
+        fake_cluster.ephemeral_container_handler = lambda pod, container: ("Connection timed out", 1)
+
+        result = diagnosis.diagnose_connectivity("backend/backend", "db/mysql", 3306)
+
+        assert result.verdict == diagnosis.PROBE_FAILED
+        assert result.probe.output == "Connection timed out"
+
+    def test_pod_not_found(self, fake_cluster):
+        assert diagnosis.diagnose_connectivity("backend/missing", "db/mysql", 3306).verdict == diagnosis.SOURCE_NOT_FOUND
+        assert diagnosis.diagnose_connectivity("backend/backend", "db/missing", 3306).verdict == diagnosis.TARGET_NOT_FOUND
+
+    def test_port_not_exposed(self, fake_cluster):
+        result = diagnosis.diagnose_connectivity("backend/backend", "db/mysql", 3307)
+
+        assert result.verdict == diagnosis.PORT_NOT_EXPOSED
+        assert result.exposing_container is None
+        assert result.probe is None
+
+    def test_ingress_denied(self, fake_cluster):
+        # A peer without namespace selector only selects pods in the namespace of the policy
+        apply_nwp(create_nwp({"app": "db"}, {"app": "backend"}, "db", "allow-backend", 3306))
+
+        result = diagnosis.diagnose_connectivity("backend/backend", "db/mysql", 3306)
+
+        assert result.verdict == diagnosis.INGRESS_DENIED
+        assert result.ingress_policies == [diagnosis.PolicyEvaluation(name="allow-backend", namespace="db", allows=False)]
+        assert result.probe is None
+
+    def test_ingress_allowed_by_rule_without_peers(self, fake_cluster):
+        nwp = create_nwp({"app": "db"}, {}, "db", "allow-all-in", 3306)
+        nwp.spec.ingress[0]._from = None
+        apply_nwp(nwp)
+
+        result = diagnosis.diagnose_connectivity("backend/backend", "db/mysql", 3306, probe=False)
+
+        assert result.verdict == diagnosis.ALLOWED
+        assert result.ingress_policies == [diagnosis.PolicyEvaluation(name="allow-all-in", namespace="db", allows=True)]
+
+    def test_ingress_allowed_by_empty_rule(self, fake_cluster):
+        nwp = create_nwp({"app": "db"}, {}, "db", "allow-all-in", 3306)
+        nwp.spec.ingress = [client.V1NetworkPolicyIngressRule()]
+        apply_nwp(nwp)
+
+        result = diagnosis.diagnose_connectivity("backend/backend", "db/mysql", 3306, probe=False)
+
+        assert result.verdict == diagnosis.ALLOWED
+        assert result.ingress_policies[0].allows is True
+
+    def test_egress_allowed_by_rule_without_peers(self, fake_cluster):
+        nwp = create_nwp({"app": "backend"}, {}, "backend", "allow-all-out", 3306, ingress=False)
+        nwp.spec.egress[0].to = None
+        apply_nwp(nwp)
+
+        result = diagnosis.diagnose_connectivity("backend/backend", "db/mysql", 3306, probe=False)
+
+        assert result.verdict == diagnosis.ALLOWED
+        assert result.egress_policies == [diagnosis.PolicyEvaluation(name="allow-all-out", namespace="backend", allows=True)]
+
+    def test_ingress_allowed_from_namespace(self, fake_cluster):
+        apply_nwp(allow_from_namespace("db", "allow-backend", {"app": "db"}, "backend", 3306))
+
+        result = diagnosis.diagnose_connectivity("backend/backend", "db/mysql", 3306, probe=False)
+
+        assert result.verdict == diagnosis.ALLOWED
+        assert result.ingress_policies[0].allows is True
+
+    def test_egress_denied(self, fake_cluster):
+        apply_nwp(create_nwp({"app": "backend"}, {"app": "other"}, "backend", "allow-other", 3306, ingress=False))
+
+        result = diagnosis.diagnose_connectivity("backend", "mysql", 3306, namespace="backend")
+
+        assert result.verdict == diagnosis.TARGET_NOT_FOUND
+
+        result = diagnosis.diagnose_connectivity("backend", "db/mysql", 3306, namespace="backend")
+
+        assert result.verdict == diagnosis.EGRESS_DENIED
+        assert result.egress_allowed is False
+        assert [policy.name for policy in result.egress_policies] == ["allow-other"]
+
+    def test_tool(self, fake_cluster):
+        result = agent_tools.diagnose_pod_connectivity.invoke(
+            {"source_pod": "backend/backend", "target_pod": "db/mysql", "port": 3306, "probe": False}
+        )
+
+        assert result.verdict == diagnosis.ALLOWED
@@ -0,0 +1,92 @@
+import json
+
+from kubernetes import client
+
+from tests.test_utils import create_nwp
+
+from kubernetes_tools import clients, fastjson, networkpolicy, pods
+from kubernetes_tools.policy_index import PolicyIndex
+
+
+def to_json_object(model) -> fastjson.JsonObject:
+    return fastjson.JsonObject(json.loads(json.dumps(client.ApiClient().sanitize_for_serialization(model))))
+
+
+class FakeResponse:
+
+    def __init__(self, body: dict):
+        self.data = json.dumps(body).encode()
+
+
+class TestJsonObject:
+
+    def test_attribute_access(self):
+        pod = fastjson.JsonObject({
+            "metadata": {"name": "backend", "labels": {"app": "backend"}},
+            "status": {"podIP": "10.244.1.5", "podIPs": [{"ip": "10.244.1.5"}, {"ip": "fd00::5"}]}
+        })
+
+        assert pod.metadata.name == "backend"
+        assert pod.metadata.labels == {"app": "backend"}
+        assert pod.status.pod_ip == "10.244.1.5"
+        assert pod.spec is None
+        assert pods.get_pod_ips(pod) == ["10.244.1.5", "fd00::5"]
+
+    def test_keyword_attributes(self):
+        rule = fastjson.JsonObject({"from": [{"ipBlock": {"cidr": "10.0.0.0/8", "except": ["10.1.0.0/16"]}}]})
+
+        assert rule._from[0].ip_block._except == ["10.1.0.0/16"]
+
+    def test_to_dict_uses_json_keys(self):
+        policy = to_json_object(create_nwp({"app": "mysql"}, {"app": "backend"}, "test-app", "ingress-policy", 3306))
+
+        assert policy.to_dict()["spec"]["podSelector"] == {"matchLabels": {"app": "mysql"}}
+        assert fastjson.as_json_dict(policy) is policy
+
+    def test_loads_without_orjson(self, monkeypatch):
+        monkeypatch.setattr(fastjson, "orjson", None)
+
+        assert fastjson.loads(b'{"kind": "Pod"}') == {"kind": "Pod"}
+
+
+class TestNetworkPolicyLogicOnJsonObjects:
+
+    def test_contains_ingress_rule(self):
+        nwp = to_json_object(create_nwp({"app": "mysql"}, {"app": "backend"}, "test-app", "ingress-policy", 3306))
+
+        assert networkpolicy.contains_ingress_rule(nwp, port=3306, peer_selector={"app": "backend"}) is True
+        assert networkpolicy.contains_ingress_rule(nwp, port=3307, peer_selector={"app": "backend"}) is False
+
+    def test_contains_egress_rule(self):
+        nwp = to_json_object(create_nwp({"app": "backend"}, {"app": "mysql"}, "test-app", "egress-policy", 3306,
+                                        ingress=False))
+
+        assert networkpolicy.contains_egress_rule(nwp, port=3306, selector={"app": "mysql"}) is True
+        assert networkpolicy.contains_egress_rule(nwp, port=3306, selector={"app": "frontend"}) is False
+
+    def test_policy_index(self):
+        index = PolicyIndex([
+            to_json_object(create_nwp({"app": "mysql"}, {"app": "backend"}, "test-app", "mysql", 3306)),
+            to_json_object(create_nwp({}, {"app": "backend"}, "test-app", "deny-all", 3306)),
+        ])
+
+        assert [policy.metadata.name for policy in index.match({"app": "mysql"})] == ["deny-all", "mysql"]
+
+    def test_list_network_policies_raw(self, monkeypatch):
+        body = {"items": [
+            client.ApiClient().sanitize_for_serialization(
+                create_nwp({"app": "mysql"}, {"app": "backend"}, "test-app", "mysql", 3306)
+            )
+        ]}
+
+        class FakeNetworkingV1Api:
+            def list_namespaced_network_policy(self, namespace, _preload_content=True):
+                assert _preload_content is False
+                return FakeResponse(body)
+
+        monkeypatch.setattr(clients, "networking_v1", lambda api_client=None: FakeNetworkingV1Api())
+
+        network_policies = networkpolicy.list_network_policies("test-app", raw=True)
+
+        assert isinstance(network_policies[0], fastjson.JsonObject)
+        assert network_policies[0].spec.pod_selector.match_labels == {"app": "mysql"}
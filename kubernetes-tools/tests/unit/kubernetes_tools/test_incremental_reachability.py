@@ -0,0 +1,162 @@
+import random
+import time
+
+from kubernetes import client
+
+from tests.test_utils import apply_nwp, create_nwp
+from tests.unit.kubernetes_tools.test_reachability import create_deny_all, create_namespace, create_pod
+
+from kubernetes_tools import informer, reachability
+from kubernetes_tools.incremental_reachability import IncrementalReachability
+
+PORTS = [(80, "TCP"), (8080, "TCP"), (53, "UDP")]
+
+
+def create_named_pod(name: str, namespace: str, labels: dict, port: int) -> client.V1Pod:
+    pod = create_pod(name, namespace, labels)
+    pod.spec.containers[0].ports = [client.V1ContainerPort(container_port=port, name="http")]
+    return pod
+
+
+def create_policies(namespace: str) -> list:
+    deny_all = create_deny_all(namespace)
+
+    allow_web = create_nwp({"app": "db"}, {"app": "web"}, namespace, "allow-web", 80)
+
+    egress_to_team = create_nwp({"app": "web"}, {}, namespace, "egress-to-team", "http", ingress=False)
+    egress_to_team.spec.egress[0].to[0].namespace_selector = client.V1LabelSelector(match_labels={"team": "x"})
+
+    ingress_from_team = create_nwp({}, {}, namespace, "ingress-from-team", 8080)
+    ingress_from_team.spec.ingress[0]._from[0].pod_selector = None
+    ingress_from_team.spec.ingress[0]._from[0].namespace_selector = client.V1LabelSelector(match_labels={"team": "y"})
+
+    egress_named = create_nwp({}, {}, namespace, "egress-http", "http", ingress=False)
+    egress_named.spec.egress[0].to = None
+
+    dns = create_nwp({"app": "web"}, {}, namespace, "dns", 53, protocol="UDP", ingress=False)
+    dns.spec.egress[0].to = [client.V1NetworkPolicyPeer(ip_block=client.V1IPBlock(cidr="10.0.0.0/8"))]
+
+    return [deny_all, allow_web, egress_to_team, ingress_from_team, egress_named, dns]
+
+
+def verdicts(pod_keys: list, allows) -> dict:
+    return {
+        (source, target, port, protocol): allows(source, target, port, protocol)
+        for source in pod_keys for target in pod_keys if source != target
+        for port, protocol in PORTS
+    }
+
+
+class TestIncrementalReachability:
+
+    def test_matches_full_recomputation(self):
+        rng = random.Random(7)
+        namespaces = {"a": create_namespace("a", {"team": "x"}), "b": create_namespace("b", {"team": "y"})}
+        pods = {}
+        policies = {}
+        engine = IncrementalReachability(PORTS, reachability.ClusterSnapshot([], list(namespaces.values()), []))
+
+        for _ in range(300):
+            before = verdicts(sorted(pods), engine.allows)
+            action = rng.random()
+            if action < 0.4:
+                name = f"pod-{rng.randrange(6)}"
+                namespace = "a" if name < "pod-3" else "b"
+                labels = rng.choice([{}, {"app": "web"}, {"app": "db"}])
+                pod = create_named_pod(name, namespace, labels, rng.choice([80, 8080]))
+                pods[f"{namespace}/{name}"] = pod
+                deltas = engine.handle_pod_event("MODIFIED", pod)
+            elif action < 0.5 and pods:
+                key = rng.choice(sorted(pods))
+                deltas = engine.handle_pod_event("DELETED", pods.pop(key))
+            elif action < 0.8:
+                policy = rng.choice(create_policies(rng.choice(["a", "b"])))
+                policies[f"{policy.metadata.namespace}/{policy.metadata.name}"] = policy
+                deltas = engine.handle_policy_event("ADDED", policy)
+            elif action < 0.9 and policies:
+                key = rng.choice(sorted(policies))
+                deltas = engine.handle_policy_event("DELETED", policies.pop(key))
+            else:
+                namespace = create_namespace(rng.choice(["a", "b"]), rng.choice([{"team": "x"}, {"team": "y"}, None]))
+                namespaces[namespace.metadata.name] = namespace
+                deltas = engine.handle_namespace_event("MODIFIED", namespace)
+
+            matrix = reachability.compute_reachability(
+                reachability.ClusterSnapshot(list(pods.values()), list(namespaces.values()), list(policies.values())),
+                ports=PORTS
+            )
+            after = verdicts(sorted(pods), matrix.allows)
+            assert verdicts(sorted(pods), engine.allows) == after
+
+            flips = {pair + (allowed,) for pair, allowed in after.items() if pair in before and before[pair] != allowed}
+            reported = {(delta.source, delta.target, delta.port, delta.protocol, delta.allowed) for delta in deltas}
+            assert reported == flips
+            assert len(deltas) == len(reported)
+
+    def test_policy_event_deltas(self):
+        engine = IncrementalReachability([(3306, "TCP")], reachability.ClusterSnapshot(
+            pods=[create_pod("backend", "test-app", {"app": "backend"}), create_pod("mysql", "test-app", {"app": "mysql"})],
+            namespaces=[create_namespace("test-app")],
+            network_policies=[]
+        ))
+        published = []
+        engine.add_listener(published.extend)
+
+        deltas = engine.handle_policy_event(
+            "ADDED", create_nwp({"app": "mysql"}, {"app": "frontend"}, "test-app", "mysql-ingress", 3306)
+        )
+
+        assert [(delta.source, delta.target, delta.allowed) for delta in deltas] == [
+            ("test-app/backend", "test-app/mysql", False)
+        ]
+        assert published == deltas
+        assert engine.allowed_sources("test-app/mysql", 3306) == []
+        assert engine.reachable_targets("test-app/mysql", 3306) == ["test-app/backend"]
+
+        deltas = engine.handle_pod_event("MODIFIED", create_pod("backend", "test-app", {"app": "frontend"}))
+
+        assert [(delta.source, delta.target, delta.allowed) for delta in deltas] == [
+            ("test-app/backend", "test-app/mysql", True)
+        ]
+        assert engine.handle_pod_event("MODIFIED", create_pod("backend", "test-app", {"app": "frontend"})) == []
+
+    def test_sync_replaces_objects_of_namespace(self):
+        engine = IncrementalReachability([(80, "TCP")])
+        engine.handle_pod_event("SYNC", [create_pod("web", "a", {}), create_pod("db", "a", {})], "a")
+        engine.handle_pod_event("SYNC", [create_pod("web", "b", {})], "b")
+        engine.handle_policy_event("SYNC", [create_deny_all("a")], "a")
+
+        deltas = engine.handle_policy_event("SYNC", [], "a")
+
+        assert {(delta.source, delta.target) for delta in deltas} == {
+            ("a/web", "a/db"), ("a/db", "a/web"), ("a/web", "b/web"), ("a/db", "b/web"), ("b/web", "a/web"), ("b/web", "a/db")
+        }
+
+        engine.handle_pod_event("SYNC", [create_pod("db", "a", {})], "a")
+
+        assert engine.reachable_targets("a/db", 80) == ["a/db", "b/web"]
+
+    def test_subscribe(self, fake_cluster):
+        engine = IncrementalReachability([(3306, "TCP")])
+        published = []
+        engine.add_listener(published.extend)
+        try:
+            engine.subscribe(["backend", "db"], sync_timeout=10)
+
+            assert engine.allows("backend/backend", "db/mysql", 3306) is True
+
+            nwp = create_nwp({"app": "db"}, {}, "db", "allow-frontend-namespace", 3306)
+            nwp.spec.ingress[0]._from[0].pod_selector = None
+            nwp.spec.ingress[0]._from[0].namespace_selector = client.V1LabelSelector(match_labels={"name": "frontend"})
+            apply_nwp(nwp)
+
+            deadline = time.monotonic() + 10
+            while not published and time.monotonic() < deadline:
+                time.sleep(0.05)
+
+            assert [(delta.source, delta.target, delta.allowed) for delta in published] == [
+                ("backend/backend", "db/mysql", False)
+            ]
+            assert engine.allows("backend/backend", "db/mysql", 3306) is False
+        finally:
+            informer.disable()
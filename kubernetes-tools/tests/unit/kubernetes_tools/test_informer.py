@@ -0,0 +1,206 @@
+import time
+
+from kubernetes import client
+
+from kubernetes_tools import clients, informer, networkpolicy, pods
+
+
+def create_pod(name: str, labels: dict) -> client.V1Pod:
+    return client.V1Pod(metadata=client.V1ObjectMeta(name=name, namespace="test-app", labels=labels))
+
+
+def pod_json(name: str, namespace: str) -> dict:
+    return {
+        "apiVersion": "v1",
+        "kind": "Pod",
+        "metadata": {"name": name, "namespace": namespace},
+        "spec": {"containers": [{"name": name, "image": "busybox"}]},
+    }
+
+
+def wait_until(condition, timeout: float = 10) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def failing_list(calls: list):
+    def list_func(**kwargs):
+        calls.append(time.monotonic())
+        raise client.exceptions.ApiException(status=500, reason="Internal Server Error")
+    return list_func
+
+
+def list_requests(server, namespace: str) -> list:
+    return [
+        path for method, path in server.requests
+        if path.startswith(f"/api/v1/namespaces/{namespace}/pods") and "watch=" not in path
+    ]
+
+
+class TestStore:
+
+    def test_upsert_and_get(self):
+        store = informer.Store()
+        store.upsert(create_pod("backend", {"app": "backend"}))
+
+        assert store.get("backend").metadata.labels == {"app": "backend"}
+        assert store.get("mysql") is None
+
+    def test_upsert_replaces_existing_object(self):
+        store = informer.Store()
+        store.upsert(create_pod("backend", {"app": "backend"}))
+        store.upsert(create_pod("backend", {"app": "backend", "tier": "api"}))
+
+        assert len(store.list()) == 1
+        assert store.get("backend").metadata.labels == {"app": "backend", "tier": "api"}
+
+    def test_delete(self):
+        store = informer.Store()
+        pod = create_pod("backend", {"app": "backend"})
+        store.upsert(pod)
+        store.delete(pod)
+
+        assert store.get("backend") is None
+
+    def test_replace_drops_stale_objects(self):
+        store = informer.Store()
+        store.upsert(create_pod("backend", {"app": "backend"}))
+        store.replace([create_pod("mysql", {"app": "mysql"})])
+
+        assert [pod.metadata.name for pod in store.list()] == ["mysql"]
+
+    def test_revision_increments_on_change(self):
+        store = informer.Store()
+        revision = store.revision
+        store.upsert(create_pod("backend", {"app": "backend"}))
+
+        assert store.revision > revision
+
+
+class TestInformer:
+
+    def test_get_store_disabled(self):
+        assert informer.get_store(informer.PODS, "test-app") is None
+
+    def test_reads_served_from_store(self):
+        informer.enable()
+        try:
+            store = informer.get_store(informer.PODS, "test-app")
+            assert store is not None
+
+            pod = pods.get_pod_by_name(name="backend", namespace="test-app")
+            assert pod is store.get("backend")
+
+            pod_list = pods.get_pods_by_labels({"app": "backend"}, namespace="test-app")
+            assert [pod.metadata.name for pod in pod_list.items] == ["backend"]
+
+            assert isinstance(networkpolicy.get_network_policies_matching_pod(pod), list)
+        finally:
+            informer.disable()
+
+
+class TestInformerOffline:
+
+    def start_informer(self, fake_apiserver, fake_api_client) -> informer.Informer:
+        pod_informer = informer.Informer(
+            informer.PODS, "backend", client.CoreV1Api(fake_api_client).list_namespaced_pod, watch_timeout=1
+        )
+        pod_informer.start()
+        assert pod_informer.wait_for_sync(10)
+        # Changes are made once the watch is established, i.e. not received by a LIST
+        assert wait_until(lambda: fake_apiserver.active_watches > 0)
+        return pod_informer
+
+    def test_watch_resumes_from_bookmark(self, fake_apiserver, fake_api_client):
+        pod_informer = self.start_informer(fake_apiserver, fake_api_client)
+        try:
+            # Changes in other namespaces advance the resourceVersion without events for the informer
+            latest = fake_apiserver.add(pod_json("other", "db"))["metadata"]["resourceVersion"]
+            fake_apiserver.compact()
+
+            assert wait_until(lambda: pod_informer.resource_version == latest)
+
+            fake_apiserver.add(pod_json("worker", "backend"))
+
+            assert wait_until(lambda: pod_informer.store.get("worker") is not None)
+            assert len(list_requests(fake_apiserver, "backend")) == 1
+        finally:
+            pod_informer.stop()
+
+    def test_relist_on_gone(self, fake_apiserver, fake_api_client):
+        fake_apiserver.send_bookmarks = False
+        pod_informer = self.start_informer(fake_apiserver, fake_api_client)
+        events = []
+        pod_informer.add_event_handler(lambda event_type, obj: events.append(event_type))
+        try:
+            fake_apiserver.add(pod_json("other", "db"))
+            fake_apiserver.compact()
+
+            assert wait_until(lambda: "SYNC" in events)
+            assert len(list_requests(fake_apiserver, "backend")) == 2
+
+            fake_apiserver.add(pod_json("worker", "backend"))
+
+            assert wait_until(lambda: pod_informer.store.get("worker") is not None)
+            assert [pod.metadata.name for pod in pod_informer.store.list()] == ["backend", "worker"]
+        finally:
+            pod_informer.stop()
+
+    def test_failed_list_not_awaited(self, monkeypatch):
+        monkeypatch.setattr(informer, "RETRY_DELAY", 0.1)
+        calls = []
+        pod_informer = informer.Informer(informer.PODS, "backend", failing_list(calls))
+        pod_informer.start()
+        try:
+            assert not pod_informer.wait_for_sync(10)
+
+            start = time.monotonic()
+            assert not pod_informer.wait_for_sync(10)
+            assert time.monotonic() - start < 1
+        finally:
+            pod_informer.stop()
+
+    def test_failed_list_retried_with_backoff(self, monkeypatch, fake_apiserver, fake_api_client):
+        monkeypatch.setattr(informer, "RETRY_DELAY", 0.1)
+        calls = []
+        list_func = client.CoreV1Api(fake_api_client).list_namespaced_pod
+        pod_informer = informer.Informer(
+            informer.PODS, "backend", lambda **kwargs: list_func(**kwargs) if len(calls) >= 4 else failing_list(calls)()
+        )
+        pod_informer.start()
+        try:
+            assert wait_until(pod_informer.has_synced)
+            assert pod_informer.store.get("backend") is not None
+
+            delays = [later - earlier for earlier, later in zip(calls, calls[1:])]
+            assert all(later > earlier for earlier, later in zip(delays, delays[1:]))
+        finally:
+            pod_informer.stop()
+
+    def test_get_store_after_failed_list(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(informer, "_list_func_for", lambda kind: failing_list(calls))
+        informer.enable()
+        try:
+            start = time.monotonic()
+            assert informer.get_store(informer.PODS, "backend") is None
+            assert informer.get_store(informer.PODS, "backend") is None
+            assert time.monotonic() - start < 1
+            assert len(calls) == 1
+        finally:
+            informer.disable()
+
+    def test_watch_api_client(self, fake_cluster):
+        informer.enable()
+        try:
+            assert informer.get_store(informer.PODS, "backend", sync_timeout=10) is not None
+
+            api_client = informer.get_informer(informer.PODS, "backend")._list_func.__self__.api_client
+            assert api_client is clients.get_watch_api_client()
+            assert api_client is not clients.get_api_client()
+        finally:
+            informer.disable()
@@ -0,0 +1,145 @@
+import pytest
+from tests.test_utils import apply_nwp, create_nwp
+
+from kubernetes_tools import agent_tools, debug, instrumentation, pods, selectors
+from kubernetes_tools.instrumentation import API, PHASE, TOOL
+
+
+@pytest.fixture
+def recording():
+    backend = instrumentation.RecordingBackend()
+    instrumentation.enable(backend)
+    yield backend
+    instrumentation.disable()
+
+
+class TestInstrumentation:
+
+    def test_disabled_by_default(self):
+        assert not instrumentation.is_enabled()
+
+        with instrumentation.measure(TOOL, "noop") as measurement:
+            assert measurement is None
+
+    def test_measure(self, recording):
+        with instrumentation.measure(TOOL, "tool") as measurement:
+            measurement.objects = 3
+            instrumentation.record_cache("informer", True)
+            instrumentation.record_cache("informer", False)
+
+        measurement, = recording.find(TOOL, "tool")
+        assert measurement.objects == 3
+        assert measurement.duration >= 0
+        assert (measurement.cache_hits, measurement.cache_misses) == (1, 1)
+        assert recording.cache_lookups == {"informer": {True: 1, False: 1}}
+
+    def test_measure_error(self, recording):
+        with pytest.raises(ValueError):
+            with instrumentation.measure(TOOL, "tool"):
+                raise ValueError("failed")
+
+        assert recording.find(TOOL, "tool")[0].error == "ValueError"
+
+    def test_api_requests(self, recording, fake_cluster):
+        pods.get_pod_by_name(name="backend", namespace="backend")
+        pods.get_pod_by_name(name="missing", namespace="backend")
+
+        found, missing = recording.find(API, "GET /api/v1/namespaces/{namespace}/pods/{name}")
+        assert found.objects == 1
+        assert found.bytes > 0
+        assert found.error is None
+        assert missing.error == "ApiException 404"
+
+    def test_list_request_objects(self, recording, fake_cluster):
+        pods.get_pods_by_labels({}, "backend")
+
+        measurement, = recording.find(API, "GET /api/v1/namespaces/{namespace}/pods")
+        assert measurement.objects == 1
+
+    def test_tool_call(self, recording, fake_cluster):
+        apply_nwp(create_nwp({"app": "db"}, {"app": "backend"}, "db", "allow-backend", 3306))
+        recording.measurements.clear()
+
+        policies = agent_tools.get_network_policies_for_pod.invoke({"pod_name": "mysql", "namespace": "db"})
+
+        tool_call, = recording.find(TOOL, "get_network_policies_for_pod")
+        assert tool_call.objects == len(policies) == 1
+        assert tool_call.bytes > 0
+        # The requests are finished before the tool call
+        assert [measurement.kind for measurement in recording.measurements] == [API, API, TOOL]
+
+    def test_compiled_policy_cache(self, recording):
+        policy = create_nwp({"app": "db"}, {"app": "backend"}, "db", "allow-backend", 3306)
+        policy.metadata.uid = "compiled-policy-cache-test"
+        policy.metadata.resource_version = "1"
+
+        selectors.compile_policy(policy)
+        selectors.compile_policy(policy)
+
+        assert recording.cache_lookups["compiled_policy"] == {True: 1, False: 1}
+
+    def test_ephemeral_container_phases(self, recording, fake_api_client):
+        debug.run_debug_command(namespace="backend", pod_name="backend", command=["true"], api_client=fake_api_client)
+
+        assert [measurement.name for measurement in recording.find(PHASE)] == [
+            "ephemeral_container.patch",
+            "ephemeral_container.scheduled",
+            "ephemeral_container.image_pulled",
+            "ephemeral_container.running",
+            "ephemeral_container.terminated",
+        ]
+
+    def test_tools_instrumented(self):
+        assert agent_tools.get_pod_by_name.func.__instrumented__
+        if agent_tools.get_pod_by_name.coroutine is not None:
+            assert agent_tools.get_pod_by_name.coroutine.__instrumented__
+
+
+class TestPrometheusBackend:
+
+    def test_metrics(self):
+        prometheus_client = pytest.importorskip("prometheus_client")
+        registry = prometheus_client.CollectorRegistry()
+        instrumentation.enable(instrumentation.PrometheusBackend(registry))
+
+        try:
+            with instrumentation.measure(API, "GET /api/v1/pods") as measurement:
+                measurement.bytes = 100
+                measurement.objects = 2
+            instrumentation.record_cache("informer", True)
+        finally:
+            instrumentation.disable()
+
+        labels = {"kind": API, "name": "GET /api/v1/pods"}
+        assert registry.get_sample_value("kubernetes_tools_duration_seconds_count", labels) == 1
+        assert registry.get_sample_value("kubernetes_tools_response_bytes_total", labels) == 100
+        assert registry.get_sample_value("kubernetes_tools_objects_total", labels) == 2
+        assert registry.get_sample_value(
+            "kubernetes_tools_cache_lookups_total", {"cache": "informer", "result": "hit"}
+        ) == 1
+
+
+class TestOpenTelemetryBackend:
+
+    def test_nested_spans(self):
+        pytest.importorskip("opentelemetry.sdk")
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        instrumentation.enable(instrumentation.OpenTelemetryBackend(provider.get_tracer("test")))
+
+        try:
+            with instrumentation.measure(TOOL, "get_pod_by_name"):
+                with instrumentation.measure(API, "GET /api/v1/namespaces/{namespace}/pods/{name}") as measurement:
+                    measurement.bytes = 100
+        finally:
+            instrumentation.disable()
+
+        request, tool_call = exporter.get_finished_spans()
+        assert tool_call.name == "tool get_pod_by_name"
+        assert request.parent.span_id == tool_call.context.span_id
+        assert request.attributes["kubernetes_tools.bytes"] == 100
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+from kubernetes import client, config
+
+from kubernetes_tools import clients, kubeconfig
+
+
+@pytest.fixture
+def restore_configuration(monkeypatch):
+    """Restore the loaded configuration and the shared ApiClient after a test that configures the client."""
+    monkeypatch.setattr(kubeconfig, "_configured", kubeconfig.is_configured())
+    monkeypatch.setattr(kubeconfig, "_settings", kubeconfig._settings)
+    previous = client.Configuration._default
+    yield
+    client.Configuration.set_default(previous)
+    clients.reset_api_client()
+
+
+class TestKubeconfig:
+
+    def test_import_does_not_load_kube_config(self):
+        env = dict(os.environ, KUBECONFIG=os.devnull, PYTHONPATH=os.pathsep.join(sys.path))
+        result = subprocess.run(
+            [sys.executable, "-c", "from kubernetes_tools import kubeconfig, pods, networkpolicy, agent_tools; "
+                                   "assert not kubeconfig.is_configured()"],
+            env=env,
+            capture_output=True,
+            text=True
+        )
+
+        assert result.returncode == 0, result.stderr
+
+    def test_configure_with_configuration(self, restore_configuration):
+        kubeconfig.configure(configuration=client.Configuration(host="http://127.0.0.1:8001"))
+
+        assert kubeconfig.is_configured() is True
+        assert clients.get_api_client().configuration.host == "http://127.0.0.1:8001"
+
+    def test_running_in_cluster(self, monkeypatch):
+        monkeypatch.setenv("KUBERNETES_SERVICE_HOST", "10.96.0.1")
+        monkeypatch.delenv("KUBECONFIG", raising=False)
+
+        assert kubeconfig.running_in_cluster() is True
+
+        monkeypatch.setenv("KUBECONFIG", "/tmp/config")
+
+        assert kubeconfig.running_in_cluster() is False
+
+    def test_configure_detects_in_cluster(self, monkeypatch, restore_configuration):
+        loaded = []
+        monkeypatch.setenv("KUBERNETES_SERVICE_HOST", "10.96.0.1")
+        monkeypatch.delenv("KUBECONFIG", raising=False)
+        monkeypatch.setattr(config, "load_incluster_config", lambda: loaded.append("in-cluster"))
+        monkeypatch.setattr(config, "load_kube_config", lambda **kwargs: loaded.append("kube-config"))
+
+        kubeconfig.configure()
+
+        assert loaded == ["in-cluster"]
+
+        kubeconfig.configure(in_cluster=False)
+
+        assert loaded == ["in-cluster", "kube-config"]
+
+    def test_async_clients_use_the_same_settings(self, monkeypatch, restore_configuration):
+        aio_clients = pytest.importorskip("kubernetes_tools.aio.clients")
+        loaded = []
+
+        async def load_kube_config(**kwargs):
+            loaded.append(kwargs)
+            kwargs["client_configuration"].host = "https://kind-cks:6443"
+
+        monkeypatch.setattr(config, "load_kube_config", lambda **kwargs: None)
+        monkeypatch.setattr(aio_clients.config, "load_kube_config", load_kube_config)
+
+        async def get_host():
+            try:
+                return (await aio_clients.get_api_client()).configuration.host
+            finally:
+                await aio_clients.close_api_client()
+
+        kubeconfig.configure(config_file="/tmp/config", context="kind-cks")
+
+        assert asyncio.run(get_host()) == "https://kind-cks:6443"
+        assert [(kwargs["config_file"], kwargs["context"]) for kwargs in loaded] == [("/tmp/config", "kind-cks")]
+
+        kubeconfig.configure(configuration=client.Configuration(host="http://127.0.0.1:8001"))
+
+        assert asyncio.run(get_host()) == "http://127.0.0.1:8001"
+
+    def test_forked_child_creates_own_api_client(self, restore_configuration):
+        kubeconfig.configure(configuration=client.Configuration(host="http://127.0.0.1:8001"))
+        parent_api_client = clients.get_api_client()
+        read_fd, write_fd = os.pipe()
+
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            os.write(write_fd, b"1" if clients.get_api_client() is not parent_api_client else b"0")
+            os._exit(0)
+
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+        with os.fdopen(read_fd, "rb") as pipe:
+            assert pipe.read() == b"1"
@@ -1,7 +1,7 @@
 from kubernetes import client
-from tests.test_utils import create_nwp
+from tests.test_utils import apply_nwp, create_nwp, delete_nwp
 
-from kubernetes_tools import networkpolicy, pods
+from kubernetes_tools import agent_tools, clients, networkpolicy, pods
 
 # TODO: Refactor repetitive code into helper functions
 class TestNetworkPolicy:
@@ -309,7 +309,7 @@ class TestNetworkPolicy:
         assert networkpolicy.contains_egress_rule(egress_nwp, port=3306, selector={"app": "pod-b"}, protocol="TCP") is False
 
     def test_contains_egress_rule_no_peers(self):
-        """Test that function returns False when egress rule has no peers"""
+        """Test that an egress rule without peers allows all destinations"""
         egress_nwp = create_nwp(
             pod_match_labels={"app": "pod-a"},
             peer_match_labels={"app": "pod-b"},
@@ -322,5 +322,267 @@ class TestNetworkPolicy:
 
         egress_nwp.spec.egress[0].to = []
 
-        assert networkpolicy.contains_egress_rule(egress_nwp, port=3306, selector={"app": "pod-b"}, protocol="TCP") is False
+        assert networkpolicy.contains_egress_rule(egress_nwp, port=3306, selector={"app": "pod-b"}, protocol="TCP") is True
+        assert networkpolicy.contains_egress_rule(egress_nwp, port=3306, selector={"app": "other"}, protocol="TCP") is True
+        assert networkpolicy.contains_egress_rule(egress_nwp, port=3307, selector={"app": "pod-b"}, protocol="TCP") is False
+
+    def test_contains_ingress_rule_match_subset_of_peer_labels(self):
+        """Test that a peer selector matches pods having additional labels"""
+        ingress_nwp = create_nwp(
+            pod_match_labels={"app": "pod-b"},
+            peer_match_labels={"app": "pod-a"},
+            namespace="test-app",
+            name="ingress-policy",
+            port=3306,
+            protocol="TCP",
+            ingress=True
+        )
+
+        assert networkpolicy.contains_ingress_rule(ingress_nwp, port=3306, peer_selector={"app": "pod-a", "tier": "frontend"}, protocol="TCP") is True
+
+    def test_contains_ingress_rule_match_expressions(self):
+        ingress_nwp = create_nwp(
+            pod_match_labels={"app": "pod-b"},
+            peer_match_labels=None,
+            namespace="test-app",
+            name="ingress-policy",
+            port=3306,
+            protocol="TCP",
+            ingress=True
+        )
+
+        ingress_nwp.spec.ingress[0]._from[0].pod_selector.match_expressions = [
+            client.V1LabelSelectorRequirement(key="app", operator="In", values=["pod-a", "pod-c"]),
+            client.V1LabelSelectorRequirement(key="tier", operator="DoesNotExist")
+        ]
+
+        assert networkpolicy.contains_ingress_rule(ingress_nwp, port=3306, peer_selector={"app": "pod-c"}, protocol="TCP") is True
+        assert networkpolicy.contains_ingress_rule(ingress_nwp, port=3306, peer_selector={"app": "pod-c", "tier": "frontend"}, protocol="TCP") is False
+        assert networkpolicy.contains_ingress_rule(ingress_nwp, port=3306, peer_selector={"app": "xxx"}, protocol="TCP") is False
+
+    def test_contains_ingress_rule_peer_in_other_namespace(self):
+        """Test that a peer without namespace selector only selects pods in the policy's namespace"""
+        ingress_nwp = create_nwp(
+            pod_match_labels={"app": "pod-b"},
+            peer_match_labels={"app": "pod-a"},
+            namespace="test-app",
+            name="ingress-policy",
+            port=3306,
+            protocol="TCP",
+            ingress=True
+        )
+
+        assert networkpolicy.contains_ingress_rule(ingress_nwp, port=3306, peer_selector={"app": "pod-a"}, protocol="TCP", peer_namespace="other") is False
+
+    def test_contains_egress_rule_namespace_selector(self):
+        """Test that a namespace selector peer selects all pods of matching namespaces"""
+        egress_nwp = create_nwp(
+            pod_match_labels={"app": "pod-a"},
+            peer_match_labels={},
+            namespace="test-app",
+            name="egress-policy",
+            port=53,
+            protocol="UDP",
+            ingress=False
+        )
+
+        peer = egress_nwp.spec.egress[0].to[0]
+        peer.pod_selector = None
+        peer.namespace_selector = client.V1LabelSelector(match_labels={"kubernetes.io/metadata.name": "kube-system"})
+
+        assert networkpolicy.contains_egress_rule(egress_nwp, port=53, selector={"k8s-app": "kube-dns"}, protocol="UDP", peer_namespace="kube-system") is True
+        assert networkpolicy.contains_egress_rule(egress_nwp, port=53, selector={"k8s-app": "kube-dns"}, protocol="UDP") is False
+        assert networkpolicy.contains_egress_rule(egress_nwp, port=53, selector={"k8s-app": "kube-dns"}, protocol="UDP",
+                                                  peer_namespace="dns", peer_namespace_labels={"kubernetes.io/metadata.name": "kube-system"}) is True
+
+    def test_contains_egress_rule_namespace_and_pod_selector(self):
+        """Test that a peer with namespace and pod selector requires both to match"""
+        egress_nwp = create_nwp(
+            pod_match_labels={"app": "pod-a"},
+            peer_match_labels={"app": "mysql"},
+            namespace="test-app",
+            name="egress-policy",
+            port=3306,
+            protocol="TCP",
+            ingress=False
+        )
+
+        egress_nwp.spec.egress[0].to[0].namespace_selector = client.V1LabelSelector(match_labels={"team": "db"})
+
+        assert networkpolicy.contains_egress_rule(egress_nwp, port=3306, selector={"app": "mysql"}, protocol="TCP",
+                                                  peer_namespace="db", peer_namespace_labels={"team": "db"}) is True
+        assert networkpolicy.contains_egress_rule(egress_nwp, port=3306, selector={"app": "backend"}, protocol="TCP",
+                                                  peer_namespace="db", peer_namespace_labels={"team": "db"}) is False
+        assert networkpolicy.contains_egress_rule(egress_nwp, port=3306, selector={"app": "mysql"}, protocol="TCP") is False
+
+
+class FakeNetworkingV1Api:
+
+    def __init__(self, network_policies: list):
+        self.network_policies = network_policies
+        self.namespaces = []
+
+    def list_network_policy_for_all_namespaces(self):
+        return client.V1NetworkPolicyList(items=self.network_policies)
+
+    def list_namespaced_network_policy(self, namespace):
+        self.namespaces.append(namespace)
+        return client.V1NetworkPolicyList(items=[
+            network_policy for network_policy in self.network_policies
+            if network_policy.metadata.namespace == namespace
+        ])
+
+
+def create_policies() -> list:
+    return [
+        create_nwp({"app": "db"}, {"app": "backend"}, "shop", "db-ingress", 5432),
+        create_nwp({"app": "web"}, {"app": "lb"}, "shop", "web-ingress", 8080),
+        create_nwp({"app": "db"}, {"app": "api"}, "billing", "db-ingress", 5432),
+        create_nwp({}, {"app": "api"}, "billing", "deny-all", 5432),
+    ]
+
+
+class TestNetworkPoliciesInNamespaces:
+
+    def test_all_namespaces(self, monkeypatch):
+        api = FakeNetworkingV1Api(create_policies())
+        monkeypatch.setattr(clients, "networking_v1", lambda api_client=None: api)
+
+        matching = networkpolicy.get_network_policies_matching_labels_in_namespaces({"app": "db"})
+
+        assert {namespace: [p.metadata.name for p in policies] for namespace, policies in matching.items()} == {
+            "shop": ["db-ingress"],
+            "billing": ["db-ingress", "deny-all"],
+        }
+        assert api.namespaces == []
+
+    def test_given_namespaces(self, monkeypatch):
+        api = FakeNetworkingV1Api(create_policies())
+        monkeypatch.setattr(clients, "networking_v1", lambda api_client=None: api)
+
+        matching = networkpolicy.get_network_policies_matching_labels_in_namespaces(
+            {"app": "web"}, ["shop", "billing", "empty"]
+        )
+
+        assert {namespace: [p.metadata.name for p in policies] for namespace, policies in matching.items()} == {
+            "shop": ["web-ingress"],
+            "billing": ["deny-all"],
+            "empty": [],
+        }
+        assert sorted(api.namespaces) == ["billing", "empty", "shop"]
+
+    def test_matching_pods(self, monkeypatch):
+        api = FakeNetworkingV1Api(create_policies())
+        monkeypatch.setattr(clients, "networking_v1", lambda api_client=None: api)
+        db_pods = [
+            client.V1Pod(metadata=client.V1ObjectMeta(name=name, namespace=namespace, labels={"app": "db"}))
+            for name, namespace in (("db-0", "shop"), ("db-1", "shop"), ("db-0", "billing"))
+        ]
+
+        matching = networkpolicy.get_network_policies_matching_pods(db_pods)
+
+        assert {
+            namespace: {pod: [p.metadata.name for p in policies] for pod, policies in by_pod.items()}
+            for namespace, by_pod in matching.items()
+        } == {
+            "shop": {"db-0": ["db-ingress"], "db-1": ["db-ingress"]},
+            "billing": {"db-0": ["db-ingress", "deny-all"]},
+        }
+        assert sorted(api.namespaces) == ["billing", "shop"]
+
+
+class TestNetworkPolicyOffline:
+
+    def test_get_network_policies_matching_pod(self, fake_cluster):
+        apply_nwp(create_nwp({"app": "backend"}, {"app": "frontend"}, "backend", "allow-frontend", 8080))
+        apply_nwp(create_nwp({"app": "other"}, {"app": "frontend"}, "backend", "allow-other", 8080))
+        pod = pods.get_pod_by_name(name="backend", namespace="backend")
+
+        policies = networkpolicy.get_network_policies_matching_pod(pod)
+
+        assert [policy.metadata.name for policy in policies] == ["allow-frontend"]
+
+    def test_delete_nwp(self, fake_cluster):
+        apply_nwp(create_nwp({"app": "backend"}, {"app": "frontend"}, "backend", "allow-frontend", 8080))
+
+        delete_nwp("allow-frontend", "backend")
+
+        assert networkpolicy.list_network_policies("backend") == []
+
+    def test_get_network_policies_for_pod_tool(self, fake_cluster):
+        apply_nwp(create_nwp({"app": "db"}, {"app": "backend"}, "db", "allow-backend", 3306))
+
+        policies = agent_tools.get_network_policies_for_pod.invoke({"pod_name": "mysql", "namespace": "db"})
+
+        assert [policy["metadata"]["name"] for policy in policies] == ["allow-backend"]
+        assert policies[0]["spec"]["ingress"][0]["from"][0]["podSelector"]["matchLabels"] == {"app": "backend"}
+
+    def test_contains_egress_rule_with_ip_block(self):
+        nwp = create_nwp({"app": "backend"}, {"app": "db"}, "backend", "allow-external", 443, ingress=False)
+        nwp.spec.egress[0].to = [client.V1NetworkPolicyPeer(
+            ip_block=client.V1IPBlock(cidr="10.0.0.0/8", _except=["10.2.0.0/16"])
+        )]
+
+        assert networkpolicy.contains_egress_rule(nwp, 443, {}, peer_ips=["10.1.2.3"])
+        assert not networkpolicy.contains_egress_rule(nwp, 443, {}, peer_ips=["10.2.3.4"])
+        assert not networkpolicy.contains_egress_rule(nwp, 443, {})
+        assert networkpolicy.contains_egress_rule(nwp, 443, {}, peer_ips=["10.2.3.4", "10.3.0.1"])
+
+    def test_get_network_policies_allowing_egress_to_ip(self, fake_cluster):
+        nwp = create_nwp({"app": "backend"}, {"app": "db"}, "backend", "allow-external", 443, ingress=False)
+        nwp.spec.egress[0].to = [client.V1NetworkPolicyPeer(ip_block=client.V1IPBlock(cidr="10.0.0.0/8"))]
+        pod = pods.get_pod_by_name(name="backend", namespace="backend")
+
+        assert networkpolicy.get_network_policies_allowing_egress_to_ip(pod, "10.2.3.4", 443) is None
+
+        apply_nwp(nwp)
+
+        policies = networkpolicy.get_network_policies_allowing_egress_to_ip(pod, "10.2.3.4", 443)
+        assert [policy.metadata.name for policy in policies] == ["allow-external"]
+        assert networkpolicy.get_network_policies_allowing_egress_to_ip(pod, "10.2.3.4", 80) == []
+        assert networkpolicy.get_network_policies_allowing_egress_to_ip(pod, "192.168.1.1", 443) == []
+
+    def test_check_pod_egress_to_ip_tool(self, fake_cluster):
+        nwp = create_nwp({"app": "backend"}, {"app": "db"}, "backend", "allow-external", 443, ingress=False)
+        nwp.spec.egress[0].to = [client.V1NetworkPolicyPeer(ip_block=client.V1IPBlock(cidr="fd00::/8"))]
+        apply_nwp(nwp)
+
+        result = agent_tools.check_pod_egress_to_ip.invoke(
+            {"pod_name": "backend", "namespace": "backend", "ip": "fd00::1", "port": 443}
+        )
+
+        assert result == {"allowed": True, "isolated": True, "policies": ["allow-external"]}
+
+    def test_check_pod_egress_to_ip_tool_missing_pod(self, fake_cluster):
+        result = agent_tools.check_pod_egress_to_ip.invoke(
+            {"pod_name": "missing", "namespace": "backend", "ip": "fd00::1", "port": 443}
+        )
 
+        assert result is None
+
+    def test_contains_ingress_rule_with_named_port_and_end_port(self):
+        nwp = create_nwp({"app": "web"}, {"app": "frontend"}, "default", "allow-http", 8080)
+        nwp.spec.ingress[0].ports = [
+            client.V1NetworkPolicyPort(port="http"),
+            client.V1NetworkPolicyPort(port=30000, end_port=30100)
+        ]
+        port_names = {"http": ((8080, "TCP"),)}
+
+        assert networkpolicy.contains_ingress_rule(nwp, 8080, {"app": "frontend"}, port_names=port_names)
+        assert not networkpolicy.contains_ingress_rule(nwp, 8080, {"app": "frontend"})
+        assert networkpolicy.contains_ingress_rule(nwp, 30050, {"app": "frontend"})
+        assert not networkpolicy.contains_ingress_rule(nwp, 30101, {"app": "frontend"})
+        assert networkpolicy.rule_allows_port(nwp.spec.ingress[0].ports, 30100)
+
+    def test_get_network_policies_matching_pods(self, fake_cluster):
+        apply_nwp(create_nwp({"app": "backend"}, {"app": "frontend"}, "backend", "allow-frontend", 8080))
+        apply_nwp(create_nwp({"app": "db"}, {"app": "backend"}, "db", "allow-backend", 3306))
+        backend = pods.get_pod_by_name(name="backend", namespace="backend")
+        mysql = pods.get_pod_by_name(name="mysql", namespace="db")
+
+        matching = networkpolicy.get_network_policies_matching_pods([backend, mysql])
+
+        assert {
+            namespace: {name: [policy.metadata.name for policy in policies] for name, policies in by_pod.items()}
+            for namespace, by_pod in matching.items()
+        } == {"backend": {"backend": ["allow-frontend"]}, "db": {"mysql": ["allow-backend"]}}
@@ -1,4 +1,10 @@
-from kubernetes_tools import pods
+import itertools
+import json
+import time
+
+from kubernetes import client
+
+from kubernetes_tools import clients, pods
 
 # TODO: Remove superfluous comments for obvious assertions
 class TestPods:
@@ -202,3 +208,156 @@ class TestPods:
             assert pod.metadata.name is not None
             assert pod.metadata.namespace == "test-app"
             assert pod.spec.containers[0].name == "backend"
+
+
+class FakePagedCoreV1Api:
+    """Serves pods in pages of the requested limit like the API server"""
+
+    def __init__(self, names: list):
+        self.names = names
+        self.calls = []
+
+    def list_namespaced_pod(self, namespace, label_selector, limit, _continue=None, _preload_content=True):
+        self.calls.append(_continue)
+        start = int(_continue or 0)
+        end = start + limit
+        continue_token = str(end) if end < len(self.names) else None
+        names = self.names[start:end]
+
+        if not _preload_content:
+            return FakeResponse({
+                "metadata": {"continue": continue_token} if continue_token else {},
+                "items": [{"metadata": {"name": name, "namespace": namespace}} for name in names]
+            })
+
+        return client.V1PodList(
+            metadata=client.V1ListMeta(_continue=continue_token),
+            items=[client.V1Pod(metadata=client.V1ObjectMeta(name=name, namespace=namespace)) for name in names]
+        )
+
+
+class FakeResponse:
+
+    def __init__(self, body: dict):
+        self.data = json.dumps(body).encode()
+
+
+class TestIterPodsByLabels:
+
+    def test_pages_through_all_pods(self, monkeypatch):
+        api = FakePagedCoreV1Api([f"pod-{i}" for i in range(5)])
+        monkeypatch.setattr(clients, "core_v1", lambda api_client=None: api)
+
+        names = [pod.metadata.name for pod in pods.iter_pods_by_labels({"app": "backend"}, "test-app", page_size=2)]
+
+        assert names == [f"pod-{i}" for i in range(5)]
+        assert api.calls == [None, "2", "4"]
+
+    def test_early_termination_skips_remaining_pages(self, monkeypatch):
+        api = FakePagedCoreV1Api([f"pod-{i}" for i in range(5)])
+        monkeypatch.setattr(clients, "core_v1", lambda api_client=None: api)
+
+        first = list(itertools.islice(pods.iter_pods_by_labels({}, "test-app", page_size=2), 3))
+
+        assert len(first) == 3
+        assert api.calls == [None, "2"]
+
+    def test_raw(self, monkeypatch):
+        api = FakePagedCoreV1Api([f"pod-{i}" for i in range(3)])
+        monkeypatch.setattr(clients, "core_v1", lambda api_client=None: api)
+
+        items = list(pods.iter_pods_by_labels({}, "test-app", page_size=2, raw=True))
+
+        assert [item["metadata"]["name"] for item in items] == ["pod-0", "pod-1", "pod-2"]
+        assert api.calls == [None, "2"]
+
+    def test_live(self):
+        names = [pod.metadata.name for pod in pods.iter_pods_by_labels({"app": "backend"}, "test-app", page_size=1)]
+
+        assert names == ["backend"]
+
+
+class FakeAllNamespacesCoreV1Api:
+
+    def __init__(self, pods_by_namespace: dict):
+        self.pods_by_namespace = pods_by_namespace
+        self.namespaces = []
+
+    def list_pod_for_all_namespaces(self, label_selector):
+        return client.V1PodList(items=[pod for pods in self.pods_by_namespace.values() for pod in pods])
+
+    def list_namespaced_pod(self, namespace, label_selector):
+        self.namespaces.append(namespace)
+        return client.V1PodList(items=self.pods_by_namespace.get(namespace, []))
+
+
+class TestGetPodsByLabelsInNamespaces:
+
+    def create_api(self) -> FakeAllNamespacesCoreV1Api:
+        return FakeAllNamespacesCoreV1Api({
+            namespace: [client.V1Pod(metadata=client.V1ObjectMeta(name=name, namespace=namespace)) for name in names]
+            for namespace, names in (("shop", ["db-0", "db-1"]), ("billing", ["db-0"]))
+        })
+
+    def test_all_namespaces(self, monkeypatch):
+        api = self.create_api()
+        monkeypatch.setattr(clients, "core_v1", lambda api_client=None: api)
+
+        pods_by_namespace = pods.get_pods_by_labels_in_namespaces({"app": "db"})
+
+        assert {namespace: [pod.metadata.name for pod in namespace_pods]
+                for namespace, namespace_pods in pods_by_namespace.items()} == {
+            "shop": ["db-0", "db-1"],
+            "billing": ["db-0"],
+        }
+        assert api.namespaces == []
+
+    def test_given_namespaces(self, monkeypatch):
+        api = self.create_api()
+        monkeypatch.setattr(clients, "core_v1", lambda api_client=None: api)
+
+        pods_by_namespace = pods.get_pods_by_labels_in_namespaces({"app": "db"}, ["billing", "empty"])
+
+        assert {namespace: [pod.metadata.name for pod in namespace_pods]
+                for namespace, namespace_pods in pods_by_namespace.items()} == {
+            "billing": ["db-0"],
+            "empty": [],
+        }
+        assert sorted(api.namespaces) == ["billing", "empty"]
+
+
+class TestPodsOffline:
+
+    def test_get_pod_by_name(self, fake_api_client):
+        pod = pods.get_pod_by_name(name="backend", namespace="backend", api_client=fake_api_client)
+
+        assert pod.metadata.labels == {"app": "backend"}
+        assert pod.status.phase == "Running"
+        assert pods.get_pod_ips(pod) == [pod.status.pod_ip]
+
+    def test_get_pod_not_found(self, fake_api_client):
+        assert pods.get_pod_by_name(name="backend", namespace="frontend", api_client=fake_api_client) is None
+
+    def test_iter_pods_by_labels_pages(self, fake_apiserver, fake_api_client):
+        for index in range(5):
+            fake_apiserver.add({
+                "kind": "Pod",
+                "metadata": {"name": f"worker-{index}", "namespace": "jobs", "labels": {"app": "worker"}},
+                "spec": {"containers": [{"name": "worker", "image": "busybox"}]}
+            })
+
+        names = [
+            pod.metadata.name
+            for pod in pods.iter_pods_by_labels({"app": "worker"}, "jobs", page_size=2, api_client=fake_api_client)
+        ]
+
+        assert names == [f"worker-{index}" for index in range(5)]
+        assert len([path for method, path in fake_apiserver.requests if "/namespaces/jobs/pods" in path]) == 3
+
+    def test_latency(self, fake_apiserver, fake_api_client):
+        fake_apiserver.latency = 0.2
+
+        start = time.monotonic()
+        pods.get_pod_by_name(name="backend", namespace="backend", api_client=fake_api_client)
+
+        assert time.monotonic() - start >= 0.2
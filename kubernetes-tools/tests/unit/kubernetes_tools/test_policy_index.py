@@ -0,0 +1,117 @@
+from kubernetes import client
+
+from tests.test_utils import create_nwp
+
+from kubernetes_tools.policy_index import IPBlockIndex, PolicyIndex
+
+
+def create_policy(name: str, pod_match_labels: dict):
+    return create_nwp(
+        pod_match_labels=pod_match_labels,
+        peer_match_labels={"app": "frontend"},
+        namespace="test-app",
+        name=name,
+        port=8080
+    )
+
+
+def names(policies) -> list[str]:
+    return [policy.metadata.name for policy in policies]
+
+
+class TestPolicyIndex:
+
+    def test_match_single_label(self):
+        index = PolicyIndex([
+            create_policy("backend", {"app": "backend"}),
+            create_policy("mysql", {"app": "mysql"})
+        ])
+
+        assert names(index.match({"app": "backend"})) == ["backend"]
+
+    def test_match_requires_all_selector_labels(self):
+        index = PolicyIndex([create_policy("backend-api", {"app": "backend", "tier": "api"})])
+
+        assert names(index.match({"app": "backend"})) == []
+        assert names(index.match({"app": "backend", "tier": "api", "version": "v1"})) == ["backend-api"]
+
+    def test_empty_selector_matches_all_pods(self):
+        index = PolicyIndex([
+            create_policy("deny-all", {}),
+            create_policy("backend", {"app": "backend"})
+        ])
+
+        assert names(index.match({})) == ["deny-all"]
+        assert names(index.match({"app": "backend"})) == ["backend", "deny-all"]
+
+    def test_no_match(self):
+        index = PolicyIndex([create_policy("backend", {"app": "backend"})])
+
+        assert names(index.match({"app": "frontend"})) == []
+
+    def test_add_replaces_policy_with_same_name(self):
+        index = PolicyIndex([create_policy("backend", {"app": "backend"})])
+        index.add(create_policy("backend", {"app": "mysql"}))
+
+        assert len(index) == 1
+        assert names(index.match({"app": "backend"})) == []
+        assert names(index.match({"app": "mysql"})) == ["backend"]
+
+    def test_remove(self):
+        policy = create_policy("backend", {"app": "backend"})
+        index = PolicyIndex([policy, create_policy("deny-all", {})])
+
+        index.remove(policy)
+
+        assert names(index.match({"app": "backend"})) == ["deny-all"]
+
+    def test_match_expressions(self):
+        policy = create_policy("not-frontend", {})
+        policy.spec.pod_selector.match_expressions = [
+            client.V1LabelSelectorRequirement(key="app", operator="NotIn", values=["frontend"])
+        ]
+        index = PolicyIndex([policy, create_policy("deny-all", {})])
+
+        assert names(index.match({"app": "backend"})) == ["deny-all", "not-frontend"]
+        assert names(index.match({"app": "frontend"})) == ["deny-all"]
+
+
+def create_ip_block_policy(name: str, cidr: str, excepts: list = None, port: int = 443, ingress: bool = False):
+    peer = client.V1NetworkPolicyPeer(ip_block=client.V1IPBlock(cidr=cidr, _except=excepts))
+    ports = [client.V1NetworkPolicyPort(port=port, protocol="TCP")]
+    return client.V1NetworkPolicy(
+        metadata=client.V1ObjectMeta(name=name, namespace="test-app"),
+        spec=client.V1NetworkPolicySpec(
+            pod_selector=client.V1LabelSelector(match_labels={"app": "backend"}),
+            policy_types=["Ingress"] if ingress else ["Egress"],
+            ingress=[client.V1NetworkPolicyIngressRule(_from=[peer], ports=ports)] if ingress else None,
+            egress=[client.V1NetworkPolicyEgressRule(to=[peer], ports=ports)] if not ingress else None
+        )
+    )
+
+
+class TestIPBlockIndex:
+
+    def test_egress_rules(self):
+        index = IPBlockIndex([
+            create_ip_block_policy("internal", "10.0.0.0/8", excepts=["10.2.0.0/16"]),
+            create_ip_block_policy("team", "10.2.0.0/16"),
+            create_ip_block_policy("ipv6", "fd00::/8"),
+        ])
+
+        assert [policy.metadata.name for policy, _ in index.egress_rules("10.1.2.3")] == ["internal"]
+        assert [policy.metadata.name for policy, _ in index.egress_rules("10.2.3.4")] == ["team"]
+        assert [policy.metadata.name for policy, _ in index.egress_rules("10.2.3.4", "fd00::4")] == ["team", "ipv6"]
+        assert index.ingress_rules("10.1.2.3") == []
+
+    def test_rule_without_peers_selects_all_addresses(self):
+        policy = create_ip_block_policy("all", "10.0.0.0/8")
+        policy.spec.egress[0].to = None
+
+        assert [policy.metadata.name for policy, _ in IPBlockIndex([policy]).egress_rules("192.168.1.1")] == ["all"]
+
+    def test_ingress_rules(self):
+        index = IPBlockIndex([create_ip_block_policy("monitoring", "192.168.0.0/24", ingress=True)])
+
+        assert [policy.metadata.name for policy, _ in index.ingress_rules("192.168.0.10")] == ["monitoring"]
+        assert index.egress_rules("192.168.0.10") == []
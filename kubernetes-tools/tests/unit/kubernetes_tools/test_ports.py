@@ -0,0 +1,86 @@
+from kubernetes import client
+
+from kubernetes_tools.ports import ALL_PORTS, compile_ports, get_port_names
+
+
+def create_port(port=None, protocol=None, end_port=None) -> client.V1NetworkPolicyPort:
+    return client.V1NetworkPolicyPort(port=port, protocol=protocol, end_port=end_port)
+
+
+def create_pod(*container_ports: client.V1ContainerPort) -> client.V1Pod:
+    return client.V1Pod(
+        metadata=client.V1ObjectMeta(name="web", namespace="default"),
+        spec=client.V1PodSpec(containers=[client.V1Container(name="web", ports=list(container_ports))])
+    )
+
+
+class TestCompilePorts:
+
+    def test_no_ports_allow_everything(self):
+        assert compile_ports(None) is ALL_PORTS
+        assert compile_ports([]).allows(12345, "UDP")
+
+    def test_single_port(self):
+        compiled = compile_ports([create_port(8080)])
+
+        assert compiled.allows(8080)
+        assert compiled.allows(8080, "tcp")
+        assert not compiled.allows(8081)
+        assert not compiled.allows(8080, "UDP")
+
+    def test_port_without_number_allows_all_ports_of_protocol(self):
+        compiled = compile_ports([create_port(protocol="UDP")])
+
+        assert compiled.allows(1, "UDP")
+        assert compiled.allows(65535, "UDP")
+        assert not compiled.allows(53, "TCP")
+
+    def test_end_port_range(self):
+        compiled = compile_ports([create_port(32000, end_port=32768)])
+
+        assert compiled.allows(32000)
+        assert compiled.allows(32500)
+        assert compiled.allows(32768)
+        assert not compiled.allows(31999)
+        assert not compiled.allows(32769)
+
+    def test_overlapping_ranges_are_merged(self):
+        compiled = compile_ports([
+            create_port(100, end_port=200),
+            create_port(150, end_port=300),
+            create_port(301),
+            create_port(1000, end_port=1010),
+        ])
+
+        assert compiled.starts["TCP"] == [100, 1000]
+        assert compiled.ends["TCP"] == [301, 1010]
+        assert compiled.allows(250)
+        assert not compiled.allows(500)
+        assert compiled.allows(1005)
+
+    def test_numeric_string_port(self):
+        assert compile_ports([create_port("443")]).allows(443)
+
+    def test_named_port(self):
+        compiled = compile_ports([create_port("http")])
+        port_names = get_port_names(create_pod(
+            client.V1ContainerPort(container_port=8080, name="http"),
+            client.V1ContainerPort(container_port=9090, name="metrics")
+        ))
+
+        assert compiled.allows(8080, port_names=port_names)
+        assert not compiled.allows(9090, port_names=port_names)
+        assert not compiled.allows(8080, "UDP", port_names=port_names)
+        assert not compiled.allows(8080)
+
+
+class TestGetPortNames:
+
+    def test_named_ports_of_all_containers(self):
+        pod = create_pod(
+            client.V1ContainerPort(container_port=53, name="dns", protocol="UDP"),
+            client.V1ContainerPort(container_port=53, name="dns-tcp"),
+            client.V1ContainerPort(container_port=8080)
+        )
+
+        assert get_port_names(pod) == {"dns": ((53, "UDP"),), "dns-tcp": ((53, "TCP"),)}
@@ -0,0 +1,136 @@
+import json
+
+import pytest
+from kubernetes import client
+
+from kubernetes_tools import clients, projection
+
+
+def create_pod() -> client.V1Pod:
+    return client.V1Pod(
+        metadata=client.V1ObjectMeta(
+            name="backend",
+            namespace="test-app",
+            labels={"app": "backend"},
+            managed_fields=[client.V1ManagedFieldsEntry(manager="kubectl", operation="Apply")]
+        ),
+        spec=client.V1PodSpec(
+            node_name="kind-worker",
+            containers=[client.V1Container(
+                name="backend",
+                image="python:3.9-slim",
+                ports=[client.V1ContainerPort(container_port=8080, name="http")]
+            )]
+        ),
+        status=client.V1PodStatus(
+            phase="Running",
+            pod_ip="10.244.1.5",
+            pod_i_ps=[client.V1PodIP(ip="10.244.1.5"), client.V1PodIP(ip="fd00::5")]
+        )
+    )
+
+
+class FakeResponse:
+
+    def __init__(self, body: dict):
+        self.data = json.dumps(body).encode()
+
+
+class FakeCoreV1Api:
+
+    def __init__(self, body: dict):
+        self.body = body
+        self.calls = []
+
+    def list_namespaced_pod(self, **kwargs):
+        self.calls.append(kwargs)
+        return FakeResponse(self.body)
+
+
+class TestPodSummary:
+
+    def test_default_fields(self):
+        assert projection.summarize_pod(create_pod()) == {
+            "name": "backend",
+            "namespace": "test-app",
+            "labels": {"app": "backend"},
+            "ips": ["10.244.1.5", "fd00::5"],
+            "ports": [{"container": "backend", "name": "http", "port": 8080, "protocol": "TCP"}],
+            "phase": "Running",
+            "node": "kind-worker",
+        }
+
+    def test_field_sets_and_names(self):
+        summary = projection.summarize_pod(create_pod(), fields=["metadata", "images"])
+
+        assert summary == {
+            "name": "backend",
+            "namespace": "test-app",
+            "labels": {"app": "backend"},
+            "images": ["python:3.9-slim"],
+        }
+
+    def test_unknown_field(self):
+        with pytest.raises(ValueError):
+            projection.summarize_pod(create_pod(), fields=["managed_fields"])
+
+    def test_slots(self):
+        summary = projection.PodSummary.from_pod(create_pod())
+
+        with pytest.raises(AttributeError):
+            summary.spec = {}
+
+    def test_smaller_than_full_pod(self):
+        pod = create_pod()
+
+        assert len(json.dumps(projection.summarize_pod(pod))) < len(json.dumps(pod.to_dict(), default=str))
+
+
+class TestListPodSummaries:
+
+    def test_cheapest_source(self):
+        assert projection._cheapest_source(projection.resolve_fields("metadata"), None) == projection.METADATA
+        assert projection._cheapest_source(projection.resolve_fields(["name", "ips", "node"]), None) == projection.TABLE
+        assert projection._cheapest_source(projection.resolve_fields(None), None) == projection.OBJECTS
+
+    def test_table(self, monkeypatch):
+        api = FakeCoreV1Api({
+            "kind": "Table",
+            "columnDefinitions": [{"name": name} for name in ("Name", "Ready", "Status", "Restarts", "Age", "IP", "Node")],
+            "rows": [{
+                "cells": ["backend", "1/1", "Running", 0, "5m", "10.244.1.5", "kind-worker"],
+                "object": {"metadata": {"name": "backend", "namespace": "test-app", "labels": {"app": "backend"}}}
+            }]
+        })
+        monkeypatch.setattr(clients, "accepting_core_v1", lambda accept, api_client=None: api)
+
+        summaries = projection.list_pod_summaries("test-app", {"app": "backend"}, source=projection.TABLE)
+
+        assert api.calls[0]["label_selector"] == "app=backend"
+        assert [summary.to_dict() for summary in summaries] == [{
+            "name": "backend",
+            "namespace": "test-app",
+            "labels": {"app": "backend"},
+            "ips": ["10.244.1.5"],
+            "phase": "Running",
+            "node": "kind-worker",
+        }]
+
+    def test_metadata(self, monkeypatch):
+        api = FakeCoreV1Api({
+            "kind": "PartialObjectMetadataList",
+            "items": [{"metadata": {"name": "backend", "namespace": "test-app", "labels": {"app": "backend"}}}]
+        })
+        monkeypatch.setattr(clients, "accepting_core_v1", lambda accept, api_client=None: api)
+
+        summaries = projection.list_pod_summaries("test-app", fields="metadata")
+
+        assert [summary.to_dict("all") for summary in summaries] == [
+            {"name": "backend", "namespace": "test-app", "labels": {"app": "backend"}}
+        ]
+
+    def test_live_table(self):
+        summaries = projection.list_pod_summaries("test-app", {"app": "backend"}, source=projection.TABLE)
+
+        assert [summary.name for summary in summaries] == ["backend"]
+        assert summaries[0].phase == "Running"
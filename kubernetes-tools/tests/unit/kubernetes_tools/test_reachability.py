@@ -0,0 +1,134 @@
+from kubernetes import client
+
+from tests.test_utils import create_nwp
+
+from kubernetes_tools import reachability
+
+
+def create_pod(name: str, namespace: str, labels: dict, port: int = None) -> client.V1Pod:
+    return client.V1Pod(
+        metadata=client.V1ObjectMeta(name=name, namespace=namespace, labels=labels),
+        spec=client.V1PodSpec(containers=[
+            client.V1Container(
+                name=name,
+                ports=[client.V1ContainerPort(container_port=port)] if port else None
+            )
+        ])
+    )
+
+
+def create_namespace(name: str, labels: dict = None) -> client.V1Namespace:
+    return client.V1Namespace(metadata=client.V1ObjectMeta(name=name, labels=labels))
+
+
+def create_deny_all(namespace: str) -> client.V1NetworkPolicy:
+    return client.V1NetworkPolicy(
+        metadata=client.V1ObjectMeta(name="deny-all", namespace=namespace),
+        spec=client.V1NetworkPolicySpec(
+            pod_selector=client.V1LabelSelector(),
+            policy_types=["Ingress", "Egress"]
+        )
+    )
+
+
+def create_snapshot(network_policies: list) -> reachability.ClusterSnapshot:
+    return reachability.ClusterSnapshot(
+        pods=[
+            create_pod("frontend", "test-app", {"app": "frontend"}, 8080),
+            create_pod("backend-1", "test-app", {"app": "backend"}, 8080),
+            create_pod("backend-2", "test-app", {"app": "backend"}, 8080),
+            create_pod("mysql", "test-app", {"app": "mysql"}, 3306)
+        ],
+        namespaces=[create_namespace("test-app")],
+        network_policies=network_policies
+    )
+
+
+class TestReachability:
+
+    def test_no_policies_allow_everything(self):
+        matrix = reachability.compute_reachability(create_snapshot([]))
+
+        assert matrix.allows("test-app/frontend", "test-app/mysql", 3306) is True
+        assert matrix.allows("test-app/mysql", "test-app/frontend", 12345, "UDP") is True
+
+    def test_pods_with_same_labels_share_class(self):
+        matrix = reachability.compute_reachability(create_snapshot([]))
+
+        assert len(matrix.classes) == 3
+
+    def test_deny_all(self):
+        matrix = reachability.compute_reachability(create_snapshot([create_deny_all("test-app")]))
+
+        assert matrix.allows("test-app/backend-1", "test-app/mysql", 3306) is False
+        assert matrix.reachable_targets("test-app/backend-1", 3306) == []
+
+    def test_deny_all_with_allow_rules(self):
+        matrix = reachability.compute_reachability(create_snapshot([
+            create_deny_all("test-app"),
+            create_nwp({"app": "backend"}, {"app": "mysql"}, "test-app", "backend-egress", 3306, ingress=False),
+            create_nwp({"app": "mysql"}, {"app": "backend"}, "test-app", "mysql-ingress", 3306, ingress=True)
+        ]))
+
+        assert matrix.allows("test-app/backend-1", "test-app/mysql", 3306) is True
+        assert matrix.allows("test-app/backend-2", "test-app/mysql", 3306) is True
+        assert matrix.allows("test-app/backend-1", "test-app/mysql", 3307) is False
+        assert matrix.allows("test-app/backend-1", "test-app/mysql", 3306, "UDP") is False
+        assert matrix.allows("test-app/frontend", "test-app/mysql", 3306) is False
+        assert matrix.allows("test-app/mysql", "test-app/backend-1", 3306) is False
+        assert matrix.allowed_sources("test-app/mysql", 3306) == ["test-app/backend-1", "test-app/backend-2"]
+
+    def test_egress_only_allowed_is_not_enough(self):
+        matrix = reachability.compute_reachability(create_snapshot([
+            create_deny_all("test-app"),
+            create_nwp({"app": "backend"}, {"app": "mysql"}, "test-app", "backend-egress", 3306, ingress=False)
+        ]))
+
+        assert matrix.allows("test-app/backend-1", "test-app/mysql", 3306) is False
+
+    def test_ingress_policy_does_not_isolate_egress(self):
+        matrix = reachability.compute_reachability(create_snapshot([
+            create_nwp({"app": "mysql"}, {"app": "backend"}, "test-app", "mysql-ingress", 3306, ingress=True)
+        ]))
+
+        assert matrix.allows("test-app/backend-1", "test-app/mysql", 3306) is True
+        assert matrix.allows("test-app/frontend", "test-app/mysql", 3306) is False
+        assert matrix.allows("test-app/mysql", "test-app/frontend", 8080) is True
+
+    def test_namespace_selector_peer(self):
+        snapshot = create_snapshot([
+            create_deny_all("test-app")
+        ])
+        snapshot.pods.append(create_pod("monitoring", "monitoring", {"app": "prometheus"}))
+        snapshot.namespaces.append(create_namespace("monitoring", {"team": "observability"}))
+
+        ingress_nwp = create_nwp({"app": "backend"}, {}, "test-app", "allow-monitoring", 8080, ingress=True)
+        ingress_nwp.spec.ingress[0]._from[0].pod_selector = None
+        ingress_nwp.spec.ingress[0]._from[0].namespace_selector = client.V1LabelSelector(match_labels={"team": "observability"})
+        snapshot.network_policies.append(ingress_nwp)
+
+        matrix = reachability.compute_reachability(snapshot)
+
+        assert matrix.allows("monitoring/monitoring", "test-app/backend-1", 8080) is True
+        assert matrix.allows("test-app/frontend", "test-app/backend-1", 8080) is False
+
+    def test_ports_computed_on_demand(self):
+        matrix = reachability.compute_reachability(create_snapshot([]), ports=[])
+
+        assert matrix.allows("test-app/frontend", "test-app/backend-1", 9999) is True
+
+    def test_named_ports_resolve_per_destination(self):
+        snapshot = create_snapshot([create_deny_all("test-app")])
+        web = create_pod("web", "test-app", {"app": "web"})
+        web.spec.containers[0].ports = [client.V1ContainerPort(container_port=8080, name="http")]
+        snapshot.pods.append(web)
+
+        egress_nwp = create_nwp({"app": "frontend"}, {}, "test-app", "frontend-egress", "http", ingress=False)
+        ingress_nwp = create_nwp({}, {"app": "frontend"}, "test-app", "http-ingress", "http", ingress=True)
+        snapshot.network_policies.extend([egress_nwp, ingress_nwp])
+
+        matrix = reachability.compute_reachability(snapshot)
+
+        assert matrix.allows("test-app/frontend", "test-app/web", 8080) is True
+        assert matrix.allows("test-app/frontend", "test-app/backend-1", 8080) is False
+        assert matrix.allows("test-app/frontend", "test-app/web", 9090) is False
@@ -0,0 +1,106 @@
+import itertools
+
+import pytest
+from kubernetes import client
+
+from tests.test_utils import create_nwp
+
+from kubernetes_tools import selector_matrix, selectors
+
+
+@pytest.fixture(params=["index", "numpy"])
+def implementation(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(selector_matrix, "np", None)
+    return request.param
+
+
+def create_pod(name: str, namespace: str, labels: dict) -> client.V1Pod:
+    return client.V1Pod(metadata=client.V1ObjectMeta(name=name, namespace=namespace, labels=labels))
+
+
+def create_policy(name: str, namespace: str, match_labels: dict = None, match_expressions: list = None):
+    policy = create_nwp({}, {}, namespace, name, 80)
+    policy.spec.pod_selector = client.V1LabelSelector(
+        match_labels=match_labels,
+        match_expressions=[
+            client.V1LabelSelectorRequirement(key=key, operator=operator, values=values)
+            for key, operator, values in match_expressions or []
+        ]
+    )
+    return policy
+
+
+def names(objects) -> list:
+    return [obj.metadata.name for obj in objects]
+
+
+class TestComputeSelectionMatrix:
+
+    def test_match_labels(self, implementation):
+        matrix = selector_matrix.compute_selection_matrix(
+            [
+                create_pod("backend", "test-app", {"app": "backend", "tier": "api"}),
+                create_pod("frontend", "test-app", {"app": "frontend"}),
+                create_pod("unlabeled", "test-app", None)
+            ],
+            [
+                create_policy("backend", "test-app", {"app": "backend"}),
+                create_policy("api", "test-app", {"app": "backend", "tier": "api"}),
+                create_policy("all", "test-app")
+            ]
+        )
+
+        assert names(matrix.policies_for(0)) == ["backend", "api", "all"]
+        assert names(matrix.policies_for(1)) == ["all"]
+        assert names(matrix.policies_for(2)) == ["all"]
+        assert names(matrix.pods_for(1)) == ["backend"]
+        assert matrix.count() == 5
+
+    def test_policies_only_select_pods_of_their_namespace(self, implementation):
+        matrix = selector_matrix.compute_selection_matrix(
+            [create_pod("backend", "test-app", {"app": "backend"}), create_pod("backend", "other", {"app": "backend"})],
+            [create_policy("backend", "test-app", {"app": "backend"}), create_policy("all", "other")]
+        )
+
+        assert names(matrix.policies_for(0)) == ["backend"]
+        assert names(matrix.policies_for(1)) == ["all"]
+
+    def test_match_expressions_agree_with_compiled_selector(self, implementation):
+        expressions = [
+            ("app", "In", ["backend", "mysql"]),
+            ("app", "NotIn", ["frontend"]),
+            ("tier", "Exists", None),
+            ("tier", "DoesNotExist", None),
+            ("app", "In", []),
+        ]
+        policies = [
+            create_policy(f"policy-{index}", "test-app", match_labels, [expression])
+            for index, (match_labels, expression) in enumerate(
+                itertools.product([None, {"app": "backend"}, {"tier": "db"}], expressions)
+            )
+        ]
+        pods = [
+            create_pod(f"pod-{index}", "test-app", labels)
+            for index, labels in enumerate([
+                {}, {"app": "backend"}, {"app": "frontend"}, {"app": "mysql", "tier": "db"},
+                {"app": "backend", "tier": "api"}, {"tier": "db"}
+            ])
+        ]
+
+        matrix = selector_matrix.compute_selection_matrix(pods, policies)
+
+        for row, pod in enumerate(pods):
+            expected = [
+                policy for policy in policies
+                if selectors.compile_policy(policy).pod_selector.matches(pod.metadata.labels)
+            ]
+            assert names(matrix.policies_for(row)) == names(expected), pod.metadata.labels
+
+    def test_empty(self, implementation):
+        matrix = selector_matrix.compute_selection_matrix([create_pod("backend", "test-app", {})], [])
+
+        assert matrix.policies_for(0) == []
+        assert matrix.count() == 0
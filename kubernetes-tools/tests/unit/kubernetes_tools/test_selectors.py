@@ -0,0 +1,110 @@
+import pytest
+from kubernetes import client
+
+from tests.test_utils import create_nwp
+
+from kubernetes_tools import selectors
+
+
+def create_selector(match_labels: dict = None, match_expressions: list = None) -> client.V1LabelSelector:
+    return client.V1LabelSelector(
+        match_labels=match_labels,
+        match_expressions=[
+            client.V1LabelSelectorRequirement(key=key, operator=operator, values=values)
+            for key, operator, values in match_expressions or []
+        ]
+    )
+
+
+class TestCompileSelector:
+
+    def test_match_labels(self):
+        selector = selectors.compile_selector(create_selector({"app": "backend"}))
+
+        assert selector.matches({"app": "backend", "tier": "api"}) is True
+        assert selector.matches({"app": "frontend"}) is False
+        assert selector.matches({}) is False
+
+    def test_empty_selector_matches_everything(self):
+        selector = selectors.compile_selector(create_selector())
+
+        assert selector.is_empty() is True
+        assert selector.matches({}) is True
+        assert selector.matches({"app": "backend"}) is True
+
+    def test_none_selector_matches_everything(self):
+        assert selectors.compile_selector(None).matches({"app": "backend"}) is True
+
+    def test_in(self):
+        selector = selectors.compile_selector(create_selector(match_expressions=[("app", "In", ["backend", "mysql"])]))
+
+        assert selector.matches({"app": "mysql"}) is True
+        assert selector.matches({"app": "frontend"}) is False
+        assert selector.matches({}) is False
+
+    def test_not_in(self):
+        selector = selectors.compile_selector(create_selector(match_expressions=[("app", "NotIn", ["frontend"])]))
+
+        assert selector.matches({"app": "backend"}) is True
+        assert selector.matches({}) is True
+        assert selector.matches({"app": "frontend"}) is False
+
+    def test_exists(self):
+        selector = selectors.compile_selector(create_selector(match_expressions=[("tier", "Exists", None)]))
+
+        assert selector.matches({"tier": "api"}) is True
+        assert selector.matches({"app": "backend"}) is False
+
+    def test_does_not_exist(self):
+        selector = selectors.compile_selector(create_selector(match_expressions=[("tier", "DoesNotExist", None)]))
+
+        assert selector.matches({"app": "backend"}) is True
+        assert selector.matches({"tier": "api"}) is False
+
+    def test_match_labels_and_expressions_combined(self):
+        selector = selectors.compile_selector(create_selector(
+            {"app": "backend"},
+            [("tier", "In", ["api"])]
+        ))
+
+        assert selector.matches({"app": "backend", "tier": "api"}) is True
+        assert selector.matches({"app": "backend", "tier": "web"}) is False
+        assert selector.matches({"app": "mysql", "tier": "api"}) is False
+
+    def test_unknown_operator(self):
+        with pytest.raises(ValueError):
+            selectors.compile_selector(create_selector(match_expressions=[("app", "Gt", ["1"])]))
+
+
+class TestCompilePolicy:
+
+    def test_cached_by_uid_and_resource_version(self):
+        nwp = create_nwp({"app": "mysql"}, {"app": "backend"}, "test-app", "ingress-policy", 3306)
+        nwp.metadata.uid = "4d5c0f7e-1b4e-4a55-9c3a-0d1b5f7f2a11"
+        nwp.metadata.resource_version = "1"
+
+        compiled = selectors.compile_policy(nwp)
+
+        assert selectors.compile_policy(nwp) is compiled
+
+        nwp.metadata.resource_version = "2"
+
+        assert selectors.compile_policy(nwp) is not compiled
+
+    def test_not_cached_without_uid(self):
+        nwp = create_nwp({"app": "mysql"}, {"app": "backend"}, "test-app", "ingress-policy", 3306)
+
+        assert selectors.compile_policy(nwp) is not selectors.compile_policy(nwp)
+
+    def test_compiled_peers(self):
+        nwp = create_nwp({"app": "mysql"}, {"app": "backend"}, "test-app", "ingress-policy", 3306)
+
+        compiled = selectors.compile_policy(nwp)
+
+        assert compiled.pod_selector.matches({"app": "mysql"}) is True
+        assert len(compiled.ingress_peers) == 1
+        assert compiled.egress_peers == ()
+
+        peer = compiled.ingress_peers[0][0]
+        assert peer.matches_pod("test-app", {"app": "backend"}, "test-app", None) is True
+        assert peer.matches_pod("test-app", {"app": "backend"}, "other", None) is False
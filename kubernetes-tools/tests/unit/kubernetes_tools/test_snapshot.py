@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+from kubernetes import client
+
+from tests.test_utils import apply_nwp, create_nwp
+from tests.unit.kubernetes_tools.test_reachability import create_deny_all, create_namespace, create_pod
+
+from kubernetes_tools import agent_tools, clients, diagnosis, informer, networkpolicy, pods, reachability, snapshot
+
+
+def create_objects() -> dict:
+    backend = create_pod("backend", "test-app", {"app": "backend"})
+    backend.status = client.V1PodStatus(pod_ip="10.244.0.2")
+    mysql = create_pod("mysql", "test-app", {"app": "mysql"}, 3306)
+    mysql.status = client.V1PodStatus(pod_ip="10.244.0.3")
+    mysql.metadata.managed_fields = [client.V1ManagedFieldsEntry(manager="kubectl", operation="Apply")]
+    return {
+        informer.NAMESPACES: [create_namespace("test-app"), create_namespace("other")],
+        informer.PODS: [mysql, backend, {"metadata": {"name": "web", "namespace": "other"}, "status": {"podIP": "10.244.0.9"}}],
+        informer.NETWORK_POLICIES: [
+            create_deny_all("test-app"),
+            create_nwp({"app": "mysql"}, {"app": "backend"}, "test-app", "mysql-ingress", 3306),
+        ],
+    }
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = str(tmp_path / "cluster.snap")
+    snapshot.dump_snapshot(path, create_objects(), snapshot.JSON)
+    return path
+
+
+class TestSnapshot:
+
+    def test_get_and_list(self, snapshot_path):
+        with snapshot.load_snapshot(snapshot_path) as loaded:
+            assert loaded.count() == 7
+            assert loaded.count(informer.PODS) == 3
+            assert loaded.namespaces(informer.PODS) == ["other", "test-app"]
+            assert loaded.get(informer.PODS, "test-app", "mysql").spec.containers[0].ports[0].container_port == 3306
+            assert loaded.get(informer.PODS, "test-app", "web") is None
+            assert loaded.get(informer.PODS, "missing", "web") is None
+            assert loaded.get(informer.NAMESPACES, None, "other").metadata.name == "other"
+            assert [pod.metadata.name for pod in loaded.list(informer.PODS)] == ["web", "backend", "mysql"]
+            assert [pod.metadata.name for pod in loaded.list(informer.PODS, "test-app")] == ["backend", "mysql"]
+            assert loaded.list(snapshot.SERVICES) == []
+
+    def test_objects_are_decoded_once(self, snapshot_path):
+        with snapshot.load_snapshot(snapshot_path) as loaded:
+            pod = loaded.get(informer.PODS, "test-app", "mysql")
+
+            assert loaded.list(informer.PODS, "test-app")[1] is pod
+
+    def test_managed_fields_are_dropped(self, snapshot_path):
+        with snapshot.load_snapshot(snapshot_path) as loaded:
+            pod = loaded.get(informer.PODS, "test-app", "mysql")
+
+        assert pod.metadata.managed_fields is None
+        assert pod.status.pod_ip == "10.244.0.3"
+
+    def test_revisions_differ_between_loads(self, snapshot_path):
+        with snapshot.load_snapshot(snapshot_path) as first, snapshot.load_snapshot(snapshot_path) as second:
+            assert first.revision != second.revision
+
+    def test_dump_without_kubeconfig(self, monkeypatch, tmp_path):
+        def get_api_client():
+            raise AssertionError("the kubeconfig must not be loaded")
+
+        monkeypatch.setattr(clients, "get_api_client", get_api_client)
+        path = str(tmp_path / "cluster.snap")
+        snapshot.dump_snapshot(path, create_objects(), snapshot.JSON)
+
+        with snapshot.load_snapshot(path) as loaded:
+            assert loaded.get(informer.PODS, "test-app", "backend").status.pod_ip == "10.244.0.2"
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "cluster.json"
+        path.write_bytes(b'{"kind": "PodList", "items": []}' * 2)
+
+        with pytest.raises(ValueError, match="not a snapshot"):
+            snapshot.load_snapshot(str(path))
+
+    def test_msgpack_encoding(self, tmp_path):
+        pytest.importorskip("msgpack")
+        path = str(tmp_path / "cluster.snap")
+        snapshot.dump_snapshot(path, create_objects(), snapshot.MSGPACK)
+
+        with snapshot.load_snapshot(path) as loaded:
+            assert loaded.encoding == snapshot.MSGPACK
+            assert loaded.get(informer.PODS, "test-app", "backend").metadata.labels == {"app": "backend"}
+
+    def test_write_snapshot(self, fake_cluster, tmp_path):
+        apply_nwp(create_nwp({"app": "mysql"}, {"app": "backend"}, "db", "mysql-ingress", 3306))
+        path = str(tmp_path / "cluster.snap")
+
+        assert snapshot.write_snapshot(path) == 10
+
+        with snapshot.load_snapshot(path) as loaded:
+            assert loaded.namespaces(informer.PODS) == ["backend", "db", "frontend"]
+            assert [namespace.metadata.name for namespace in loaded.list(informer.NAMESPACES)] == ["backend", "db", "frontend"]
+            assert loaded.get(snapshot.SERVICES, "db", "mysql").spec.ports[0].port == 3306
+            assert loaded.get(informer.NETWORK_POLICIES, "db", "mysql-ingress").spec.pod_selector.match_labels == {"app": "mysql"}
+
+
+class TestSnapshotMode:
+
+    def test_reads_served_from_snapshot(self, fake_cluster, tmp_path):
+        path = str(tmp_path / "cluster.snap")
+        snapshot.write_snapshot(path)
+        fake_cluster.clear()
+
+        snapshot.enable(path)
+        try:
+            assert pods.get_pod_by_name("mysql", "db").metadata.labels == {"app": "db"}
+            assert pods.get_pod_by_name("mysql", "backend") is None
+            assert [pod.metadata.name for pod in pods.get_pods_by_labels({"app": "backend"}, "backend").items] == ["backend"]
+            assert list(pods.get_pods_by_labels_in_namespaces({"app": "db"})) == ["db"]
+            assert networkpolicy.list_network_policies("db") == []
+            assert len(reachability.take_snapshot().pods) == 3
+            assert fake_cluster.requests == []
+        finally:
+            snapshot.disable()
+
+        assert not snapshot.is_enabled()
+        assert informer.get_store(informer.PODS, "db") is None
+
+    def test_diagnosis_without_cluster(self, snapshot_path):
+        snapshot.enable(snapshot_path)
+        try:
+            from_backend = diagnosis.diagnose_connectivity("test-app/backend", "test-app/mysql", 3306, probe=False)
+            from_web = diagnosis.diagnose_connectivity("other/web", "test-app/mysql", 3306, probe=False)
+        finally:
+            snapshot.disable()
+
+        assert from_backend.verdict == diagnosis.EGRESS_DENIED
+        assert [policy.name for policy in from_backend.ingress_policies if policy.allows] == ["mysql-ingress"]
+        assert from_web.verdict == diagnosis.INGRESS_DENIED
+        assert from_web.egress_policies == []
+
+    def test_policy_tools_without_cluster(self, snapshot_path):
+        ingress = {"namespace": "test-app", "port": 3306, "peer_selector": {"app": "backend"}}
+        egress = {"namespace": "test-app", "port": 3306, "selector": {"app": "mysql"}}
+
+        snapshot.enable(snapshot_path)
+        try:
+            assert agent_tools.check_network_policy_allows_ingress.invoke({"policy_name": "mysql-ingress", **ingress})
+            assert not agent_tools.check_network_policy_allows_ingress.invoke({"policy_name": "missing", **ingress})
+            assert not agent_tools.check_network_policy_allows_egress.invoke({"policy_name": "deny-all", **egress})
+            assert agent_tools.contains_ingress_rule.invoke({"network_policy_name": "mysql-ingress", **ingress})
+            assert not agent_tools.contains_ingress_rule.invoke({"network_policy_name": "missing", **ingress})
+            assert not agent_tools.contains_egress_rule.invoke(
+                {"network_policy_name": "deny-all", "namespace": "test-app", "port": 3306, "peer_selector": {"app": "mysql"}}
+            )
+            assert asyncio.run(agent_tools.contains_ingress_rule.ainvoke({"network_policy_name": "mysql-ingress", **ingress}))
+            assert not asyncio.run(agent_tools.contains_egress_rule.ainvoke(
+                {"network_policy_name": "missing", "namespace": "test-app", "port": 3306, "peer_selector": {"app": "mysql"}}
+            ))
+        finally:
+            snapshot.disable()
+
+    def test_async_tools_without_cluster(self, snapshot_path, monkeypatch):
+        pytest.importorskip("kubernetes_asyncio")
+        from kubernetes_tools.aio import clients as aio_clients
+
+        async def get_api_client():
+            raise AssertionError("the API server must not be called")
+
+        monkeypatch.setattr(aio_clients, "get_api_client", get_api_client)
+
+        async def invoke_tools():
+            return await asyncio.gather(
+                agent_tools.get_pod_by_name.ainvoke({"name": "mysql", "namespace": "test-app", "fields": ["name"]}),
+                agent_tools.get_pod_ip_addresses.ainvoke({"pod_name": "backend", "namespace": "test-app"}),
+                agent_tools.check_pod_exposes_port.ainvoke({"pod_name": "mysql", "namespace": "test-app", "port": 3306}),
+                agent_tools.get_network_policies_for_pod.ainvoke({"pod_name": "mysql", "namespace": "test-app"}),
+                agent_tools.get_pod_by_name.ainvoke({"name": "missing", "namespace": "test-app"}),
+            )
+
+        snapshot.enable(snapshot_path)
+        try:
+            pod, ips, exposed, policies, missing = asyncio.run(invoke_tools())
+        finally:
+            snapshot.disable()
+
+        assert pod == {"name": "mysql"}
+        assert ips == ["10.244.0.2"]
+        assert exposed.container_name == "mysql"
+        assert sorted(policy["metadata"]["name"] for policy in policies) == ["deny-all", "mysql-ingress"]
+        assert missing is None
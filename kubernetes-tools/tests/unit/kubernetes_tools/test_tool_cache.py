@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+import pytest
+from tests.test_utils import apply_nwp, create_nwp
+
+from kubernetes_tools import agent_tools, informer, tool_cache
+
+THREAD = {"configurable": {"thread_id": "thread-1"}}
+
+
+@pytest.fixture
+def cache():
+    cache = tool_cache.enable()
+    yield cache
+    tool_cache.disable()
+
+
+def pod_requests(fake_apiserver) -> list:
+    return [path for method, path in fake_apiserver.requests if path.startswith("/api/v1/namespaces/backend/pods/backend")]
+
+
+class TestToolCache:
+
+    def test_repeated_call_is_cached(self, cache, fake_cluster):
+        first = agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"}, THREAD)
+        second = agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"}, THREAD)
+
+        assert second == first
+        assert len(pod_requests(fake_cluster)) == 1
+        assert len(cache) == 1
+
+    def test_other_arguments_are_not_cached(self, cache, fake_cluster):
+        agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"}, THREAD)
+        result = agent_tools.get_pod_by_name.invoke(
+            {"name": "backend", "namespace": "backend", "fields": ["name"]}, THREAD
+        )
+
+        assert result == {"name": "backend"}
+        assert len(pod_requests(fake_cluster)) == 2
+
+    def test_threads_are_separated(self, cache, fake_cluster):
+        agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"}, THREAD)
+        agent_tools.get_pod_by_name.invoke(
+            {"name": "backend", "namespace": "backend"}, {"configurable": {"thread_id": "thread-2"}}
+        )
+
+        assert len(pod_requests(fake_cluster)) == 2
+
+    def test_not_cached_without_thread(self, cache, fake_cluster):
+        agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"})
+        agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"})
+
+        assert len(pod_requests(fake_cluster)) == 2
+        assert len(cache) == 0
+
+    def test_not_cached_when_disabled(self, fake_cluster):
+        agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"}, THREAD)
+        agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"}, THREAD)
+
+        assert len(pod_requests(fake_cluster)) == 2
+
+    def test_invalidated_by_store_revision(self, cache, fake_cluster):
+        informer.enable()
+        try:
+            arguments = {"pod_name": "mysql", "namespace": "db"}
+            assert agent_tools.get_network_policies_for_pod.invoke(arguments, THREAD) == []
+
+            store = informer.get_store(informer.NETWORK_POLICIES, "db")
+            revision = store.revision
+            apply_nwp(create_nwp({"app": "db"}, {"app": "backend"}, "db", "allow-backend", 3306))
+            deadline = time.monotonic() + 10
+            while store.revision == revision and time.monotonic() < deadline:
+                time.sleep(0.05)
+            policies = agent_tools.get_network_policies_for_pod.invoke(arguments, THREAD)
+
+            assert [policy["metadata"]["name"] for policy in policies] == ["allow-backend"]
+        finally:
+            informer.disable()
+
+    def test_only_ttl_without_store(self, cache, fake_cluster):
+        arguments = {"pod_name": "mysql", "namespace": "db"}
+        assert agent_tools.get_network_policies_for_pod.invoke(arguments, THREAD) == []
+
+        apply_nwp(create_nwp({"app": "db"}, {"app": "backend"}, "db", "allow-backend", 3306))
+        fake_cluster.requests.clear()
+
+        assert agent_tools.get_network_policies_for_pod.invoke(arguments, THREAD) == []
+        assert fake_cluster.requests == []
+
+    def test_expired(self, fake_cluster):
+        tool_cache.enable(ttl=0)
+        try:
+            agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"}, THREAD)
+            agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"}, THREAD)
+        finally:
+            tool_cache.disable()
+
+        assert len(pod_requests(fake_cluster)) == 2
+
+    def test_least_recently_used_evicted(self, fake_cluster):
+        cache = tool_cache.enable(max_entries=1)
+        try:
+            agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"}, THREAD)
+            agent_tools.get_pod_ip_addresses.invoke({"pod_name": "backend", "namespace": "backend"}, THREAD)
+            agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"}, THREAD)
+        finally:
+            tool_cache.disable()
+
+        assert len(pod_requests(fake_cluster)) == 3
+        assert len(cache) == 1
+
+    def test_reference_unchanged(self, fake_cluster):
+        tool_cache.enable(reference_unchanged=True)
+        try:
+            agent_tools.get_pod_ip_addresses.invoke({"pod_name": "frontend", "namespace": "frontend"}, THREAD)
+            agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"}, THREAD)
+            result = agent_tools.get_pod_by_name.invoke({"name": "backend", "namespace": "backend"}, THREAD)
+        finally:
+            tool_cache.disable()
+
+        assert result["unchanged_since_call"] == 2
+        assert "get_pod_by_name" in result["message"]
+
+    def test_async(self, cache):
+        calls = []
+
+        @tool_cache.cached()
+        async def read(name: str) -> str:
+            calls.append(name)
+            return name.upper()
+
+        async def read_twice():
+            from langchain_core.runnables.config import var_child_runnable_config
+            var_child_runnable_config.set(THREAD)
+            return [await read("backend"), await read(name="backend")]
+
+        assert asyncio.run(read_twice()) == ["BACKEND", "BACKEND"]
+        assert calls == ["backend"]